@@ -0,0 +1,139 @@
+"""
+Management command to load-test the heaviest API endpoints
+
+Runs against the configured database, so load a realistic volume first
+(generate_synthetic_data). Every endpoint is requested in-process through the
+full middleware stack; streamed responses are read to the end so that their
+queries and time are included.
+"""
+import json
+import resource
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+# (label, URL): dashboard, lists, map, stats and exports
+ENDPOINTS = [
+    ('dashboard', '/v1/analytics/dashboard/'),
+    ('service analytics', '/v1/analytics/services/'),
+    ('survey analytics', '/v1/analytics/surveys/'),
+    ('reference bundle', '/v1/directory/reference-bundle/'),
+    ('service list', '/v1/directory/services/'),
+    ('service search', '/v1/directory/services/?search=puskesmas'),
+    ('service stats', '/v1/directory/services/stats/'),
+    ('service map', '/v1/directory/services/map/?bbox=109.3,-7.8,109.8,-7.5'),
+    ('service clusters', '/v1/directory/services/map/?bbox=109.3,-7.8,109.8,-7.5&zoom=10'),
+    ('survey list', '/v1/surveys/surveys/'),
+    ('survey stats', '/v1/surveys/surveys/stats/'),
+    ('survey sync', '/v1/surveys/sync/surveys/'),
+    ('activity log list', '/v1/logs/activity/'),
+    ('activity log cursor', '/v1/logs/activity/?pagination=cursor'),
+    ('activity log stats', '/v1/logs/activity/stats/'),
+    ('service CSV export', '/v1/analytics/export/services/csv/'),
+]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of some values"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process (ru_maxrss is in KB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def timed_request(client, url):
+    """(status code, milliseconds, queries) of a GET request, read to the end"""
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        response = client.get(url)
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        elapsed = (time.perf_counter() - start) * 1000
+    return response.status_code, elapsed, len(context.captured_queries)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the dashboard, list, map, stats and export endpoints: latency, queries and memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Measured requests per endpoint (default: 20)')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per endpoint (default: 2)')
+        parser.add_argument('--role', default=User.Role.ADMIN, choices=User.Role.values,
+                            help='Role of the requesting user (default: ADMIN)')
+        parser.add_argument('--user', help='E-mail of the requesting user (overrides --role)')
+        parser.add_argument('--endpoint', help='Only endpoints whose label or URL contains this')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this JSON file')
+
+    def get_user(self, options):
+        users = User.objects.filter(is_active=True)
+        if options['user']:
+            user = users.filter(email=options['user']).first()
+        else:
+            user = users.filter(role=options['role']).order_by('pk').first()
+        if user is None:
+            raise CommandError('No matching active user; run seed_data or generate_synthetic_data first')
+        return user
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests must be at least 1')
+        endpoints = [
+            (label, url) for label, url in ENDPOINTS
+            if not options['endpoint'] or options['endpoint'] in label or options['endpoint'] in url
+        ]
+        if not endpoints:
+            raise CommandError(f"No endpoint matches {options['endpoint']!r}")
+
+        user = self.get_user(options)
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user=user)
+        self.stdout.write(f'Requesting as {user.email} ({user.role}), {options["requests"]} requests per endpoint\n')
+
+        self.stdout.write(
+            f"{'endpoint':<20} {'status':>6} {'p50 (ms)':>9} {'p95 (ms)':>9} {'max (ms)':>9} "
+            f"{'queries':>8} {'peak RSS (MB)':>14}"
+        )
+        results = []
+        for label, url in endpoints:
+            for _ in range(options['warmup']):
+                timed_request(client, url)
+            statuses, timings, queries = set(), [], []
+            for _ in range(options['requests']):
+                status, elapsed, count = timed_request(client, url)
+                statuses.add(status)
+                timings.append(elapsed)
+                queries.append(count)
+
+            result = {
+                'endpoint': label,
+                'url': url,
+                'status': sorted(statuses),
+                'p50_ms': round(statistics.median(timings), 2),
+                'p95_ms': round(percentile(timings, 0.95), 2),
+                'max_ms': round(max(timings), 2),
+                'queries': max(queries),
+                'peak_rss_mb': round(peak_rss_mb(), 1),
+            }
+            results.append(result)
+            status = ','.join(str(code) for code in result['status'])
+            line = (
+                f"{label:<20} {status:>6} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+                f"{result['max_ms']:>9.1f} {result['queries']:>8} {result['peak_rss_mb']:>14.1f}"
+            )
+            self.stdout.write(line if statuses == {200} else self.style.ERROR(line))
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(f"\nWrote {options['json_path']}")
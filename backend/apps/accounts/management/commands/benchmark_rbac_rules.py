@@ -0,0 +1,85 @@
+"""
+Management command to measure the per-request cost of RBAC rule matching
+"""
+import random
+import re
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.accounts.middleware import CompiledAccessRules, RBACValidationMiddleware
+
+METHODS = ['GET', 'GET', 'GET', 'POST', 'PATCH', 'DELETE']
+
+
+def match_uncompiled(rules, bypass_patterns, path, method):
+    """Rule matching as done per request before the rules were compiled"""
+    for pattern in bypass_patterns:
+        if re.match(pattern, path):
+            return None
+    return tuple(
+        tuple(methods[method])
+        for pattern, methods in rules.items()
+        if re.match(pattern, path) and methods.get(method)
+    )
+
+
+def scale_rules(rules, factor):
+    """Copy the rule set `factor` times under distinct URL prefixes"""
+    scaled = dict(rules)
+    for copy in range(1, factor):
+        for pattern, methods in rules.items():
+            scaled[pattern.replace('^/api/', f'^/api/ext{copy}/', 1)] = methods
+    return scaled
+
+
+def sample_paths(rules, count, seed=0):
+    """Request paths hitting the rules, with varying object ids"""
+    rng = random.Random(seed)
+    templates = [pattern.lstrip('^') for pattern in rules] + ['/api/accounts/profile/']
+    paths = []
+    for _ in range(count):
+        template = rng.choice(templates)
+        path = re.sub(r'\\d\+', lambda match: str(rng.randint(1, 100000)), template)
+        paths.append((path, rng.choice(METHODS)))
+    return paths
+
+
+class Command(BaseCommand):
+    help = 'Benchmark RBAC rule matching: uncompiled re.match loop vs compiled, memoized lookups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000, help='Requests per run (default: 20000)')
+        parser.add_argument('--scale', type=int, default=10, help='Size multiplier of the large rule set (default: 10)')
+
+    def time_per_request(self, match, paths):
+        start = time.perf_counter()
+        for path, method in paths:
+            match(path, method)
+        return (time.perf_counter() - start) / len(paths) * 1e6
+
+    def handle(self, *args, **options):
+        base_rules = RBACValidationMiddleware.ROLE_ACCESS_RULES
+        bypass = RBACValidationMiddleware.BYPASS_ENDPOINTS
+
+        self.stdout.write(f"{'rule set':<12} {'rules':>6} {'before (us)':>12} {'after (us)':>11} {'speedup':>8}")
+        rule_sets = [
+            ('existing', base_rules),
+            (f"{options['scale']}x", scale_rules(base_rules, options['scale'])),
+        ]
+        for label, rules in rule_sets:
+            paths = sample_paths(rules, options['requests'])
+            compiled = CompiledAccessRules(rules, bypass)
+
+            # Check both implementations agree before timing them
+            for path, method in paths[:500]:
+                if compiled.lookup(path, method) != match_uncompiled(rules, bypass, path, method):
+                    raise CommandError(f'Compiled rules disagree for {method} {path}')
+
+            before = self.time_per_request(
+                lambda path, method: match_uncompiled(rules, bypass, path, method), paths
+            )
+            after = self.time_per_request(compiled.lookup, paths)
+            self.stdout.write(
+                f'{label:<12} {len(rules):>6} {before:>12.2f} {after:>11.2f} {before / after:>7.1f}x'
+            )
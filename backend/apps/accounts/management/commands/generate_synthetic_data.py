@@ -0,0 +1,374 @@
+"""
+Management command to generate a production-scale synthetic dataset
+
+Unlike seed_data, rows are built in memory and written with bulk_create in
+large batches, with realistic distributions: services spread over the
+Kebumen kecamatan in proportion to their number of RT (neighbourhood units),
+DESDE-LTC main types weighted towards outpatient care, a role mix dominated
+by surveyors, surveys over the last few years and activity logs clustered in
+working hours. Everything bulk_create skips is done explicitly: geohash and
+region of services and surveys, search documents, activity log rollups (via
+write_activity_logs), service counts of the boundary layers and the
+dashboard snapshot.
+
+Generated users, services (with their surveys) and activity logs use the
+SYNTHETIC_DOMAIN e-mail domain, so that --clear removes them and nothing else.
+"""
+import math
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.analytics.snapshot import refresh_sections
+from apps.directory.geo import encode_geohash
+from apps.directory.models import (
+    MainTypeOfCare, BasicStableInputsOfCare, TargetPopulation, ServiceType, Service
+)
+from apps.directory.search import index_services
+from apps.geo.boundaries import invalidate_boundary_payloads
+from apps.geo.index import region_index
+from apps.logs.buffer import write_activity_logs
+from apps.logs.models import ActivityLog
+from apps.survey.models import Survey
+
+from .seed_data import Command as SeedDataCommand
+
+User = get_user_model()
+
+SYNTHETIC_DOMAIN = 'synthetic.invalid'
+SYNTHETIC_PASSWORD = 'synthetic123'
+
+# Kecamatan of Kabupaten Kebumen: (name, number of RT in 2023, approximate centre)
+KECAMATAN = [
+    ('Ayah', 416, -7.7762, 109.4110), ('Buayan', 346, -7.7634, 109.4567),
+    ('Puring', 320, -7.7421, 109.4823), ('Petanahan', 269, -7.7089, 109.5234),
+    ('Klirong', 305, -7.6845, 109.5612), ('Buluspesantren', 290, -7.6523, 109.5987),
+    ('Ambal', 313, -7.6234, 109.6345), ('Mirit', 266, -7.5912, 109.6678),
+    ('Bonorowo', 139, -7.5623, 109.7012), ('Prembun', 139, -7.5789, 109.7345),
+    ('Padureso', 85, -7.5456, 109.7623), ('Kutowinangun', 245, -7.6123, 109.6834),
+    ('Alian', 287, -7.6456, 109.6512), ('Poncowarno', 99, -7.5234, 109.7234),
+    ('Kebumen', 612, -7.6712, 109.6634), ('Pejagoan', 266, -7.6989, 109.6423),
+    ('Sruweng', 348, -7.7234, 109.6212), ('Adimulyo', 231, -7.6612, 109.7012),
+    ('Kuwarasan', 248, -7.6845, 109.7345), ('Rowokele', 327, -7.5012, 109.4234),
+    ('Sempor', 377, -7.5234, 109.4567), ('Gombong', 296, -7.6078, 109.5123),
+    ('Karanganyar', 243, -7.5789, 109.5456), ('Karanggayam', 403, -7.5456, 109.4012),
+    ('Sadang', 151, -7.5123, 109.3789), ('Karangsambung', 267, -7.5567, 109.4789),
+]
+
+# Share of services per DESDE-LTC main type (first letter of the MTC code)
+MTC_WEIGHTS = {'O': 45, 'D': 20, 'R': 15, 'A': 10, 'W': 10}
+
+SERVICE_NAMES = {
+    'O': ['Puskesmas', 'Klinik Kesehatan Jiwa', 'Poli Jiwa'],
+    'D': ['Rumah Singgah', 'Pusat Rehabilitasi', 'Posyandu Jiwa'],
+    'R': ['RSJ', 'Panti Rehabilitasi', 'Griya Pemulihan'],
+    'A': ['Layanan Krisis', 'Tim Reaksi Cepat Keswa'],
+    'W': ['Bengkel Kerja', 'Balai Latihan Kerja'],
+}
+
+ROLE_MIX = [
+    (User.Role.ADMIN, 2), (User.Role.SURVEYOR, 60), (User.Role.VERIFIER, 13), (User.Role.VIEWER, 25),
+]
+
+STATUS_MIX = [
+    (Survey.Status.DRAFT, 15), (Survey.Status.SUBMITTED, 25),
+    (Survey.Status.VERIFIED, 50), (Survey.Status.REJECTED, 10),
+]
+
+ACTION_MIX = [
+    (ActivityLog.Action.READ, 55), (ActivityLog.Action.LOGIN, 12), (ActivityLog.Action.UPDATE, 10),
+    (ActivityLog.Action.CREATE, 8), (ActivityLog.Action.SURVEY_SUBMIT, 4),
+    (ActivityLog.Action.SURVEY_VERIFY, 3), (ActivityLog.Action.EXPORT, 3),
+    (ActivityLog.Action.LOGOUT, 3), (ActivityLog.Action.LOGIN_FAILED, 2),
+]
+MODEL_NAMES = ['Service', 'Survey', 'User']
+
+
+def weighted(rng, pairs, k=1):
+    """k values drawn from (value, weight) pairs"""
+    values, weights = zip(*pairs)
+    return rng.choices(values, weights=weights, k=k)
+
+
+@contextmanager
+def explicit_timestamps(model, *field_names):
+    """Let bulk_create keep the given values of auto_now/auto_now_add fields"""
+    fields = [model._meta.get_field(name) for name in field_names]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Generate a large synthetic dataset with bulk inserts (services, surveys, users, activity logs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500, help='Users to create (default: 500)')
+        parser.add_argument('--services', type=int, default=50000, help='Services to create (default: 50000)')
+        parser.add_argument('--surveys', type=int, default=500000, help='Surveys to create (default: 500000)')
+        parser.add_argument(
+            '--activity-logs', type=int, default=10000000, help='Activity log entries to create (default: 10000000)'
+        )
+        parser.add_argument('--days', type=int, default=3 * 365, help='Days of history to spread rows over (default: 1095)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT (default: 5000)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument('--clear', action='store_true', help='Delete previously generated data first')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.days = options['days']
+        self.now = timezone.now()
+
+        if options['clear']:
+            self.clear()
+
+        seed = SeedDataCommand(stdout=self.stdout)
+        seed.seed_mtc_classifications()
+        seed.seed_bsic_classifications()
+        seed.seed_target_populations()
+        seed.seed_service_types()
+
+        users = self.generate_users(options['users'])
+        services = self.generate_services(options['services'], users)
+        surveys = self.generate_surveys(options['surveys'], services, users)
+        logs = self.generate_activity_logs(options['activity_logs'], users)
+
+        invalidate_boundary_payloads()
+        refresh_sections()
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {len(users)} users, {len(services)} services, {surveys} surveys '
+            f'and {logs} activity log entries'
+        ))
+
+    def clear(self):
+        self.stdout.write(self.style.WARNING('Deleting previously generated data...'))
+        suffix = f'@{SYNTHETIC_DOMAIN}'
+        ActivityLog.objects.filter(username__endswith=suffix).delete()
+        Survey.objects.filter(service__email__endswith=suffix).delete()
+        Service.objects.filter(email__endswith=suffix).delete()
+        User.objects.filter(email__endswith=suffix).delete()
+
+    def random_moment(self):
+        """Datetime in the generated history, during working hours more often than not"""
+        day = self.now.date() - timedelta(days=self.rng.randrange(self.days))
+        hour = int(self.rng.triangular(6, 20, 10)) if self.rng.random() < 0.9 else self.rng.randrange(24)
+        return self.aware(datetime.combine(day, time(hour, self.rng.randrange(60), self.rng.randrange(60))))
+
+    def aware(self, moment):
+        return timezone.make_aware(moment) if timezone.is_aware(self.now) else moment
+
+    def batches(self, total):
+        """Sizes of the INSERT batches for `total` rows"""
+        for start in range(0, total, self.batch_size):
+            yield min(self.batch_size, total - start)
+
+    def generate_users(self, count):
+        """Users with the ROLE_MIX role distribution; returns {role: [id, ...]}"""
+        first = User.objects.filter(email__endswith=f'@{SYNTHETIC_DOMAIN}').count()
+        password = make_password(SYNTHETIC_PASSWORD)
+        # At least one user of every role, even in tiny datasets
+        roles = ([role for role, _ in ROLE_MIX] + weighted(self.rng, ROLE_MIX, count))[:count]
+        users = [
+            User(
+                email=f'user{n}@{SYNTHETIC_DOMAIN}', username=f'synthetic{n}', password=password,
+                role=role, first_name='Pengguna', last_name=str(n), organization='Dinkes Kebumen',
+            )
+            for n, role in zip(range(first, first + count), roles)
+        ]
+        for start in range(0, len(users), self.batch_size):
+            User.objects.bulk_create(users[start:start + self.batch_size])
+
+        by_role = {role: [] for role, _ in ROLE_MIX}
+        for pk, role in User.objects.filter(email__endswith=f'@{SYNTHETIC_DOMAIN}').values_list('id', 'role'):
+            by_role.setdefault(role, []).append(pk)
+        # Fewer users than roles: fall back to an existing user
+        fallback = User.objects.filter(is_active=True).values_list('id', flat=True).first()
+        for role in by_role:
+            if not by_role[role] and fallback:
+                by_role[role] = [fallback]
+        self.stdout.write(f'  ✓ {count} users')
+        return by_role
+
+    def build_service(self, n, mtc_by_letter, bsic_ids, type_ids, users):
+        name, rt, lat, lng = weighted(self.rng, [(k, k[1]) for k in KECAMATAN])[0]
+        letter = weighted(self.rng, [(key, value) for key, value in MTC_WEIGHTS.items() if mtc_by_letter.get(key)])[0]
+        latitude = Decimal(f'{lat + self.rng.gauss(0, 0.015):.6f}')
+        longitude = Decimal(f'{lng + self.rng.gauss(0, 0.015):.6f}')
+        service = Service(
+            name=f'{self.rng.choice(SERVICE_NAMES[letter])} {name} {n}',
+            description=f'Layanan kesehatan jiwa di Kecamatan {name}',
+            mtc_id=self.rng.choice(mtc_by_letter[letter]),
+            bsic_id=self.rng.choice(bsic_ids),
+            service_type_id=self.rng.choice(type_ids),
+            phone_number=f'+6228{self.rng.randrange(10 ** 7, 10 ** 8)}',
+            email=f'layanan{n}@{SYNTHETIC_DOMAIN}',
+            address=f'Jl. Raya {name} No. {self.rng.randint(1, 300)}',
+            city=name,
+            province='Jawa Tengah',
+            postal_code=f'54{self.rng.randint(300, 399)}',
+            latitude=latitude,
+            longitude=longitude,
+            bed_capacity=self.rng.randint(10, 200) if letter == 'R' else None,
+            staff_count=self.rng.randint(3, 80),
+            psychiatrist_count=self.rng.choice([0, 0, 1, 1, 2, 3]),
+            psychologist_count=self.rng.randint(0, 4),
+            nurse_count=self.rng.randint(1, 20),
+            social_worker_count=self.rng.randint(0, 5),
+            operating_hours='Senin-Sabtu: 07:30-14:00',
+            is_24_7=letter in ('R', 'A') and self.rng.random() < 0.7,
+            accepts_emergency=letter in ('R', 'A'),
+            accepts_bpjs=self.rng.random() < 0.85,
+            accepts_private_insurance=self.rng.random() < 0.3,
+            is_verified=self.rng.random() < 0.6,
+            is_active=self.rng.random() < 0.95,
+            created_by_id=self.rng.choice(users[User.Role.ADMIN]),
+            geohash=encode_geohash(latitude, longitude),
+        )
+        service.region_id = region_index.lookup(latitude, longitude) or region_index.lookup_name(name)
+        service.created_at = service.updated_at = self.random_moment()
+        return service
+
+    def generate_services(self, count, users):
+        """Services with target populations and search documents; returns [(id, lat, lng, region id)]"""
+        mtc_by_letter = {}
+        for pk, code in MainTypeOfCare.objects.filter(is_active=True).values_list('id', 'code'):
+            mtc_by_letter.setdefault(code[0], []).append(pk)
+        bsic_ids = list(BasicStableInputsOfCare.objects.values_list('id', flat=True))
+        type_ids = list(ServiceType.objects.values_list('id', flat=True))
+        population_ids = list(TargetPopulation.objects.values_list('id', flat=True))
+        Through = Service.target_populations.through
+
+        first = Service.objects.filter(email__endswith=f'@{SYNTHETIC_DOMAIN}').count()
+        services = []
+        n = first
+        for size in self.batches(count):
+            batch = [self.build_service(n + i, mtc_by_letter, bsic_ids, type_ids, users) for i in range(size)]
+            n += size
+            with explicit_timestamps(Service, 'created_at', 'updated_at'):
+                Service.objects.bulk_create(batch)
+            # Not every backend returns primary keys from bulk_create
+            ids = dict(Service.objects.filter(email__in=[s.email for s in batch]).values_list('email', 'id'))
+            Through.objects.bulk_create([
+                Through(service_id=ids[service.email], targetpopulation_id=population_id)
+                for service in batch
+                for population_id in self.rng.sample(population_ids, k=min(len(population_ids), self.rng.randint(1, 3)))
+            ])
+            index_services(Service.objects.filter(pk__in=ids.values()), batch_size=self.batch_size)
+            services.extend(
+                (ids[service.email], service.latitude, service.longitude, service.region_id)
+                for service in batch
+            )
+            self.stdout.write(f'  ✓ {len(services)}/{count} services')
+        return services
+
+    def generate_surveys(self, count, services, users):
+        """
+        Surveys spread over the services with a skewed (exponential) number
+        per service; returns the number created, which is lower than `count`
+        when the services cannot hold that many within --days
+        """
+        if not services or not count:
+            return 0
+        mean = count / len(services)
+        created = 0
+        pending = []
+        order = list(services)
+        self.rng.shuffle(order)
+        for service_id, latitude, longitude, region_id in order:
+            remaining = count - created - len(pending)
+            if remaining <= 0:
+                break
+            # A service has at most one survey per day
+            k = min(remaining, self.days, max(1, round(self.rng.expovariate(1 / mean))))
+            for offset in self.rng.sample(range(self.days), k):
+                pending.append(self.build_survey(service_id, latitude, longitude, region_id, offset, users))
+            if len(pending) >= self.batch_size:
+                created += self.write_surveys(pending)
+                pending = []
+        created += self.write_surveys(pending)
+        self.stdout.write(f'  ✓ {created} surveys')
+        return created
+
+    def build_survey(self, service_id, latitude, longitude, region_id, offset, users):
+        survey_date = self.now.date() - timedelta(days=offset)
+        status = weighted(self.rng, STATUS_MIX)[0]
+        patients = self.rng.randint(20, 600)
+        new_patients = self.rng.randint(0, patients // 3)
+        verifier = self.rng.choice(users[User.Role.VERIFIER])
+        created_at = self.aware(datetime.combine(survey_date, time(9)))
+        survey = Survey(
+            service_id=service_id,
+            survey_date=survey_date,
+            survey_period_start=survey_date - timedelta(days=30),
+            survey_period_end=survey_date,
+            latitude=latitude + Decimal(f'{self.rng.uniform(-0.0005, 0.0005):.6f}'),
+            longitude=longitude + Decimal(f'{self.rng.uniform(-0.0005, 0.0005):.6f}'),
+            location_accuracy=Decimal(f'{self.rng.uniform(3, 30):.2f}'),
+            region_id=region_id,
+            surveyor_id=self.rng.choice(users[User.Role.SURVEYOR]),
+            verification_status=status,
+            assigned_verifier_id=verifier if status != Survey.Status.DRAFT else None,
+            verified_by_id=verifier if status in (Survey.Status.VERIFIED, Survey.Status.REJECTED) else None,
+            verified_at=created_at + timedelta(days=self.rng.randint(1, 14))
+            if status in (Survey.Status.VERIFIED, Survey.Status.REJECTED) else None,
+            total_patients_served=patients,
+            new_patients=new_patients,
+            returning_patients=patients - new_patients,
+            patients_male=patients // 2,
+            patients_female=patients - patients // 2,
+            patient_satisfaction_score=Decimal(f'{min(5.0, self.rng.gauss(4.1, 0.4)):.2f}'),
+            average_wait_time_days=math.ceil(self.rng.expovariate(1 / 7)),
+            submitted_at=created_at + timedelta(hours=self.rng.randint(1, 72))
+            if status != Survey.Status.DRAFT else None,
+        )
+        survey.created_at = survey.updated_at = created_at
+        return survey
+
+    def write_surveys(self, surveys):
+        if surveys:
+            with explicit_timestamps(Survey, 'created_at', 'updated_at'):
+                Survey.objects.bulk_create(surveys)
+        return len(surveys)
+
+    def generate_activity_logs(self, count, users):
+        """Activity logs of the generated users, mostly reads during working hours"""
+        user_ids = [pk for ids in users.values() for pk in ids]
+        emails = dict(User.objects.filter(pk__in=user_ids).values_list('id', 'email'))
+        created = 0
+        for size in self.batches(count):
+            actions = weighted(self.rng, ACTION_MIX, size)
+            entries = []
+            for action in actions:
+                user_id = self.rng.choice(user_ids)
+                model_name = self.rng.choice(MODEL_NAMES)
+                entries.append(ActivityLog(
+                    user_id=user_id,
+                    username=emails[user_id],
+                    action=action,
+                    severity=ActivityLog.Severity.WARNING if action == ActivityLog.Action.LOGIN_FAILED
+                    else ActivityLog.Severity.INFO,
+                    description=f'{action.label} {model_name}',
+                    model_name=model_name,
+                    ip_address=f'10.{self.rng.randrange(256)}.{self.rng.randrange(256)}.{self.rng.randrange(1, 255)}',
+                    request_method='GET' if action == ActivityLog.Action.READ else 'POST',
+                    request_path=f'/v1/{model_name.lower()}s/',
+                    timestamp=self.random_moment(),
+                ))
+            # Also maintains the daily rollups
+            write_activity_logs(entries)
+            created += size
+            if created % (self.batch_size * 20) == 0 or created == count:
+                self.stdout.write(f'  ✓ {created}/{count} activity log entries')
+        return created
@@ -6,8 +6,59 @@ Provides additional security layer beyond Django REST Framework permissions
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
+from functools import lru_cache
 import re
 
+# Numeric path segments (object ids); rules match them with \d+
+NUMERIC_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+class CompiledAccessRules:
+    """
+    RBAC rules compiled once, with lookups memoized per path shape
+
+    Numeric segments are collapsed (/users/17/ -> /users/0/), so every
+    object of an endpoint shares one cache entry. If a rule contains a
+    literal numeric segment, lookups are memoized per exact path instead.
+    """
+
+    def __init__(self, rules, bypass_patterns, cache_size=4096):
+        self.rules = [
+            (re.compile(pattern), {method: tuple(roles) for method, roles in methods.items()})
+            for pattern, methods in rules.items()
+        ]
+        self.bypass = (
+            re.compile('|'.join(f'(?:{pattern})' for pattern in bypass_patterns))
+            if bypass_patterns else None
+        )
+        self.collapse_ids = not any(
+            NUMERIC_SEGMENT.search(pattern) for pattern in [*rules, *bypass_patterns]
+        )
+        self._resolve_shape = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def shape(self, path):
+        """Cache key of a request path"""
+        return NUMERIC_SEGMENT.sub('/0', path) if self.collapse_ids else path
+
+    def _resolve(self, shape, method):
+        if self.bypass is not None and self.bypass.match(shape):
+            return None
+        return tuple(
+            methods[method]
+            for pattern, methods in self.rules
+            if methods.get(method) and pattern.match(shape)
+        )
+
+    def lookup(self, path, method):
+        """
+        Role requirements of a request.
+
+        Returns None for bypassed endpoints, otherwise a tuple with the
+        allowed roles of every matching rule (in rule order); the user's role
+        must be in each of them.
+        """
+        return self._resolve_shape(self.shape(path), method)
+
 
 class RBACValidationMiddleware(MiddlewareMixin):
     """
@@ -81,6 +132,10 @@ class RBACValidationMiddleware(MiddlewareMixin):
         r'^/media/',  # Media files
     ]
 
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        self.access_rules = CompiledAccessRules(self.ROLE_ACCESS_RULES, self.BYPASS_ENDPOINTS)
+
     def process_request(self, request):
         """
         Validate user access before processing the request
@@ -89,10 +144,10 @@ class RBACValidationMiddleware(MiddlewareMixin):
         if not request.path.startswith('/api/'):
             return None
 
-        # Skip for bypassed endpoints
-        for pattern in self.BYPASS_ENDPOINTS:
-            if re.match(pattern, request.path):
-                return None
+        # Skip for bypassed endpoints and endpoints without rules for this method
+        requirements = self.access_rules.lookup(request.path, request.method)
+        if not requirements:
+            return None
 
         # Skip for unauthenticated requests (handled by DRF permissions)
         if not request.user or not request.user.is_authenticated:
@@ -104,22 +159,14 @@ class RBACValidationMiddleware(MiddlewareMixin):
 
         # Check role-based access rules
         method = request.method
-        path = request.path
         user_role = getattr(request.user, 'role', None)
 
-        for url_pattern, rules in self.ROLE_ACCESS_RULES.items():
-            if re.match(url_pattern, path):
-                allowed_roles = rules.get(method, [])
-
-                if not allowed_roles:
-                    # Method not explicitly allowed for this endpoint
-                    continue
-
-                if user_role not in allowed_roles:
-                    return JsonResponse({
-                        'detail': f'Your role ({user_role}) does not have permission to {method} this resource.',
-                        'required_roles': allowed_roles,
-                    }, status=403)
+        for allowed_roles in requirements:
+            if user_role not in allowed_roles:
+                return JsonResponse({
+                    'detail': f'Your role ({user_role}) does not have permission to {method} this resource.',
+                    'required_roles': list(allowed_roles),
+                }, status=403)
 
         return None
 
@@ -0,0 +1,7 @@
+"""
+Signal handlers invalidating the cached user stats (see core.caching)
+"""
+from core.caching import track_model_writes
+from .models import User, UserActivityLog
+
+track_model_writes(User, UserActivityLog)
@@ -1,6 +1,13 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.test import TestCase, RequestFactory
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from .middleware import CompiledAccessRules, RBACValidationMiddleware
 from .models import UserActivityLog
 
 User = get_user_model()
@@ -276,3 +283,105 @@ class UserManagerTests(TestCase):
 
         self.assertEqual(user1.username, 'test')
         self.assertEqual(user2.username, 'test1')
+
+
+class RBACValidationMiddlewareTests(TestCase):
+    """Test cases for the compiled RBAC route rules"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = RBACValidationMiddleware(lambda request: None)
+
+    def make_request(self, method, path, role):
+        request = getattr(self.factory, method.lower())(path)
+        request.user = User(email=f'{role.lower()}@example.com', role=role)
+        return request
+
+    def test_every_matching_rule_must_allow_the_role(self):
+        """A POST to set_role needs ADMIN on both matching rules"""
+        response = self.middleware.process_request(
+            self.make_request('POST', '/api/accounts/users/7/set_role/', 'SURVEYOR')
+        )
+
+        self.assertEqual(response.status_code, 403)
+        self.assertIsNone(self.middleware.process_request(
+            self.make_request('POST', '/api/accounts/users/7/set_role/', 'ADMIN')
+        ))
+        self.assertIsNone(self.middleware.process_request(
+            self.make_request('GET', '/api/accounts/users/7/', 'VIEWER')
+        ))
+
+    def test_bypassed_and_unruled_paths_allowed(self):
+        """Bypassed endpoints and methods without rules are not checked"""
+        for method, path in [('GET', '/api/accounts/profile/'), ('GET', '/api/survey/surveys/3/verify/')]:
+            self.assertIsNone(self.middleware.process_request(self.make_request(method, path, 'VIEWER')))
+
+    def test_lookups_memoized_per_path_shape(self):
+        """Paths differing only in object ids share one cached lookup"""
+        rules = CompiledAccessRules(
+            RBACValidationMiddleware.ROLE_ACCESS_RULES, RBACValidationMiddleware.BYPASS_ENDPOINTS
+        )
+        for pk in range(1, 50):
+            rules.lookup(f'/api/survey/surveys/{pk}/verify/', 'POST')
+
+        self.assertEqual(rules._resolve_shape.cache_info().currsize, 1)
+        self.assertEqual(
+            rules.lookup('/api/survey/surveys/5/verify/', 'POST'),
+            (('ADMIN', 'SURVEYOR'), ('ADMIN', 'VERIFIER'))
+        )
+
+
+class SyntheticDataTests(TestCase):
+    """generate_synthetic_data and benchmark_api at a small scale"""
+
+    def generate(self, **options):
+        call_command(
+            'generate_synthetic_data', users=20, services=30, surveys=120, activity_logs=300,
+            batch_size=50, stdout=StringIO(), **options
+        )
+
+    def test_generates_requested_rows(self):
+        """Bulk-inserted rows get what save() and signals would have set"""
+        from apps.directory.models import Service, ServiceSearchDocument
+        from apps.logs.models import ActivityLog, ActivityLogDailyRollup
+        from apps.survey.models import Survey
+
+        self.generate()
+
+        services = Service.objects.filter(email__endswith='@synthetic.invalid')
+        self.assertEqual(User.objects.filter(email__endswith='@synthetic.invalid').count(), 20)
+        self.assertEqual(services.count(), 30)
+        self.assertEqual(Survey.objects.filter(service__in=services).count(), 120)
+        self.assertEqual(ActivityLog.objects.filter(username__endswith='@synthetic.invalid').count(), 300)
+        self.assertFalse(services.filter(geohash='').exists())
+        self.assertEqual(ServiceSearchDocument.objects.filter(service__in=services).count(), 30)
+        self.assertFalse(services.filter(target_populations=None).exists())
+        self.assertEqual(
+            sum(ActivityLogDailyRollup.objects.values_list('count', flat=True)), 300
+        )
+        # Created dates are spread over the history
+        self.assertGreater(services.dates('created_at', 'day').count(), 1)
+
+    def test_clear_removes_generated_rows_only(self):
+        from apps.directory.models import Service
+
+        self.generate()
+        self.generate(clear=True)
+
+        self.assertEqual(User.objects.filter(email__endswith='@synthetic.invalid').count(), 20)
+        self.assertEqual(Service.objects.filter(email__endswith='@synthetic.invalid').count(), 30)
+
+    def test_benchmark_reports_every_endpoint(self):
+        from apps.accounts.management.commands.benchmark_api import ENDPOINTS
+
+        self.generate()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'benchmark.json')
+            call_command('benchmark_api', requests=1, warmup=0, json_path=path, stdout=StringIO())
+            with open(path) as handle:
+                results = json.load(handle)
+
+        self.assertEqual([row['endpoint'] for row in results], [label for label, _ in ENDPOINTS])
+        for row in results:
+            self.assertEqual(row['status'], [200], row['url'])
+            self.assertGreater(row['queries'], 0)
@@ -14,12 +14,13 @@ from .serializers import (
     ChangePasswordSerializer, UserActivityLogSerializer
 )
 from .permissions import IsAdmin, IsSurveyorOrAdmin, CanAccessUserData
+from core.caching import CachedResponseMixin
 from .mixins import StatusBasedFilterMixin
 
 User = get_user_model()
 
 
-class UserViewSet(StatusBasedFilterMixin, viewsets.ModelViewSet):
+class UserViewSet(CachedResponseMixin, StatusBasedFilterMixin, viewsets.ModelViewSet):
     """
     ViewSet for User model with role-based access control
     Uses StatusBasedFilterMixin for RBAC filtering
@@ -33,6 +34,10 @@ class UserViewSet(StatusBasedFilterMixin, viewsets.ModelViewSet):
     rbac_admin_sees_inactive = True
     rbac_verifier_sees_inactive = False
 
+    # Stats are cached (see core.caching)
+    response_cache_actions = ('stats',)
+    response_cache_models = (User, UserActivityLog)
+
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
 
     filterset_fields = {
@@ -168,6 +173,7 @@ class UserActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
 
 from rest_framework_simplejwt.views import TokenObtainPairView as BaseTokenObtainPairView
 from apps.logs.models import ActivityLog
+from apps.logs.buffer import submit_activity_log
 
 class CustomTokenObtainPairView(BaseTokenObtainPairView):
     """
@@ -184,7 +190,7 @@ class CustomTokenObtainPairView(BaseTokenObtainPairView):
                 # Get user by email
                 try:
                     user = User.objects.get(email=email)
-                    ActivityLog.objects.create(
+                    submit_activity_log(ActivityLog(
                         user=user,
                         username=user.email,
                         action=ActivityLog.Action.LOGIN,
@@ -194,7 +200,7 @@ class CustomTokenObtainPairView(BaseTokenObtainPairView):
                         user_agent=request.META.get('HTTP_USER_AGENT', ''),
                         request_method='POST',
                         request_path='/api/accounts/auth/login/',
-                    )
+                    ))
                 except User.DoesNotExist:
                     pass
             
@@ -202,7 +208,7 @@ class CustomTokenObtainPairView(BaseTokenObtainPairView):
             
         except Exception as e:
             # Failed login attempt
-            ActivityLog.objects.create(
+            submit_activity_log(ActivityLog(
                 user=None,
                 username=email,
                 action=ActivityLog.Action.LOGIN_FAILED,
@@ -212,7 +218,7 @@ class CustomTokenObtainPairView(BaseTokenObtainPairView):
                 user_agent=request.META.get('HTTP_USER_AGENT', ''),
                 request_method='POST',
                 request_path='/api/accounts/auth/login/',
-            )
+            ))
             raise
     
     def get_client_ip(self, request):
@@ -1,3 +1,14 @@
 from django.contrib import admin
+from .models import DashboardSnapshot
 
-# Register your models here.
+
+@admin.register(DashboardSnapshot)
+class DashboardSnapshotAdmin(admin.ModelAdmin):
+    """Read-only view of the materialized dashboard sections"""
+
+    list_display = ['section', 'is_stale', 'refreshed_at']
+    list_filter = ['is_stale']
+    readonly_fields = ['section', 'data', 'is_stale', 'refreshed_at']
+
+    def has_add_permission(self, request):
+        return False
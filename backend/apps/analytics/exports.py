@@ -0,0 +1,241 @@
+"""
+Service export helpers shared by the CSV and Excel export views
+
+Rows are read as plain tuples in primary-key keyset chunks, with the MTC and
+BSIC codes resolved from the reference registry, so memory stays flat
+regardless of the number of exported services (MySQL drivers buffer whole
+result sets, which rules out relying on a single server-side cursor).
+"""
+import copy
+
+from django.db.models import Max
+from django.db.models.functions import Length
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.utils import get_column_letter
+from rest_framework.request import Request
+
+from apps.directory.registry import registry
+from apps.directory.views import ServiceViewSet
+
+EXPORT_CHUNK_SIZE = 2000
+
+# (header, values_list lookup) pairs in export column order
+EXPORT_COLUMNS = [
+    ('Service Name', 'name'),
+    ('Province', 'province'),
+    ('City', 'city'),
+    ('MTC Code', 'mtc_id'),
+    ('BSIC Code', 'bsic_id'),
+    ('Bed Capacity', 'bed_capacity'),
+    ('Staff Count', 'staff_count'),
+    ('Psychiatrists', 'psychiatrist_count'),
+    ('Psychologists', 'psychologist_count'),
+    ('Nurses', 'nurse_count'),
+    ('Social Workers', 'social_worker_count'),
+    ('Verified', 'is_verified'),
+    ('Active', 'is_active'),
+    ('Created Date', 'created_at'),
+]
+
+EXPORT_HEADERS = [header for header, _ in EXPORT_COLUMNS]
+
+# Reference-table columns: lookup -> registry table whose code is exported
+REFERENCE_COLUMNS = {
+    'mtc_id': 'mtc',
+    'bsic_id': 'bsic',
+}
+
+# Rendered widths of the columns whose values are not free text
+FIXED_COLUMN_WIDTHS = {
+    'is_verified': len('Yes'),
+    'is_active': len('Yes'),
+    'created_at': len('YYYY-MM-DD'),
+}
+
+MAX_COLUMN_WIDTH = 50
+
+# Query parameter values the export page sends to mean "no filter"
+IGNORED_FILTER_VALUES = ('', 'all')
+
+
+def export_query_params(query_params):
+    """
+    Normalize export query parameters to ServiceViewSet filter params.
+
+    Drops "all"/empty values and maps the legacy export parameters
+    (`mtc=<code>`, `status=VERIFIED`) onto the viewset filters.
+    Returns (params, extra_filters).
+    """
+    params = query_params.copy()
+    extra_filters = {}
+
+    for key in list(params.keys()):
+        values = [v for v in params.getlist(key) if v not in IGNORED_FILTER_VALUES]
+        if values:
+            params.setlist(key, values)
+        else:
+            del params[key]
+
+    mtc = params.get('mtc')
+    if mtc and not mtc.isdigit():
+        code = params.pop('mtc')[-1]
+        row = registry.get_by_code('mtc', code)
+        if row is not None:
+            extra_filters['mtc_id'] = row['id']
+        else:
+            extra_filters['mtc__code'] = code
+
+    status = params.pop('status', None)
+    if status and status[-1] == 'VERIFIED':
+        params['is_verified'] = 'true'
+
+    # Exports are always streamed in keyset order
+    params.pop('ordering', None)
+
+    return params, extra_filters
+
+
+def get_export_queryset(request):
+    """
+    Services visible to the requesting user, filtered with the same
+    filter/search parameters (and RBAC scoping) as ServiceViewSet.
+    """
+    params, extra_filters = export_query_params(request.query_params)
+
+    http_request = copy.copy(request._request)
+    http_request.GET = params
+    filter_request = Request(http_request)
+    filter_request.user = request.user
+
+    view = ServiceViewSet(
+        request=filter_request, format_kwarg=None, action='list', args=(), kwargs={}
+    )
+    queryset = view.filter_queryset(view.get_queryset())
+    if extra_filters:
+        queryset = queryset.filter(**extra_filters)
+    return queryset
+
+
+def iter_export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield formatted export rows, newest service first.
+
+    Each chunk is a separate keyset query on the primary key, so only
+    `chunk_size` rows are held in memory at any time.
+    """
+    lookups = ['pk'] + [lookup for _, lookup in EXPORT_COLUMNS]
+    queryset = queryset.select_related(None).prefetch_related(None).order_by('-pk')
+
+    last_pk = None
+    while True:
+        chunk = queryset if last_pk is None else queryset.filter(pk__lt=last_pk)
+        rows = list(chunk.values_list(*lookups)[:chunk_size])
+        if not rows:
+            return
+
+        for (pk, name, province, city, mtc_id, bsic_id, bed_capacity, staff_count,
+             psychiatrists, psychologists, nurses, social_workers, is_verified,
+             is_active, created_at) in rows:
+            mtc = registry.get('mtc', mtc_id)
+            bsic = registry.get('bsic', bsic_id)
+            yield [
+                name,
+                province,
+                city,
+                mtc['code'] if mtc else '',
+                bsic['code'] if bsic else '',
+                bed_capacity or 0,
+                staff_count or 0,
+                psychiatrists or 0,
+                psychologists or 0,
+                nurses or 0,
+                social_workers or 0,
+                'Yes' if is_verified else 'No',
+                'Yes' if is_active else 'No',
+                created_at.strftime('%Y-%m-%d'),
+            ]
+
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+def compute_column_widths(queryset):
+    """
+    Excel column widths for the exported rows, in one aggregate query.
+
+    Write-only worksheets emit column definitions before the first row, so
+    widths are derived from MAX(LENGTH(...)) per text column (and the
+    largest value of numeric columns) instead of rescanning written cells.
+    """
+    aggregates = {}
+    for index, (_, lookup) in enumerate(EXPORT_COLUMNS):
+        if lookup in FIXED_COLUMN_WIDTHS or lookup in REFERENCE_COLUMNS:
+            continue
+        if lookup.endswith('_count') or lookup.endswith('_capacity'):
+            aggregates[f'c{index}'] = Max(lookup)
+        else:
+            aggregates[f'c{index}'] = Max(Length(lookup))
+
+    values = queryset.order_by().aggregate(**aggregates)
+
+    widths = []
+    for index, (header, lookup) in enumerate(EXPORT_COLUMNS):
+        if lookup in FIXED_COLUMN_WIDTHS:
+            longest = FIXED_COLUMN_WIDTHS[lookup]
+        elif lookup in REFERENCE_COLUMNS:
+            # Longest code of the table rather than of the exported rows
+            codes = registry.all(REFERENCE_COLUMNS[lookup]).values()
+            longest = max((len(row['code']) for row in codes), default=0)
+        elif lookup.endswith('_count') or lookup.endswith('_capacity'):
+            longest = len(str(values[f'c{index}'] or 0))
+        else:
+            longest = values[f'c{index}'] or 0
+        widths.append(min(max(longest, len(header)) + 2, MAX_COLUMN_WIDTH))
+    return widths
+
+
+def write_services_workbook(queryset, target, progress=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Write the services export as an XLSX file using openpyxl's write-only mode.
+
+    Args:
+        queryset: Services to export (see get_export_queryset)
+        target: File path or binary file object to save to
+        progress: Optional callable receiving the number of rows written so far,
+            called once per chunk
+
+    Returns:
+        Number of exported rows
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="Services Data")
+
+    for col_num, width in enumerate(compute_column_widths(queryset), 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = width
+
+    # Style for headers
+    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+    header_font = Font(color="FFFFFF", bold=True)
+    header_alignment = Alignment(horizontal='center', vertical='center')
+
+    header_cells = []
+    for header in EXPORT_HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.fill = header_fill
+        cell.font = header_font
+        cell.alignment = header_alignment
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    record_count = 0
+    for row in iter_export_rows(queryset, chunk_size=chunk_size):
+        ws.append(row)
+        record_count += 1
+        if progress and record_count % chunk_size == 0:
+            progress(record_count)
+
+    wb.save(target)
+    return record_count
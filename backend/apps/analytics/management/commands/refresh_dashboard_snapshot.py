@@ -0,0 +1,30 @@
+"""
+Management command to reconcile the materialized dashboard snapshot
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.analytics.snapshot import SECTION_BUILDERS, refresh_sections
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard snapshot (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--section',
+            action='append',
+            dest='sections',
+            help='Only refresh the given section (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        sections = options['sections']
+        if sections:
+            unknown = set(sections) - set(SECTION_BUILDERS)
+            if unknown:
+                raise CommandError(f"Unknown section(s): {', '.join(sorted(unknown))}")
+
+        refreshed = refresh_sections(sections)
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {len(refreshed)} dashboard snapshot section(s)'
+        ))
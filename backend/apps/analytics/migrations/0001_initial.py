@@ -0,0 +1,31 @@
+# Generated by Django 6.1.2 on 2026-10-17 19:06
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(choices=[('services', 'Services'), ('surveys', 'Surveys'), ('users', 'Users'), ('capacity', 'Capacity'), ('geographic_distribution', 'Geographic Distribution'), ('mtc_distribution', 'MTC Distribution'), ('system_health', 'System Health'), ('activity_trends', 'Activity Trends'), ('recent_surveys', 'Recent Surveys')], max_length=50, unique=True)),
+                ('data', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('is_stale', models.BooleanField(default=True)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Dashboard Snapshot',
+                'verbose_name_plural': 'Dashboard Snapshots',
+                'db_table': 'dashboard_snapshots',
+                'ordering': ['section'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-17 22:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dashboardsnapshot',
+            name='generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
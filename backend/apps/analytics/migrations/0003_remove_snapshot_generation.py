@@ -0,0 +1,17 @@
+# Generated by Django 6.1.2 on 2026-10-17 23:00
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_snapshot_generation'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='dashboardsnapshot',
+            name='generation',
+        ),
+    ]
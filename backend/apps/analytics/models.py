@@ -1,3 +1,31 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 
-# Create your models here.
+
+class DashboardSnapshot(models.Model):
+    """Precomputed section of the dashboard statistics payload"""
+
+    class Section(models.TextChoices):
+        SERVICES = 'services', 'Services'
+        SURVEYS = 'surveys', 'Surveys'
+        USERS = 'users', 'Users'
+        CAPACITY = 'capacity', 'Capacity'
+        GEOGRAPHIC_DISTRIBUTION = 'geographic_distribution', 'Geographic Distribution'
+        MTC_DISTRIBUTION = 'mtc_distribution', 'MTC Distribution'
+        SYSTEM_HEALTH = 'system_health', 'System Health'
+        ACTIVITY_TRENDS = 'activity_trends', 'Activity Trends'
+        RECENT_SURVEYS = 'recent_surveys', 'Recent Surveys'
+
+    section = models.CharField(max_length=50, choices=Section.choices, unique=True)
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    is_stale = models.BooleanField(default=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'dashboard_snapshots'
+        ordering = ['section']
+        verbose_name = 'Dashboard Snapshot'
+        verbose_name_plural = 'Dashboard Snapshots'
+
+    def __str__(self):
+        return f"{self.get_section_display()} (refreshed {self.refreshed_at})"
@@ -0,0 +1,42 @@
+"""
+Signal handlers keeping the dashboard snapshot in sync with model writes
+"""
+from django.db.models.signals import post_save, post_delete
+
+from apps.directory.importer import rows_imported
+from apps.logs.buffer import activity_logs_written
+from apps.logs.retention import logs_purged
+from .snapshot import MODEL_SECTIONS, mark_stale
+
+
+def invalidate_dashboard_snapshot(sender, **kwargs):
+    """Mark the dashboard sections affected by a write as stale"""
+    sections = MODEL_SECTIONS.get(sender)
+    if sections:
+        mark_stale(sections)
+
+
+for model in MODEL_SECTIONS:
+    post_save.connect(
+        invalidate_dashboard_snapshot, sender=model,
+        dispatch_uid=f'dashboard_snapshot_save_{model.__name__}'
+    )
+    post_delete.connect(
+        invalidate_dashboard_snapshot, sender=model,
+        dispatch_uid=f'dashboard_snapshot_delete_{model.__name__}'
+    )
+
+# Activity logs are bulk-inserted by the buffered writer, which bypasses post_save
+activity_logs_written.connect(
+    invalidate_dashboard_snapshot, dispatch_uid='dashboard_snapshot_activity_logs_written'
+)
+
+# Directory imports bulk-write services without per-row signals
+rows_imported.connect(
+    invalidate_dashboard_snapshot, dispatch_uid='dashboard_snapshot_rows_imported'
+)
+
+# The retention purge deletes expired rows without per-row signals
+logs_purged.connect(
+    invalidate_dashboard_snapshot, dispatch_uid='dashboard_snapshot_logs_purged'
+)
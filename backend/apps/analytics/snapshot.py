@@ -0,0 +1,234 @@
+"""
+Materialized dashboard snapshot
+
+The dashboard payload is split into sections, each stored as one row of
+DashboardSnapshot. Model signals mark the sections a write affects as stale;
+the dashboard endpoint reads every section in a single query and only
+recomputes the ones that are stale, missing or older than
+DASHBOARD_SNAPSHOT_MAX_AGE seconds (the payload has "last N days" figures).
+
+A refresh clears is_stale before computing its sections, and an
+invalidation only writes to sections that are not stale already. A write
+landing while a section is being computed therefore flags it again instead
+of being lost, and writes to an already stale section cost no row update.
+Invalidations are repeated once their transaction commits, in case a refresh
+cleared the flag before the write was visible to it.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from apps.directory.models import Service
+from apps.survey.models import Survey
+from apps.accounts.models import User
+from apps.geo.models import Region
+from apps.logs.models import ActivityLog, SystemError
+from .models import DashboardSnapshot
+
+Section = DashboardSnapshot.Section
+
+DEFAULT_MAX_AGE = 300
+
+
+def build_services():
+    week_ago = timezone.now() - timedelta(days=7)
+    return {
+        'total': Service.objects.count(),
+        'verified': Service.objects.filter(is_verified=True).count(),
+        'active': Service.objects.filter(is_active=True).count(),
+        'recent': Service.objects.filter(created_at__gte=week_ago).count(),
+    }
+
+
+def build_surveys():
+    week_ago = timezone.now() - timedelta(days=7)
+    return {
+        'total': Survey.objects.count(),
+        'pending': Survey.objects.filter(
+            verification_status=Survey.Status.SUBMITTED
+        ).count(),
+        'verified': Survey.objects.filter(
+            verification_status=Survey.Status.VERIFIED
+        ).count(),
+        'recent': Survey.objects.filter(created_at__gte=week_ago).count(),
+    }
+
+
+def build_users():
+    return {
+        'total': User.objects.count(),
+        'active': User.objects.filter(is_active=True).count(),
+    }
+
+
+def build_capacity():
+    capacity_data = Service.objects.aggregate(
+        total_beds=Sum('bed_capacity'),
+        total_staff=Sum('staff_count'),
+        total_psychiatrists=Sum('psychiatrist_count'),
+        total_psychologists=Sum('psychologist_count'),
+        total_nurses=Sum('nurse_count'),
+        total_social_workers=Sum('social_worker_count')
+    )
+    return {
+        'total_beds': capacity_data['total_beds'] or 0,
+        'total_staff': capacity_data['total_staff'] or 0,
+        'psychiatrists': capacity_data['total_psychiatrists'] or 0,
+        'psychologists': capacity_data['total_psychologists'] or 0,
+        'nurses': capacity_data['total_nurses'] or 0,
+        'social_workers': capacity_data['total_social_workers'] or 0
+    }
+
+
+def build_geographic_distribution():
+    # Geographic distribution by assigned kecamatan/regency (see apps.geo);
+    # services outside every ingested region are grouped under region None
+    return [
+        {
+            'region_id': row['region_id'],
+            'region_code': row['region__code'],
+            # Kept under the former key for existing clients
+            'city': row['region__name'],
+            'count': row['count'],
+        }
+        for row in Service.objects.values(
+            'region_id', 'region__code', 'region__name'
+        ).annotate(count=Count('id')).order_by('-count', 'region__name')
+    ]
+
+
+def build_mtc_distribution():
+    return list(
+        Service.objects.values(
+            'mtc__code', 'mtc__name'
+        ).annotate(count=Count('id')).order_by('-count')[:10]
+    )
+
+
+def build_system_health():
+    return {
+        'unresolved_errors': SystemError.objects.filter(is_resolved=False).count(),
+        'critical_errors': SystemError.objects.filter(
+            severity='CRITICAL',
+            is_resolved=False
+        ).count(),
+    }
+
+
+def build_activity_trends():
+    # Activity trends (last 30 days)
+    thirty_days_ago = timezone.now() - timedelta(days=30)
+    return list(
+        ActivityLog.objects.filter(
+            timestamp__gte=thirty_days_ago
+        ).extra(
+            select={'day': 'date(timestamp)'}
+        ).values('day').annotate(count=Count('id')).order_by('day')
+    )
+
+
+def build_recent_surveys():
+    # Latest 5 surveys with details
+    latest_surveys = Survey.objects.select_related('service').order_by('-created_at')[:5]
+    return [
+        {
+            'id': survey.id,
+            'service_name': survey.service.name if survey.service else 'Unknown Service',
+            'verification_status': survey.verification_status,
+            'created_at': survey.created_at.isoformat()
+        }
+        for survey in latest_surveys
+    ]
+
+
+SECTION_BUILDERS = {
+    Section.SERVICES: build_services,
+    Section.SURVEYS: build_surveys,
+    Section.USERS: build_users,
+    Section.CAPACITY: build_capacity,
+    Section.GEOGRAPHIC_DISTRIBUTION: build_geographic_distribution,
+    Section.MTC_DISTRIBUTION: build_mtc_distribution,
+    Section.SYSTEM_HEALTH: build_system_health,
+    Section.ACTIVITY_TRENDS: build_activity_trends,
+    Section.RECENT_SURVEYS: build_recent_surveys,
+}
+
+# Sections that have to be recomputed when a row of the given model changes
+MODEL_SECTIONS = {
+    Service: [
+        Section.SERVICES, Section.CAPACITY, Section.GEOGRAPHIC_DISTRIBUTION,
+        Section.MTC_DISTRIBUTION, Section.RECENT_SURVEYS,
+    ],
+    Survey: [Section.SURVEYS, Section.RECENT_SURVEYS],
+    User: [Section.USERS],
+    Region: [Section.GEOGRAPHIC_DISTRIBUTION],
+    ActivityLog: [Section.ACTIVITY_TRENDS],
+    SystemError: [Section.SYSTEM_HEALTH],
+}
+
+
+def get_max_age():
+    return getattr(settings, 'DASHBOARD_SNAPSHOT_MAX_AGE', DEFAULT_MAX_AGE)
+
+
+def _flag_stale(sections):
+    DashboardSnapshot.objects.filter(section__in=sections, is_stale=False).update(is_stale=True)
+
+
+def mark_stale(sections):
+    """Flag snapshot sections for recomputation on the next read"""
+    _flag_stale(sections)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _flag_stale(sections))
+
+
+def refresh_sections(sections=None):
+    """
+    Recompute snapshot sections and persist them.
+
+    Returns a dict of section name -> freshly computed data.
+    """
+    if sections is None:
+        sections = list(SECTION_BUILDERS)
+
+    # Cleared before computing, so invalidations from here on flag them again
+    claimed = DashboardSnapshot.objects.filter(section__in=sections).update(is_stale=False)
+    if claimed < len(sections):
+        DashboardSnapshot.objects.bulk_create(
+            [DashboardSnapshot(section=section, is_stale=False) for section in sections],
+            ignore_conflicts=True,
+        )
+
+    now = timezone.now()
+    refreshed = {}
+    for section in sections:
+        data = SECTION_BUILDERS[section]()
+        DashboardSnapshot.objects.filter(section=section).update(data=data, refreshed_at=now)
+        refreshed[section] = data
+    return refreshed
+
+
+def get_dashboard_stats(fresh=False):
+    """
+    Return the dashboard payload, recomputing only outdated sections.
+
+    Args:
+        fresh: Recompute every section regardless of its state
+    """
+    if fresh:
+        payload = refresh_sections()
+    else:
+        cutoff = timezone.now() - timedelta(seconds=get_max_age())
+        payload = {}
+        outdated = set(SECTION_BUILDERS)
+        for snapshot in DashboardSnapshot.objects.all():
+            payload[snapshot.section] = snapshot.data
+            if not snapshot.is_stale and snapshot.refreshed_at and snapshot.refreshed_at >= cutoff:
+                outdated.discard(snapshot.section)
+        if outdated:
+            payload.update(refresh_sections([s for s in SECTION_BUILDERS if s in outdated]))
+
+    return {str(section): payload[section] for section in SECTION_BUILDERS}
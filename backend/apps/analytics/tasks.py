@@ -0,0 +1,126 @@
+"""
+Background jobs for long-running analytics work (large exports)
+
+Jobs run on a small thread pool of the current process (BACKGROUND_TASKS_MAX_WORKERS
+threads, later jobs queue) so the request thread is not blocked; progress is
+tracked in ImportExportLog. With BACKGROUND_TASKS_ASYNC disabled (the test
+runner) jobs run inline.
+
+A job does not survive a restart of its process. An export still unfinished
+EXPORT_JOB_TIMEOUT seconds after it started is therefore reported as failed
+(see fail_stale_export), so clients polling its status stop waiting.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from apps.logs.models import ImportExportLog
+from .exports import write_services_workbook
+
+EXPORT_DIR = 'exports'
+
+DEFAULT_MAX_WORKERS = 2
+DEFAULT_EXPORT_JOB_TIMEOUT = 3600
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_TASKS_MAX_WORKERS', DEFAULT_MAX_WORKERS),
+                thread_name_prefix='background',
+            )
+        return _executor
+
+
+def run_in_background(func, *args, **kwargs):
+    """Queue func on the background pool, closing its DB connection when done"""
+    if not getattr(settings, 'BACKGROUND_TASKS_ASYNC', True):
+        return func(*args, **kwargs)
+
+    def target():
+        close_old_connections()
+        try:
+            func(*args, **kwargs)
+        finally:
+            connection.close()
+
+    return get_executor().submit(target)
+
+
+def get_export_path(file_name):
+    """Absolute path of an export file under MEDIA_ROOT"""
+    export_dir = Path(settings.MEDIA_ROOT) / EXPORT_DIR
+    export_dir.mkdir(parents=True, exist_ok=True)
+    return export_dir / file_name
+
+
+def export_services_excel_job(log_id, queryset):
+    """Build the services Excel export and record progress on the log entry"""
+    log = ImportExportLog.objects.get(pk=log_id)
+    # Prefixed with the log id: exports started in the same second share a name
+    path = get_export_path(f'{log.pk}-{log.file_name}')
+    started = time.monotonic()
+
+    # Status changes go through save() so the log rollups follow them
+    log.status = ImportExportLog.Status.IN_PROGRESS
+    log.save(update_fields=['status'])
+
+    def progress(count):
+        ImportExportLog.objects.filter(pk=log_id).update(successful_records=count)
+
+    try:
+        record_count = write_services_workbook(queryset, path, progress=progress)
+    except Exception as exc:
+        log.status = ImportExportLog.Status.FAILED
+        log.errors = [str(exc)]
+        log.completed_at = timezone.now()
+        log.duration_seconds = int(time.monotonic() - started)
+        log.save(update_fields=['status', 'errors', 'completed_at', 'duration_seconds'])
+        raise
+
+    log.status = ImportExportLog.Status.COMPLETED
+    log.total_records = record_count
+    log.successful_records = record_count
+    log.file_path = str(Path(EXPORT_DIR) / path.name)
+    log.file_size = path.stat().st_size
+    log.completed_at = timezone.now()
+    log.duration_seconds = int(time.monotonic() - started)
+    log.save(update_fields=[
+        'status', 'total_records', 'successful_records', 'file_path', 'file_size',
+        'completed_at', 'duration_seconds',
+    ])
+
+
+def fail_stale_export(log):
+    """
+    Mark an export failed when it is still unfinished EXPORT_JOB_TIMEOUT
+    seconds after it started (its process was restarted). Returns the log.
+    """
+    unfinished = (ImportExportLog.Status.INITIATED, ImportExportLog.Status.IN_PROGRESS)
+    timeout = getattr(settings, 'EXPORT_JOB_TIMEOUT', DEFAULT_EXPORT_JOB_TIMEOUT)
+    now = timezone.now()
+    if log.status not in unfinished or log.started_at > now - timedelta(seconds=timeout):
+        return log
+
+    with transaction.atomic():
+        # Locked, so that a job finishing meanwhile is not overwritten
+        log = ImportExportLog.objects.select_for_update().get(pk=log.pk)
+        if log.status in unfinished:
+            # Status changes go through save() so the log rollups follow them
+            log.status = ImportExportLog.Status.FAILED
+            log.errors = [f'Export did not finish within {timeout} seconds']
+            log.completed_at = now
+            log.duration_seconds = int((now - log.started_at).total_seconds())
+            log.save(update_fields=['status', 'errors', 'completed_at', 'duration_seconds'])
+    return log
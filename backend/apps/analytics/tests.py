@@ -1,3 +1,312 @@
-from django.test import TestCase
+import tempfile
+from unittest import mock
+from datetime import timedelta
+from io import BytesIO
 
-# Create your tests here.
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.contrib.auth import get_user_model
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework import status
+from openpyxl import load_workbook
+
+from apps.directory.models import MainTypeOfCare, BasicStableInputsOfCare, ServiceType, Service
+from apps.directory.registry import registry
+from apps.logs.models import ActivityLog, ImportExportLog, ImportExportLogDailyRollup
+from .models import DashboardSnapshot
+from .snapshot import SECTION_BUILDERS, get_dashboard_stats, mark_stale, refresh_sections
+from .exports import get_export_queryset, iter_export_rows
+
+User = get_user_model()
+
+
+class DashboardSnapshotTests(TestCase):
+    """Test the materialized dashboard snapshot"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email='admin@test.com', password='pass', role='ADMIN')
+        self.viewer = User.objects.create_user(email='viewer@test.com', password='pass', role='VIEWER')
+
+        self.mtc = MainTypeOfCare.objects.create(code='R1', name='Residential')
+        self.bsic = BasicStableInputsOfCare.objects.create(code='A', name='Accessibility')
+        self.service_type = ServiceType.objects.create(name='Hospital')
+
+    def create_service(self, name='Test Service', **kwargs):
+        return Service.objects.create(
+            name=name, mtc=self.mtc, bsic=self.bsic, service_type=self.service_type,
+            city='Kebumen', province='Jawa Tengah', **kwargs
+        )
+
+    def test_first_read_materializes_all_sections(self):
+        """The first request builds every snapshot section"""
+        self.create_service(bed_capacity=10)
+        self.client.force_authenticate(user=self.viewer)
+
+        response = self.client.get('/v1/analytics/dashboard/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(DashboardSnapshot.objects.count(), len(SECTION_BUILDERS))
+        self.assertEqual(response.data['services']['total'], 1)
+        self.assertEqual(response.data['capacity']['total_beds'], 10)
+
+    def test_snapshot_served_in_constant_queries(self):
+        """A fresh snapshot is answered from a single read"""
+        self.client.force_authenticate(user=self.viewer)
+        self.client.get('/v1/analytics/dashboard/')
+
+        # Authentication is forced, so the snapshot read is the only query
+        with self.assertNumQueries(1):
+            response = self.client.get('/v1/analytics/dashboard/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_write_invalidates_affected_sections(self):
+        """Saving a service marks only the service-derived sections stale"""
+        self.client.force_authenticate(user=self.viewer)
+        self.client.get('/v1/analytics/dashboard/')
+
+        self.create_service()
+
+        stale = set(DashboardSnapshot.objects.filter(is_stale=True).values_list('section', flat=True))
+        self.assertIn(DashboardSnapshot.Section.SERVICES, stale)
+        self.assertNotIn(DashboardSnapshot.Section.USERS, stale)
+
+        response = self.client.get('/v1/analytics/dashboard/')
+        self.assertEqual(response.data['services']['total'], 1)
+        self.assertFalse(DashboardSnapshot.objects.filter(is_stale=True).exists())
+
+    def test_write_during_refresh_keeps_section_stale(self):
+        """An invalidation racing a recomputation is not overwritten by it"""
+        refresh_sections()
+        mark_stale([DashboardSnapshot.Section.SERVICES])
+        build_services = SECTION_BUILDERS[DashboardSnapshot.Section.SERVICES]
+
+        def build_then_write():
+            data = build_services()
+            self.create_service()
+            return data
+
+        with mock.patch.dict(SECTION_BUILDERS, {DashboardSnapshot.Section.SERVICES: build_then_write}):
+            stats = get_dashboard_stats()
+        self.assertEqual(stats['services']['total'], 0)
+        self.assertTrue(DashboardSnapshot.objects.get(section=DashboardSnapshot.Section.SERVICES).is_stale)
+
+        self.assertEqual(get_dashboard_stats()['services']['total'], 1)
+        self.assertFalse(DashboardSnapshot.objects.filter(is_stale=True).exists())
+
+    def test_invalidation_repeated_on_commit(self):
+        """A refresh clearing the flag before the write committed does not lose it"""
+        refresh_sections()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_service()
+            # As cleared by a refresh that could not see the uncommitted service
+            DashboardSnapshot.objects.update(is_stale=False)
+
+        self.assertTrue(DashboardSnapshot.objects.get(section=DashboardSnapshot.Section.SERVICES).is_stale)
+        self.assertFalse(DashboardSnapshot.objects.get(section=DashboardSnapshot.Section.USERS).is_stale)
+
+    def test_fresh_param_only_honored_for_admins(self):
+        """?fresh=1 recomputes everything for admins, and is ignored otherwise"""
+        self.client.force_authenticate(user=self.viewer)
+        self.client.get('/v1/analytics/dashboard/')
+        # Bypass signals so the snapshot is out of date without being stale
+        Service.objects.bulk_create([
+            Service(name='Bulk', mtc=self.mtc, bsic=self.bsic, service_type=self.service_type,
+                    city='Kebumen', province='Jawa Tengah')
+        ])
+
+        response = self.client.get('/v1/analytics/dashboard/?fresh=1')
+        self.assertEqual(response.data['services']['total'], 0)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/v1/analytics/dashboard/?fresh=1')
+        self.assertEqual(response.data['services']['total'], 1)
+
+
+class ServiceCSVExportTests(TestCase):
+    """Test the streaming CSV export"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email='admin@test.com', password='pass', role='ADMIN')
+        self.client.force_authenticate(user=self.admin)
+
+        bsic = BasicStableInputsOfCare.objects.create(code='A', name='Accessibility')
+        service_type = ServiceType.objects.create(name='Hospital')
+        self.r1 = MainTypeOfCare.objects.create(code='R1', name='Residential')
+        self.o1 = MainTypeOfCare.objects.create(code='O1', name='Outpatient')
+
+        # Search documents are indexed on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, mtc in enumerate([self.r1, self.r1, self.o1]):
+                Service.objects.create(
+                    name=f'Service {i}', mtc=mtc, bsic=bsic, service_type=service_type,
+                    city='Kebumen', province='Jawa Tengah', is_verified=(i == 0)
+                )
+
+    def get_rows(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content).decode()
+        return [line.split(',') for line in content.strip().splitlines()]
+
+    def test_export_streams_all_services(self):
+        """Header plus one row per service, codes resolved"""
+        rows = self.get_rows('/v1/analytics/export/services/csv/')
+
+        self.assertEqual(rows[0][0], 'Service Name')
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(sorted(row[3] for row in rows[1:]), ['O1', 'R1', 'R1'])
+
+    def test_export_accepts_service_list_filters(self):
+        """ServiceViewSet filter params apply to the export"""
+        rows = self.get_rows(f'/v1/analytics/export/services/csv/?mtc={self.o1.id}')
+        self.assertEqual([row[0] for row in rows[1:]], ['Service 2'])
+
+        rows = self.get_rows('/v1/analytics/export/services/csv/?search=Service 1')
+        self.assertEqual([row[0] for row in rows[1:]], ['Service 1'])
+
+    def test_export_accepts_legacy_params(self):
+        """The export page's province/mtc/status params keep working"""
+        rows = self.get_rows('/v1/analytics/export/services/csv/?province=&mtc=all&status=all')
+        self.assertEqual(len(rows), 4)
+
+        rows = self.get_rows('/v1/analytics/export/services/csv/?mtc=R1&status=VERIFIED')
+        self.assertEqual([row[0] for row in rows[1:]], ['Service 0'])
+
+    def test_export_logged_when_complete(self):
+        """The export is logged before streaming and completed with its row count"""
+        response = self.client.get('/v1/analytics/export/services/csv/')
+        export_log = ImportExportLog.objects.get(file_format=ImportExportLog.Format.CSV)
+        self.assertEqual(export_log.status, ImportExportLog.Status.IN_PROGRESS)
+
+        b''.join(response.streaming_content)
+        export_log.refresh_from_db()
+        self.assertEqual(export_log.status, ImportExportLog.Status.COMPLETED)
+        self.assertEqual(export_log.total_records, 3)
+
+    def test_interrupted_export_logged(self):
+        """A download closed before the last row still updates the log"""
+        response = self.client.get('/v1/analytics/export/services/csv/')
+        next(iter(response.streaming_content))
+        response.close()
+
+        export_log = ImportExportLog.objects.get(file_format=ImportExportLog.Format.CSV)
+        self.assertEqual(export_log.status, ImportExportLog.Status.FAILED)
+        self.assertEqual(export_log.total_records, 0)
+        self.assertEqual(
+            ActivityLog.objects.filter(action=ActivityLog.Action.EXPORT).values_list('metadata', flat=True)[0],
+            {'format': 'CSV', 'record_count': 0}
+        )
+
+    def test_export_query_count_independent_of_rows(self):
+        """Codes come from the reference registry instead of per-row queries"""
+        request = Request(APIRequestFactory().get('/'))
+        request.user = self.admin
+        registry.all('mtc')
+
+        with self.assertNumQueries(1):
+            rows = list(iter_export_rows(get_export_queryset(request), chunk_size=10))
+        self.assertEqual(len(rows), 3)
+
+        with self.assertNumQueries(2):
+            rows = list(iter_export_rows(get_export_queryset(request), chunk_size=2))
+        self.assertEqual(len(rows), 3)
+
+
+class ServiceExcelExportTests(TestCase):
+    """Test the write-only Excel export and its background job"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email='admin@test.com', password='pass', role='ADMIN')
+        self.client.force_authenticate(user=self.admin)
+
+        mtc = MainTypeOfCare.objects.create(code='R1', name='Residential')
+        bsic = BasicStableInputsOfCare.objects.create(code='A', name='Accessibility')
+        service_type = ServiceType.objects.create(name='Hospital')
+        for i in range(3):
+            Service.objects.create(
+                name=f'Rumah Sakit Jiwa Kebumen {i}', mtc=mtc, bsic=bsic,
+                service_type=service_type, city='Kebumen', province='Jawa Tengah',
+                bed_capacity=120
+            )
+
+        self.media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media_root.cleanup)
+
+    def load_sheet(self, content):
+        return load_workbook(BytesIO(content))['Services Data']
+
+    def test_small_export_returned_inline(self):
+        """Small exports are written in write-only mode and sent directly"""
+        response = self.client.get('/v1/analytics/export/services/excel/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ws = self.load_sheet(b''.join(response.streaming_content))
+        rows = list(ws.values)
+        self.assertEqual(rows[0][0], 'Service Name')
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][3], 'R1')
+        self.assertEqual(ws.column_dimensions['A'].width, len('Rumah Sakit Jiwa Kebumen 0') + 2)
+
+    def test_background_export_records_progress(self):
+        """Background exports are tracked in ImportExportLog and downloadable"""
+        with override_settings(MEDIA_ROOT=self.media_root.name):
+            response = self.client.get('/v1/analytics/export/services/excel/?background=1')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+            export_log = ImportExportLog.objects.get(pk=response.data['id'])
+            self.assertEqual(export_log.status, ImportExportLog.Status.COMPLETED)
+            self.assertEqual(export_log.successful_records, 3)
+            self.assertGreater(export_log.file_size, 0)
+
+            response = self.client.get(f'/v1/analytics/export/jobs/{export_log.pk}/')
+            self.assertEqual(response.data['status'], ImportExportLog.Status.COMPLETED)
+
+            response = self.client.get(f'/v1/analytics/export/jobs/{export_log.pk}/download/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            rows = list(self.load_sheet(b''.join(response.streaming_content)).values)
+            self.assertEqual(len(rows), 4)
+
+    def test_background_exports_get_distinct_files(self):
+        """Exports started in the same second do not overwrite each other's file"""
+        with override_settings(MEDIA_ROOT=self.media_root.name):
+            ids = [
+                self.client.get('/v1/analytics/export/services/excel/?background=1').data['id']
+                for _ in range(2)
+            ]
+
+        logs = ImportExportLog.objects.filter(pk__in=ids)
+        self.assertEqual(len({log.file_path for log in logs}), 2)
+
+    def test_stale_export_reported_failed(self):
+        """An export left unfinished by a restarted process stops looking in progress"""
+        export_log = ImportExportLog.objects.create(
+            operation=ImportExportLog.Operation.EXPORT, status=ImportExportLog.Status.IN_PROGRESS,
+            user=self.admin, username=self.admin.email, model_name='Service',
+            file_format=ImportExportLog.Format.EXCEL, file_name='stale.xlsx',
+        )
+        url = f'/v1/analytics/export/jobs/{export_log.pk}/'
+        self.assertEqual(self.client.get(url).data['status'], ImportExportLog.Status.IN_PROGRESS)
+
+        ImportExportLog.objects.filter(pk=export_log.pk).update(started_at=timezone.now() - timedelta(hours=2))
+        response = self.client.get(url)
+        self.assertEqual(response.data['status'], ImportExportLog.Status.FAILED)
+        self.assertEqual(
+            ImportExportLogDailyRollup.objects.filter(status=ImportExportLog.Status.IN_PROGRESS)
+            .aggregate(total=Sum('count'))['total'] or 0, 0
+        )
+
+    def test_export_job_hidden_from_other_users(self):
+        """Only the owner (or an admin) can see a background export"""
+        with override_settings(MEDIA_ROOT=self.media_root.name):
+            response = self.client.get('/v1/analytics/export/services/excel/?background=1')
+
+        other = User.objects.create_user(email='viewer@test.com', password='pass', role='VIEWER')
+        self.client.force_authenticate(user=other)
+        response = self.client.get(f'/v1/analytics/export/jobs/{response.data["id"]}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
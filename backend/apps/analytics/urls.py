@@ -2,7 +2,8 @@ from django.urls import path
 
 from .views import (
     dashboard_stats, service_analytics, survey_analytics,
-    export_services_excel, export_services_csv
+    export_services_excel, export_services_csv,
+    export_job_status, export_job_download
 )
 
 urlpatterns = [
@@ -11,4 +12,6 @@ urlpatterns = [
     path('surveys/', survey_analytics, name='survey-analytics'),
     path('export/services/excel/', export_services_excel, name='export-services-excel'),
     path('export/services/csv/', export_services_csv, name='export-services-csv'),
+    path('export/jobs/<int:pk>/', export_job_status, name='export-job-status'),
+    path('export/jobs/<int:pk>/download/', export_job_download, name='export-job-download'),
 ]
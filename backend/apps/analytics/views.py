@@ -1,19 +1,29 @@
+from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
+from django.conf import settings
 from django.db.models import Count, Sum, Avg, Q
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from datetime import timedelta
+from pathlib import Path
 import csv
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment
+import tempfile
+import time
 
 from apps.directory.models import Service
 from apps.survey.models import Survey
-from apps.accounts.models import User
-from apps.logs.models import ActivityLog, SystemError
-from apps.logs.utils import log_export
+from apps.logs.models import ImportExportLog
+from apps.logs.serializers import ImportExportLogSerializer
+from apps.logs.utils import log_export, get_client_ip
+from .snapshot import get_dashboard_stats
+from .exports import (
+    EXPORT_HEADERS, get_export_queryset, iter_export_rows, write_services_workbook
+)
+from .tasks import run_in_background, export_services_excel_job, fail_stale_export
 
 
 @api_view(['GET'])
@@ -21,112 +31,15 @@ from apps.logs.utils import log_export
 def dashboard_stats(request):
     """
     Get comprehensive dashboard statistics
-    """
 
-    # Service statistics
-    total_services = Service.objects.count()
-    verified_services = Service.objects.filter(is_verified=True).count()
-    active_services = Service.objects.filter(is_active=True).count()
-
-    # Survey statistics
-    total_surveys = Survey.objects.count()
-    pending_surveys = Survey.objects.filter(
-        verification_status=Survey.Status.SUBMITTED
-    ).count()
-    verified_surveys = Survey.objects.filter(
-        verification_status=Survey.Status.VERIFIED
-    ).count()
-
-    # User statistics
-    total_users = User.objects.count()
-    active_users = User.objects.filter(is_active=True).count()
-
-    # Recent activity (last 7 days)
-    week_ago = timezone.now() - timedelta(days=7)
-    recent_surveys = Survey.objects.filter(created_at__gte=week_ago).count()
-    recent_services = Service.objects.filter(created_at__gte=week_ago).count()
-
-    # Capacity data
-    capacity_data = Service.objects.aggregate(
-        total_beds=Sum('bed_capacity'),
-        total_staff=Sum('staff_count'),
-        total_psychiatrists=Sum('psychiatrist_count'),
-        total_psychologists=Sum('psychologist_count'),
-        total_nurses=Sum('nurse_count'),
-        total_social_workers=Sum('social_worker_count')
+    Served from the materialized dashboard snapshot. Admins can pass
+    ?fresh=1 to force every section to be recomputed.
+    """
+    fresh = (
+        request.query_params.get('fresh') in ('1', 'true')
+        and (request.user.is_superuser or request.user.role == 'ADMIN')
     )
-
-    # Geographic distribution (by kecamatan/city)
-    kecamatan_distribution = Service.objects.values('city').annotate(
-        count=Count('id')
-    ).order_by('-count')
-
-    # MTC distribution
-    mtc_distribution = Service.objects.values(
-        'mtc__code', 'mtc__name'
-    ).annotate(count=Count('id')).order_by('-count')
-
-    # Recent system errors
-    unresolved_errors = SystemError.objects.filter(is_resolved=False).count()
-    critical_errors = SystemError.objects.filter(
-        severity='CRITICAL',
-        is_resolved=False
-    ).count()
-
-    # Activity trends (last 30 days)
-    thirty_days_ago = timezone.now() - timedelta(days=30)
-    daily_activities = ActivityLog.objects.filter(
-        timestamp__gte=thirty_days_ago
-    ).extra(
-        select={'day': 'date(timestamp)'}
-    ).values('day').annotate(count=Count('id')).order_by('day')
-
-    # Latest 5 surveys with details
-    latest_surveys = Survey.objects.select_related('service').order_by('-created_at')[:5]
-    recent_surveys_data = [
-        {
-            'id': survey.id,
-            'service_name': survey.service.name if survey.service else 'Unknown Service',
-            'verification_status': survey.verification_status,
-            'created_at': survey.created_at.isoformat()
-        }
-        for survey in latest_surveys
-    ]
-
-    return Response({
-        'services': {
-            'total': total_services,
-            'verified': verified_services,
-            'active': active_services,
-            'recent': recent_services
-        },
-        'surveys': {
-            'total': total_surveys,
-            'pending': pending_surveys,
-            'verified': verified_surveys,
-            'recent': recent_surveys
-        },
-        'users': {
-            'total': total_users,
-            'active': active_users
-        },
-        'capacity': {
-            'total_beds': capacity_data['total_beds'] or 0,
-            'total_staff': capacity_data['total_staff'] or 0,
-            'psychiatrists': capacity_data['total_psychiatrists'] or 0,
-            'psychologists': capacity_data['total_psychologists'] or 0,
-            'nurses': capacity_data['total_nurses'] or 0,
-            'social_workers': capacity_data['total_social_workers'] or 0
-        },
-        'geographic_distribution': list(kecamatan_distribution),
-        'mtc_distribution': list(mtc_distribution)[:10],
-        'system_health': {
-            'unresolved_errors': unresolved_errors,
-            'critical_errors': critical_errors
-        },
-        'activity_trends': list(daily_activities),
-        'recent_surveys': recent_surveys_data
-    })
+    return Response(get_dashboard_stats(fresh=fresh))
 
 
 @api_view(['GET'])
@@ -242,145 +155,168 @@ def survey_analytics(request):
 def export_services_excel(request):
     """
     Export services data to Excel
+
+    Small exports are written to a temporary file with openpyxl's write-only
+    mode and returned directly. Exports larger than EXPORT_EXCEL_INLINE_LIMIT
+    rows (or any export with ?background=1) are built by a background job;
+    the response is 202 with the job status and download URLs.
     """
-    # Get query parameters for filtering
-    province = request.GET.get('province')
-    mtc = request.GET.get('mtc')
-    status = request.GET.get('status')
+    services = get_export_queryset(request)
+    record_count = services.count()
+    file_name = f'yakkum-services-export-{timezone.now().strftime("%Y%m%d-%H%M%S")}.xlsx'
+
+    background = request.query_params.get('background') in ('1', 'true')
+    if background or record_count > settings.EXPORT_EXCEL_INLINE_LIMIT:
+        user = request.user
+        export_log = ImportExportLog.objects.create(
+            operation=ImportExportLog.Operation.EXPORT,
+            status=ImportExportLog.Status.INITIATED,
+            user=user,
+            username=user.email,
+            model_name='Service',
+            file_format=ImportExportLog.Format.EXCEL,
+            file_name=file_name,
+            total_records=record_count,
+            filters=request.query_params.dict(),
+            ip_address=get_client_ip(request),
+        )
 
-    # Filter services
-    services = Service.objects.all()
-    if province and province != 'all':
-        services = services.filter(province=province)
-    if mtc and mtc != 'all':
-        services = services.filter(mtc__code=mtc)
-    if status and status != 'all':
-        if status == 'VERIFIED':
-            services = services.filter(is_verified=True)
-
-    # Create workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Services Data"
-
-    # Define headers
-    headers = [
-        'Service Name', 'Province', 'City', 'MTC Code', 'BSIC Code',
-        'Bed Capacity', 'Staff Count', 'Psychiatrists', 'Psychologists',
-        'Nurses', 'Social Workers', 'Verified', 'Active', 'Created Date'
-    ]
-
-    # Style for headers
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(color="FFFFFF", bold=True)
-
-    # Write headers
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-
-    # Write data
-    for row_num, service in enumerate(services, 2):
-        ws.cell(row=row_num, column=1, value=service.name)
-        ws.cell(row=row_num, column=2, value=service.province)
-        ws.cell(row=row_num, column=3, value=service.city)
-        ws.cell(row=row_num, column=4, value=service.mtc.code if service.mtc else '')
-        ws.cell(row=row_num, column=5, value=service.bsic.code if service.bsic else '')
-        ws.cell(row=row_num, column=6, value=service.bed_capacity or 0)
-        ws.cell(row=row_num, column=7, value=service.staff_count or 0)
-        ws.cell(row=row_num, column=8, value=service.psychiatrist_count or 0)
-        ws.cell(row=row_num, column=9, value=service.psychologist_count or 0)
-        ws.cell(row=row_num, column=10, value=service.nurse_count or 0)
-        ws.cell(row=row_num, column=11, value=service.social_worker_count or 0)
-        ws.cell(row=row_num, column=12, value='Yes' if service.is_verified else 'No')
-        ws.cell(row=row_num, column=13, value='Yes' if service.is_active else 'No')
-        ws.cell(row=row_num, column=14, value=service.created_at.strftime('%Y-%m-%d'))
-
-    # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-    # Prepare response
-    response = HttpResponse(
+        # Log export activity
+        log_export(request, 'Service', 'Excel', record_count)
+
+        run_in_background(export_services_excel_job, export_log.pk, services)
+
+        export_log.refresh_from_db()
+        data = ImportExportLogSerializer(export_log).data
+        data['status_url'] = reverse('export-job-status', args=[export_log.pk], request=request)
+        data['download_url'] = reverse('export-job-download', args=[export_log.pk], request=request)
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+    output = tempfile.TemporaryFile()
+    record_count = write_services_workbook(services, output)
+    output.seek(0)
+
+    # Log export activity
+    log_export(request, 'Service', 'Excel', record_count)
+
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=file_name,
         content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
     )
-    response['Content-Disposition'] = f'attachment; filename=yakkum-services-export-{timezone.now().strftime("%Y%m%d")}.xlsx'
 
-    # Log export activity
-    log_export(request, 'Service', 'Excel', services.count())
 
-    wb.save(response)
-    return response
+def get_export_job(request, pk):
+    """Export log visible to the requesting user (owner or admin), failed if stale"""
+    queryset = ImportExportLog.objects.filter(operation=ImportExportLog.Operation.EXPORT)
+    if not (request.user.is_superuser or request.user.role == 'ADMIN'):
+        queryset = queryset.filter(user=request.user)
+    return fail_stale_export(get_object_or_404(queryset, pk=pk))
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def export_services_csv(request):
+def export_job_status(request, pk):
     """
-    Export services data to CSV
+    Get the progress of a background export
     """
-    # Get query parameters for filtering
-    province = request.GET.get('province')
-    mtc = request.GET.get('mtc')
-    status = request.GET.get('status')
+    export_log = get_export_job(request, pk)
+    data = ImportExportLogSerializer(export_log).data
+    if export_log.status == ImportExportLog.Status.COMPLETED:
+        data['download_url'] = reverse('export-job-download', args=[export_log.pk], request=request)
+    return Response(data)
 
-    # Filter services
-    services = Service.objects.all()
-    if province and province != 'all':
-        services = services.filter(province=province)
-    if mtc and mtc != 'all':
-        services = services.filter(mtc__code=mtc)
-    if status and status != 'all':
-        if status == 'VERIFIED':
-            services = services.filter(is_verified=True)
-
-    # Prepare response
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename=yakkum-services-export-{timezone.now().strftime("%Y%m%d")}.csv'
-
-    # Write CSV
-    writer = csv.writer(response)
-
-    # Write headers
-    writer.writerow([
-        'Service Name', 'Province', 'City', 'MTC Code', 'BSIC Code',
-        'Bed Capacity', 'Staff Count', 'Psychiatrists', 'Psychologists',
-        'Nurses', 'Social Workers', 'Verified', 'Active', 'Created Date'
-    ])
-
-    # Write data
-    record_count = 0
-    for service in services:
-        writer.writerow([
-            service.name,
-            service.province,
-            service.city,
-            service.mtc.code if service.mtc else '',
-            service.bsic.code if service.bsic else '',
-            service.bed_capacity or 0,
-            service.staff_count or 0,
-            service.psychiatrist_count or 0,
-            service.psychologist_count or 0,
-            service.nurse_count or 0,
-            service.social_worker_count or 0,
-            'Yes' if service.is_verified else 'No',
-            'Yes' if service.is_active else 'No',
-            service.created_at.strftime('%Y-%m-%d')
-        ])
-        record_count += 1
 
-    # Log export activity
-    log_export(request, 'Service', 'CSV', record_count)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_job_download(request, pk):
+    """
+    Download the file produced by a completed background export
+    """
+    export_log = get_export_job(request, pk)
+    if export_log.status != ImportExportLog.Status.COMPLETED:
+        return Response(
+            {'detail': f'Export is not ready (status: {export_log.status})'},
+            status=status.HTTP_409_CONFLICT
+        )
+
+    path = Path(settings.MEDIA_ROOT) / export_log.file_path
+    if not path.exists():
+        raise Http404('Export file no longer exists')
+
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=export_log.file_name)
 
+
+class Echo:
+    """Pseudo-buffer that hands csv.writer output straight back"""
+
+    def write(self, value):
+        return value
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_services_csv(request):
+    """
+    Export services data to CSV
+
+    Accepts the same filter/search parameters as the service list endpoint.
+    The response is streamed, so memory stays flat at any row count.
+    """
+    services = get_export_queryset(request)
+    writer = csv.writer(Echo())
+    file_name = f'yakkum-services-export-{timezone.now().strftime("%Y%m%d")}.csv'
+
+    # Logged before streaming, so interrupted downloads are recorded too
+    user = request.user
+    export_log = ImportExportLog.objects.create(
+        operation=ImportExportLog.Operation.EXPORT,
+        status=ImportExportLog.Status.IN_PROGRESS,
+        user=user,
+        username=user.email,
+        model_name='Service',
+        file_format=ImportExportLog.Format.CSV,
+        file_name=file_name,
+        filters=request.query_params.dict(),
+        ip_address=get_client_ip(request),
+    )
+    started = time.monotonic()
+
+    def stream():
+        record_count = 0
+        completed = False
+        try:
+            yield writer.writerow(EXPORT_HEADERS)
+
+            buffer = []
+            for row in iter_export_rows(services):
+                buffer.append(writer.writerow(row))
+                record_count += 1
+                if len(buffer) >= 500:
+                    yield ''.join(buffer)
+                    buffer = []
+            if buffer:
+                yield ''.join(buffer)
+            completed = True
+        finally:
+            # Runs when the response is closed, including after a client disconnect.
+            # Status changes go through save() so the log rollups follow them
+            export_log.status = (
+                ImportExportLog.Status.COMPLETED if completed else ImportExportLog.Status.FAILED
+            )
+            if not completed:
+                export_log.errors = [f'Export interrupted after {record_count} records']
+            export_log.total_records = record_count
+            export_log.successful_records = record_count
+            export_log.completed_at = timezone.now()
+            export_log.duration_seconds = int(time.monotonic() - started)
+            export_log.save(update_fields=[
+                'status', 'errors', 'total_records', 'successful_records',
+                'completed_at', 'duration_seconds',
+            ])
+            log_export(request, 'Service', 'CSV', record_count)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename={file_name}'
     return response
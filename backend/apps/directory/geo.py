@@ -0,0 +1,208 @@
+"""
+Geospatial helpers for the service map
+
+Services carry a geohash of their coordinates (an indexed CharField kept in
+sync by Service.save()), so viewport and radius queries reduce to range
+scans on the (latitude, longitude) index and map clustering to a GROUP BY on
+a geohash prefix. This works on SQLite and MySQL alike, without PostGIS.
+"""
+import math
+
+from django.conf import settings
+from django.db.models import Avg, Count, Min
+from django.db.models.functions import Substr
+from rest_framework.exceptions import ValidationError
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a coordinate pair, or '' when either is missing"""
+    if latitude is None or longitude is None:
+        return ''
+    latitude, longitude = float(latitude), float(longitude)
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in kilometres"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2 +
+        math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """(min_lng, min_lat, max_lng, max_lat) enclosing a circle"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6 or latitude + lat_delta >= 90 or latitude - lat_delta <= -90:
+        lng_delta = 180.0
+    else:
+        lng_delta = min(180.0, lat_delta / cos_lat)
+    return (
+        max(-180.0, longitude - lng_delta), max(-90.0, latitude - lat_delta),
+        min(180.0, longitude + lng_delta), min(90.0, latitude + lat_delta),
+    )
+
+
+def zoom_to_precision(zoom):
+    """Geohash prefix length giving a handful of clusters per web-map tile"""
+    # A geohash of precision p is about 360 / 2 ** (2.5 * p) degrees wide,
+    # a tile at zoom z 360 / 2 ** z degrees
+    return max(1, min(GEOHASH_PRECISION, int((zoom + 3) / 2.5)))
+
+
+def _parse_floats(request, param, count):
+    value = request.query_params.get(param)
+    if value is None or value == '':
+        return None
+    try:
+        numbers = [float(part) for part in value.split(',')]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count or not all(math.isfinite(number) for number in numbers):
+        raise ValidationError({param: f'Enter {count} comma-separated numbers.'})
+    return numbers
+
+
+def parse_map_query(request):
+    """
+    Parse the ?bbox=, ?near=&radius_km= and ?zoom= map parameters
+
+    Returns a dict with `bbox` (min_lng, min_lat, max_lng, max_lat) or None,
+    `near` (lat, lng) or None, `radius_km` and `zoom` (int or None).
+    """
+    bbox = _parse_floats(request, 'bbox', 4)
+    if bbox is not None:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+            raise ValidationError({'bbox': 'Expected minLng,minLat,maxLng,maxLat within WGS84 bounds.'})
+
+    near = _parse_floats(request, 'near', 2)
+    radius_km = None
+    if near is not None:
+        if not (-90 <= near[0] <= 90 and -180 <= near[1] <= 180):
+            raise ValidationError({'near': 'Expected lat,lng within WGS84 bounds.'})
+        max_radius = getattr(settings, 'MAP_MAX_RADIUS_KM', 500)
+        radius = _parse_floats(request, 'radius_km', 1)
+        radius_km = radius[0] if radius else getattr(settings, 'MAP_DEFAULT_RADIUS_KM', 10)
+        if not 0 < radius_km <= max_radius:
+            raise ValidationError({'radius_km': f'Enter a radius between 0 and {max_radius} km.'})
+
+    zoom = request.query_params.get('zoom')
+    if zoom not in (None, ''):
+        try:
+            zoom = int(zoom)
+        except ValueError:
+            raise ValidationError({'zoom': 'Enter an integer zoom level.'})
+        if not 0 <= zoom <= 22:
+            raise ValidationError({'zoom': 'Enter a zoom level between 0 and 22.'})
+    else:
+        zoom = None
+
+    return {'bbox': bbox, 'near': near, 'radius_km': radius_km, 'zoom': zoom}
+
+
+def filter_bbox(queryset, bbox):
+    """Services inside a (min_lng, min_lat, max_lng, max_lat) box"""
+    min_lng, min_lat, max_lng, max_lat = bbox
+    queryset = queryset.filter(latitude__gte=min_lat, latitude__lte=max_lat)
+    if min_lng <= max_lng:
+        return queryset.filter(longitude__gte=min_lng, longitude__lte=max_lng)
+    # Box crossing the antimeridian
+    return queryset.exclude(longitude__gt=max_lng, longitude__lt=min_lng)
+
+
+def map_points(queryset, near=None, radius_km=None):
+    """
+    Compact map points: id, name, MTC code and coordinates as floats
+
+    With `near`, only points within `radius_km` are kept (bounding box in the
+    database, exact distance in Python), nearest first, with `distance_km`.
+    """
+    # Imported here: models.py uses this module to compute geohashes
+    from .registry import registry
+
+    if near is not None:
+        queryset = filter_bbox(queryset, radius_bbox(near[0], near[1], radius_km))
+
+    points = []
+    for row in queryset.values_list('id', 'name', 'mtc_id', 'latitude', 'longitude'):
+        mtc = registry.get('mtc', row[2])
+        point = {
+            'id': row[0],
+            'name': row[1],
+            'mtc_code': mtc['code'] if mtc else None,
+            'latitude': float(row[3]),
+            'longitude': float(row[4]),
+        }
+        if near is not None:
+            distance = haversine_km(near[0], near[1], point['latitude'], point['longitude'])
+            if distance > radius_km:
+                continue
+            point['distance_km'] = round(distance, 3)
+        points.append(point)
+
+    if near is not None:
+        points.sort(key=lambda point: point['distance_km'])
+    return points
+
+
+def map_clusters(queryset, zoom):
+    """
+    Services grouped by geohash cell for the given zoom level
+
+    Returns (clusters, singleton_ids): one dict per cell holding more than
+    one service (`geohash`, `count`, mean `latitude`/`longitude`), and the ids
+    of the services alone in their cell, to be returned as plain points.
+    """
+    precision = zoom_to_precision(zoom)
+    cells = queryset.order_by().annotate(
+        cell=Substr('geohash', 1, precision)
+    ).values('cell').annotate(
+        count=Count('id'),
+        first_id=Min('id'),
+        avg_latitude=Avg('latitude'),
+        avg_longitude=Avg('longitude'),
+    )
+
+    clusters = []
+    singleton_ids = []
+    for cell in cells:
+        if cell['count'] == 1:
+            singleton_ids.append(cell['first_id'])
+            continue
+        clusters.append({
+            'geohash': cell['cell'],
+            'count': cell['count'],
+            'latitude': round(float(cell['avg_latitude']), 6),
+            'longitude': round(float(cell['avg_longitude']), 6),
+        })
+    clusters.sort(key=lambda cluster: cluster['geohash'])
+    return clusters, singleton_ids
@@ -0,0 +1,558 @@
+"""
+Bulk import of directory classifications and services
+
+Rows read from CSV or JSON are matched on their natural key (MTC and BSIC
+code, service type, target population and service name) and diffed against
+the existing rows with one query per table: new rows are inserted, changed
+rows updated in place with bulk_create(update_conflicts=True) and unchanged
+rows skipped. Columns missing from a row keep their stored value (or the
+model default for new rows). MTC codes are written one hierarchy level at a
+time, so that a parent imported in the same file has an id before its
+children reference it.
+
+The whole import runs in one transaction and is recorded in ImportExportLog.
+bulk_create sends no post_save, so `rows_imported` is sent for every model
+once the transaction is over; the directory, geo and analytics signal
+handlers refresh search documents and invalidate their caches from it.
+"""
+import csv
+import json
+import os
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from apps.geo.index import resolve_service_region
+from apps.logs.models import ImportExportLog
+from .geo import encode_geohash
+from .models import MainTypeOfCare, BasicStableInputsOfCare, ServiceType, TargetPopulation, Service
+
+# Sent per model after an import; provides `pks`, the ids of the rows written
+rows_imported = Signal()
+
+BATCH_SIZE = 1000
+# Separator of the references in a many-to-many CSV column
+LIST_SEPARATOR = ';'
+
+TRUE_VALUES = {'1', 't', 'true', 'y', 'yes', 'ya'}
+FALSE_VALUES = {'0', 'f', 'false', 'n', 'no', 'tidak'}
+
+
+class DirectoryImportError(ValueError):
+    """The import data cannot be read"""
+
+
+class ImportSpec:
+    """How the rows of one table are imported"""
+
+    def __init__(self, model, key, fields, foreign_keys=None, many_to_many=None,
+                 parent_field=None, prepare=None, derived_fields=(), insert_only_fields=()):
+        self.model = model
+        # Natural key the rows are matched on
+        self.key = key
+        # Columns stored as given
+        self.fields = fields
+        # Column -> (model, key field) of references given by their natural key
+        self.foreign_keys = foreign_keys or {}
+        # Column -> (model, key field) of references listed as 'a;b;c'
+        self.many_to_many = many_to_many or {}
+        # Self reference (also in foreign_keys) written one hierarchy level at a time
+        self.parent_field = parent_field
+        # Sets derived attributes (geohash, region) from the other values
+        self.prepare = prepare
+        # Fields computed on import (the hierarchy level, what `prepare` sets)
+        self.derived_fields = derived_fields
+        # Fields written on insert but never updated
+        self.insert_only_fields = insert_only_fields
+
+    @property
+    def unique_key(self):
+        return self.model._meta.get_field(self.key).unique
+
+    def stored_fields(self):
+        """Model fields holding the imported and derived values"""
+        names = [self.key, *self.fields, *self.foreign_keys, *self.derived_fields]
+        return [self.model._meta.get_field(name) for name in names]
+
+
+def prepare_service(values):
+    values['geohash'] = encode_geohash(values['latitude'], values['longitude'])
+    values['region_id'] = resolve_service_region(
+        Service(latitude=values['latitude'], longitude=values['longitude'], city=values['city'])
+    )
+
+
+SERVICE_FIELDS = [
+    'description', 'phone_number', 'email', 'website', 'address', 'city', 'province',
+    'postal_code', 'latitude', 'longitude', 'bed_capacity', 'staff_count',
+    'psychiatrist_count', 'psychologist_count', 'nurse_count', 'social_worker_count',
+    'operating_hours', 'is_24_7', 'accepts_emergency', 'accepts_bpjs',
+    'accepts_private_insurance', 'funding_sources', 'is_verified', 'is_active',
+]
+
+# Table name -> spec, in import order (references before the rows using them)
+TABLES = {
+    'mtc': ImportSpec(
+        MainTypeOfCare, 'code',
+        ['name', 'description', 'is_healthcare', 'service_delivery_type', 'is_active'],
+        foreign_keys={'parent': (MainTypeOfCare, 'code')},
+        parent_field='parent',
+        derived_fields=('level',),
+    ),
+    'bsic': ImportSpec(BasicStableInputsOfCare, 'code', ['name', 'description', 'is_active']),
+    'service_types': ImportSpec(ServiceType, 'name', ['description', 'is_active']),
+    'target_populations': ImportSpec(TargetPopulation, 'name', ['description', 'is_active']),
+    'services': ImportSpec(
+        Service, 'name', SERVICE_FIELDS,
+        foreign_keys={
+            'mtc': (MainTypeOfCare, 'code'),
+            'bsic': (BasicStableInputsOfCare, 'code'),
+            'service_type': (ServiceType, 'name'),
+        },
+        many_to_many={'target_populations': (TargetPopulation, 'name')},
+        prepare=prepare_service,
+        derived_fields=('geohash', 'region'),
+        insert_only_fields=('created_by',),
+    ),
+}
+
+
+def read_import_file(path, table=None):
+    """
+    ({table: rows}, ImportExportLog format) of a CSV or JSON file
+
+    JSON files hold either {table: [row, ...]} or the rows of `table`; CSV
+    files hold the rows of `table`, by default the file name without
+    extension (e.g. mtc.csv).
+    """
+    name, extension = os.path.splitext(os.path.basename(path))
+    extension = extension.lower()
+    table = table or (name if name in TABLES else None)
+    if extension not in ('.csv', '.json'):
+        raise DirectoryImportError(f'Unsupported file type of {path} (use .csv or .json)')
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            data = json.load(f) if extension == '.json' else list(csv.DictReader(f))
+    except (OSError, ValueError) as e:
+        raise DirectoryImportError(f'Cannot read {path}: {e}')
+
+    file_format = ImportExportLog.Format.JSON if extension == '.json' else ImportExportLog.Format.CSV
+    if isinstance(data, dict):
+        return data, file_format
+    if table is None:
+        raise DirectoryImportError(f'Name the table of {path} (one of {", ".join(TABLES)})')
+    return {table: data}, file_format
+
+
+def parse_value(field, raw):
+    """Python value of a JSON or CSV cell for a model field"""
+    if isinstance(raw, str):
+        raw = raw.strip()
+        if raw == '':
+            if field.null:
+                return None
+            return field.get_default() if field.has_default() else ''
+        if field.get_internal_type() == 'BooleanField':
+            if raw.lower() in TRUE_VALUES:
+                return True
+            if raw.lower() in FALSE_VALUES:
+                return False
+            raise ValidationError(f'{raw!r} is not a boolean')
+    if raw is None:
+        return None
+    return field.to_python(raw)
+
+
+def parse_keys(raw):
+    """Natural keys of a many-to-many column: a list, or a 'a;b;c' string"""
+    if raw is None:
+        return []
+    if isinstance(raw, str):
+        raw = raw.split(LIST_SEPARATOR)
+    return [str(key).strip() for key in raw if str(key).strip()]
+
+
+class ImportResult:
+    """Counts and problems of an import"""
+
+    def __init__(self):
+        # Table -> {'created', 'updated', 'unchanged', 'failed'}
+        self.tables = {}
+        self.errors = []
+        self.warnings = []
+        self.log = None
+        # Model -> ids of the rows written
+        self.written = {}
+
+    def counts(self, table):
+        return self.tables.setdefault(table, dict.fromkeys(('created', 'updated', 'unchanged', 'failed'), 0))
+
+    def total(self, count):
+        return sum(counts[count] for counts in self.tables.values())
+
+    def fail(self, table, row, key, message):
+        self.counts(table)['failed'] += 1
+        self.errors.append({'table': table, 'row': row, 'key': key, 'error': message})
+
+
+class TableImporter:
+    """Imports the rows of one table"""
+
+    def __init__(self, table, spec, result, user=None, update=True):
+        self.table = table
+        self.spec = spec
+        self.model = spec.model
+        self.result = result
+        self.user = user
+        self.update = update
+        self.counts = result.counts(table)
+        self.fields = {field.name: field for field in spec.stored_fields()}
+
+    def parse(self, rows):
+        """{key: (row number, {column: value})} of the valid rows"""
+        parsed = {}
+        for number, row in enumerate(rows, start=1):
+            if not isinstance(row, dict):
+                self.result.fail(self.table, number, None, 'Row is not an object')
+                continue
+            key = str(row.get(self.spec.key) or '').strip()
+            if not key:
+                self.result.fail(self.table, number, None, f'Missing {self.spec.key}')
+                continue
+            try:
+                values = self.parse_row(row)
+            except ValidationError as e:
+                self.result.fail(self.table, number, key, '; '.join(e.messages))
+                continue
+            if key in parsed:
+                self.result.warnings.append(
+                    {'table': self.table, 'row': number, 'key': key, 'warning': 'Duplicate key, later row used'}
+                )
+            values[self.spec.key] = key
+            parsed[key] = (number, values)
+        return parsed
+
+    def parse_row(self, row):
+        values = {}
+        for column in self.spec.fields:
+            if column in row:
+                try:
+                    values[column] = parse_value(self.fields[column], row[column])
+                except ValidationError as e:
+                    raise ValidationError(f'{column}: {"; ".join(e.messages)}')
+        for column in self.spec.foreign_keys:
+            if column in row:
+                values[column] = str(row[column]).strip() if row[column] not in (None, '') else None
+        for column in self.spec.many_to_many:
+            if column in row:
+                values[column] = parse_keys(row[column])
+        return values
+
+    def fetch_existing(self, keys):
+        """{key: stored values} of the existing rows (the oldest one for duplicate keys)"""
+        attnames = [field.attname for field in self.fields.values()]
+        existing = {}
+        queryset = self.model.objects.filter(**{f'{self.spec.key}__in': keys}).order_by('pk')
+        for values in queryset.values('id', *attnames):
+            existing.setdefault(values[self.spec.key], values)
+        return existing
+
+    def fetch_references(self, parsed):
+        """Column -> {natural key: id} of the rows referenced by the parsed rows"""
+        references = {}
+        for column, (model, key_field) in {**self.spec.foreign_keys, **self.spec.many_to_many}.items():
+            if column == self.spec.parent_field:
+                continue
+            keys = set()
+            for _, values in parsed.values():
+                value = values.get(column)
+                keys.update(value if isinstance(value, list) else [value] if value else [])
+            references[column] = dict(
+                model.objects.filter(**{f'{key_field}__in': keys}).values_list(key_field, 'id')
+            ) if keys else {}
+        return references
+
+    def hierarchy_levels(self, parsed, existing):
+        """
+        Rows grouped by hierarchy level, parents first, and {key: id} of the
+        stored rows; rows whose parent chain is unknown or cyclic are
+        reported and left out
+        """
+        column = self.spec.parent_field
+        # Hierarchical tables are small: load all of it
+        stored = {
+            key: (pk, parent_id, level)
+            for pk, key, parent_id, level in self.model.objects.values_list(
+                'id', self.spec.key, f'{column}_id', 'level'
+            )
+        }
+        key_by_id = {pk: key for key, (pk, _, _) in stored.items()}
+        levels = {}
+
+        def level_of(key, seen):
+            if key in levels:
+                return levels[key]
+            if key in seen:
+                raise ValidationError(f'Cyclic {column} chain')
+            _, values = parsed[key]
+            if column in values:
+                parent = values[column]
+            else:
+                parent = key_by_id.get(stored[key][1]) if key in stored else None
+            if parent is None:
+                level = 0
+            elif parent in parsed:
+                level = level_of(parent, seen | {key}) + 1
+            elif parent in stored:
+                level = stored[parent][2] + 1
+            else:
+                raise ValidationError(f'Unknown {column} {parent!r}')
+            levels[key] = level
+            return level
+
+        groups = {}
+        for key in list(parsed):
+            try:
+                level = level_of(key, frozenset())
+            except ValidationError as e:
+                number, _ = parsed.pop(key)
+                self.result.fail(self.table, number, key, '; '.join(e.messages))
+                continue
+            groups.setdefault(level, []).append(key)
+        ids = {key: pk for key, (pk, _, _) in stored.items()}
+        return [(level, groups[level]) for level in sorted(groups)], ids
+
+    def build(self, values, stored, references, ids, level):
+        """
+        (attname -> value of the row, many-to-many column -> target ids), or
+        raises ValidationError
+        """
+        if stored is not None:
+            row = {field.attname: stored[field.attname] for field in self.fields.values()}
+        else:
+            row = {field.attname: field.get_default() for field in self.fields.values()}
+            row[self.spec.key] = values[self.spec.key]
+        for column in self.spec.fields:
+            if column in values:
+                row[self.fields[column].attname] = values[column]
+
+        for column in self.spec.foreign_keys:
+            if column not in values:
+                continue
+            reference = values[column]
+            lookup = ids if column == self.spec.parent_field else references[column]
+            if reference is None:
+                row[f'{column}_id'] = None
+            elif reference in lookup:
+                row[f'{column}_id'] = lookup[reference]
+            else:
+                raise ValidationError(f'Unknown {column} {reference!r}')
+        for field in self.fields.values():
+            value = row[field.attname]
+            if field.name not in self.spec.derived_fields and (
+                (value is None and not field.null) or (value == '' and not field.blank)
+            ):
+                raise ValidationError(f'{field.name} is required')
+        if level is not None:
+            row['level'] = level
+        if self.spec.prepare:
+            self.spec.prepare(row)
+
+        many_to_many = {}
+        for column in self.spec.many_to_many:
+            if column in values:
+                unknown = [key for key in values[column] if key not in references[column]]
+                if unknown:
+                    raise ValidationError(f'Unknown {column} {", ".join(map(repr, unknown))}')
+                many_to_many[column] = {references[column][key] for key in values[column]}
+        return row, many_to_many
+
+    def upsert(self, instances):
+        """Insert new rows and update existing ones in batches"""
+        update_fields = [
+            field.name for field in self.fields.values() if not (self.spec.unique_key and field.name == self.spec.key)
+        ]
+        if any(field.name == 'updated_at' for field in self.model._meta.fields):
+            update_fields.append('updated_at')
+        options = {'update_conflicts': True, 'update_fields': update_fields}
+        connection = connections[router.db_for_write(self.model)]
+        if connection.features.supports_update_conflicts_with_target:
+            # Rows without a unique natural key are matched on the id found by the diff
+            options['unique_fields'] = [self.spec.key if self.spec.unique_key else 'id']
+        self.model.objects.bulk_create(instances, batch_size=BATCH_SIZE, **options)
+
+    def write_many_to_many(self, column, targets):
+        """Replace the {row id: target ids} links of a many-to-many column"""
+        if not targets:
+            return
+        field = self.model._meta.get_field(column)
+        through = field.remote_field.through
+        source = field.m2m_field_name() + '_id'
+        target = field.m2m_reverse_field_name() + '_id'
+        through.objects.filter(**{f'{source}__in': list(targets)}).delete()
+        through.objects.bulk_create([
+            through(**{source: pk, target: target_id})
+            for pk, target_ids in targets.items()
+            for target_id in sorted(target_ids)
+        ], batch_size=BATCH_SIZE)
+
+    def stored_links(self, column, row_ids):
+        """{row id: target ids} of a many-to-many column"""
+        field = self.model._meta.get_field(column)
+        through = field.remote_field.through
+        source = field.m2m_field_name() + '_id'
+        target = field.m2m_reverse_field_name() + '_id'
+        links = {pk: set() for pk in row_ids}
+        for pk, target_id in through.objects.filter(**{f'{source}__in': row_ids}).values_list(source, target):
+            links[pk].add(target_id)
+        return links
+
+    def run(self, rows):
+        parsed = self.parse(rows)
+        if not parsed:
+            return
+        existing = self.fetch_existing(list(parsed))
+        references = self.fetch_references(parsed)
+        links = {
+            column: self.stored_links(column, [row['id'] for row in existing.values()])
+            for column in self.spec.many_to_many
+        }
+        if self.spec.parent_field:
+            groups, ids = self.hierarchy_levels(parsed, existing)
+        else:
+            groups, ids = [(None, list(parsed))], {}
+
+        written = self.result.written.setdefault(self.model, [])
+        for level, keys in groups:
+            instances = []
+            created = []
+            changed_links = {column: {} for column in self.spec.many_to_many}
+            for key in keys:
+                number, values = parsed[key]
+                stored = existing.get(key)
+                if stored is not None and not self.update:
+                    self.counts['unchanged'] += 1
+                    continue
+                try:
+                    row, many_to_many = self.build(values, stored, references, ids, level)
+                except ValidationError as e:
+                    self.result.fail(self.table, number, key, '; '.join(e.messages))
+                    continue
+
+                new_links = {
+                    column: targets for column, targets in many_to_many.items()
+                    if stored is None or links[column][stored['id']] != targets
+                }
+                if stored is None:
+                    for name in self.spec.insert_only_fields:
+                        row[f'{name}_id'] = self.user.pk if self.user else None
+                    instances.append(self.model(**row))
+                    created.append((key, new_links))
+                    continue
+
+                row_changed = any(row[name] != stored[name] for name in row)
+                if not row_changed and not new_links:
+                    self.counts['unchanged'] += 1
+                    continue
+                if row_changed:
+                    # Rows without a unique natural key are matched on their id
+                    instances.append(self.model(**row) if self.spec.unique_key else self.model(id=stored['id'], **row))
+                for column, targets in new_links.items():
+                    changed_links[column][stored['id']] = targets
+                self.counts['updated'] += 1
+                written.append(stored['id'])
+
+            self.upsert(instances)
+            if created:
+                created_ids = dict(
+                    self.model.objects.filter(**{f'{self.spec.key}__in': [key for key, _ in created]})
+                    .values_list(self.spec.key, 'id')
+                )
+                for key, new_links in created:
+                    written.append(created_ids[key])
+                    for column, targets in new_links.items():
+                        changed_links[column][created_ids[key]] = targets
+                ids.update(created_ids)
+                self.counts['created'] += len(created)
+            for column, targets in changed_links.items():
+                self.write_many_to_many(column, targets)
+
+
+def import_directory(data, user=None, file_name='', file_format=ImportExportLog.Format.JSON,
+                     update=True, strict=False, dry_run=False):
+    """
+    Import {table: rows} (tables as in TABLES) in one transaction
+
+    Invalid rows are skipped and reported; with `strict` any invalid row
+    rolls the whole import back. With `update` disabled existing rows are
+    left untouched and only new ones inserted. `dry_run` computes the
+    counts and rolls back. Returns an ImportResult whose `log` is the
+    ImportExportLog of the import.
+    """
+    unknown = set(data) - set(TABLES)
+    if unknown:
+        raise DirectoryImportError(f'Unknown table(s) {", ".join(sorted(unknown))} (use {", ".join(TABLES)})')
+
+    result = ImportResult()
+    total = sum(len(rows) for rows in data.values())
+    log = ImportExportLog.objects.create(
+        operation=ImportExportLog.Operation.IMPORT,
+        status=ImportExportLog.Status.IN_PROGRESS,
+        user=user,
+        username=user.email if user else 'system',
+        model_name=', '.join(TABLES[table].model.__name__ for table in TABLES if table in data)[:100],
+        file_format=file_format,
+        file_name=file_name[:500],
+        total_records=total,
+        options={'update': update, 'strict': strict, 'dry_run': dry_run},
+    )
+    result.log = log
+    started = time.monotonic()
+
+    try:
+        with transaction.atomic():
+            for table, spec in TABLES.items():
+                if table in data:
+                    TableImporter(table, spec, result, user=user, update=update).run(data[table])
+            if dry_run or (strict and result.errors):
+                transaction.set_rollback(True)
+    except Exception as e:
+        log.status = ImportExportLog.Status.FAILED
+        log.errors = [{'error': str(e)}]
+        log.completed_at = timezone.now()
+        log.duration_seconds = int(time.monotonic() - started)
+        log.save(update_fields=['status', 'errors', 'completed_at', 'duration_seconds'])
+        raise
+
+    rolled_back = dry_run or (strict and result.errors)
+    written = result.total('created') + result.total('updated')
+    if strict and result.errors:
+        log.status = ImportExportLog.Status.FAILED
+    elif result.errors:
+        log.status = ImportExportLog.Status.PARTIALLY_COMPLETED if written or result.total('unchanged') \
+            else ImportExportLog.Status.FAILED
+    else:
+        log.status = ImportExportLog.Status.COMPLETED
+    log.successful_records = 0 if rolled_back else written
+    log.failed_records = result.total('failed')
+    log.skipped_records = result.total('unchanged')
+    log.errors = result.errors or None
+    log.warnings = result.warnings or None
+    log.metadata = {'tables': result.tables}
+    if dry_run:
+        log.notes = 'Dry run: nothing was written'
+    log.completed_at = timezone.now()
+    log.duration_seconds = int(time.monotonic() - started)
+    log.save(update_fields=[
+        'status', 'successful_records', 'failed_records', 'skipped_records', 'errors', 'warnings',
+        'metadata', 'notes', 'completed_at', 'duration_seconds',
+    ])
+
+    if not rolled_back:
+        for model, pks in result.written.items():
+            if pks:
+                rows_imported.send(sender=model, pks=pks)
+    return result
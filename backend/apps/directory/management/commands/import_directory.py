@@ -0,0 +1,67 @@
+"""
+Management command to bulk-import classifications and services from CSV or JSON
+"""
+import os
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.directory.importer import TABLES, DirectoryImportError, import_directory, read_import_file
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Import MTC, BSIC, service types, target populations and services (insert or update by natural key)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='+',
+            help='CSV files (one table each, named after it by default) or JSON files ({table: rows})',
+        )
+        parser.add_argument('--table', choices=list(TABLES), help='Table of the rows in the given files')
+        parser.add_argument('--user', help='E-mail of the user the import is logged as (and who creates services)')
+        parser.add_argument('--insert-only', action='store_true', help='Leave existing rows untouched')
+        parser.add_argument('--strict', action='store_true', help='Roll everything back if any row is invalid')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change, then roll back')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(email=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user {options['user']}")
+
+        data = {}
+        file_format = None
+        try:
+            for path in options['paths']:
+                tables, file_format = read_import_file(path, options['table'])
+                for table, rows in tables.items():
+                    data.setdefault(table, []).extend(rows)
+            result = import_directory(
+                data, user=user, file_name=', '.join(os.path.basename(path) for path in options['paths']),
+                file_format=file_format, update=not options['insert_only'], strict=options['strict'],
+                dry_run=options['dry_run'],
+            )
+        except DirectoryImportError as e:
+            raise CommandError(str(e))
+
+        for table, counts in result.tables.items():
+            self.stdout.write(
+                f"{table:<20} {counts['created']:>6} created {counts['updated']:>6} updated "
+                f"{counts['unchanged']:>6} unchanged {counts['failed']:>6} failed"
+            )
+        for error in result.errors[:20]:
+            self.stdout.write(self.style.ERROR(
+                f"  {error['table']} row {error['row']} ({error['key'] or '-'}): {error['error']}"
+            ))
+        if len(result.errors) > 20:
+            self.stdout.write(self.style.ERROR(f'  ... and {len(result.errors) - 20} more error(s)'))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing was written'))
+        elif options['strict'] and result.errors:
+            raise CommandError('Invalid rows, nothing was imported')
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Import logged as #{result.log.pk} ({result.log.status})'))
@@ -0,0 +1,24 @@
+"""
+Management command to rebuild the service full-text search documents
+"""
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.directory.search import FTS_TABLE, get_search_backend, index_services
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the service search documents (e.g. after bulk writes that bypass save())'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Services per batch (default: 500)')
+
+    def handle(self, *args, **options):
+        count = index_services(batch_size=options['batch_size'])
+
+        if get_search_backend(connection) == 'fts5':
+            # Also recompacts the FTS5 index
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} service(s)'))
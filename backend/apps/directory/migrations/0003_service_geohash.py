@@ -0,0 +1,39 @@
+# Generated by Django 6.1.2 on 2026-10-17 19:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+from apps.directory.geo import encode_geohash
+
+
+def backfill_geohash(apps, schema_editor):
+    """Compute the geohash of the services created before the column existed"""
+    Service = apps.get_model('directory', 'Service')
+    services = list(
+        Service.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .only('id', 'latitude', 'longitude')
+    )
+    for service in services:
+        service.geohash = encode_geohash(service.latitude, service.longitude)
+    Service.objects.bulk_update(services, ['geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directory', '0002_add_desde_ltc_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Geohash of latitude/longitude, maintained on save', max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['latitude', 'longitude'], name='services_latitud_72f6b3_idx'),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
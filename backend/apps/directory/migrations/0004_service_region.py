@@ -0,0 +1,20 @@
+# Generated by Django 6.1.2 on 2026-10-17 19:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directory', '0003_service_geohash'),
+        ('geo', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='region',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Kecamatan/regency containing the service, assigned on save', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='services', to='geo.region'),
+        ),
+    ]
@@ -0,0 +1,154 @@
+# Generated by Django 6.1.2 on 2026-10-17 19:52
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+# Frozen copy of the analyzer of apps.directory.search at the time of this
+# migration; documents built by a later analyzer are rewritten by
+# `manage.py rebuild_search_index`
+ABBREVIATIONS = {
+    'rsj': 'rumah sakit jiwa',
+    'rsud': 'rumah sakit umum daerah',
+    'rsu': 'rumah sakit umum',
+    'rs': 'rumah sakit',
+    'puskesmas': 'pusat kesehatan masyarakat',
+    'pustu': 'puskesmas pembantu',
+    'keswa': 'kesehatan jiwa',
+    'odgj': 'orang dengan gangguan jiwa',
+    'odmk': 'orang dengan masalah kejiwaan',
+    'napza': 'narkotika psikotropika dan zat adiktif',
+    'ipwl': 'institusi penerima wajib lapor',
+    'bpjs': 'badan penyelenggara jaminan sosial',
+    'dinkes': 'dinas kesehatan',
+    'dinsos': 'dinas sosial',
+    'poli': 'poliklinik',
+    'kab': 'kabupaten',
+    'kec': 'kecamatan',
+    'jl': 'jalan',
+    'dr': 'dokter',
+}
+EXPANSIONS = {tuple(expansion.split()): abbreviation for abbreviation, expansion in ABBREVIATIONS.items()}
+
+TOKEN = re.compile(r'[0-9a-z]+')
+
+
+def analyze(*texts):
+    """Space-separated, expanded tokens of some texts, as stored in a document"""
+    tokens = []
+    for text in texts:
+        text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode()
+        tokens.extend(TOKEN.findall(text.lower()))
+    expanded = list(tokens)
+    for index, token in enumerate(tokens):
+        if token in ABBREVIATIONS:
+            expanded.extend(ABBREVIATIONS[token].split())
+        for phrase, abbreviation in EXPANSIONS.items():
+            if tuple(tokens[index:index + len(phrase)]) == phrase:
+                expanded.append(abbreviation)
+    return ' '.join(expanded)
+
+
+SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE service_search_fts USING fts5(
+        name, body,
+        content='service_search_documents', content_rowid='service_id',
+        prefix='2 3', tokenize='unicode61'
+    )""",
+    """CREATE TRIGGER service_search_documents_ai AFTER INSERT ON service_search_documents BEGIN
+        INSERT INTO service_search_fts(rowid, name, body) VALUES (new.service_id, new.name, new.body);
+    END""",
+    """CREATE TRIGGER service_search_documents_ad AFTER DELETE ON service_search_documents BEGIN
+        INSERT INTO service_search_fts(service_search_fts, rowid, name, body)
+        VALUES ('delete', old.service_id, old.name, old.body);
+    END""",
+    """CREATE TRIGGER service_search_documents_au AFTER UPDATE ON service_search_documents BEGIN
+        INSERT INTO service_search_fts(service_search_fts, rowid, name, body)
+        VALUES ('delete', old.service_id, old.name, old.body);
+        INSERT INTO service_search_fts(rowid, name, body) VALUES (new.service_id, new.name, new.body);
+    END""",
+]
+SQLITE_FTS_DROP = [
+    'DROP TRIGGER IF EXISTS service_search_documents_ai',
+    'DROP TRIGGER IF EXISTS service_search_documents_ad',
+    'DROP TRIGGER IF EXISTS service_search_documents_au',
+    'DROP TABLE IF EXISTS service_search_fts',
+]
+MYSQL_FULLTEXT = [
+    'ALTER TABLE service_search_documents'
+    ' ADD FULLTEXT INDEX service_search_name_body (name, body),'
+    ' ADD FULLTEXT INDEX service_search_name (name)',
+]
+MYSQL_FULLTEXT_DROP = [
+    'ALTER TABLE service_search_documents'
+    ' DROP INDEX service_search_name_body, DROP INDEX service_search_name',
+]
+
+
+def create_fulltext_index(apps, schema_editor):
+    """FTS5 table (SQLite) or FULLTEXT indexes (MySQL) over the search documents"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            for statement in SQLITE_FTS:
+                schema_editor.execute(statement)
+        except OperationalError:
+            # SQLite built without FTS5: search falls back to substring matching
+            for statement in SQLITE_FTS_DROP:
+                schema_editor.execute(statement)
+    elif vendor == 'mysql':
+        for statement in MYSQL_FULLTEXT:
+            schema_editor.execute(statement)
+
+
+def drop_fulltext_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_FTS_DROP, 'mysql': MYSQL_FULLTEXT_DROP}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def populate_documents(apps, schema_editor):
+    """Index the services created before the search documents existed"""
+    Service = apps.get_model('directory', 'Service')
+    ServiceSearchDocument = apps.get_model('directory', 'ServiceSearchDocument')
+    services = Service.objects.select_related('mtc', 'bsic', 'service_type').order_by('pk')
+    ServiceSearchDocument.objects.bulk_create([
+        ServiceSearchDocument(
+            service_id=service.pk,
+            name=analyze(service.name),
+            body=analyze(
+                service.description, service.address, service.city, service.province,
+                service.mtc.code, service.mtc.name, service.bsic.code, service.bsic.name,
+                service.service_type.name,
+            ),
+        )
+        for service in services.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directory', '0004_service_region'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ServiceSearchDocument',
+            fields=[
+                ('service', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='directory.service')),
+                ('name', models.TextField(help_text='Tokens of the service name')),
+                ('body', models.TextField(help_text='Tokens of the other searchable fields')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'service_search_documents',
+            },
+        ),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+        migrations.RunPython(populate_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.1.2 on 2026-10-17 21:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('directory', '0005_service_search_document'),
+        ('geo', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['updated_at', 'id'], name='services_updated_c8bca9_idx'),
+        ),
+    ]
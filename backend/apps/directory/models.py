@@ -1,6 +1,8 @@
 from django.db import models
 from django.core.validators import MinValueValidator
 
+from .geo import encode_geohash
+
 
 class MainTypeOfCare(models.Model):
     """MTC - Main Type of Care classification from DESDE-LTC"""
@@ -173,6 +175,22 @@ class Service(models.Model):
         null=True,
         blank=True
     )
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Geohash of latitude/longitude, maintained on save"
+    )
+    region = models.ForeignKey(
+        'geo.Region',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='services',
+        help_text="Kecamatan/regency containing the service, assigned on save"
+    )
 
     # Capacity and Staffing
     bed_capacity = models.PositiveIntegerField(
@@ -240,11 +258,22 @@ class Service(models.Model):
             models.Index(fields=['city', 'province']),
             models.Index(fields=['is_verified', 'is_active']),
             models.Index(fields=['-created_at']),
+            models.Index(fields=['latitude', 'longitude']),
+            # Delta sync walks (updated_at, id) (see apps.survey.sync)
+            models.Index(fields=['updated_at', 'id']),
         ]
 
     def __str__(self):
         return f"{self.name} ({self.city})"
 
+    def save(self, *args, **kwargs):
+        self.geohash = encode_geohash(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude', 'city'} & set(update_fields):
+            # Kept in sync with the location (the region by a pre_save handler)
+            kwargs['update_fields'] = {*update_fields, 'geohash', 'region'}
+        super().save(*args, **kwargs)
+
     @property
     def total_professional_staff(self):
         """Total count of professional staff"""
@@ -254,3 +283,28 @@ class Service(models.Model):
             self.nurse_count +
             self.social_worker_count
         )
+
+
+class ServiceSearchDocument(models.Model):
+    """
+    Denormalized, pre-tokenized search text of a service (see search.py)
+
+    Full-text indexed by a SQLite FTS5 table or MySQL FULLTEXT indexes
+    created in the migration; kept in sync by signals.
+    """
+
+    service = models.OneToOneField(
+        Service,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='search_document'
+    )
+    name = models.TextField(help_text="Tokens of the service name")
+    body = models.TextField(help_text="Tokens of the other searchable fields")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'service_search_documents'
+
+    def __str__(self):
+        return f"Search document for service {self.service_id}"
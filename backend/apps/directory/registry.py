@@ -0,0 +1,146 @@
+"""
+Process-wide registry of the DESDE-LTC reference tables
+
+MTC, BSIC, ServiceType and TargetPopulation rows are loaded lazily (one query
+per table) into dicts keyed by id and by code (name for the tables without a
+code), holding each row's serialized representation. Service serializers and
+exports resolve their foreign keys here instead of joining the tables.
+
+Writes to a reference table bump a version stamp in the default cache, which
+the workers share (see CACHES); every process compares its loaded version
+with the stamp at most once per REFERENCE_DATA_CHECK_INTERVAL seconds and
+reloads when it changed. An id missing from the loaded rows is looked up
+with a one-row query: the tables are reloaded if it exists (created since
+the last load), and it is remembered as missing until the next load if not.
+
+Each load also fingerprints every table from its row count and latest
+updated_at. Fingerprints are the same in every process and across restarts,
+so the reference endpoints derive their ETags from them.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .models import MainTypeOfCare, BasicStableInputsOfCare, ServiceType, TargetPopulation
+
+REFERENCE_VERSION_CACHE_KEY = 'directory:reference_version'
+
+
+def _mtc_queryset():
+    return MainTypeOfCare.objects.select_related('parent').annotate(num_children=Count('children'))
+
+
+# Table name -> (model, queryset factory, serializer name, code field)
+REFERENCE_TABLES = {
+    'mtc': (MainTypeOfCare, _mtc_queryset, 'MainTypeOfCareSerializer', 'code'),
+    'bsic': (BasicStableInputsOfCare, BasicStableInputsOfCare.objects.all,
+             'BasicStableInputsOfCareSerializer', 'code'),
+    'service_type': (ServiceType, ServiceType.objects.all, 'ServiceTypeSerializer', 'name'),
+    'target_population': (TargetPopulation, TargetPopulation.objects.all,
+                          'TargetPopulationSerializer', 'name'),
+}
+
+
+def get_reference_version():
+    """Current version stamp shared by all processes"""
+    version = cache.get(REFERENCE_VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(REFERENCE_VERSION_CACHE_KEY, version, None)
+        version = cache.get(REFERENCE_VERSION_CACHE_KEY, version)
+    return version
+
+
+class ReferenceRegistry:
+    """Lazily loaded, version-checked copy of the reference tables"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tables = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def _load(self):
+        # Imported here: the serializers resolve their references through this module
+        from . import serializers
+
+        tables = {}
+        for name, (model, get_queryset, serializer_name, code_field) in REFERENCE_TABLES.items():
+            # Taken before the rows, so that a concurrent write changes it on the next load
+            stats = model.objects.aggregate(count=Count('pk'), updated=Max('updated_at'))
+            fingerprint = f"{stats['count']}-{stats['updated'].timestamp() if stats['updated'] else 0}"
+            serializer_class = getattr(serializers, serializer_name)
+            by_id = {}
+            by_code = {}
+            for row in serializer_class(get_queryset(), many=True).data:
+                by_id[row['id']] = row
+                by_code[row[code_field]] = row
+            # Ids found missing since the load
+            tables[name] = (by_id, by_code, fingerprint, set())
+        return tables
+
+    def _get_tables(self):
+        now = time.monotonic()
+        interval = getattr(settings, 'REFERENCE_DATA_CHECK_INTERVAL', 5)
+        # Read once: reload() may reset it concurrently
+        tables = self._tables
+        if tables is not None and now - self._checked_at < interval:
+            return tables
+
+        with self._lock:
+            version = get_reference_version()
+            if self._tables is None or version != self._version:
+                self._tables = self._load()
+                self._version = version
+            self._checked_at = now
+            return self._tables
+
+    def reload(self):
+        """Reload every table on next access"""
+        with self._lock:
+            self._tables = None
+
+    def all(self, table):
+        """All rows of a table, keyed by id (treat as read-only)"""
+        return self._get_tables()[table][0]
+
+    def get(self, table, pk):
+        """Serialized row of a table by id, or None"""
+        if pk is None:
+            return None
+        by_id, _, _, missing = self._get_tables()[table]
+        row = by_id.get(pk)
+        if row is None and pk not in missing:
+            model = REFERENCE_TABLES[table][0]
+            try:
+                exists = model.objects.filter(pk=pk).exists()
+            except (TypeError, ValueError):
+                exists = False
+            if exists:
+                # Created by another process since the last load
+                self.reload()
+                row = self._get_tables()[table][0].get(pk)
+            else:
+                missing.add(pk)
+        return row
+
+    def get_by_code(self, table, code):
+        """Serialized row of a table by code (or name), or None"""
+        return self._get_tables()[table][1].get(code)
+
+    def fingerprint(self, table):
+        """'<row count>-<latest updated_at>' of a table, as of its last load"""
+        return self._get_tables()[table][2]
+
+
+registry = ReferenceRegistry()
+
+
+def bump_reference_version():
+    """Invalidate the reference registry in every process"""
+    cache.set(REFERENCE_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    registry.reload()
@@ -0,0 +1,255 @@
+"""
+Full-text search over services
+
+Every service has a ServiceSearchDocument holding its searchable fields
+(name, description, address, location and the names and codes of its MTC,
+BSIC and service type) as normalized tokens, with common Indonesian health
+abbreviations and their expansions indexed side by side ("RSJ" also indexes
+"rumah sakit jiwa" and the other way round).
+
+The documents are full-text indexed by the database:
+- SQLite: an FTS5 table kept in sync by triggers, ranked with bm25()
+- MySQL: FULLTEXT indexes, ranked with MATCH ... AGAINST in boolean mode
+Other backends fall back to substring matching on the document table, and
+so do the MySQL query terms InnoDB does not index (stopwords and words
+shorter than its minimum token size), which would otherwise match nothing.
+
+Every query term is matched as a prefix ("pusk" finds "Puskesmas").
+
+Documents are rebuilt once the transaction writing their service or its
+classifications commits, the services of all the writes of a transaction
+together (see index_services_on_commit).
+"""
+import functools
+import operator
+import re
+import threading
+import unicodedata
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from core.caching import bump_generation
+from .models import Service, ServiceSearchDocument
+
+FTS_TABLE = 'service_search_fts'
+MYSQL_MIN_TOKEN_SIZE = 3
+# InnoDB's default FULLTEXT stopword list (INNODB_FT_DEFAULT_STOPWORD)
+MYSQL_STOPWORDS = frozenset({
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how',
+    'i', 'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what',
+    'when', 'where', 'who', 'will', 'with', 'und', 'www',
+})
+
+# Abbreviation -> expansion, both lowercase
+ABBREVIATIONS = {
+    'rsj': 'rumah sakit jiwa',
+    'rsud': 'rumah sakit umum daerah',
+    'rsu': 'rumah sakit umum',
+    'rs': 'rumah sakit',
+    'puskesmas': 'pusat kesehatan masyarakat',
+    'pustu': 'puskesmas pembantu',
+    'keswa': 'kesehatan jiwa',
+    'odgj': 'orang dengan gangguan jiwa',
+    'odmk': 'orang dengan masalah kejiwaan',
+    'napza': 'narkotika psikotropika dan zat adiktif',
+    'ipwl': 'institusi penerima wajib lapor',
+    'bpjs': 'badan penyelenggara jaminan sosial',
+    'dinkes': 'dinas kesehatan',
+    'dinsos': 'dinas sosial',
+    'poli': 'poliklinik',
+    'kab': 'kabupaten',
+    'kec': 'kecamatan',
+    'jl': 'jalan',
+    'dr': 'dokter',
+}
+EXPANSIONS = {tuple(expansion.split()): abbreviation for abbreviation, expansion in ABBREVIATIONS.items()}
+
+TOKEN = re.compile(r'[0-9a-z]+')
+
+
+def tokenize(text):
+    """Lowercase ASCII word tokens of a text (accents and punctuation dropped)"""
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode()
+    return TOKEN.findall(text.lower())
+
+
+def expand_tokens(tokens):
+    """Tokens plus the expansion of each abbreviation and the abbreviation of each expansion"""
+    expanded = list(tokens)
+    for index, token in enumerate(tokens):
+        if token in ABBREVIATIONS:
+            expanded.extend(ABBREVIATIONS[token].split())
+        for phrase, abbreviation in EXPANSIONS.items():
+            if tuple(tokens[index:index + len(phrase)]) == phrase:
+                expanded.append(abbreviation)
+    return expanded
+
+
+def analyze(*texts):
+    """Space-separated, expanded tokens of some texts, as stored in a document"""
+    tokens = []
+    for text in texts:
+        tokens.extend(tokenize(text))
+    return ' '.join(expand_tokens(tokens))
+
+
+def build_document(service):
+    """Unsaved ServiceSearchDocument of a service (with mtc, bsic, service_type loaded)"""
+    return ServiceSearchDocument(
+        service_id=service.pk,
+        name=analyze(service.name),
+        body=analyze(
+            service.description, service.address, service.city, service.province,
+            service.mtc.code, service.mtc.name, service.bsic.code, service.bsic.name,
+            service.service_type.name,
+        ),
+    )
+
+
+def index_services(queryset=None, batch_size=500):
+    """
+    (Re)build the search documents of some services (default: all of them)
+
+    Returns the number of documents written. bulk_create sends no signals, so
+    the cached service lists are invalidated here (see core.caching).
+    """
+    if queryset is None:
+        queryset = Service.objects.all()
+    queryset = queryset.select_related('mtc', 'bsic', 'service_type').order_by('pk')
+
+    count = 0
+    last_pk = 0
+    while True:
+        services = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+        if not services:
+            if count:
+                bump_generation(ServiceSearchDocument)
+            return count
+        documents = [build_document(service) for service in services]
+        ServiceSearchDocument.objects.filter(service_id__in=[s.pk for s in services]).delete()
+        ServiceSearchDocument.objects.bulk_create(documents)
+        count += len(documents)
+        last_pk = services[-1].pk
+
+
+_pending = threading.local()
+
+
+def index_services_on_commit(queryset):
+    """
+    Rebuild the search documents of some services once the current
+    transaction commits (right away outside of one). The services scheduled
+    by the writes of a transaction are reindexed together.
+    """
+    _pending.__dict__.setdefault('querysets', []).append(queryset)
+    transaction.on_commit(index_pending_services)
+
+
+def index_pending_services():
+    # The first callback of a commit indexes everything scheduled so far
+    querysets = _pending.__dict__.pop('querysets', None)
+    if querysets:
+        index_services(functools.reduce(operator.or_, querysets))
+
+
+def get_search_backend(connection):
+    """'fts5', 'mysql' or None (substring fallback) for a database connection"""
+    if connection.vendor == 'mysql':
+        return 'mysql'
+    if connection.vendor != 'sqlite':
+        return None
+    # The FTS5 table only exists where SQLite was built with FTS5
+    key = (connection.alias, connection.settings_dict['NAME'])
+    if key not in _fts_tables:
+        with connection.cursor() as cursor:
+            _fts_tables[key] = FTS_TABLE in connection.introspection.table_names(cursor)
+    return 'fts5' if _fts_tables[key] else None
+
+
+_fts_tables = {}
+
+
+def parse_query(text):
+    """Distinct query tokens, at most SERVICE_SEARCH_MAX_TERMS of them"""
+    terms = list(dict.fromkeys(tokenize(text)))
+    return terms[:getattr(settings, 'SERVICE_SEARCH_MAX_TERMS', 10)]
+
+
+def search_services(queryset, terms):
+    """
+    Services of a queryset matching every term (as a prefix), annotated with
+    `search_rank`; returns (queryset, ordering putting the best matches first)
+    """
+    connection = connections[queryset.db]
+    backend = get_search_backend(connection)
+    services_table = Service._meta.db_table
+
+    if backend == 'fts5':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        # bm25() is lower for better matches; the name counts ten times the rest
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {services_table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'bm25({FTS_TABLE}, 10.0, 1.0)'},
+        ), ['search_rank']
+
+    if backend == 'mysql':
+        # A required term InnoDB does not index (shorter than
+        # innodb_ft_min_token_size, or a stopword) would match nothing
+        indexed = [term for term in terms if len(term) >= MYSQL_MIN_TOKEN_SIZE and term not in MYSQL_STOPWORDS]
+        if indexed:
+            queryset = filter_substrings(queryset, [term for term in terms if term not in indexed])
+            terms = indexed
+        else:
+            backend = None
+    if backend == 'mysql':
+        documents_table = ServiceSearchDocument._meta.db_table
+        match = ' '.join(f'+{term}*' for term in terms)
+        return queryset.extra(
+            tables=[documents_table],
+            where=[
+                f'{documents_table}.service_id = {services_table}.id',
+                f'MATCH ({documents_table}.name, {documents_table}.body) AGAINST (%s IN BOOLEAN MODE)',
+            ],
+            params=[match],
+            select={'search_rank': (
+                f'MATCH ({documents_table}.name, {documents_table}.body) AGAINST (%s IN BOOLEAN MODE)'
+                f' + 10 * MATCH ({documents_table}.name) AGAINST (%s IN BOOLEAN MODE)'
+            )},
+            select_params=[match, match],
+        ), ['-search_rank']
+
+    return filter_substrings(queryset, terms), []
+
+
+def filter_substrings(queryset, terms):
+    """Services of a queryset whose document contains every term"""
+    for term in terms:
+        queryset = queryset.filter(
+            Q(search_document__name__contains=term) | Q(search_document__body__contains=term)
+        )
+    return queryset
+
+
+class ServiceSearchFilter(filters.SearchFilter):
+    """
+    ?search= backed by the service full-text index
+
+    Results are ranked by relevance unless an explicit ?ordering= is given;
+    list it after OrderingFilter in filter_backends.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = parse_query(request.query_params.get(self.search_param, ''))
+        if not terms:
+            return queryset
+
+        queryset, rank_ordering = search_services(queryset, terms)
+        if rank_ordering and not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by(*rank_ordering, *queryset.query.order_by)
+        return queryset
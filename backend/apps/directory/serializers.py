@@ -1,5 +1,27 @@
 from rest_framework import serializers
 from .models import MainTypeOfCare, BasicStableInputsOfCare, TargetPopulation, ServiceType, Service
+from .registry import registry
+
+
+class ReferenceField(serializers.ReadOnlyField):
+    """
+    Read-only representation of a reference-table foreign key, resolved
+    from the reference registry instead of a join.
+
+    `source` is the foreign key's id attribute (e.g. `mtc_id`); without
+    `attribute` the whole serialized row is returned.
+    """
+
+    def __init__(self, table, attribute=None, **kwargs):
+        self.table = table
+        self.attribute = attribute
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        row = registry.get(self.table, value)
+        if row is None or self.attribute is None:
+            return row
+        return row[self.attribute]
 
 
 class MainTypeOfCareSerializer(serializers.ModelSerializer):
@@ -17,6 +39,9 @@ class MainTypeOfCareSerializer(serializers.ModelSerializer):
         ]
 
     def get_children_count(self, obj):
+        # Annotated by MainTypeOfCareViewSet and the MTC tree builder
+        if hasattr(obj, 'num_children'):
+            return obj.num_children
         return obj.children.count()
 
 
@@ -47,11 +72,11 @@ class ServiceTypeSerializer(serializers.ModelSerializer):
 class ServiceListSerializer(serializers.ModelSerializer):
     """Lightweight serializer for service listing"""
 
-    mtc_code = serializers.CharField(source='mtc.code', read_only=True)
-    mtc_name = serializers.CharField(source='mtc.name', read_only=True)
-    bsic_code = serializers.CharField(source='bsic.code', read_only=True)
-    bsic_name = serializers.CharField(source='bsic.name', read_only=True)
-    service_type_name = serializers.CharField(source='service_type.name', read_only=True)
+    mtc_code = ReferenceField('mtc', 'code', source='mtc_id')
+    mtc_name = ReferenceField('mtc', 'name', source='mtc_id')
+    bsic_code = ReferenceField('bsic', 'code', source='bsic_id')
+    bsic_name = ReferenceField('bsic', 'name', source='bsic_id')
+    service_type_name = ReferenceField('service_type', 'name', source='service_type_id')
     total_professional_staff = serializers.ReadOnlyField()
 
     class Meta:
@@ -66,10 +91,10 @@ class ServiceListSerializer(serializers.ModelSerializer):
 class ServiceDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for service"""
 
-    mtc = MainTypeOfCareSerializer(read_only=True)
-    bsic = BasicStableInputsOfCareSerializer(read_only=True)
-    service_type = ServiceTypeSerializer(read_only=True)
-    target_populations = TargetPopulationSerializer(many=True, read_only=True)
+    mtc = ReferenceField('mtc', source='mtc_id')
+    bsic = ReferenceField('bsic', source='bsic_id')
+    service_type = ReferenceField('service_type', source='service_type_id')
+    target_populations = serializers.SerializerMethodField()
     total_professional_staff = serializers.ReadOnlyField()
     created_by_email = serializers.EmailField(source='created_by.email', read_only=True)
     verified_by_email = serializers.EmailField(source='verified_by.email', read_only=True)
@@ -104,7 +129,7 @@ class ServiceDetailSerializer(serializers.ModelSerializer):
             'id', 'name', 'description', 'mtc', 'mtc_id', 'bsic', 'bsic_id',
             'service_type', 'service_type_id', 'target_populations', 'target_population_ids',
             'phone_number', 'email', 'website', 'address', 'city', 'province',
-            'postal_code', 'latitude', 'longitude', 'bed_capacity', 'staff_count',
+            'postal_code', 'latitude', 'longitude', 'region', 'bed_capacity', 'staff_count',
             'psychiatrist_count', 'psychologist_count', 'nurse_count', 'social_worker_count',
             'total_professional_staff', 'operating_hours', 'is_24_7', 'accepts_emergency',
             'accepts_bpjs', 'accepts_private_insurance', 'funding_sources',
@@ -113,6 +138,18 @@ class ServiceDetailSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_by', 'verified_by', 'verified_at', 'created_at', 'updated_at']
 
+    def get_target_populations(self, obj):
+        # The rows come from the registry: only the ids are read, from the
+        # prefetched relation when there is one, else from the link table
+        if 'target_populations' in getattr(obj, '_prefetched_objects_cache', {}):
+            population_ids = [population.pk for population in obj.target_populations.all()]
+        else:
+            population_ids = Service.target_populations.through.objects.filter(
+                service_id=obj.pk
+            ).values_list('targetpopulation_id', flat=True)
+        populations = [registry.get('target_population', pk) for pk in population_ids]
+        return sorted(populations, key=lambda population: population['name'])
+
 
 class ServiceCreateUpdateSerializer(serializers.ModelSerializer):
     """Serializer for creating/updating services"""
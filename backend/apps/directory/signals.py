@@ -0,0 +1,116 @@
+"""
+Signal handlers invalidating cached directory data and keeping the service
+search index in sync on writes (including bulk imports, see importer.py)
+"""
+from django.db.models.signals import post_save, post_delete
+
+from core.caching import bump_generation, track_model_writes
+from .importer import rows_imported
+from .models import (
+    MainTypeOfCare, BasicStableInputsOfCare, ServiceType, TargetPopulation, Service, ServiceSearchDocument
+)
+from .registry import REFERENCE_TABLES, bump_reference_version
+from .search import index_services_on_commit
+from .taxonomy import invalidate_mtc_tree
+
+
+def invalidate_mtc_tree_cache(sender, **kwargs):
+    """Drop the cached MTC tree when a classification changes"""
+    invalidate_mtc_tree()
+
+
+post_save.connect(
+    invalidate_mtc_tree_cache, sender=MainTypeOfCare, dispatch_uid='mtc_tree_save'
+)
+post_delete.connect(
+    invalidate_mtc_tree_cache, sender=MainTypeOfCare, dispatch_uid='mtc_tree_delete'
+)
+rows_imported.connect(
+    invalidate_mtc_tree_cache, sender=MainTypeOfCare, dispatch_uid='mtc_tree_import'
+)
+
+
+def invalidate_reference_registry(sender, **kwargs):
+    """Reload the reference registry in every process after a reference-table write"""
+    bump_reference_version()
+
+
+for model, *_ in REFERENCE_TABLES.values():
+    post_save.connect(
+        invalidate_reference_registry, sender=model,
+        dispatch_uid=f'reference_registry_save_{model.__name__}'
+    )
+    post_delete.connect(
+        invalidate_reference_registry, sender=model,
+        dispatch_uid=f'reference_registry_delete_{model.__name__}'
+    )
+    rows_imported.connect(
+        invalidate_reference_registry, sender=model,
+        dispatch_uid=f'reference_registry_import_{model.__name__}'
+    )
+
+
+def index_saved_service(sender, instance, raw=False, **kwargs):
+    """Rebuild the search document of a saved service"""
+    if not raw:
+        index_services_on_commit(Service.objects.filter(pk=instance.pk))
+
+
+post_save.connect(index_saved_service, sender=Service, dispatch_uid='service_search_index_save')
+
+
+def index_imported_services(sender, pks, **kwargs):
+    """Rebuild the search documents of imported services"""
+    index_services_on_commit(Service.objects.filter(pk__in=pks))
+
+
+rows_imported.connect(index_imported_services, sender=Service, dispatch_uid='service_search_index_import')
+
+
+def reindex_classified_services(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """Rebuild the search documents of the services using a renamed classification"""
+    if raw or created or (update_fields is not None and not {'code', 'name'} & set(update_fields)):
+        return
+    field = SEARCHED_REFERENCES[sender]
+    index_services_on_commit(Service.objects.filter(**{field: instance}))
+
+
+# Reference models whose names are part of the service search documents
+SEARCHED_REFERENCES = {
+    MainTypeOfCare: 'mtc',
+    BasicStableInputsOfCare: 'bsic',
+    ServiceType: 'service_type',
+}
+
+for model in SEARCHED_REFERENCES:
+    post_save.connect(
+        reindex_classified_services, sender=model,
+        dispatch_uid=f'service_search_reindex_{model.__name__}'
+    )
+
+
+def reindex_imported_classifications(sender, pks, **kwargs):
+    """Rebuild the search documents of the services using imported classifications"""
+    field = SEARCHED_REFERENCES[sender]
+    index_services_on_commit(Service.objects.filter(**{f'{field}__in': pks}))
+
+
+for model in SEARCHED_REFERENCES:
+    rows_imported.connect(
+        reindex_imported_classifications, sender=model,
+        dispatch_uid=f'service_search_reindex_import_{model.__name__}'
+    )
+
+
+# Cached service lists and stats (see core.caching)
+track_model_writes(
+    Service, ServiceSearchDocument, MainTypeOfCare, BasicStableInputsOfCare, ServiceType, TargetPopulation
+)
+
+
+def invalidate_cached_responses(sender, **kwargs):
+    """Drop the cached responses built from a bulk-imported table"""
+    bump_generation(sender)
+
+
+rows_imported.connect(invalidate_cached_responses, dispatch_uid='response_cache_import')
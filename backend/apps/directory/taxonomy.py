@@ -0,0 +1,67 @@
+"""
+In-memory DESDE-LTC MTC classification tree
+
+The whole (small) classification table is read in one query, nested in
+Python and cached until a MainTypeOfCare is saved or deleted. The tree lives
+in the default cache, so the invalidation reaches every worker sharing it
+(see CACHES in the settings).
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import MainTypeOfCare
+from .serializers import MainTypeOfCareSerializer
+
+MTC_TREE_CACHE_KEY = 'directory:mtc_tree'
+
+
+def build_mtc_tree():
+    """
+    Nested list of active MTC classifications, roots first, ordered by code.
+
+    Every node holds the MainTypeOfCareSerializer fields plus `children`;
+    `level` is the node's depth in the tree and `children_count` the number
+    of children included under it. Nodes whose parent is inactive are
+    treated as roots.
+    """
+    mtcs = list(
+        MainTypeOfCare.objects.filter(is_active=True).select_related('parent').order_by('code')
+    )
+    active_ids = {mtc.pk for mtc in mtcs}
+
+    children_by_parent = {}
+    for mtc in mtcs:
+        parent_id = mtc.parent_id if mtc.parent_id in active_ids else None
+        children_by_parent.setdefault(parent_id, []).append(mtc)
+    for mtc in mtcs:
+        mtc.num_children = len(children_by_parent.get(mtc.pk, []))
+
+    nodes = {
+        node['id']: {**node, 'children': []}
+        for node in MainTypeOfCareSerializer(mtcs, many=True).data
+    }
+
+    def attach(parent_id, level):
+        branch = []
+        for mtc in children_by_parent.get(parent_id, []):
+            node = nodes[mtc.pk]
+            node['level'] = level
+            node['children'] = attach(mtc.pk, level + 1)
+            branch.append(node)
+        return branch
+
+    return attach(None, 0)
+
+
+def get_mtc_tree():
+    """Cached MTC tree (see build_mtc_tree)"""
+    tree = cache.get(MTC_TREE_CACHE_KEY)
+    if tree is None:
+        tree = build_mtc_tree()
+        cache.set(MTC_TREE_CACHE_KEY, tree, getattr(settings, 'MTC_TREE_CACHE_TIMEOUT', 3600))
+    return tree
+
+
+def invalidate_mtc_tree():
+    """Drop the cached MTC tree"""
+    cache.delete(MTC_TREE_CACHE_KEY)
@@ -1,11 +1,26 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.utils import timezone
 from decimal import Decimal
+from unittest import mock
+from io import StringIO
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.settings.loader import get_system_settings
 from .models import (
     MainTypeOfCare, BasicStableInputsOfCare, TargetPopulation,
-    ServiceType, Service
+    ServiceType, Service, ServiceSearchDocument
 )
+from .registry import REFERENCE_VERSION_CACHE_KEY, registry
+from .serializers import ServiceDetailSerializer
+from .taxonomy import invalidate_mtc_tree
+from .geo import encode_geohash
+from .search import analyze, get_search_backend, index_pending_services, search_services
 
 User = get_user_model()
 
@@ -399,3 +414,548 @@ class ServiceTests(TestCase):
         # Service should still exist
         service = Service.objects.get(id=service_id)
         self.assertIsNone(service.created_by)
+
+
+class MainTypeOfCareTreeTests(TestCase):
+    """Test cases for the MTC list and tree endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='viewer@test.com', password='pass', role='VIEWER')
+        self.client.force_authenticate(user=self.user)
+
+        self.residential = MainTypeOfCare.objects.create(code='R', name='Residential')
+        self.acute = MainTypeOfCare.objects.create(code='R1', name='Acute', parent=self.residential)
+        MainTypeOfCare.objects.create(code='R1.1', name='Acute hospital', parent=self.acute)
+        MainTypeOfCare.objects.create(code='R2', name='Non-acute', parent=self.residential)
+        MainTypeOfCare.objects.create(code='O', name='Outpatient')
+        invalidate_mtc_tree()
+
+    def test_tree_returns_full_hierarchy(self):
+        """The tree nests every level with computed levels and child counts"""
+        response = self.client.get('/v1/directory/mtc/tree/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([node['code'] for node in response.data], ['O', 'R'])
+        residential = response.data[1]
+        self.assertEqual(residential['children_count'], 2)
+        acute = residential['children'][0]
+        self.assertEqual((acute['code'], acute['level'], acute['parent_code']), ('R1', 1, 'R'))
+        self.assertEqual(acute['children'][0]['level'], 2)
+        self.assertEqual(acute['children'][0]['children'], [])
+
+    def test_tree_loads_in_one_query_then_from_cache(self):
+        """The tree is built from one query and then served from the cache"""
+        get_system_settings()
+        registry.all('mtc')  # ETags come from the registry fingerprints
+        with self.assertNumQueries(1):
+            self.client.get('/v1/directory/mtc/tree/')
+        with self.assertNumQueries(0):
+            self.client.get('/v1/directory/mtc/tree/')
+
+    def test_tree_invalidated_on_write(self):
+        """Saving or deleting a classification refreshes the tree"""
+        self.client.get('/v1/directory/mtc/tree/')
+
+        MainTypeOfCare.objects.create(code='R3', name='Long-term', parent=self.residential)
+        response = self.client.get('/v1/directory/mtc/tree/')
+        self.assertEqual(response.data[1]['children_count'], 3)
+
+        self.acute.delete()
+        response = self.client.get('/v1/directory/mtc/tree/')
+        self.assertEqual([node['code'] for node in response.data[1]['children']], ['R2', 'R3'])
+
+    def test_list_query_count_independent_of_rows(self):
+        """Children counts and parent codes are loaded with the list query"""
+        get_system_settings()
+        registry.all('mtc')
+        with self.assertNumQueries(2):
+            response = self.client.get('/v1/directory/mtc/')
+
+        results = {row['code']: row for row in response.data['results']}
+        self.assertEqual(results['R']['children_count'], 2)
+        self.assertEqual(results['R1.1']['parent_code'], 'R1')
+
+
+class ReferenceRegistryTests(TestCase):
+    """Test cases for the reference-data registry used by service serializers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='viewer@test.com', password='pass', role='VIEWER')
+        self.client.force_authenticate(user=self.user)
+
+        self.mtc = MainTypeOfCare.objects.create(code='R1', name='Residential')
+        self.bsic = BasicStableInputsOfCare.objects.create(code='A', name='Accessibility')
+        self.service_type = ServiceType.objects.create(name='Hospital')
+        self.population = TargetPopulation.objects.create(name='Adults')
+        for i in range(3):
+            service = Service.objects.create(
+                name=f'Service {i}', mtc=self.mtc, bsic=self.bsic, service_type=self.service_type,
+                city='Kebumen', province='Jawa Tengah'
+            )
+            service.target_populations.add(self.population)
+        self.service = service
+
+    def test_list_resolves_codes_without_joins(self):
+        """Service list codes and names come from the registry"""
+        get_system_settings()
+        registry.all('mtc')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/v1/directory/services/')
+
+        row = response.data['results'][0]
+        self.assertEqual((row['mtc_code'], row['bsic_name'], row['service_type_name']),
+                         ('R1', 'Accessibility', 'Hospital'))
+        # Page count and page rows only
+        self.assertEqual(len(queries), 2)
+        for query in queries:
+            self.assertNotIn('mtc_classifications', query['sql'])
+
+    def test_detail_nests_reference_rows(self):
+        """Service detail nests the serialized reference rows"""
+        response = self.client.get(f'/v1/directory/services/{self.service.pk}/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['mtc']['code'], 'R1')
+        self.assertEqual(response.data['service_type']['name'], 'Hospital')
+        self.assertEqual([p['name'] for p in response.data['target_populations']], ['Adults'])
+
+    def test_detail_serializer_uses_prefetched_populations(self):
+        """Serializing many services reads no link table when the relation is prefetched"""
+        registry.all('target_population')
+        services = list(Service.objects.select_related('created_by', 'verified_by')
+                        .prefetch_related('target_populations'))
+        with self.assertNumQueries(0):
+            data = ServiceDetailSerializer(services, many=True).data
+        self.assertEqual([[p['name'] for p in row['target_populations']] for row in data], [['Adults']] * 3)
+
+    def test_reference_write_reloads_registry(self):
+        """Editing a reference row is visible on the next read"""
+        registry.all('mtc')
+        self.mtc.name = 'Residential care'
+        self.mtc.save()
+
+        response = self.client.get(f'/v1/directory/services/{self.service.pk}/')
+        self.assertEqual(response.data['mtc']['name'], 'Residential care')
+
+    def test_unknown_ids_looked_up_once(self):
+        """A missing id costs one single-row query, then none until the next load"""
+        registry.all('mtc')
+        with self.assertNumQueries(1):
+            self.assertIsNone(registry.get('mtc', 9999))
+        with self.assertNumQueries(0):
+            self.assertIsNone(registry.get('mtc', 9999))
+        self.assertIsNone(registry.get('mtc', 'not an id'))
+
+    def test_row_created_elsewhere_found(self):
+        """A row created since the load (e.g. by another process) reloads the tables"""
+        registry.all('bsic')
+        bsic = BasicStableInputsOfCare.objects.bulk_create([
+            BasicStableInputsOfCare(code='B', name='Availability')
+        ])[0]
+        self.assertEqual(registry.get('bsic', bsic.pk)['code'], 'B')
+
+
+class ServiceMapTests(TestCase):
+    """Test cases for the geohash-backed service map endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='viewer@test.com', password='pass', role='VIEWER')
+        self.client.force_authenticate(user=self.user)
+
+        mtc = MainTypeOfCare.objects.create(code='O1', name='Outpatient')
+        bsic = BasicStableInputsOfCare.objects.create(code='A', name='Accessibility')
+        service_type = ServiceType.objects.create(name='Clinic')
+        coordinates = {
+            # Kebumen town centre and two services a few hundred metres away
+            'Kebumen A': ('-7.66790000', '109.65190000'),
+            'Kebumen B': ('-7.67000000', '109.65400000'),
+            'Kebumen C': ('-7.66500000', '109.64900000'),
+            # Gombong, about 20 km west
+            'Gombong': ('-7.60770000', '109.51320000'),
+            # Semarang, outside the regency
+            'Semarang': ('-6.96670000', '110.41670000'),
+        }
+        self.services = {}
+        for name, (latitude, longitude) in coordinates.items():
+            self.services[name] = Service.objects.create(
+                name=name, mtc=mtc, bsic=bsic, service_type=service_type,
+                city='Kebumen', province='Jawa Tengah',
+                latitude=Decimal(latitude), longitude=Decimal(longitude)
+            )
+        Service.objects.create(
+            name='No coordinates', mtc=mtc, bsic=bsic, service_type=service_type,
+            city='Kebumen', province='Jawa Tengah'
+        )
+
+    def test_encode_geohash(self):
+        """Geohashes match the reference encoding"""
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(encode_geohash(None, 10), '')
+        self.assertEqual(len(self.services['Gombong'].geohash), 12)
+
+        service = self.services['Gombong']
+        service.latitude, service.longitude = Decimal('-7.6679'), Decimal('109.6519')
+        service.save(update_fields=['latitude', 'longitude'])
+        service.refresh_from_db()
+        self.assertEqual(service.geohash, encode_geohash(-7.6679, 109.6519))
+
+    def test_map_returns_compact_points(self):
+        """Without parameters every service with coordinates is returned as a point"""
+        response = self.client.get('/v1/directory/services/map/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 5)
+        self.assertEqual(
+            set(response.data[0]), {'id', 'name', 'mtc_code', 'latitude', 'longitude'}
+        )
+        self.assertEqual(response.data[0]['mtc_code'], 'O1')
+
+    def test_map_bbox(self):
+        """bbox keeps only the services inside the viewport"""
+        response = self.client.get('/v1/directory/services/map/', {'bbox': '109.6,-7.7,109.7,-7.6'})
+
+        self.assertEqual(
+            sorted(point['name'] for point in response.data),
+            ['Kebumen A', 'Kebumen B', 'Kebumen C']
+        )
+
+    def test_map_near_radius(self):
+        """near/radius_km keeps services within the radius, nearest first"""
+        response = self.client.get(
+            '/v1/directory/services/map/', {'near': '-7.6679,109.6519', 'radius_km': '25'}
+        )
+
+        names = [point['name'] for point in response.data]
+        self.assertEqual(names[0], 'Kebumen A')
+        self.assertEqual(names[-1], 'Gombong')
+        self.assertEqual(len(names), 4)
+        self.assertLess(response.data[-1]['distance_km'], 25)
+
+        response = self.client.get(
+            '/v1/directory/services/map/', {'near': '-7.6679,109.6519', 'radius_km': '1'}
+        )
+        self.assertEqual(len(response.data), 3)
+
+    def test_map_zoom_clusters(self):
+        """zoom groups nearby services into clusters and keeps lone ones as points"""
+        response = self.client.get('/v1/directory/services/map/', {'zoom': '10'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([cluster['count'] for cluster in response.data['clusters']], [3])
+        self.assertEqual(
+            sorted(point['name'] for point in response.data['points']), ['Gombong', 'Semarang']
+        )
+
+        response = self.client.get('/v1/directory/services/map/', {'zoom': '18'})
+        self.assertEqual(response.data['clusters'], [])
+        self.assertEqual(len(response.data['points']), 5)
+
+    def test_map_invalid_parameters(self):
+        """Malformed geo parameters are rejected"""
+        for params in ({'bbox': '1,2,3'}, {'near': 'a,b'}, {'near': '0,0', 'radius_km': '-1'},
+                       {'zoom': 'far'}, {'bbox': '0,10,1,5'}):
+            response = self.client.get('/v1/directory/services/map/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class ServiceSearchTests(TestCase):
+    """Test cases for the full-text service search"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='viewer@test.com', password='pass', role='VIEWER')
+        self.client.force_authenticate(user=self.user)
+
+        self.mtc = MainTypeOfCare.objects.create(code='R1', name='Residential Acute')
+        outpatient = MainTypeOfCare.objects.create(code='O1', name='Outpatient')
+        bsic = BasicStableInputsOfCare.objects.create(code='A', name='Accessibility')
+        hospital = ServiceType.objects.create(name='Hospital')
+        clinic = ServiceType.objects.create(name='Clinic')
+        services = [
+            ('RSJ Prof. dr. Soerojo', self.mtc, hospital, 'Magelang', 'Layanan rawat inap'),
+            ('Puskesmas Gombong I', outpatient, clinic, 'Kebumen', 'Layanan kesehatan jiwa'),
+            ('Klinik Sehat Jiwa', outpatient, clinic, 'Kebumen', 'Rujukan dari puskesmas'),
+            ('Rumah Sakit Jiwa Daerah Surakarta', self.mtc, hospital, 'Surakarta', ''),
+        ]
+        self.services = {}
+        # Documents are indexed on commit, which TestCase never reaches
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, mtc, service_type, city, description in services:
+                self.services[name] = Service.objects.create(
+                    name=name, mtc=mtc, bsic=bsic, service_type=service_type,
+                    city=city, province='Jawa Tengah', description=description
+                )
+
+    def search(self, query, **params):
+        response = self.client.get('/v1/directory/services/', {'search': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['name'] for row in response.data['results']]
+
+    def test_analyze_expands_abbreviations(self):
+        self.assertEqual(analyze('RSJ Soerojo'), 'rsj soerojo rumah sakit jiwa')
+        self.assertEqual(analyze('Rumah Sakit Jiwa Daerah'), 'rumah sakit jiwa daerah rsj rs')
+        self.assertEqual(analyze('Jl. Kartini, Kec. Kebumen'), 'jl kartini kec kebumen jalan kecamatan')
+
+    def test_uses_fulltext_index(self):
+        """On SQLite the search runs against the FTS5 table, without LIKE scans"""
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        self.assertEqual(get_search_backend(connection), 'fts5')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.search('jiwa')
+        search_sql = [query['sql'] for query in queries if 'MATCH' in query['sql']]
+        self.assertTrue(search_sql)
+        for sql in search_sql:
+            self.assertNotIn('LIKE', sql)
+
+    def test_ranked_name_matches_first(self):
+        """Services named after the term rank above those only describing it"""
+        names = self.search('puskesmas')
+        self.assertEqual(names, ['Puskesmas Gombong I', 'Klinik Sehat Jiwa'])
+
+    def test_abbreviations_match_both_ways(self):
+        self.assertEqual(
+            sorted(self.search('rsj')),
+            ['RSJ Prof. dr. Soerojo', 'Rumah Sakit Jiwa Daerah Surakarta']
+        )
+        self.assertEqual(
+            sorted(self.search('rumah sakit jiwa')),
+            ['RSJ Prof. dr. Soerojo', 'Rumah Sakit Jiwa Daerah Surakarta']
+        )
+
+    def test_prefix_and_all_terms(self):
+        self.assertEqual(self.search('pusk gomb'), ['Puskesmas Gombong I'])
+        self.assertEqual(self.search('surak'), ['Rumah Sakit Jiwa Daerah Surakarta'])
+        self.assertEqual(self.search('gombong surakarta'), [])
+
+    def test_explicit_ordering_overrides_rank(self):
+        names = self.search('puskesmas', ordering='name')
+        self.assertEqual(names, ['Klinik Sehat Jiwa', 'Puskesmas Gombong I'])
+
+    def test_index_follows_writes(self):
+        """Service and classification writes are reflected in the index"""
+        service = self.services['Klinik Sehat Jiwa']
+        service.name = 'Klinik Harapan'
+        with self.captureOnCommitCallbacks(execute=True):
+            service.save()
+        self.assertEqual(self.search('harapan'), ['Klinik Harapan'])
+
+        self.mtc.name = 'Residential Crisis'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mtc.save()
+        self.assertEqual(len(self.search('crisis')), 2)
+        # Not reindexed when the searched fields are left alone
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.mtc.save(update_fields=['description'])
+        self.assertNotIn(index_pending_services, callbacks)
+
+        service.delete()
+        self.assertEqual(self.search('harapan'), [])
+
+    def test_writes_of_a_transaction_indexed_together(self):
+        with mock.patch('apps.directory.search.index_services') as index_services:
+            with self.captureOnCommitCallbacks(execute=True):
+                for service in self.services.values():
+                    service.save()
+        index_services.assert_called_once()
+        self.assertEqual(set(index_services.call_args.args[0]), set(self.services.values()))
+
+    def test_mysql_unindexed_terms_matched_as_substrings(self):
+        """Stopwords and short words are not required FULLTEXT terms, which would match nothing"""
+        with mock.patch('apps.directory.search.get_search_backend', return_value='mysql'):
+            queryset, ordering = search_services(Service.objects.all(), ['the', 'rs', 'jiwa'])
+        self.assertEqual(ordering, ['-search_rank'])
+        self.assertEqual(queryset.query.extra['search_rank'][1], ['+jiwa*', '+jiwa*'])
+        sql = str(queryset.query)
+        self.assertIn('%the%', sql)
+        self.assertIn('%rs%', sql)
+
+        with mock.patch('apps.directory.search.get_search_backend', return_value='mysql'):
+            queryset, ordering = search_services(Service.objects.all(), ['of', 'rs'])
+        self.assertEqual(ordering, [])
+        self.assertNotIn('MATCH', str(queryset.query))
+
+    def test_rebuild_search_index_command(self):
+        """Documents lost to bulk writes are rebuilt by the command"""
+        ServiceSearchDocument.objects.all().delete()
+        self.assertEqual(self.search('rsj'), [])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('rsj')), 2)
+
+
+class DirectoryImportTests(TestCase):
+    """Test cases for the bulk classification/service import"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='admin@test.com', password='pass', role='ADMIN')
+        self.data = {
+            'mtc': [
+                {'code': 'R1.1', 'name': 'Acute ward', 'parent': 'R1'},
+                {'code': 'R1', 'name': 'Acute', 'parent': 'R'},
+                {'code': 'R', 'name': 'Residential'},
+            ],
+            'bsic': [{'code': 'B1', 'name': 'Hospital'}],
+            'service_types': [{'name': 'Rumah Sakit Jiwa'}],
+            'target_populations': [{'name': 'Dewasa'}, {'name': 'Lansia'}],
+            'services': [{
+                'name': 'RSJ Kebumen', 'mtc': 'R1.1', 'bsic': 'B1', 'service_type': 'Rumah Sakit Jiwa',
+                'city': 'Kebumen', 'province': 'Jawa Tengah', 'latitude': '-7.6712',
+                'longitude': '109.6634', 'is_24_7': 'ya', 'target_populations': 'Dewasa;Lansia',
+            }],
+        }
+
+    def test_imports_hierarchy_and_services(self):
+        """Children may come before their parents; bulk rows get what save() would set"""
+        from .importer import import_directory
+        from apps.logs.models import ImportExportLog
+
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_directory(self.data, user=self.user)
+
+        ward = MainTypeOfCare.objects.get(code='R1.1')
+        self.assertEqual(ward.parent.code, 'R1')
+        self.assertEqual(ward.parent.parent.code, 'R')
+        self.assertEqual(ward.level, 2)
+        service = Service.objects.get(name='RSJ Kebumen')
+        self.assertTrue(service.is_24_7)
+        self.assertEqual(service.created_by, self.user)
+        self.assertEqual(service.geohash, encode_geohash(Decimal('-7.6712'), Decimal('109.6634')))
+        self.assertEqual(
+            sorted(service.target_populations.values_list('name', flat=True)), ['Dewasa', 'Lansia']
+        )
+        self.assertTrue(ServiceSearchDocument.objects.filter(service=service).exists())
+        self.assertEqual(result.log.status, ImportExportLog.Status.COMPLETED)
+        self.assertEqual(result.log.successful_records, 8)
+
+    def test_reimport_diffs_rows(self):
+        """Unchanged rows are skipped, changed ones updated in place, in constant queries"""
+        from .importer import import_directory
+
+        import_directory(self.data)
+        ward_pk = MainTypeOfCare.objects.get(code='R1.1').pk
+        self.data['mtc'][0]['name'] = 'Acute psychiatric ward'
+        self.data['services'][0]['target_populations'] = 'Dewasa'
+
+        with CaptureQueriesContext(connection) as small:
+            result = import_directory(self.data)
+        self.data['bsic'] += [{'code': f'B{n}', 'name': f'Input {n}'} for n in range(2, 40)]
+        import_directory(self.data)
+        with CaptureQueriesContext(connection) as large:
+            import_directory(self.data)
+
+        self.assertEqual(result.tables['mtc'], {'created': 0, 'updated': 1, 'unchanged': 2, 'failed': 0})
+        self.assertEqual(result.tables['services']['updated'], 1)
+        self.assertEqual(MainTypeOfCare.objects.get(pk=ward_pk).name, 'Acute psychiatric ward')
+        self.assertEqual(
+            list(Service.objects.get(name='RSJ Kebumen').target_populations.values_list('name', flat=True)),
+            ['Dewasa']
+        )
+        self.assertLessEqual(len(large), len(small))
+
+    def test_invalid_rows_reported(self):
+        from .importer import import_directory
+        from apps.logs.models import ImportExportLog
+
+        self.data['mtc'].append({'code': 'X1', 'name': 'Orphan', 'parent': 'X'})
+        self.data['services'].append({'name': 'Klinik', 'mtc': 'R1', 'bsic': 'nope', 'city': 'Kebumen'})
+
+        result = import_directory(self.data)
+
+        self.assertEqual([error['key'] for error in result.errors], ['X1', 'Klinik'])
+        self.assertEqual(result.log.status, ImportExportLog.Status.PARTIALLY_COMPLETED)
+        self.assertFalse(MainTypeOfCare.objects.filter(code='X1').exists())
+
+        result = import_directory(self.data, strict=True)
+        self.assertEqual(result.log.status, ImportExportLog.Status.FAILED)
+
+    def test_command_reads_csv(self):
+        import os
+        import tempfile
+
+        MainTypeOfCare.objects.create(code='O', name='Outpatient')
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'mtc.csv')
+            with open(path, 'w') as f:
+                f.write('code,name,parent,is_active\nO1,Clinic,O,yes\nO2,Home visits,O,no\n')
+            call_command('import_directory', path, stdout=StringIO())
+
+        self.assertEqual(
+            list(MainTypeOfCare.objects.filter(parent__code='O').values_list('code', 'is_active', 'level')),
+            [('O1', True, 1), ('O2', False, 1)]
+        )
+
+
+class ReferenceETagTests(TestCase):
+    """Conditional GETs of the reference endpoints and the reference bundle"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='viewer@test.com', password='pass', role='VIEWER')
+        self.client.force_authenticate(user=self.user)
+        self.mtc = MainTypeOfCare.objects.create(code='R1', name='Residential')
+        MainTypeOfCare.objects.create(code='O', name='Outpatient')
+        MainTypeOfCare.objects.create(code='X', name='Retired', is_active=False)
+        BasicStableInputsOfCare.objects.create(code='A', name='Accessibility')
+        ServiceType.objects.create(name='Hospital')
+        TargetPopulation.objects.create(name='Adults')
+
+    def test_not_modified_without_queries(self):
+        first = self.client.get('/v1/directory/mtc/')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/v1/directory/mtc/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+        # Other representations of the table have their own ETag
+        other = self.client.get('/v1/directory/mtc/?search=resid', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(other.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(other['ETag'], first['ETag'])
+
+    def test_etag_follows_table_writes(self):
+        first = self.client.get('/v1/directory/mtc/')
+        bsic = self.client.get('/v1/directory/bsic/')
+
+        self.mtc.name = 'Residential care'
+        self.mtc.save()
+        response = self.client.get('/v1/directory/mtc/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        # Other tables are unaffected
+        response = self.client.get('/v1/directory/bsic/', HTTP_IF_NONE_MATCH=bsic['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_follows_writes_of_other_workers(self):
+        """A write elsewhere only bumps the shared version stamp, seen on the next check"""
+        first = self.client.get('/v1/directory/mtc/')
+        MainTypeOfCare.objects.filter(pk=self.mtc.pk).update(name='Renamed', updated_at=timezone.now())
+        cache.set(REFERENCE_VERSION_CACHE_KEY, 'bumped by another worker', None)
+
+        with override_settings(REFERENCE_DATA_CHECK_INTERVAL=0):
+            response = self.client.get('/v1/directory/mtc/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Renamed', [row['name'] for row in response.data['results']])
+
+    def test_reference_bundle(self):
+        response = self.client.get('/v1/directory/reference-bundle/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['code'] for row in response.data['mtc']], ['O', 'R1'])
+        self.assertEqual(response.data['bsic'][0]['code'], 'A')
+        self.assertEqual(response.data['service_types'][0]['name'], 'Hospital')
+        self.assertEqual(response.data['target_populations'][0]['name'], 'Adults')
+
+        with self.assertNumQueries(0):
+            cached = self.client.get('/v1/directory/reference-bundle/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        TargetPopulation.objects.create(name='Children')
+        changed = self.client.get('/v1/directory/reference-bundle/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(changed.data['target_populations']), 2)
@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 
 from .views import (
     MainTypeOfCareViewSet, BasicStableInputsOfCareViewSet,
-    TargetPopulationViewSet, ServiceTypeViewSet, ServiceViewSet
+    TargetPopulationViewSet, ServiceTypeViewSet, ServiceViewSet, reference_bundle
 )
 
 router = DefaultRouter()
@@ -14,5 +14,6 @@ router.register(r'service-types', ServiceTypeViewSet, basename='service-type')
 router.register(r'services', ServiceViewSet, basename='service')
 
 urlpatterns = [
+    path('reference-bundle/', reference_bundle, name='reference-bundle'),
     path('', include(router.urls)),
 ]
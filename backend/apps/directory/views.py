@@ -1,13 +1,24 @@
+import hashlib
+import json
+
 from rest_framework import viewsets, filters, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
 from django.db.models import Count, Q, Avg
 
 from .models import (
     MainTypeOfCare, BasicStableInputsOfCare, TargetPopulation,
-    ServiceType, Service
+    ServiceType, Service, ServiceSearchDocument
+)
+from .registry import REFERENCE_TABLES, registry
+from .taxonomy import get_mtc_tree
+from .search import ServiceSearchFilter
+from .geo import (
+    parse_map_query, filter_bbox, radius_bbox, map_points, map_clusters,
+    zoom_to_precision
 )
 from .serializers import (
     MainTypeOfCareSerializer, BasicStableInputsOfCareSerializer,
@@ -18,13 +29,83 @@ from .serializers import (
 from apps.accounts.permissions import IsSurveyorOrAdmin, CanAccessServiceData
 from apps.accounts.mixins import StatusBasedFilterMixin
 from apps.logs.utils import log_create, log_update, log_delete
+from apps.settings.loader import get_system_settings
+from core.caching import CachedResponseMixin, ConditionalGetMixin, etag_matches
+
+
+def reference_etag(tables, *parts):
+    """ETag of a representation of some reference tables, from their fingerprints"""
+    fingerprints = [registry.fingerprint(table) for table in tables]
+    return '"%s"' % hashlib.sha1(json.dumps([fingerprints, *parts]).encode()).hexdigest()
+
+
+class ReferenceETagMixin(ConditionalGetMixin):
+    """
+    Conditional GETs of a reference table
+
+    The ETag is derived from the table's fingerprint (see registry.py), the
+    query string and the page sizes, so a matching If-None-Match is answered
+    with a 304 before the table is queried or serialized. Fingerprints are
+    recomputed from the database once a write anywhere bumps the registry's
+    version stamp, which the workers share through the cache (see CACHES),
+    so no worker validates an old ETag for more than
+    REFERENCE_DATA_CHECK_INTERVAL seconds.
+    """
+    reference_table = None
+
+    def get_response_validators(self, request):
+        system = get_system_settings()
+        params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+        etag = reference_etag(
+            [self.reference_table], request.path, params,
+            system.default_page_size, system.max_page_size,
+        )
+        return {'etag': etag}
+
+
+# Bundle key -> registry table
+BUNDLE_TABLES = {
+    'mtc': 'mtc',
+    'bsic': 'bsic',
+    'service_types': 'service_type',
+    'target_populations': 'target_population',
+}
+
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def reference_bundle(request):
+    """
+    The active rows of the four reference tables in one payload
 
-class MainTypeOfCareViewSet(viewsets.ReadOnlyModelViewSet):
+    Returns {mtc, bsic, service_types, target_populations}, each ordered like
+    its list endpoint (by code, or by name), straight from the reference
+    registry. The ETag changes only when one of the tables does, so clients
+    revalidate with If-None-Match and usually get a 304.
+    """
+    etag = reference_etag(BUNDLE_TABLES.values(), 'bundle')
+    if etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        payload = {}
+        for key, table in BUNDLE_TABLES.items():
+            order_field = REFERENCE_TABLES[table][3]
+            rows = [row for row in registry.all(table).values() if row['is_active']]
+            payload[key] = sorted(rows, key=lambda row: row[order_field])
+        response = Response(payload)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+class MainTypeOfCareViewSet(ReferenceETagMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for MainTypeOfCare (read-only)
     """
-    queryset = MainTypeOfCare.objects.filter(is_active=True)
+    reference_table = 'mtc'
+    queryset = MainTypeOfCare.objects.filter(is_active=True).select_related('parent').annotate(
+        num_children=Count('children')
+    )
     serializer_class = MainTypeOfCareSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
@@ -34,16 +115,15 @@ class MainTypeOfCareViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['get'])
     def tree(self, request):
-        """Get hierarchical tree structure of MTC"""
-        root_mtcs = MainTypeOfCare.objects.filter(parent__isnull=True, is_active=True)
-        serializer = self.get_serializer(root_mtcs, many=True)
-        return Response(serializer.data)
+        """Get the full nested MTC hierarchy (cached, see apps.directory.taxonomy)"""
+        return Response(get_mtc_tree())
 
 
-class BasicStableInputsOfCareViewSet(viewsets.ReadOnlyModelViewSet):
+class BasicStableInputsOfCareViewSet(ReferenceETagMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for BasicStableInputsOfCare (read-only)
     """
+    reference_table = 'bsic'
     queryset = BasicStableInputsOfCare.objects.filter(is_active=True)
     serializer_class = BasicStableInputsOfCareSerializer
     permission_classes = [IsAuthenticated]
@@ -53,10 +133,11 @@ class BasicStableInputsOfCareViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['code']
 
 
-class TargetPopulationViewSet(viewsets.ReadOnlyModelViewSet):
+class TargetPopulationViewSet(ReferenceETagMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for TargetPopulation (read-only)
     """
+    reference_table = 'target_population'
     queryset = TargetPopulation.objects.filter(is_active=True)
     serializer_class = TargetPopulationSerializer
     permission_classes = [IsAuthenticated]
@@ -66,10 +147,11 @@ class TargetPopulationViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['name']
 
 
-class ServiceTypeViewSet(viewsets.ReadOnlyModelViewSet):
+class ServiceTypeViewSet(ReferenceETagMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for ServiceType (read-only)
     """
+    reference_table = 'service_type'
     queryset = ServiceType.objects.filter(is_active=True)
     serializer_class = ServiceTypeSerializer
     permission_classes = [IsAuthenticated]
@@ -79,14 +161,14 @@ class ServiceTypeViewSet(viewsets.ReadOnlyModelViewSet):
     ordering = ['name']
 
 
-class ServiceViewSet(StatusBasedFilterMixin, viewsets.ModelViewSet):
+class ServiceViewSet(CachedResponseMixin, StatusBasedFilterMixin, viewsets.ModelViewSet):
     """
     ViewSet for Service with comprehensive filtering and search
     Uses StatusBasedFilterMixin for RBAC filtering
     """
-    queryset = Service.objects.select_related(
-        'mtc', 'bsic', 'service_type', 'created_by', 'verified_by'
-    ).prefetch_related('target_populations')
+    # MTC, BSIC, service type and target populations are resolved from the
+    # reference registry by the serializers, so they are not joined here
+    queryset = Service.objects.select_related('created_by', 'verified_by')
     permission_classes = [IsAuthenticated]
 
     # RBAC Mixin Configuration
@@ -94,7 +176,15 @@ class ServiceViewSet(StatusBasedFilterMixin, viewsets.ModelViewSet):
     rbac_status_value = True
     rbac_admin_sees_inactive = True
     rbac_verifier_sees_inactive = False
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+
+    # Lists and stats are cached per role (see core.caching)
+    response_cache_actions = ('list', 'stats')
+    response_cache_models = (
+        Service, ServiceSearchDocument, MainTypeOfCare, BasicStableInputsOfCare, ServiceType
+    )
+
+    # Full-text search, ranked unless ?ordering= is given (see search.py)
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, ServiceSearchFilter]
 
     filterset_fields = {
         'mtc': ['exact'],
@@ -102,6 +192,7 @@ class ServiceViewSet(StatusBasedFilterMixin, viewsets.ModelViewSet):
         'service_type': ['exact'],
         'city': ['exact', 'icontains'],
         'province': ['exact', 'icontains'],
+        'region': ['exact'],
         'is_active': ['exact'],
         'is_verified': ['exact'],
         'accepts_bpjs': ['exact'],
@@ -110,11 +201,6 @@ class ServiceViewSet(StatusBasedFilterMixin, viewsets.ModelViewSet):
         'accepts_emergency': ['exact'],
     }
 
-    search_fields = [
-        'name', 'description', 'address', 'city', 'province',
-        'mtc__name', 'bsic__name', 'service_type__name'
-    ]
-
     ordering_fields = [
         'name', 'city', 'created_at', 'bed_capacity',
         'staff_count', 'total_professional_staff'
@@ -218,18 +304,50 @@ class ServiceViewSet(StatusBasedFilterMixin, viewsets.ModelViewSet):
         from apps.survey.models import Survey
 
         service = self.get_object()
-        surveys = Survey.objects.filter(service=service).order_by('-survey_date')
+        surveys = Survey.objects.filter(service=service).select_related(
+            'service', 'surveyor', 'assigned_verifier'
+        ).order_by('-survey_date')
 
         serializer = SurveyListSerializer(surveys, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def map(self, request):
-        """Get services with coordinates for map view"""
-        services = self.get_queryset().filter(
+        """
+        Get services with coordinates for map view
+
+        Query parameters (all optional, combined with the list filters):
+        - bbox=minLng,minLat,maxLng,maxLat: only services inside the viewport
+        - near=lat,lng&radius_km=: only services within the radius, nearest first
+        - zoom=: cluster services by geohash cell for that map zoom level
+
+        Without zoom, returns a list of points (id, name, mtc_code, latitude,
+        longitude). With zoom, returns {zoom, precision, clusters, points};
+        services alone in their cell, and all services above
+        MAP_CLUSTER_MAX_ZOOM, are returned as points.
+        """
+        params = parse_map_query(request)
+        services = self.filter_queryset(self.get_queryset()).filter(
             latitude__isnull=False,
             longitude__isnull=False
         )
+        if params['bbox'] is not None:
+            services = filter_bbox(services, params['bbox'])
 
-        serializer = ServiceListSerializer(services, many=True)
-        return Response(serializer.data)
+        zoom = params['zoom']
+        if zoom is None:
+            return Response(map_points(services, params['near'], params['radius_km']))
+
+        clusters = []
+        if zoom <= getattr(settings, 'MAP_CLUSTER_MAX_ZOOM', 15):
+            if params['near'] is not None:
+                services = filter_bbox(services, radius_bbox(*params['near'], params['radius_km']))
+            clusters, singleton_ids = map_clusters(services, zoom)
+            services = services.filter(id__in=singleton_ids)
+
+        return Response({
+            'zoom': zoom,
+            'precision': zoom_to_precision(zoom),
+            'clusters': clusters,
+            'points': map_points(services, params['near'], params['radius_km']),
+        })
@@ -0,0 +1,19 @@
+from django.contrib import admin
+from .models import Region, BoundaryLayer
+
+
+@admin.register(Region)
+class RegionAdmin(admin.ModelAdmin):
+    list_display = ['code', 'name', 'level', 'parent', 'service_count', 'updated_at']
+    list_filter = ['level']
+    search_fields = ['code', 'name']
+    ordering = ['level', 'name']
+    exclude = ['geometry']
+    readonly_fields = ['normalized_name', 'service_count', 'created_at', 'updated_at']
+
+
+@admin.register(BoundaryLayer)
+class BoundaryLayerAdmin(admin.ModelAdmin):
+    list_display = ['zoom', 'tolerance', 'vertex_count', 'created_at']
+    exclude = ['features']
+    ordering = ['zoom']
@@ -0,0 +1,290 @@
+"""
+Precomputed boundary layers for the service map
+
+`ingest_boundaries` loads the region features of a GeoJSON file once,
+simplifies them for every zoom in GEO_BOUNDARY_ZOOMS and stores the results
+as BoundaryLayer rows. The endpoint then serves one compact FeatureCollection
+per zoom, with the per-region service counts in the feature properties,
+built once and cached (plain and gzipped, with its ETag) until a service or
+region changes. The counts are kept in Region.service_count, recomputed by
+the ingest and assign commands and after imports, and for the regions a
+service write touches once its transaction commits (see signals.py), so
+serving the layers only reads.
+"""
+import gzip
+import hashlib
+import json
+import re
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+
+from apps.directory.models import Service
+
+from .geometry import (
+    geometry_bounds, simplify_geometry, tolerance_for_zoom,
+    precision_for_tolerance, vertex_count
+)
+from .models import Region, BoundaryLayer
+
+BOUNDARY_VERSION_CACHE_KEY = 'geo:boundaries:version'
+
+# GeoJSON name property -> region level, in order of precedence
+REGION_NAME_PROPERTIES = [
+    ('nm_kecamatan', Region.Level.DISTRICT),
+    ('nm_dati2', Region.Level.REGENCY),
+]
+# Code properties, from the widest to the narrowest administrative level
+REGION_CODE_PROPERTIES = ['kd_propinsi', 'kd_dati2', 'kd_kecamatan']
+
+ADMINISTRATIVE_PREFIX = re.compile(r'^(kecamatan|kec\.?|kabupaten|kab\.?|kota)\s+')
+
+
+def normalize_region_name(name):
+    """Lowercase name without administrative prefix, for matching free-text city names"""
+    name = ' '.join((name or '').lower().split())
+    return ADMINISTRATIVE_PREFIX.sub('', name)
+
+
+def get_boundary_zooms():
+    return sorted(getattr(settings, 'GEO_BOUNDARY_ZOOMS', [8, 10, 12, 14]))
+
+
+def parse_region_feature(feature):
+    """(code, name, level, parent code) of a GeoJSON feature"""
+    properties = feature.get('properties') or {}
+    for name_property, level in REGION_NAME_PROPERTIES:
+        if properties.get(name_property):
+            name = str(properties[name_property]).strip()
+            break
+    else:
+        raise ValueError(
+            'Feature has none of the name properties '
+            + ', '.join(name for name, _ in REGION_NAME_PROPERTIES)
+        )
+
+    code_parts = [str(properties[key]) for key in REGION_CODE_PROPERTIES if properties.get(key)]
+    if level == Region.Level.DISTRICT and len(code_parts) < 3:
+        code_parts.append(normalize_region_name(name).replace(' ', '-'))
+    code = '.'.join(code_parts) or normalize_region_name(name).replace(' ', '-')
+    parent_code = '.'.join(code_parts[:2]) if level == Region.Level.DISTRICT else None
+    return code, name, level, parent_code
+
+
+@transaction.atomic
+def ingest_regions(data, replace=False):
+    """
+    Create or update a Region per feature of a GeoJSON FeatureCollection
+
+    Kecamatan features are attached to the ingested regency sharing their
+    province/regency code. With `replace`, regions absent from the data are
+    deleted. Returns the ingested regions.
+    """
+    parsed = []
+    for feature in data.get('features', []):
+        code, name, level, parent_code = parse_region_feature(feature)
+        geometry = feature['geometry']
+        min_lng, min_lat, max_lng, max_lat = geometry_bounds(geometry)
+        parsed.append((parent_code, {
+            'code': code,
+            'name': name,
+            'normalized_name': normalize_region_name(name),
+            'level': level,
+            'properties': feature.get('properties') or {},
+            'geometry': geometry,
+            'min_latitude': min_lat,
+            'min_longitude': min_lng,
+            'max_latitude': max_lat,
+            'max_longitude': max_lng,
+        }))
+
+    # Regencies first so that kecamatan can point at them
+    parsed.sort(key=lambda item: item[1]['level'] != Region.Level.REGENCY)
+    regions = []
+    for parent_code, fields in parsed:
+        parent = Region.objects.filter(code=parent_code).first() if parent_code else None
+        region, _ = Region.objects.update_or_create(
+            code=fields.pop('code'), defaults={**fields, 'parent': parent}
+        )
+        regions.append(region)
+
+    if replace:
+        Region.objects.exclude(pk__in=[region.pk for region in regions]).delete()
+    return regions
+
+
+def refresh_service_counts(region_ids=None):
+    """
+    Recompute Region.service_count from the services' assigned region
+
+    A regency also counts the services assigned to its kecamatan. With
+    `region_ids`, only those regions and their regencies are recomputed.
+    """
+    regions = Region.objects.only('id', 'parent_id', 'service_count')
+    services = Service.objects.filter(is_active=True, region__isnull=False)
+    if region_ids is not None:
+        region_ids = set(region_ids) - {None}
+        if not region_ids:
+            return 0
+        region_ids |= set(
+            Region.objects.filter(pk__in=region_ids, parent__isnull=False).values_list('parent_id', flat=True)
+        )
+        # The regions and the kecamatan counted in the regencies among them
+        regions = regions.filter(Q(pk__in=region_ids) | Q(parent_id__in=region_ids))
+        services = services.filter(region__in=regions.values('pk'))
+    region_counts = dict(services.order_by().values_list('region_id').annotate(count=Count('id')))
+
+    regions = list(regions)
+    totals = dict.fromkeys((region.pk for region in regions), 0)
+    for region in regions:
+        count = region_counts.get(region.pk, 0)
+        totals[region.pk] += count
+        if region.parent_id in totals:
+            totals[region.parent_id] += count
+
+    changed = []
+    for region in regions:
+        if totals[region.pk] != region.service_count:
+            region.service_count = totals[region.pk]
+            changed.append(region)
+    Region.objects.bulk_update(changed, ['service_count'])
+    return len(changed)
+
+
+_pending = threading.local()
+
+
+def refresh_service_counts_on_commit(region_ids):
+    """
+    Recompute the counts of some regions once the current transaction
+    commits (right away outside of one), those of all the writes of a
+    transaction together, and drop the cached payloads
+    """
+    _pending.__dict__.setdefault('region_ids', set()).update(region_ids)
+    transaction.on_commit(refresh_pending_service_counts)
+
+
+def refresh_pending_service_counts():
+    # The first callback of a commit recounts everything scheduled so far;
+    # recounting is idempotent, so regions left by a rollback do no harm
+    region_ids = _pending.__dict__.pop('region_ids', None)
+    if region_ids:
+        refresh_service_counts(region_ids)
+        invalidate_boundary_payloads()
+
+
+@transaction.atomic
+def build_boundary_layers(zooms=None, pixels=None):
+    """Simplify every region for each zoom and store one BoundaryLayer per zoom"""
+    zooms = zooms or get_boundary_zooms()
+    if pixels is None:
+        pixels = getattr(settings, 'GEO_SIMPLIFY_PIXELS', 1.0)
+    # Regency outlines first, drawn under their kecamatan
+    regions = sorted(Region.objects.order_by('name'), key=lambda region: region.level != Region.Level.REGENCY)
+
+    layers = []
+    for zoom in zooms:
+        tolerance = tolerance_for_zoom(zoom, pixels)
+        precision = precision_for_tolerance(tolerance)
+        features = [
+            {'region_id': region.pk, 'geometry': simplify_geometry(region.geometry, tolerance, precision)}
+            for region in regions
+        ]
+        layer, _ = BoundaryLayer.objects.update_or_create(zoom=zoom, defaults={
+            'tolerance': tolerance,
+            'features': features,
+            'vertex_count': sum(vertex_count(feature['geometry']) for feature in features),
+        })
+        layers.append(layer)
+
+    BoundaryLayer.objects.exclude(zoom__in=zooms).delete()
+    invalidate_boundary_payloads()
+    return layers
+
+
+def get_boundary_version():
+    version = cache.get(BOUNDARY_VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(BOUNDARY_VERSION_CACHE_KEY, version, None)
+        version = cache.get(BOUNDARY_VERSION_CACHE_KEY, version)
+    return version
+
+
+def invalidate_boundary_payloads():
+    """Drop the cached boundary payloads of every zoom"""
+    cache.set(BOUNDARY_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def build_boundary_payload(layer):
+    """Serialized FeatureCollection of a layer, gzipped copy and ETag"""
+    regions = {
+        region['id']: region
+        for region in Region.objects.values('id', 'code', 'name', 'level', 'properties', 'service_count')
+    }
+    features = []
+    for feature in layer.features:
+        region = regions.get(feature['region_id'])
+        if region is None:
+            continue
+        features.append({
+            'type': 'Feature',
+            'id': region['id'],
+            'properties': {
+                **region['properties'],
+                'region_id': region['id'],
+                'code': region['code'],
+                'name': region['name'],
+                'level': region['level'],
+                'service_count': region['service_count'],
+            },
+            'geometry': feature['geometry'],
+        })
+
+    body = json.dumps(
+        {'type': 'FeatureCollection', 'zoom': layer.zoom, 'features': features},
+        separators=(',', ':')
+    ).encode()
+    return {
+        'zoom': layer.zoom,
+        'etag': '"%s"' % hashlib.sha1(body).hexdigest(),
+        'body': body,
+        'gzipped': gzip.compress(body, 6),
+    }
+
+
+def get_layer_zooms():
+    """Zooms of the built layers, ascending (cached with the payloads)"""
+    cache_key = f'geo:boundaries:{get_boundary_version()}:zooms'
+    zooms = cache.get(cache_key)
+    if zooms is None:
+        zooms = list(BoundaryLayer.objects.order_by('zoom').values_list('zoom', flat=True))
+        cache.set(cache_key, zooms, getattr(settings, 'GEO_BOUNDARY_CACHE_TIMEOUT', 3600))
+    return zooms
+
+
+def get_boundary_payload(zoom):
+    """
+    Cached payload of the precomputed layer best matching a zoom level
+
+    That is the most detailed layer not finer than the requested zoom (the
+    coarsest layer below it). Payloads are cached per layer, so there is at
+    most one entry per built zoom. Returns None when no layer has been built.
+    """
+    zooms = get_layer_zooms()
+    if not zooms:
+        return None
+    layer_zoom = max((z for z in zooms if z <= zoom), default=zooms[0])
+    cache_key = f'geo:boundaries:{get_boundary_version()}:{layer_zoom}'
+    payload = cache.get(cache_key)
+    if payload is None:
+        layer = BoundaryLayer.objects.filter(zoom=layer_zoom).first()
+        if layer is None:
+            return None
+        payload = build_boundary_payload(layer)
+        cache.set(cache_key, payload, getattr(settings, 'GEO_BOUNDARY_CACHE_TIMEOUT', 3600))
+    return payload
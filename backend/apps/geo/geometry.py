@@ -0,0 +1,128 @@
+"""
+Planar geometry helpers for GeoJSON (Multi)Polygons in WGS84 degrees
+
+Kebumen spans well under a degree near the equator, so distances are taken
+directly in degrees without projecting.
+"""
+import math
+
+
+def iter_polygons(geometry):
+    """Polygons (lists of rings) of a Polygon or MultiPolygon geometry"""
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    raise ValueError(f"Unsupported geometry type: {geometry['type']}")
+
+
+def geometry_bounds(geometry):
+    """(min_lng, min_lat, max_lng, max_lat) of a (Multi)Polygon"""
+    lngs = []
+    lats = []
+    for polygon in iter_polygons(geometry):
+        for point in polygon[0]:
+            lngs.append(point[0])
+            lats.append(point[1])
+    return min(lngs), min(lats), max(lngs), max(lats)
+
+
+def vertex_count(geometry):
+    return sum(len(ring) for polygon in iter_polygons(geometry) for ring in polygon)
+
+
+def _segment_distance(point, start, end):
+    """Distance from a point to the segment start-end"""
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    if dx == 0 and dy == 0:
+        return math.hypot(point[0] - start[0], point[1] - start[1])
+    t = ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy) / (dx * dx + dy * dy)
+    t = max(0.0, min(1.0, t))
+    return math.hypot(point[0] - (start[0] + t * dx), point[1] - (start[1] + t * dy))
+
+
+def simplify_line(points, tolerance):
+    """Douglas-Peucker simplification of a polyline (iterative, keeps both ends)"""
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        max_distance = 0.0
+        index = None
+        for i in range(first + 1, last):
+            distance = _segment_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance = distance
+                index = i
+        if index is not None and max_distance > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def simplify_ring(ring, tolerance):
+    """
+    Simplify a closed ring, or return None when it collapses below a triangle
+    """
+    if len(ring) < 4:
+        return None
+    # Split the ring at the vertex farthest from its start so that both
+    # halves have distinct ends
+    start = ring[0]
+    split = max(range(len(ring)), key=lambda i: math.hypot(ring[i][0] - start[0], ring[i][1] - start[1]))
+    if split == 0:
+        return None
+    simplified = simplify_line(ring[:split + 1], tolerance)[:-1] + simplify_line(ring[split:], tolerance)
+    if len(simplified) < 4:
+        return None
+    return simplified
+
+
+def simplify_geometry(geometry, tolerance, precision):
+    """
+    Douglas-Peucker simplified copy of a (Multi)Polygon as a MultiPolygon
+
+    Coordinates are rounded to `precision` decimals and reduced to 2D;
+    holes and polygons smaller than the tolerance are dropped. When every
+    polygon collapses, the geometry's bounding box is returned instead.
+    """
+    polygons = []
+    for polygon in iter_polygons(geometry):
+        rings = []
+        for ring in polygon:
+            rounded = []
+            for point in ring:
+                vertex = [round(point[0], precision), round(point[1], precision)]
+                if not rounded or vertex != rounded[-1]:
+                    rounded.append(vertex)
+            simplified = simplify_ring(rounded, tolerance)
+            if simplified is None:
+                if not rings:
+                    break
+                continue
+            rings.append(simplified)
+        if rings:
+            polygons.append(rings)
+
+    if not polygons:
+        min_lng, min_lat, max_lng, max_lat = (round(value, precision) for value in geometry_bounds(geometry))
+        polygons = [[[
+            [min_lng, min_lat], [max_lng, min_lat], [max_lng, max_lat],
+            [min_lng, max_lat], [min_lng, min_lat],
+        ]]]
+    return {'type': 'MultiPolygon', 'coordinates': polygons}
+
+
+def tolerance_for_zoom(zoom, pixels=1.0):
+    """Simplification tolerance (degrees) of `pixels` 256px-tile pixels at a zoom"""
+    return pixels * 360.0 / (256 * 2 ** zoom)
+
+
+def precision_for_tolerance(tolerance):
+    """Decimals needed to keep coordinates an order of magnitude finer than the tolerance"""
+    return max(0, math.ceil(-math.log10(tolerance))) + 1
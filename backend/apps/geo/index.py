@@ -0,0 +1,199 @@
+"""
+Process-wide spatial index of the ingested regions
+
+Region outlines are bucketed into a uniform grid of GEO_INDEX_CELL_DEGREES
+cells by bounding box; a lookup only tests the (few) polygons registered in
+the point's cell, first against their bounding box and then with an exact
+even-odd point-in-polygon test. The index is loaded lazily and reloaded when
+a region is written (version stamp in the default cache, which the workers
+must share, checked at most every GEO_INDEX_CHECK_INTERVAL seconds, as for
+the directory registry).
+"""
+import math
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.directory.models import Service
+from apps.survey.models import Survey
+
+from .boundaries import normalize_region_name
+from .geometry import iter_polygons
+from .models import Region
+
+REGION_INDEX_VERSION_CACHE_KEY = 'geo:region_index:version'
+
+# Kecamatan win over the regency containing them
+LEVEL_PRIORITY = {Region.Level.DISTRICT: 0, Region.Level.REGENCY: 1}
+
+
+def point_in_ring(lng, lat, ring):
+    """Even-odd rule test of a point against a closed ring"""
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > lat) != (yj > lat) and lng < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def point_in_polygon(lng, lat, polygon):
+    """Point inside the outer ring of a polygon and outside its holes"""
+    if not point_in_ring(lng, lat, polygon[0]):
+        return False
+    return not any(point_in_ring(lng, lat, hole) for hole in polygon[1:])
+
+
+def get_region_index_version():
+    version = cache.get(REGION_INDEX_VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(REGION_INDEX_VERSION_CACHE_KEY, version, None)
+        version = cache.get(REGION_INDEX_VERSION_CACHE_KEY, version)
+    return version
+
+
+class RegionIndex:
+    """Grid index of region polygons with exact point-in-polygon lookups"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._grid = None
+        self._names = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def _cell(self, lng, lat):
+        return math.floor(lng / self._cell_size), math.floor(lat / self._cell_size)
+
+    def _load(self):
+        self._cell_size = getattr(settings, 'GEO_INDEX_CELL_DEGREES', 0.05)
+        grid = {}
+        names = {}
+        regions = Region.objects.only('id', 'level', 'normalized_name', 'geometry')
+        for region in regions:
+            priority = LEVEL_PRIORITY.get(region.level, len(LEVEL_PRIORITY))
+            current = names.get(region.normalized_name)
+            if current is None or priority < current[0]:
+                names[region.normalized_name] = (priority, region.pk)
+
+            for polygon in iter_polygons(region.geometry):
+                lngs = [point[0] for point in polygon[0]]
+                lats = [point[1] for point in polygon[0]]
+                entry = (priority, region.pk, (min(lngs), min(lats), max(lngs), max(lats)), polygon)
+                min_x, min_y = self._cell(min(lngs), min(lats))
+                max_x, max_y = self._cell(max(lngs), max(lats))
+                for x in range(min_x, max_x + 1):
+                    for y in range(min_y, max_y + 1):
+                        grid.setdefault((x, y), []).append(entry)
+
+        for entries in grid.values():
+            entries.sort(key=lambda entry: entry[0])
+        return grid, {name: pk for name, (_, pk) in names.items()}
+
+    def _get_index(self):
+        now = time.monotonic()
+        interval = getattr(settings, 'GEO_INDEX_CHECK_INTERVAL', 5)
+        if self._grid is not None and now - self._checked_at < interval:
+            return self._grid, self._names
+
+        with self._lock:
+            version = get_region_index_version()
+            if self._grid is None or version != self._version:
+                self._grid, self._names = self._load()
+                self._version = version
+            self._checked_at = now
+            return self._grid, self._names
+
+    def reload(self):
+        """Reload the regions on next lookup"""
+        with self._lock:
+            self._grid = None
+
+    def lookup(self, latitude, longitude):
+        """Id of the most specific region containing a point, or None"""
+        if latitude is None or longitude is None:
+            return None
+        grid, _ = self._get_index()
+        lat, lng = float(latitude), float(longitude)
+        for _, region_id, bbox, polygon in grid.get(self._cell(lng, lat), ()):
+            if bbox[0] <= lng <= bbox[2] and bbox[1] <= lat <= bbox[3] and point_in_polygon(lng, lat, polygon):
+                return region_id
+        return None
+
+    def lookup_name(self, name):
+        """Id of the region (kecamatan first) whose normalized name matches, or None"""
+        _, names = self._get_index()
+        return names.get(normalize_region_name(name))
+
+
+region_index = RegionIndex()
+
+
+def bump_region_index_version():
+    """Invalidate the region index in every process sharing the cache"""
+    cache.set(REGION_INDEX_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    region_index.reload()
+
+
+def resolve_service_region(service):
+    """Region of a service: by coordinates, else by its (free-text) city"""
+    region_id = region_index.lookup(service.latitude, service.longitude)
+    if region_id is None:
+        region_id = region_index.lookup_name(service.city)
+    return region_id
+
+
+def resolve_survey_region(survey):
+    """Region of a survey: by its GPS fix, else its service's region"""
+    region_id = region_index.lookup(survey.latitude, survey.longitude)
+    if region_id is None and Survey.service.is_cached(survey):
+        # Loaded with the survey, e.g. by the batch upload (see apps.survey.ingest)
+        region_id = survey.service.region_id
+    elif region_id is None and survey.service_id:
+        region_id = Service.objects.filter(
+            pk=survey.service_id
+        ).values_list('region_id', flat=True).first()
+    return region_id
+
+
+def assign_regions(model, batch_size=1000):
+    """
+    Recompute the region of every service or survey, in batches
+
+    Used after (re)ingesting boundaries and for rows written without save()
+    (bulk_create, queryset.update). Services are assigned before surveys
+    fall back to their service's region. Returns the number of rows changed.
+    """
+    if model is Service:
+        fields = ['id', 'latitude', 'longitude', 'city', 'region']
+        resolve = resolve_service_region
+    else:
+        fields = ['id', 'latitude', 'longitude', 'service', 'region']
+        service_regions = dict(Service.objects.values_list('id', 'region_id'))
+
+        def resolve(survey):
+            region_id = region_index.lookup(survey.latitude, survey.longitude)
+            return region_id if region_id is not None else service_regions.get(survey.service_id)
+
+    changed = 0
+    last_pk = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last_pk).order_by('pk').only(*fields)[:batch_size])
+        if not batch:
+            return changed
+        updated = []
+        for instance in batch:
+            region_id = resolve(instance)
+            if region_id != instance.region_id:
+                instance.region_id = region_id
+                updated.append(instance)
+        model.objects.bulk_update(updated, ['region'])
+        changed += len(updated)
+        last_pk = batch[-1].pk
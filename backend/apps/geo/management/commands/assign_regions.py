@@ -0,0 +1,38 @@
+"""
+Management command to (re)assign the region of every service and survey
+"""
+from django.core.management.base import BaseCommand
+
+from apps.directory.models import Service
+from apps.survey.models import Survey
+from apps.geo.boundaries import invalidate_boundary_payloads, refresh_service_counts
+from apps.geo.index import assign_regions
+
+MODELS = {'services': Service, 'surveys': Survey}
+
+
+class Command(BaseCommand):
+    help = 'Assign services and surveys to the kecamatan/regency containing them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            action='append',
+            dest='models',
+            choices=sorted(MODELS),
+            help='Only assign the given model (can be repeated; default: services, then surveys)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per batch (default: 1000)')
+
+    def handle(self, *args, **options):
+        # Services first: surveys without GPS fix fall back to their service's region
+        names = [name for name in MODELS if name in (options['models'] or MODELS)]
+        for name in names:
+            changed = assign_regions(MODELS[name], batch_size=options['batch_size'])
+            self.stdout.write(f'  {name}: {changed} region assignment(s) changed')
+        if 'services' in names:
+            # Assignments are bulk-written, without the signals keeping the counts
+            refresh_service_counts()
+            invalidate_boundary_payloads()
+
+        self.stdout.write(self.style.SUCCESS('Region assignment complete'))
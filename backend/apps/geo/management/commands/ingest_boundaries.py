@@ -0,0 +1,62 @@
+"""
+Management command to ingest region boundaries and precompute the map layers
+"""
+import json
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.geo.boundaries import (
+    ingest_regions, refresh_service_counts, build_boundary_layers, get_boundary_zooms
+)
+
+
+class Command(BaseCommand):
+    help = 'Load region boundaries from a GeoJSON file and build the simplified per-zoom map layers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            help='GeoJSON FeatureCollection (default: GEO_BOUNDARIES_FILE)',
+        )
+        parser.add_argument(
+            '--zoom',
+            action='append',
+            dest='zooms',
+            type=int,
+            help='Zoom level to build a layer for (can be repeated; default: GEO_BOUNDARY_ZOOMS)',
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help='Delete regions that are not in the file',
+        )
+        parser.add_argument(
+            '--skip-assign',
+            action='store_true',
+            help='Do not reassign services and surveys to the ingested regions',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path'] or settings.GEO_BOUNDARIES_FILE
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+
+        try:
+            regions = ingest_regions(data, replace=options['replace'])
+        except (KeyError, ValueError) as e:
+            raise CommandError(f'Invalid boundary feature: {e}')
+        self.stdout.write(f'Ingested {len(regions)} region(s) from {path}')
+
+        if not options['skip_assign']:
+            call_command('assign_regions', stdout=self.stdout)
+        refresh_service_counts()
+        for layer in build_boundary_layers(sorted(options['zooms'] or get_boundary_zooms())):
+            self.stdout.write(f'  z{layer.zoom}: {layer.vertex_count} vertices')
+
+        self.stdout.write(self.style.SUCCESS('Boundary layers built'))
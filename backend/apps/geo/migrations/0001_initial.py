@@ -0,0 +1,54 @@
+# Generated by Django 6.1.2 on 2026-10-17 19:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoundaryLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zoom', models.PositiveSmallIntegerField(unique=True)),
+                ('tolerance', models.FloatField(help_text='Douglas-Peucker tolerance in degrees')),
+                ('features', models.JSONField(help_text='List of {region_id, geometry}')),
+                ('vertex_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'boundary_layers',
+                'ordering': ['zoom'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Region',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('name', models.CharField(max_length=100)),
+                ('normalized_name', models.CharField(db_index=True, help_text='Lowercase name without administrative prefix, matched against Service.city', max_length=100)),
+                ('level', models.CharField(choices=[('REGENCY', 'Regency (Kabupaten)'), ('DISTRICT', 'District (Kecamatan)')], max_length=20)),
+                ('properties', models.JSONField(blank=True, default=dict)),
+                ('geometry', models.JSONField()),
+                ('min_latitude', models.FloatField()),
+                ('min_longitude', models.FloatField()),
+                ('max_latitude', models.FloatField()),
+                ('max_longitude', models.FloatField()),
+                ('service_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='geo.region')),
+            ],
+            options={
+                'db_table': 'regions',
+                'ordering': ['level', 'name'],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+from django.db import models
+
+
+class Region(models.Model):
+    """Administrative boundary (regency or kecamatan) ingested from GeoJSON"""
+
+    class Level(models.TextChoices):
+        REGENCY = 'REGENCY', 'Regency (Kabupaten)'
+        DISTRICT = 'DISTRICT', 'District (Kecamatan)'
+
+    code = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=100)
+    normalized_name = models.CharField(
+        max_length=100,
+        db_index=True,
+        help_text="Lowercase name without administrative prefix, matched against Service.city"
+    )
+    level = models.CharField(max_length=20, choices=Level.choices)
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='children'
+    )
+
+    # Source feature, as ingested (GeoJSON properties and full-resolution geometry)
+    properties = models.JSONField(default=dict, blank=True)
+    geometry = models.JSONField()
+
+    # Bounding box
+    min_latitude = models.FloatField()
+    min_longitude = models.FloatField()
+    max_latitude = models.FloatField()
+    max_longitude = models.FloatField()
+
+    service_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'regions'
+        ordering = ['level', 'name']
+
+    def __str__(self):
+        return f"{self.name} ({self.get_level_display()})"
+
+
+class BoundaryLayer(models.Model):
+    """Region features simplified for one map zoom level"""
+
+    zoom = models.PositiveSmallIntegerField(unique=True)
+    tolerance = models.FloatField(help_text="Douglas-Peucker tolerance in degrees")
+    features = models.JSONField(help_text="List of {region_id, geometry}")
+    vertex_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'boundary_layers'
+        ordering = ['zoom']
+
+    def __str__(self):
+        return f"Boundary layer z{self.zoom} ({self.vertex_count} vertices)"
@@ -0,0 +1,78 @@
+"""
+Signal handlers keeping region assignments and cached boundary data in sync
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from apps.directory.importer import rows_imported
+from apps.directory.models import Service
+from apps.survey.models import Survey
+
+from .boundaries import invalidate_boundary_payloads, refresh_service_counts, refresh_service_counts_on_commit
+from .index import bump_region_index_version, resolve_service_region, resolve_survey_region
+from .models import Region
+
+# Model -> (fields the region depends on, resolver)
+REGION_ASSIGNMENTS = {
+    Service: ({'latitude', 'longitude', 'city'}, resolve_service_region),
+    Survey: ({'latitude', 'longitude', 'service'}, resolve_survey_region),
+}
+
+
+def assign_region(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Set the region of a service or survey from its location before it is saved"""
+    location_fields, resolve = REGION_ASSIGNMENTS[sender]
+    if raw or (update_fields is not None and not location_fields & set(update_fields)):
+        return
+    instance.region_id = resolve(instance)
+
+
+for model in REGION_ASSIGNMENTS:
+    pre_save.connect(
+        assign_region, sender=model, dispatch_uid=f'geo_assign_region_{model.__name__}'
+    )
+
+
+def invalidate_boundaries(sender, **kwargs):
+    """Rebuild the boundary payloads on next read"""
+    invalidate_boundary_payloads()
+
+
+def remember_counted_region(sender, instance, raw=False, **kwargs):
+    """Load the stored region of a service before it changes"""
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._counted_region_id = Service.objects.filter(pk=instance.pk).values_list('region_id', flat=True).first()
+
+
+def recount_saved_service(sender, instance, raw=False, **kwargs):
+    """Recompute the counts of the previous and current region of a saved service"""
+    previous = instance.__dict__.pop('_counted_region_id', None)
+    if not raw:
+        refresh_service_counts_on_commit({previous, instance.region_id})
+
+
+def recount_deleted_service(sender, instance, **kwargs):
+    refresh_service_counts_on_commit({instance.region_id})
+
+
+def recount_imported_services(sender, **kwargs):
+    """Recompute every count after an import (services are bulk-written, without post_save)"""
+    refresh_service_counts()
+    invalidate_boundary_payloads()
+
+
+post_save.connect(invalidate_boundaries, sender=Region, dispatch_uid='geo_boundaries_save_Region')
+post_delete.connect(invalidate_boundaries, sender=Region, dispatch_uid='geo_boundaries_delete_Region')
+pre_save.connect(remember_counted_region, sender=Service, dispatch_uid='geo_boundaries_pre_save_Service')
+post_save.connect(recount_saved_service, sender=Service, dispatch_uid='geo_boundaries_save_Service')
+post_delete.connect(recount_deleted_service, sender=Service, dispatch_uid='geo_boundaries_delete_Service')
+rows_imported.connect(recount_imported_services, sender=Service, dispatch_uid='geo_boundaries_import_Service')
+
+
+def invalidate_region_index(sender, **kwargs):
+    """Reload the region index in every process after a region write"""
+    bump_region_index_version()
+
+
+post_save.connect(invalidate_region_index, sender=Region, dispatch_uid='geo_region_index_save')
+post_delete.connect(invalidate_region_index, sender=Region, dispatch_uid='geo_region_index_delete')
@@ -0,0 +1,268 @@
+import gzip
+import json
+import os
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from io import StringIO
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.directory.models import MainTypeOfCare, BasicStableInputsOfCare, ServiceType, Service
+from apps.survey.models import Survey
+from .boundaries import (
+    ingest_regions, build_boundary_layers, invalidate_boundary_payloads, normalize_region_name
+)
+from .index import bump_region_index_version, point_in_polygon
+from .geometry import simplify_geometry, vertex_count
+from .models import Region, BoundaryLayer
+
+User = get_user_model()
+
+
+def square(min_lng, min_lat, size, steps=50):
+    """Closed square ring with `steps` collinear vertices per side"""
+    ring = []
+    corners = [(min_lng, min_lat), (min_lng + size, min_lat),
+               (min_lng + size, min_lat + size), (min_lng, min_lat + size)]
+    for (x1, y1), (x2, y2) in zip(corners, corners[1:] + corners[:1]):
+        for i in range(steps):
+            ring.append([x1 + (x2 - x1) * i / steps, y1 + (y2 - y1) * i / steps, 0.0])
+    ring.append(ring[0])
+    return ring
+
+
+def feature(properties, ring):
+    return {
+        'type': 'Feature',
+        'properties': properties,
+        'geometry': {'type': 'MultiPolygon', 'coordinates': [[ring]]},
+    }
+
+
+KEBUMEN = {
+    'type': 'FeatureCollection',
+    'features': [
+        feature({'kd_propinsi': '33', 'kd_dati2': '05', 'nm_dati2': 'Kebumen'}, square(109.4, -7.8, 0.4)),
+        feature({'kd_propinsi': '33', 'kd_dati2': '05', 'kd_kecamatan': '010', 'nm_kecamatan': 'Gombong'},
+                square(109.4, -7.8, 0.2)),
+        feature({'kd_propinsi': '33', 'kd_dati2': '05', 'kd_kecamatan': '020', 'nm_kecamatan': 'Kebumen'},
+                square(109.6, -7.6, 0.2)),
+    ],
+}
+
+
+class BoundaryLayerTests(TestCase):
+    """Test cases for the precomputed boundary layers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        ingest_regions(KEBUMEN)
+        build_boundary_layers([8, 12])
+        mtc = MainTypeOfCare.objects.create(code='O1', name='Outpatient')
+        bsic = BasicStableInputsOfCare.objects.create(code='A', name='Accessibility')
+        service_type = ServiceType.objects.create(name='Puskesmas')
+        # Without coordinates, services are assigned by their city name; the
+        # region counts follow on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            for city in ('Gombong', 'gombong ', 'Kecamatan Kebumen', 'Semarang'):
+                Service.objects.create(
+                    name=f'Puskesmas {city}', mtc=mtc, bsic=bsic, service_type=service_type,
+                    city=city, province='Jawa Tengah'
+                )
+
+    def tearDown(self):
+        # The index is process-wide; forget the rolled-back regions
+        bump_region_index_version()
+
+    def test_ingest_regions(self):
+        """Kecamatan are attached to their regency and names are normalized"""
+        gombong = Region.objects.get(code='33.05.010')
+        self.assertEqual(gombong.level, Region.Level.DISTRICT)
+        self.assertEqual(gombong.parent.code, '33.05')
+        self.assertEqual((gombong.min_longitude, gombong.max_latitude), (109.4, -7.6))
+        self.assertEqual(normalize_region_name('  Kec. Gombong'), 'gombong')
+
+    def test_simplify_drops_collinear_vertices(self):
+        """Douglas-Peucker keeps only the corners of a square"""
+        geometry = KEBUMEN['features'][0]['geometry']
+        simplified = simplify_geometry(geometry, 0.001, 4)
+        self.assertEqual(vertex_count(geometry), 201)
+        self.assertEqual(vertex_count(simplified), 5)
+
+    def test_boundaries_endpoint(self):
+        """Features carry the service counts of each region"""
+        response = self.client.get('/v1/geo/boundaries/', {'zoom': 10})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/geo+json')
+        data = json.loads(response.content)
+        self.assertEqual(data['zoom'], 8)
+        counts = {f['properties']['code']: f['properties']['service_count'] for f in data['features']}
+        self.assertEqual(counts, {'33.05': 3, '33.05.010': 2, '33.05.020': 1})
+        self.assertEqual(data['features'][1]['properties']['nm_kecamatan'], 'Gombong')
+        self.assertEqual(data['features'][0]['properties']['level'], Region.Level.REGENCY)
+
+    def test_boundaries_etag_and_gzip(self):
+        """Responses are gzipped on request and revalidated through the ETag"""
+        response = self.client.get('/v1/geo/boundaries/', {'zoom': 12}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['zoom'], 12)
+
+        etag = response['ETag']
+        response = self.client.get('/v1/geo/boundaries/', {'zoom': 12}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_gzip_refused_with_zero_quality(self):
+        response = self.client.get('/v1/geo/boundaries/', {'zoom': 12}, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(json.loads(response.content)['zoom'], 12)
+
+    def test_boundaries_endpoint_only_reads(self):
+        """Counts are kept by the service writes, not recomputed by the public GET"""
+        Region.objects.update(service_count=0)
+        invalidate_boundary_payloads()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/v1/geo/boundaries/', {'zoom': 8})
+        self.assertTrue(queries.captured_queries)
+        self.assertTrue(all(q['sql'].lstrip().upper().startswith('SELECT') for q in queries.captured_queries))
+
+    def test_service_write_refreshes_counts(self):
+        """Creating a service changes the counts and the ETag"""
+        response = self.client.get('/v1/geo/boundaries/', {'zoom': 8})
+        etag = response['ETag']
+
+        service = Service.objects.first()
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.create(
+                name='Klinik Gombong', mtc=service.mtc, bsic=service.bsic,
+                service_type=service.service_type, city='Gombong', province='Jawa Tengah'
+            )
+
+        response = self.client.get('/v1/geo/boundaries/', {'zoom': 8}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Region.objects.get(code='33.05.010').service_count, 3)
+
+    def test_moved_and_deactivated_services_recounted(self):
+        """A write recounts the service's previous and current regions and their regency"""
+        service = Service.objects.get(name='Puskesmas Gombong')
+        service.city = 'Kebumen'
+        with self.captureOnCommitCallbacks(execute=True):
+            service.save()
+        counts = dict(Region.objects.values_list('code', 'service_count'))
+        self.assertEqual(counts, {'33.05': 3, '33.05.010': 1, '33.05.020': 2})
+
+        service.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            service.save()
+        counts = dict(Region.objects.values_list('code', 'service_count'))
+        self.assertEqual(counts, {'33.05': 2, '33.05.010': 1, '33.05.020': 1})
+
+    def test_zoom_outside_layer_range_rejected(self):
+        for zoom in (7, 15, 1000000):
+            response = self.client.get('/v1/geo/boundaries/', {'zoom': zoom})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, zoom)
+
+    def test_payload_cached_per_layer(self):
+        """Zooms served by the same layer share one cache entry"""
+        self.client.get('/v1/geo/boundaries/', {'zoom': 9})
+        with self.assertNumQueries(0):
+            response = self.client.get('/v1/geo/boundaries/', {'zoom': 11})
+        self.assertEqual(json.loads(response.content)['zoom'], 8)
+
+    def test_boundaries_not_built(self):
+        BoundaryLayer.objects.all().delete()
+        response = self.client.get('/v1/geo/boundaries/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_ingest_command_shipped_file(self):
+        """The shipped 3 MB boundary file is served in tens of KB"""
+        if not os.path.exists(settings.GEO_BOUNDARIES_FILE):
+            self.skipTest('Boundary file not available')
+        call_command('ingest_boundaries', '--replace', stdout=StringIO())
+
+        response = self.client.get('/v1/geo/boundaries/', {'zoom': 10}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLess(len(response.content), 50 * 1024)
+        self.assertEqual(Region.objects.get().code, '33.05')
+
+
+class RegionIndexTests(TestCase):
+    """Test cases for the point-in-polygon region assignment"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email='admin@test.com', password='pass', role='ADMIN')
+        self.client.force_authenticate(user=self.admin)
+        self.mtc = MainTypeOfCare.objects.create(code='O1', name='Outpatient')
+        self.bsic = BasicStableInputsOfCare.objects.create(code='A', name='Accessibility')
+        self.service_type = ServiceType.objects.create(name='Puskesmas')
+
+    def tearDown(self):
+        bump_region_index_version()
+
+    def create_service(self, name, latitude=None, longitude=None, city='Kebumen'):
+        return Service.objects.create(
+            name=name, mtc=self.mtc, bsic=self.bsic, service_type=self.service_type,
+            city=city, province='Jawa Tengah', latitude=latitude, longitude=longitude
+        )
+
+    def test_point_in_polygon_holes(self):
+        polygon = [square(0, 0, 10, steps=1), square(4, 4, 2, steps=1)]
+        self.assertTrue(point_in_polygon(1, 1, polygon))
+        self.assertFalse(point_in_polygon(5, 5, polygon))
+        self.assertFalse(point_in_polygon(11, 5, polygon))
+
+    def test_assign_on_save(self):
+        """Services and surveys get the most specific region containing them"""
+        ingest_regions(KEBUMEN)
+        gombong = Region.objects.get(code='33.05.010')
+        regency = Region.objects.get(code='33.05')
+
+        # City says Kebumen, coordinates say Gombong
+        service = self.create_service('Klinik', Decimal('-7.7'), Decimal('109.5'))
+        self.assertEqual(service.region_id, gombong.pk)
+        outside_kecamatan = self.create_service('Balai', Decimal('-7.7'), Decimal('109.7'))
+        self.assertEqual(outside_kecamatan.region_id, regency.pk)
+
+        service.latitude, service.longitude = Decimal('-7.45'), Decimal('109.65')
+        service.save(update_fields=['latitude', 'longitude'])
+        service.refresh_from_db()
+        self.assertEqual(service.region.code, '33.05.020')
+
+        survey = Survey.objects.create(
+            service=outside_kecamatan, survey_date='2026-01-10', survey_period_start='2026-01-01',
+            survey_period_end='2026-01-31', surveyor=self.admin
+        )
+        self.assertEqual(survey.region_id, regency.pk)
+
+    def test_assign_regions_command(self):
+        """Rows written before the boundaries were ingested are backfilled"""
+        service = self.create_service('Klinik', Decimal('-7.7'), Decimal('109.5'))
+        self.assertIsNone(service.region_id)
+
+        ingest_regions(KEBUMEN)
+        call_command('assign_regions', stdout=StringIO())
+
+        service.refresh_from_db()
+        self.assertEqual(service.region.code, '33.05.010')
+
+    def test_dashboard_groups_by_region(self):
+        """Geographic distribution counts services per assigned region"""
+        ingest_regions(KEBUMEN)
+        self.create_service('A', Decimal('-7.7'), Decimal('109.5'), city='Gombong ')
+        self.create_service('B', Decimal('-7.71'), Decimal('109.51'), city='kec. gombong')
+        self.create_service('C', Decimal('-7.0'), Decimal('110.4'), city='Semarang')
+
+        response = self.client.get('/v1/analytics/dashboard/')
+
+        distribution = response.data['geographic_distribution']
+        self.assertEqual(
+            [(row['region_code'], row['count']) for row in distribution],
+            [('33.05.010', 2), (None, 1)]
+        )
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .views import boundaries
+
+urlpatterns = [
+    path('boundaries/', boundaries, name='geo-boundaries'),
+]
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import AllowAny
+
+from core.caching import accepts_gzip, etag_matches
+from .boundaries import get_boundary_payload, get_boundary_zooms
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def boundaries(request):
+    """
+    Region boundaries for the map as a GeoJSON FeatureCollection
+
+    ?zoom= selects the precomputed simplification (default GEO_DEFAULT_ZOOM),
+    within the range of GEO_BOUNDARY_ZOOMS.
+    Feature properties carry the source properties plus region_id, code,
+    name, level and service_count. Served gzipped when accepted, with an
+    ETag honoured through If-None-Match.
+    """
+    zoom = request.query_params.get('zoom') or getattr(settings, 'GEO_DEFAULT_ZOOM', 10)
+    try:
+        zoom = int(zoom)
+    except (TypeError, ValueError):
+        raise ValidationError({'zoom': 'Enter an integer zoom level.'})
+    zooms = get_boundary_zooms()
+    if not zooms[0] <= zoom <= zooms[-1]:
+        raise ValidationError({'zoom': f'Enter a zoom level between {zooms[0]} and {zooms[-1]}.'})
+
+    payload = get_boundary_payload(zoom)
+    if payload is None:
+        raise NotFound('Boundary layers have not been built; run `manage.py ingest_boundaries`.')
+
+    if etag_matches(request, payload['etag']):
+        response = HttpResponseNotModified()
+    elif accepts_gzip(request):
+        response = HttpResponse(payload['gzipped'], content_type='application/geo+json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(payload['body'], content_type='application/geo+json')
+    response['ETag'] = payload['etag']
+    response['Cache-Control'] = f"public, max-age={getattr(settings, 'GEO_BOUNDARY_MAX_AGE', 300)}"
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
@@ -0,0 +1,147 @@
+"""
+Batched view counters for help articles and FAQs
+
+Retrieving an article or FAQ only adds one to an in-process counter map; a
+background flusher thread applies the accumulated increments every
+HELP_VIEW_FLUSH_INTERVAL seconds with one `views_count = views_count + n`
+UPDATE per model and increment, and drains the map when the process exits.
+Every worker adds its own increments, so the stored counts are exact once
+all workers have flushed. With HELP_VIEW_COUNTS_ASYNC disabled (the test
+runner) each view is written immediately, still without reading the row.
+
+UPDATE bypasses save(), so view counts do not touch updated_at or the help
+search index.
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 10.0
+
+
+def apply_view_counts(increments):
+    """
+    Add {(model, pk): count} to the stored views_count
+
+    Rows with the same model and increment are updated in one statement.
+    """
+    groups = {}
+    for (model, pk), count in increments.items():
+        groups.setdefault((model, count), []).append(pk)
+    for (model, count), pks in groups.items():
+        model.objects.filter(pk__in=pks).update(views_count=F('views_count') + count)
+
+
+class ViewCounter:
+    """In-process map of pending view increments with a flusher thread"""
+
+    def __init__(self, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def add(self, instance, count=1):
+        """Count views of an article or FAQ"""
+        self._ensure_started()
+        key = (type(instance), instance.pk)
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + count
+
+    def pending(self, instance):
+        """Views of an instance not flushed yet"""
+        return self._pending.get((type(instance), instance.pk), 0)
+
+    def _ensure_started(self):
+        # Restart after fork (e.g. gunicorn --preload): threads do not survive it
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # Increments inherited from the parent are the parent's to flush
+                self._pending = {}
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='help-view-counter', daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stopping.wait(self.flush_interval):
+                close_old_connections()
+                self.flush()
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Write every pending increment from the calling thread"""
+        with self._lock:
+            increments, self._pending = self._pending, {}
+        if not increments:
+            return
+        try:
+            apply_view_counts(increments)
+        except Exception:
+            logger.exception('Failed to write %d help view counts', len(increments))
+            # Keep them for the next flush
+            with self._lock:
+                for key, count in increments.items():
+                    self._pending[key] = self._pending.get(key, 0) + count
+
+    def stop(self):
+        """Stop the flusher thread and write what is pending"""
+        self._stopping.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def get_view_counter():
+    """Process-wide view counter, created on first use"""
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                _counter = ViewCounter(
+                    flush_interval=getattr(settings, 'HELP_VIEW_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL),
+                )
+                atexit.register(_counter.stop)
+    return _counter
+
+
+def record_view(instance):
+    """
+    Count a view of an article or FAQ and return its views_count including it
+
+    Buffered when HELP_VIEW_COUNTS_ASYNC is enabled, written immediately
+    otherwise.
+    """
+    if getattr(settings, 'HELP_VIEW_COUNTS_ASYNC', False):
+        counter = get_view_counter()
+        counter.add(instance)
+        return instance.views_count + counter.pending(instance)
+    apply_view_counts({(type(instance), instance.pk): 1})
+    return instance.views_count + 1
+
+
+def flush_view_counts():
+    """Write all buffered view counts now (no-op in synchronous mode)"""
+    if _counter is not None:
+        _counter.flush()
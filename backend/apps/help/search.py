@@ -0,0 +1,286 @@
+"""
+In-memory inverted index over the help centre
+
+Published articles and active FAQs are tokenized (with the directory's
+Indonesian abbreviation expansion) into a process-wide inverted index of
+weighted term frequencies: a document's title (FAQ question) counts
+HELP_SEARCH_WEIGHTS['title'] times, its tags 'tags' times and its body
+(summary and Markdown content, or FAQ answer) 'body' times. Queries are
+scored with BM25 over those weighted frequencies, every term matched as a
+prefix of the indexed words, and answered from memory.
+
+The index is built lazily with one query per model and rebuilt when an
+article or FAQ is written (version stamp in the default cache, which the
+workers must share, checked at most every HELP_SEARCH_CHECK_INTERVAL seconds,
+as for the directory registry).
+"""
+import bisect
+import html
+import math
+import re
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, When, IntegerField
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from apps.directory.search import tokenize, expand_tokens
+from .models import HelpArticle, FAQ
+
+HELP_SEARCH_VERSION_CACHE_KEY = 'help:search_version'
+
+DEFAULT_WEIGHTS = {'title': 3.0, 'tags': 2.0, 'body': 1.0}
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+MARKDOWN_SYNTAX = [
+    (re.compile(r'\\n'), '\n'),                      # escaped newlines in fixtures
+    (re.compile(r'!?\[([^\]]*)\]\([^)]*\)'), r'\1'),  # links and images
+    (re.compile(r'`{1,3}'), ''),
+    (re.compile(r'^\s{0,3}(#{1,6}|>|[-*+]|\d+\.)\s+', re.MULTILINE), ''),
+    (re.compile(r'(\*\*|__|\*|_|~~)'), ''),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def strip_markdown(text):
+    """Plain text of some Markdown, on a single line"""
+    text = text or ''
+    for pattern, replacement in MARKDOWN_SYNTAX:
+        text = pattern.sub(replacement, text)
+    return text.strip()
+
+
+def get_search_version():
+    version = cache.get(HELP_SEARCH_VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(HELP_SEARCH_VERSION_CACHE_KEY, version, None)
+        version = cache.get(HELP_SEARCH_VERSION_CACHE_KEY, version)
+    return version
+
+
+class HelpSearchIndex:
+    """Process-wide inverted index of help articles and FAQs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def _documents(self):
+        """(key, title, tags, body, extra fields) of every searchable document"""
+        articles = HelpArticle.objects.filter(status='published').select_related('category').only(
+            'id', 'slug', 'title', 'summary', 'content', 'tags', 'category__name'
+        )
+        for article in articles:
+            yield ('article', article.pk), article.title, article.tags, \
+                strip_markdown(f'{article.summary}\n{article.content}'), \
+                {'slug': article.slug, 'category_name': article.category.name}
+
+        faqs = FAQ.objects.filter(is_active=True).select_related('category').only(
+            'id', 'question', 'answer', 'category__name'
+        )
+        for faq in faqs:
+            yield ('faq', faq.pk), faq.question, '', strip_markdown(faq.answer), \
+                {'slug': None, 'category_name': faq.category.name if faq.category else None}
+
+    def _build(self):
+        weights = {**DEFAULT_WEIGHTS, **getattr(settings, 'HELP_SEARCH_WEIGHTS', {})}
+        postings = {}
+        documents = {}
+        for key, title, tags, body, extra in self._documents():
+            frequencies = {}
+            for field, text in (('title', title), ('tags', tags), ('body', body)):
+                for token in expand_tokens(tokenize(text)):
+                    frequencies[token] = frequencies.get(token, 0.0) + weights[field]
+            for token, frequency in frequencies.items():
+                postings.setdefault(token, {})[key] = frequency
+            documents[key] = {
+                'title': title,
+                'body': body,
+                'length': sum(frequencies.values()),
+                **extra,
+            }
+
+        average_length = (
+            sum(document['length'] for document in documents.values()) / len(documents)
+            if documents else 0.0
+        )
+        return {
+            'postings': postings,
+            'vocabulary': sorted(postings),
+            'documents': documents,
+            'average_length': average_length,
+        }
+
+    def _get_index(self):
+        now = time.monotonic()
+        interval = getattr(settings, 'HELP_SEARCH_CHECK_INTERVAL', 5)
+        if self._index is not None and now - self._checked_at < interval:
+            return self._index
+
+        with self._lock:
+            version = get_search_version()
+            if self._index is None or version != self._version:
+                self._index = self._build()
+                self._version = version
+            self._checked_at = now
+            return self._index
+
+    def reload(self):
+        """Rebuild the index on next search"""
+        with self._lock:
+            self._index = None
+
+    def _expand(self, index, term):
+        """Indexed words starting with a query term"""
+        vocabulary = index['vocabulary']
+        start = bisect.bisect_left(vocabulary, term)
+        end = bisect.bisect_left(vocabulary, term + '\uffff', start)
+        return vocabulary[start:end]
+
+    def search(self, query, kind=None, limit=None):
+        """
+        Documents matching every query term (as a prefix), best first
+
+        Returns a list of (kind, id, score, words) where `words` are the
+        indexed words the query matched. `kind` restricts the results to
+        'article' or 'faq'.
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        index = self._get_index()
+        postings = index['postings']
+        documents = index['documents']
+        total = len(documents)
+
+        scores = None
+        words = set()
+        for term in terms:
+            term_scores = {}
+            for word in self._expand(index, term):
+                words.add(word)
+                posting = postings[word]
+                idf = math.log(1 + (total - len(posting) + 0.5) / (len(posting) + 0.5))
+                for key, frequency in posting.items():
+                    if kind and key[0] != kind:
+                        continue
+                    norm = 1 - B + B * documents[key]['length'] / (index['average_length'] or 1)
+                    score = idf * frequency * (K1 + 1) / (frequency + K1 * norm)
+                    term_scores[key] = max(term_scores.get(key, 0.0), score)
+            scores = term_scores if scores is None else {
+                key: score + term_scores[key] for key, score in scores.items() if key in term_scores
+            }
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        if limit:
+            ranked = ranked[:limit]
+        return [(key[0], key[1], score, words) for key, score in ranked]
+
+    def document(self, kind, pk):
+        """Indexed fields of a document (title, body, slug, category_name)"""
+        return self._get_index()['documents'].get((kind, pk))
+
+
+help_index = HelpSearchIndex()
+
+
+def bump_search_version():
+    """Invalidate the help search index in every process sharing the cache"""
+    cache.set(HELP_SEARCH_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    help_index.reload()
+
+
+def highlight(text, words, max_chars=None):
+    """
+    HTML-escaped text with the words matching the query wrapped in <mark>;
+    with `max_chars`, cut to a window around the first match
+    """
+    spans = [
+        match.span() for match in re.finditer(r'[0-9A-Za-zÀ-ɏ]+', text)
+        if ' '.join(tokenize(match.group())) in words
+    ]
+    start, end = 0, len(text)
+    if max_chars and len(text) > max_chars:
+        first = spans[0][0] if spans else 0
+        start = max(0, min(first - max_chars // 4, len(text) - max_chars))
+        # Start and end on word boundaries
+        if start:
+            start = text.find(' ', start) + 1 or start
+        end = start + max_chars
+        if end < len(text):
+            end = text.rfind(' ', start, end) if text.rfind(' ', start, end) > start else end
+
+    parts = ['…' if start else '']
+    position = start
+    for span_start, span_end in spans:
+        if span_start < start or span_end > end:
+            continue
+        parts.append(html.escape(text[position:span_start]))
+        parts.append(f'<mark>{html.escape(text[span_start:span_end])}</mark>')
+        position = span_end
+    parts.append(html.escape(text[position:end]))
+    parts.append('…' if end < len(text) else '')
+    return ''.join(parts)
+
+
+def search_help(query, kind=None, limit=None):
+    """Search results with highlighted title and body snippet"""
+    snippet_chars = getattr(settings, 'HELP_SEARCH_SNIPPET_CHARS', 160)
+    results = []
+    for result_kind, pk, score, words in help_index.search(query, kind=kind, limit=limit):
+        document = help_index.document(result_kind, pk)
+        if document is None:
+            # Index rebuilt by a concurrent write since the search
+            continue
+        results.append({
+            'type': result_kind,
+            'id': pk,
+            'slug': document['slug'],
+            'category_name': document['category_name'],
+            'title': document['title'],
+            'title_highlighted': highlight(document['title'], words),
+            'snippet': highlight(document['body'], words, snippet_chars),
+            'score': round(score, 4),
+        })
+    return results
+
+
+class HelpSearchFilter(filters.SearchFilter):
+    """
+    ?search= answered from the help search index, ranked by relevance
+    unless an explicit ?ordering= is given
+    """
+    search_kind = None
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not tokenize(query):
+            return queryset
+
+        ids = [pk for _, pk, _, _ in help_index.search(query, kind=self.search_kind)]
+        queryset = queryset.filter(pk__in=ids)
+        if ids and not request.query_params.get(api_settings.ORDERING_PARAM):
+            rank = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)],
+                        output_field=IntegerField())
+            queryset = queryset.order_by(rank)
+        return queryset
+
+
+class HelpArticleSearchFilter(HelpSearchFilter):
+    search_kind = 'article'
+
+
+class FAQSearchFilter(HelpSearchFilter):
+    search_kind = 'faq'
@@ -13,15 +13,20 @@ class HelpCategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at']
 
     def get_articles_count(self, obj):
+        # Annotated by HelpCategoryViewSet
+        if hasattr(obj, 'num_articles'):
+            return obj.num_articles
         return obj.articles.filter(status='published').count()
 
     def get_faqs_count(self, obj):
+        if hasattr(obj, 'num_faqs'):
+            return obj.num_faqs
         return obj.faqs.filter(is_active=True).count()
 
 
 class HelpArticleSerializer(serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
-    author_name = serializers.CharField(source='author.full_name', read_only=True)
+    author_name = serializers.CharField(source='author.get_full_name', read_only=True)
 
     class Meta:
         model = HelpArticle
@@ -34,7 +39,7 @@ class HelpArticleSerializer(serializers.ModelSerializer):
 class HelpArticleListSerializer(serializers.ModelSerializer):
     """Lighter serializer for listing articles"""
     category_name = serializers.CharField(source='category.name', read_only=True)
-    author_name = serializers.CharField(source='author.full_name', read_only=True)
+    author_name = serializers.CharField(source='author.get_full_name', read_only=True)
 
     class Meta:
         model = HelpArticle
@@ -54,7 +59,7 @@ class FAQSerializer(serializers.ModelSerializer):
 
 
 class SupportTicketReplySerializer(serializers.ModelSerializer):
-    user_name = serializers.CharField(source='user.full_name', read_only=True)
+    user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     user_email = serializers.CharField(source='user.email', read_only=True)
 
     class Meta:
@@ -65,9 +70,9 @@ class SupportTicketReplySerializer(serializers.ModelSerializer):
 
 
 class SupportTicketSerializer(serializers.ModelSerializer):
-    user_name = serializers.CharField(source='user.full_name', read_only=True)
+    user_name = serializers.CharField(source='user.get_full_name', read_only=True)
     user_email = serializers.CharField(source='user.email', read_only=True)
-    assigned_to_name = serializers.CharField(source='assigned_to.full_name', read_only=True, allow_null=True)
+    assigned_to_name = serializers.CharField(source='assigned_to.get_full_name', read_only=True, allow_null=True)
     category_name = serializers.CharField(source='category.name', read_only=True, allow_null=True)
     replies = SupportTicketReplySerializer(many=True, read_only=True)
     replies_count = serializers.SerializerMethodField()
@@ -81,13 +86,16 @@ class SupportTicketSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'created_at', 'updated_at']
 
     def get_replies_count(self, obj):
+        # Annotated by SupportTicketViewSet
+        if hasattr(obj, 'num_replies'):
+            return obj.num_replies
         return obj.replies.count()
 
 
 class SupportTicketListSerializer(serializers.ModelSerializer):
     """Lighter serializer for listing tickets"""
-    user_name = serializers.CharField(source='user.full_name', read_only=True)
-    assigned_to_name = serializers.CharField(source='assigned_to.full_name', read_only=True, allow_null=True)
+    user_name = serializers.CharField(source='user.get_full_name', read_only=True)
+    assigned_to_name = serializers.CharField(source='assigned_to.get_full_name', read_only=True, allow_null=True)
     category_name = serializers.CharField(source='category.name', read_only=True, allow_null=True)
     replies_count = serializers.SerializerMethodField()
 
@@ -98,4 +106,7 @@ class SupportTicketListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
     def get_replies_count(self, obj):
+        # Annotated by SupportTicketViewSet
+        if hasattr(obj, 'num_replies'):
+            return obj.num_replies
         return obj.replies.count()
@@ -0,0 +1,28 @@
+"""
+Signal handlers keeping the help search index in sync with writes
+"""
+from django.db.models.signals import post_save, post_delete
+
+from .models import HelpCategory, HelpArticle, FAQ
+from .search import bump_search_version
+
+# Writes that do not change what is searchable
+UNINDEXED_FIELDS = {'views_count', 'updated_at'}
+
+
+def invalidate_help_search(sender, update_fields=None, **kwargs):
+    """Rebuild the help search index after an article, FAQ or category write"""
+    if update_fields is not None and set(update_fields) <= UNINDEXED_FIELDS:
+        return
+    bump_search_version()
+
+
+for model in (HelpCategory, HelpArticle, FAQ):
+    post_save.connect(
+        invalidate_help_search, sender=model,
+        dispatch_uid=f'help_search_save_{model.__name__}'
+    )
+    post_delete.connect(
+        invalidate_help_search, sender=model,
+        dispatch_uid=f'help_search_delete_{model.__name__}'
+    )
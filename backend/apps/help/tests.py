@@ -1,3 +1,256 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+from apps.settings.loader import get_system_settings
 
-# Create your tests here.
+from .models import HelpCategory, HelpArticle, FAQ, SupportTicket, SupportTicketReply
+from .counters import ViewCounter
+from .search import bump_search_version, help_index, highlight, strip_markdown
+
+User = get_user_model()
+
+
+class HelpSearchTests(TestCase):
+    """Test cases for the help centre search index"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.category = HelpCategory.objects.create(name='Getting Started', slug='getting-started')
+        self.articles = {}
+        for slug, title, tags, content in [
+            ('survey-basics', 'Submitting a survey', 'survey, enumerator',
+             '## Steps\n\n1. Open the **survey** form\n2. Capture the GPS location'),
+            ('export-data', 'Exporting data', 'export, excel',
+             'Exports include every survey of the [service](/services) directory.'),
+            ('draft', 'Survey drafts', 'survey', 'Not yet published'),
+        ]:
+            self.articles[slug] = HelpArticle.objects.create(
+                category=self.category, title=title, slug=slug, summary='', content=content,
+                tags=tags, status='draft' if slug == 'draft' else 'published'
+            )
+        self.faq = FAQ.objects.create(
+            question='Apa itu RSJ?', answer='Rumah sakit jiwa adalah layanan rawat inap.',
+            category=self.category
+        )
+
+    def tearDown(self):
+        bump_search_version()
+
+    def test_strip_markdown(self):
+        self.assertEqual(
+            strip_markdown('## Steps\\n\\n1. Open the **survey** [form](/x)'),
+            'Steps Open the survey form'
+        )
+
+    def test_ranks_title_and_tags_above_body(self):
+        """A word in the title or tags outweighs the same word in the body"""
+        results = help_index.search('survey')
+        self.assertEqual(
+            [(kind, pk) for kind, pk, _, _ in results],
+            [('article', self.articles['survey-basics'].pk), ('article', self.articles['export-data'].pk)]
+        )
+
+    def test_search_endpoint_highlights(self):
+        response = self.client.get('/v1/help/search/', {'q': 'gps surv'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        result, = response.data['results']
+        self.assertEqual(result['slug'], 'survey-basics')
+        self.assertEqual(result['title_highlighted'], 'Submitting a <mark>survey</mark>')
+        self.assertIn('<mark>GPS</mark>', result['snippet'])
+        self.assertNotIn('**', result['snippet'])
+
+    def test_faq_abbreviation_and_type_filter(self):
+        response = self.client.get('/v1/help/search/', {'q': 'rumah sakit jiwa', 'type': 'faq'})
+        self.assertEqual([r['id'] for r in response.data['results']], [self.faq.pk])
+
+        response = self.client.get('/v1/help/faqs/', {'search': 'rsj'})
+        self.assertEqual([faq['id'] for faq in response.data['results']], [self.faq.pk])
+
+    def test_article_list_search_is_ranked(self):
+        response = self.client.get('/v1/help/articles/', {'search': 'survey'})
+        self.assertEqual(
+            [article['slug'] for article in response.data['results']], ['survey-basics', 'export-data']
+        )
+
+    def test_index_follows_writes(self):
+        """Edits are searchable; view-count updates do not rebuild the index"""
+        help_index.search('survey')
+        index = help_index._get_index()
+        self.client.get(f"/v1/help/articles/{self.articles['export-data'].slug}/")
+        self.assertIs(help_index._get_index(), index)
+
+        article = self.articles['draft']
+        article.status = 'published'
+        article.save()
+        self.assertEqual(len(help_index.search('draft')), 1)
+
+    def test_highlight_window(self):
+        text = 'lorem ' * 50 + 'survey ' + 'ipsum ' * 50
+        snippet = highlight(text, {'survey'}, 60)
+        self.assertTrue(snippet.startswith('…') and snippet.endswith('…'))
+        self.assertIn('<mark>survey</mark>', snippet)
+        self.assertLessEqual(len(snippet), 60 + len('<mark></mark>') + 2)
+
+
+class ViewCounterTests(TestCase):
+    """Test cases for the batched help view counters"""
+
+    def setUp(self):
+        self.client = APIClient()
+        category = HelpCategory.objects.create(name='Getting Started', slug='getting-started')
+        self.article = HelpArticle.objects.create(
+            category=category, title='Submitting a survey', slug='survey-basics',
+            content='Open the form', status='published'
+        )
+        self.faqs = [
+            FAQ.objects.create(question=f'Question {i}', answer='Answer', category=category)
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        bump_search_version()
+
+    def test_retrieve_counts_view_without_saving_instance(self):
+        updated_at = self.article.updated_at
+        response = self.client.get(f'/v1/help/articles/{self.article.slug}/')
+
+        self.assertEqual(response.data['views_count'], 1)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.views_count, 1)
+        self.assertEqual(self.article.updated_at, updated_at)
+
+    def test_flush_groups_increments(self):
+        """Pending views are written with one UPDATE per model and increment"""
+        counter = ViewCounter()
+        counter._ensure_started = lambda: None
+        counter.add(self.article)
+        counter.add(self.article)
+        for faq in self.faqs:
+            counter.add(faq)
+        counter.add(self.faqs[0])
+        self.assertEqual(counter.pending(self.article), 2)
+
+        with self.assertNumQueries(3):
+            counter.flush()
+
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.views_count, 2)
+        self.assertEqual(
+            list(FAQ.objects.order_by('pk').values_list('views_count', flat=True)), [2, 1, 1]
+        )
+        self.assertEqual(counter.pending(self.article), 0)
+        with self.assertNumQueries(0):
+            counter.flush()
+
+
+class HelpQueryCountTests(TestCase):
+    """The help endpoints run a fixed number of queries whatever the page size"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='staff@test.com', password='testpass123', first_name='Staff', is_staff=True
+        )
+        self.client.force_authenticate(user=self.user)
+        self.rows = 0
+        # Loaded once per process, outside the measured requests
+        get_system_settings()
+
+    def tearDown(self):
+        bump_search_version()
+
+    def add_rows(self, count):
+        """Categories with articles and FAQs, and tickets with replies"""
+        for _ in range(count):
+            self.rows += 1
+            n = self.rows
+            category = HelpCategory.objects.create(name=f'Category {n}', slug=f'category-{n}')
+            for i in range(2):
+                HelpArticle.objects.create(
+                    category=category, title=f'Article {n}.{i}', slug=f'article-{n}-{i}',
+                    summary='', content='', status='published', author=self.user, is_featured=i == 0
+                )
+                FAQ.objects.create(question=f'Question {n}.{i}', answer='Answer', category=category)
+            ticket = SupportTicket.objects.create(
+                user=self.user, subject=f'Ticket {n}', description='Help', category=category,
+                assigned_to=self.user
+            )
+            for i in range(2):
+                SupportTicketReply.objects.create(ticket=ticket, user=self.user, message=f'Reply {i}')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context.captured_queries), response
+
+    def assertConstantQueries(self, url):
+        self.add_rows(1)
+        queries, _ = self.count_queries(url)
+        self.add_rows(5)
+        more_queries, response = self.count_queries(url)
+        self.assertEqual(more_queries, queries, f'{url} runs queries per row')
+        return response
+
+    def test_categories(self):
+        response = self.assertConstantQueries('/v1/help/categories/')
+        category = response.data['results'][0]
+        self.assertEqual((category['articles_count'], category['faqs_count']), (2, 2))
+
+    def test_category_articles_and_faqs(self):
+        category = HelpCategory.objects.create(name='Getting Started', slug='getting-started')
+        HelpArticle.objects.create(
+            category=category, title='Draft', slug='draft', summary='', content='', author=self.user
+        )
+
+        def add_to_category(count):
+            self.add_rows(count)
+            HelpArticle.objects.filter(slug__startswith='article-').update(category=category)
+            FAQ.objects.update(category=category)
+
+        for action in ('articles', 'faqs'):
+            url = f'/v1/help/categories/getting-started/{action}/'
+            add_to_category(1)
+            queries, _ = self.count_queries(url)
+            add_to_category(5)
+            more_queries, response = self.count_queries(url)
+            self.assertEqual(more_queries, queries, f'{url} runs queries per row')
+        self.assertEqual(len(response.data), 2 * self.rows)
+
+    def test_articles(self):
+        self.assertConstantQueries('/v1/help/articles/')
+        response = self.assertConstantQueries('/v1/help/articles/featured/')
+        self.assertEqual(len(response.data), self.rows)
+        self.assertEqual(response.data[0]['author_name'], 'Staff')
+
+    def test_faqs(self):
+        self.assertConstantQueries('/v1/help/faqs/')
+
+    def test_tickets(self):
+        response = self.assertConstantQueries('/v1/help/tickets/')
+        self.assertEqual(response.data['results'][0]['replies_count'], 2)
+
+    def test_ticket_detail(self):
+        self.add_rows(1)
+        ticket = SupportTicket.objects.get()
+        queries, _ = self.count_queries(f'/v1/help/tickets/{ticket.pk}/')
+        for i in range(5):
+            SupportTicketReply.objects.create(ticket=ticket, user=self.user, message=f'More {i}')
+
+        more_queries, response = self.count_queries(f'/v1/help/tickets/{ticket.pk}/')
+        self.assertEqual(more_queries, queries)
+        self.assertEqual(response.data['replies_count'], 7)
+        self.assertEqual(response.data['replies'][0]['user_name'], 'Staff')
+
+    def test_non_staff_sees_own_tickets(self):
+        self.add_rows(2)
+        other = User.objects.create_user(email='other@test.com', password='testpass123')
+        SupportTicket.objects.create(user=other, subject='Mine', description='Help')
+        self.client.force_authenticate(user=other)
+
+        response = self.client.get('/v1/help/tickets/')
+        self.assertEqual([ticket['subject'] for ticket in response.data['results']], ['Mine'])
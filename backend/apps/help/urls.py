@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import HelpCategoryViewSet, HelpArticleViewSet, FAQViewSet, SupportTicketViewSet
+from .views import HelpCategoryViewSet, HelpArticleViewSet, FAQViewSet, SupportTicketViewSet, help_search
 
 router = DefaultRouter()
 router.register(r'categories', HelpCategoryViewSet, basename='help-category')
@@ -9,5 +9,6 @@ router.register(r'faqs', FAQViewSet, basename='faq')
 router.register(r'tickets', SupportTicketViewSet, basename='support-ticket')
 
 urlpatterns = [
+    path('search/', help_search, name='help-search'),
     path('', include(router.urls)),
 ]
@@ -1,9 +1,13 @@
 from rest_framework import viewsets, filters, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Prefetch, Q
 from django.utils import timezone
+from .counters import record_view
+from .search import HelpArticleSearchFilter, FAQSearchFilter, search_help
 from .models import HelpCategory, HelpArticle, FAQ, SupportTicket, SupportTicketReply
 from .serializers import (
     HelpCategorySerializer, HelpArticleSerializer, HelpArticleListSerializer,
@@ -11,12 +15,19 @@ from .serializers import (
     SupportTicketReplySerializer
 )
 
+User = get_user_model()
+
 
 class HelpCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for help categories
     """
-    queryset = HelpCategory.objects.filter(is_active=True)
+    # Both counts join a one-to-many relation, hence distinct; GROUP BY
+    # queries do not fall back on Meta.ordering
+    queryset = HelpCategory.objects.filter(is_active=True).annotate(
+        num_articles=Count('articles', filter=Q(articles__status='published'), distinct=True),
+        num_faqs=Count('faqs', filter=Q(faqs__is_active=True), distinct=True),
+    ).order_by('order', 'name')
     serializer_class = HelpCategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
@@ -25,7 +36,7 @@ class HelpCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     def articles(self, request, slug=None):
         """Get all articles in this category"""
         category = self.get_object()
-        articles = category.articles.filter(status='published')
+        articles = category.articles.filter(status='published').select_related('category', 'author')
         serializer = HelpArticleListSerializer(articles, many=True)
         return Response(serializer.data)
 
@@ -33,7 +44,7 @@ class HelpCategoryViewSet(viewsets.ReadOnlyModelViewSet):
     def faqs(self, request, slug=None):
         """Get all FAQs in this category"""
         category = self.get_object()
-        faqs = category.faqs.filter(is_active=True)
+        faqs = category.faqs.filter(is_active=True).select_related('category')
         serializer = FAQSerializer(faqs, many=True)
         return Response(serializer.data)
 
@@ -42,13 +53,13 @@ class HelpArticleViewSet(viewsets.ModelViewSet):
     """
     API endpoint for help articles
     """
-    queryset = HelpArticle.objects.filter(status='published')
+    queryset = HelpArticle.objects.filter(status='published').select_related('category', 'author')
     serializer_class = HelpArticleSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # ?search= is answered from the help search index (see search.py)
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, HelpArticleSearchFilter]
     filterset_fields = ['category', 'status', 'is_featured']
-    search_fields = ['title', 'summary', 'content', 'tags']
     ordering_fields = ['created_at', 'views_count', 'order']
     ordering = ['category', 'order', 'title']
 
@@ -58,10 +69,9 @@ class HelpArticleViewSet(viewsets.ModelViewSet):
         return HelpArticleSerializer
 
     def retrieve(self, request, *args, **kwargs):
-        """Increment view count when article is retrieved"""
+        """Count a view when article is retrieved (written in batches, see counters.py)"""
         instance = self.get_object()
-        instance.views_count += 1
-        instance.save(update_fields=['views_count'])
+        instance.views_count = record_view(instance)
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
@@ -77,22 +87,50 @@ class FAQViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for FAQs
     """
-    queryset = FAQ.objects.filter(is_active=True)
+    queryset = FAQ.objects.filter(is_active=True).select_related('category')
     serializer_class = FAQSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, FAQSearchFilter]
     filterset_fields = ['category']
-    search_fields = ['question', 'answer']
 
     def retrieve(self, request, *args, **kwargs):
-        """Increment view count when FAQ is retrieved"""
+        """Count a view when FAQ is retrieved (written in batches, see counters.py)"""
         instance = self.get_object()
-        instance.views_count += 1
-        instance.save(update_fields=['views_count'])
+        instance.views_count = record_view(instance)
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticatedOrReadOnly])
+def help_search(request):
+    """
+    Search published articles and active FAQs
+
+    ?q= query (every word matched as a prefix), ?type=article|faq,
+    ?limit= (default 10, at most 50). Results are ranked by relevance and
+    carry an HTML-escaped title and body snippet with the matches in <mark>.
+    """
+    kind = request.query_params.get('type') or None
+    if kind not in (None, 'article', 'faq'):
+        return Response(
+            {'type': ['Expected "article" or "faq".']},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+    except ValueError:
+        return Response({'limit': ['Enter a whole number.']}, status=status.HTTP_400_BAD_REQUEST)
+
+    query = request.query_params.get('q', '')
+    return Response({'query': query, 'results': search_help(query, kind=kind, limit=limit)})
+
+
+def is_support_staff(user):
+    """Staff and administrators see and answer every support ticket"""
+    return user.is_staff or user.role == User.Role.ADMIN
+
+
 class SupportTicketViewSet(viewsets.ModelViewSet):
     """
     API endpoint for support tickets
@@ -108,9 +146,17 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """Users can only see their own tickets unless they're staff"""
         user = self.request.user
-        if user.is_staff or user.role in ['admin', 'data_manager']:
-            return SupportTicket.objects.all()
-        return SupportTicket.objects.filter(user=user)
+        queryset = SupportTicket.objects.select_related('user', 'assigned_to', 'category').annotate(
+            num_replies=Count('replies')
+        )
+        if self.action != 'list':
+            # Nested in SupportTicketSerializer
+            queryset = queryset.prefetch_related(
+                Prefetch('replies', queryset=SupportTicketReply.objects.select_related('user'))
+            )
+        if not is_support_staff(user):
+            queryset = queryset.filter(user=user)
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -137,7 +183,7 @@ class SupportTicketViewSet(viewsets.ModelViewSet):
             ticket=ticket,
             user=request.user,
             message=message,
-            is_staff_reply=request.user.is_staff or request.user.role in ['admin', 'data_manager']
+            is_staff_reply=is_support_staff(request.user)
         )
         
         serializer = SupportTicketReplySerializer(reply)
@@ -0,0 +1,204 @@
+"""
+Buffered, batched ActivityLog writer
+
+Request threads hand unsaved ActivityLog instances to an in-process queue; a
+background flusher thread bulk-inserts them once BATCH_SIZE entries are
+waiting or FLUSH_INTERVAL seconds have passed, and drains the queue when the
+process exits. With ACTIVITY_LOG_ASYNC disabled (the test runner) entries are
+written synchronously.
+
+Because bulk_create does not send post_save, every write sends the
+`activity_logs_written` signal with the inserted entries instead.
+
+Code logging many actions at once (e.g. the survey batch upload) wraps them
+in collect_activity_logs(), which records the entries together on exit.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.dispatch import Signal
+
+from apps.settings.loader import get_system_settings
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+# Sent after activity log entries have been inserted; provides `logs`
+activity_logs_written = Signal()
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 2.0
+DEFAULT_MAX_QUEUE_SIZE = 10000
+
+
+def write_activity_logs(entries):
+    """Insert activity log entries in one statement and announce them"""
+    if not entries:
+        return entries
+    ActivityLog.objects.bulk_create(entries)
+    activity_logs_written.send(sender=ActivityLog, logs=entries)
+    return entries
+
+
+class ActivityLogBuffer:
+    """In-process queue of pending activity log entries with a flusher thread"""
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_queue_size=DEFAULT_MAX_QUEUE_SIZE):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def enqueue(self, entry):
+        """Queue an entry; write it synchronously if the queue is full"""
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            write_activity_logs([entry])
+
+    def _ensure_started(self):
+        # Restart after fork (e.g. gunicorn --preload): threads do not survive it
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(
+                target=self._run, name='activity-log-flusher', daemon=True
+            )
+            self._thread.start()
+
+    def _take_batch(self, timeout):
+        """Collect up to batch_size entries, waiting at most `timeout` seconds"""
+        batch = []
+        deadline = time.monotonic() + timeout
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self.queue.get_nowait())
+                else:
+                    batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            close_old_connections()
+            write_activity_logs(batch)
+        except Exception:
+            logger.exception('Failed to write %d activity log entries', len(batch))
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                batch = self._take_batch(self.flush_interval)
+                if batch:
+                    self._write(batch)
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Write every queued entry from the calling thread"""
+        while True:
+            batch = self._take_batch(0)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self):
+        """Stop the flusher thread and drain the queue"""
+        self._stopping.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout=self.flush_interval + 1)
+        self.flush()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Process-wide activity log buffer, created on first use"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = ActivityLogBuffer(
+                    batch_size=getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                    flush_interval=getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL),
+                    max_queue_size=getattr(settings, 'ACTIVITY_LOG_MAX_QUEUE_SIZE', DEFAULT_MAX_QUEUE_SIZE),
+                )
+                atexit.register(_buffer.stop)
+    return _buffer
+
+
+_collector = threading.local()
+
+
+def submit_activity_logs(entries):
+    """
+    Record unsaved ActivityLog instances.
+
+    Buffered when ACTIVITY_LOG_ASYNC is enabled, written immediately in one
+    statement otherwise; dropped while SystemSettings.enable_audit_logs is off.
+    """
+    if not entries or not get_system_settings().enable_audit_logs:
+        return entries
+    if getattr(settings, 'ACTIVITY_LOG_ASYNC', False):
+        buffer = get_buffer()
+        for entry in entries:
+            buffer.enqueue(entry)
+    else:
+        write_activity_logs(entries)
+    return entries
+
+
+def submit_activity_log(entry):
+    """Record an unsaved ActivityLog instance (see submit_activity_logs)"""
+    collected = getattr(_collector, 'entries', None)
+    if collected is not None:
+        collected.append(entry)
+    else:
+        submit_activity_logs([entry])
+    return entry
+
+
+@contextmanager
+def collect_activity_logs():
+    """
+    Hold the entries submitted by this thread in the block and record them
+    together when it exits (dropped if it raises)
+    """
+    if getattr(_collector, 'entries', None) is not None:
+        # Nested: the outer block records them
+        yield
+        return
+    _collector.entries = []
+    try:
+        yield
+        entries = _collector.entries
+    finally:
+        _collector.entries = None
+    submit_activity_logs(entries)
+
+
+def flush_activity_logs():
+    """Write all buffered entries now (no-op in synchronous mode)"""
+    if _buffer is not None:
+        _buffer.flush()
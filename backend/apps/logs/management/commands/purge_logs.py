@@ -0,0 +1,76 @@
+"""
+Management command to enforce the log retention policy
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.logs.retention import (
+    DEFAULT_BATCH_SIZE, RETENTION_POLICIES, get_retention_cutoff, get_retention_days,
+    purge_expired_logs,
+)
+
+MODELS_BY_TABLE = {model._meta.db_table: model for model in RETENTION_POLICIES}
+
+
+class Command(BaseCommand):
+    help = 'Delete (or archive) log rows older than the data retention period (run daily, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Retention period in days (defaults to SystemSettings.data_retention_days)',
+        )
+        parser.add_argument(
+            '--table',
+            action='append',
+            dest='tables',
+            choices=sorted(MODELS_BY_TABLE),
+            help='Only purge the given log table (can be repeated)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows deleted per statement (default: {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--archive',
+            action='store_true',
+            help='Write purged rows to gzip-compressed JSONL files before deleting them',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            help='Directory for archive files (defaults to settings.LOG_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be purged',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else get_retention_days()
+        if days < 1:
+            raise CommandError('--days must be at least 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        models = [MODELS_BY_TABLE[table] for table in options['tables'] or []]
+        cutoff = get_retention_cutoff(days)
+        self.stdout.write(f'Purging log rows older than {cutoff:%Y-%m-%d %H:%M %Z} ({days} days)')
+
+        results = purge_expired_logs(
+            days=days,
+            models=models,
+            batch_size=options['batch_size'],
+            archive=options['archive'],
+            archive_dir=options['archive_dir'],
+            dry_run=options['dry_run'],
+        )
+
+        verb = 'Would purge' if options['dry_run'] else 'Purged'
+        for model, count in results.items():
+            self.stdout.write(f'  {model._meta.db_table}: {verb.lower()} {count} row(s)')
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {sum(results.values())} log row(s)'
+        ))
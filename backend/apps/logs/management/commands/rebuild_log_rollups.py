@@ -0,0 +1,49 @@
+"""
+Management command to recompute the daily log rollups from the raw log tables
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.logs.rollups import ROLLUPS, rebuild_rollups
+
+MODELS_BY_TABLE = {model._meta.db_table: model for model in ROLLUPS}
+
+
+class Command(BaseCommand):
+    help = 'Recompute the daily log rollups (e.g. after bulk updates that bypass save())'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--table',
+            action='append',
+            dest='tables',
+            choices=sorted(MODELS_BY_TABLE),
+            help='Only rebuild the rollups of the given log table (can be repeated)',
+        )
+        parser.add_argument('--since', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Last day to rebuild (YYYY-MM-DD)')
+
+    def parse_day(self, options, name):
+        value = options[name]
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'--{name} must be a date in YYYY-MM-DD format')
+        return day
+
+    def handle(self, *args, **options):
+        since = self.parse_day(options, 'since')
+        until = self.parse_day(options, 'until')
+        if until is not None:
+            # rebuild_rollups stops before `until`
+            until += timedelta(days=1)
+
+        models = [MODELS_BY_TABLE[table] for table in options['tables'] or []] or list(ROLLUPS)
+        for model in models:
+            count = rebuild_rollups(model, since=since, until=until)
+            self.stdout.write(f'  {model._meta.db_table}: {count} rollup row(s)')
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rollups for {len(models)} log table(s)'))
@@ -0,0 +1,121 @@
+# Generated by Django 6.1.2 on 2026-10-17 19:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+# (log model, rollup model, date field, dimensions, measures)
+ROLLUPS = [
+    ('ActivityLog', 'ActivityLogDailyRollup', 'timestamp',
+     ('user_id', 'username', 'action', 'severity', 'model_name'), ()),
+    ('DataChangeLog', 'DataChangeLogDailyRollup', 'timestamp',
+     ('user_id', 'username', 'model_name', 'operation'), ()),
+    ('SystemError', 'SystemErrorDailyRollup', 'timestamp',
+     ('severity', 'error_type', 'is_resolved', 'error_code', 'error_message'), ()),
+    ('ImportExportLog', 'ImportExportLogDailyRollup', 'started_at',
+     ('user_id', 'username', 'operation', 'status', 'file_format'), ('total_records',)),
+]
+
+
+def backfill_rollups(apps, schema_editor):
+    """Roll up the log rows written before the rollup tables existed"""
+    for log_name, rollup_name, date_field, dimensions, measures in ROLLUPS:
+        log_model = apps.get_model('logs', log_name)
+        rollup_model = apps.get_model('logs', rollup_name)
+        rows = log_model.objects.order_by().annotate(
+            rollup_day=TruncDate(date_field)
+        ).values('rollup_day', *dimensions).annotate(
+            rollup_count=Count('pk'),
+            **{f'rollup_{measure}': Sum(measure) for measure in measures}
+        )
+        rollup_model.objects.bulk_create([
+            rollup_model(
+                day=row['rollup_day'],
+                count=row['rollup_count'],
+                **{field: row[field] for field in dimensions},
+                **{measure: row[f'rollup_{measure}'] or 0 for measure in measures}
+            )
+            for row in rows
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0002_activitylog_timestamp_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemErrorDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('count', models.IntegerField(default=0)),
+                ('severity', models.CharField(choices=[('DEBUG', 'Debug'), ('INFO', 'Information'), ('WARNING', 'Warning'), ('ERROR', 'Error'), ('CRITICAL', 'Critical')], max_length=20)),
+                ('error_type', models.CharField(choices=[('VALIDATION', 'Validation Error'), ('DATABASE', 'Database Error'), ('API', 'API Error'), ('AUTHENTICATION', 'Authentication Error'), ('PERMISSION', 'Permission Error'), ('FILE_SYSTEM', 'File System Error'), ('EXTERNAL_SERVICE', 'External Service Error'), ('CONFIGURATION', 'Configuration Error'), ('RUNTIME', 'Runtime Error'), ('UNKNOWN', 'Unknown Error')], max_length=50)),
+                ('is_resolved', models.BooleanField(default=False)),
+                ('error_code', models.CharField(blank=True, max_length=50)),
+                ('error_message', models.TextField()),
+            ],
+            options={
+                'db_table': 'system_error_daily_rollups',
+                'indexes': [models.Index(fields=['day', 'error_code'], name='system_erro_day_e972f8_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ActivityLogDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('count', models.IntegerField(default=0)),
+                ('username', models.CharField(max_length=150)),
+                ('action', models.CharField(choices=[('LOGIN', 'Login'), ('LOGOUT', 'Logout'), ('LOGIN_FAILED', 'Login Failed'), ('PASSWORD_CHANGED', 'Password Changed'), ('PASSWORD_RESET', 'Password Reset'), ('CREATE', 'Create'), ('READ', 'Read/View'), ('UPDATE', 'Update'), ('DELETE', 'Delete'), ('SURVEY_SUBMIT', 'Survey Submitted'), ('SURVEY_ASSIGN', 'Survey Assigned'), ('SURVEY_VERIFY', 'Survey Verified'), ('SURVEY_REJECT', 'Survey Rejected'), ('EXPORT', 'Data Export'), ('IMPORT', 'Data Import'), ('BULK_UPDATE', 'Bulk Update'), ('BULK_DELETE', 'Bulk Delete'), ('FILE_UPLOAD', 'File Upload'), ('FILE_DOWNLOAD', 'File Download'), ('FILE_DELETE', 'File Delete'), ('SETTINGS_CHANGE', 'Settings Changed'), ('ROLE_ASSIGNED', 'Role Assigned'), ('PERMISSION_CHANGED', 'Permission Changed')], max_length=50)),
+                ('severity', models.CharField(choices=[('INFO', 'Information'), ('WARNING', 'Warning'), ('ERROR', 'Error'), ('CRITICAL', 'Critical')], max_length=20)),
+                ('model_name', models.CharField(blank=True, max_length=100)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'activity_log_daily_rollups',
+                'indexes': [models.Index(fields=['day', 'action'], name='activity_lo_day_be44d5_idx'), models.Index(fields=['user', 'day'], name='activity_lo_user_id_98e907_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DataChangeLogDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('count', models.IntegerField(default=0)),
+                ('username', models.CharField(max_length=150)),
+                ('model_name', models.CharField(max_length=100)),
+                ('operation', models.CharField(choices=[('INSERT', 'Insert'), ('UPDATE', 'Update'), ('DELETE', 'Delete'), ('BULK_INSERT', 'Bulk Insert'), ('BULK_UPDATE', 'Bulk Update'), ('BULK_DELETE', 'Bulk Delete')], max_length=20)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'data_change_log_daily_rollups',
+                'indexes': [models.Index(fields=['day', 'model_name'], name='data_change_day_aab680_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImportExportLogDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(db_index=True)),
+                ('count', models.IntegerField(default=0)),
+                ('username', models.CharField(max_length=150)),
+                ('operation', models.CharField(choices=[('IMPORT', 'Import'), ('EXPORT', 'Export')], max_length=20)),
+                ('status', models.CharField(choices=[('INITIATED', 'Initiated'), ('IN_PROGRESS', 'In Progress'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed'), ('PARTIALLY_COMPLETED', 'Partially Completed')], max_length=30)),
+                ('file_format', models.CharField(choices=[('CSV', 'CSV'), ('EXCEL', 'Excel (XLSX)'), ('JSON', 'JSON'), ('XML', 'XML'), ('PDF', 'PDF')], max_length=20)),
+                ('total_records', models.BigIntegerField(default=0)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'import_export_log_daily_rollups',
+                'indexes': [models.Index(fields=['day', 'operation'], name='import_expo_day_bc76be_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.1.2 on 2026-10-17 22:18
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Left, TruncDate
+
+MESSAGE_LENGTH = 200
+
+
+def regroup_error_rollups(apps, schema_editor):
+    """Rebuild the SystemError rollups grouped by truncated message"""
+    SystemError = apps.get_model('logs', 'SystemError')
+    SystemErrorDailyRollup = apps.get_model('logs', 'SystemErrorDailyRollup')
+    rows = SystemError.objects.order_by().annotate(rollup_day=TruncDate('timestamp')).values(
+        'rollup_day', 'severity', 'error_type', 'is_resolved', 'error_code',
+        rollup_message=Left('error_message', MESSAGE_LENGTH),
+    ).annotate(rollup_count=Count('pk'))
+    SystemErrorDailyRollup.objects.all().delete()
+    SystemErrorDailyRollup.objects.bulk_create([
+        SystemErrorDailyRollup(
+            day=row['rollup_day'], count=row['rollup_count'], severity=row['severity'],
+            error_type=row['error_type'], is_resolved=row['is_resolved'],
+            error_code=row['error_code'], error_message=row['rollup_message'],
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0003_daily_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(regroup_error_rollups, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='systemerrordailyrollup',
+            name='error_message',
+            field=models.CharField(max_length=200),
+        ),
+        migrations.AddConstraint(
+            model_name='systemerrordailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'severity', 'error_type', 'is_resolved', 'error_code', 'error_message'), name='system_error_rollup_unique_bucket'),
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 6.1.2 on 2026-10-17 22:49
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+# (log model, rollup model, date field, dimensions, measures)
+ROLLUPS = [
+    ('ActivityLog', 'ActivityLogDailyRollup', 'timestamp',
+     ('user_id', 'username', 'action', 'severity', 'model_name'), ()),
+    ('DataChangeLog', 'DataChangeLogDailyRollup', 'timestamp',
+     ('user_id', 'username', 'model_name', 'operation'), ()),
+    ('SystemError', 'SystemErrorDailyRollup', 'timestamp',
+     ('severity', 'error_type', 'is_resolved', 'error_code', 'error_message'), ()),
+    ('ImportExportLog', 'ImportExportLogDailyRollup', 'started_at',
+     ('user_id', 'username', 'operation', 'status', 'file_format'), ('total_records',)),
+]
+
+
+def bucket_key(dimensions):
+    """Frozen copy of apps.logs.rollups.bucket_key"""
+    return hashlib.sha1(json.dumps(list(dimensions), default=str).encode()).hexdigest()
+
+
+def rebuild_rollups(apps, schema_editor):
+    """Rebuild every rollup with buckets (and full SystemError messages)"""
+    for log_name, rollup_name, date_field, dimensions, measures in ROLLUPS:
+        log_model = apps.get_model('logs', log_name)
+        rollup_model = apps.get_model('logs', rollup_name)
+        rows = log_model.objects.order_by().annotate(
+            rollup_day=TruncDate(date_field)
+        ).values('rollup_day', *dimensions).annotate(
+            rollup_count=Count('pk'),
+            **{f'rollup_{measure}': Sum(measure) for measure in measures}
+        )
+        rollup_model.objects.all().delete()
+        rollup_model.objects.bulk_create([
+            rollup_model(
+                day=row['rollup_day'],
+                count=row['rollup_count'],
+                bucket=bucket_key([row[field] for field in dimensions]),
+                **{field: row[field] for field in dimensions},
+                **{measure: row[f'rollup_{measure}'] or 0 for measure in measures}
+            )
+            for row in rows
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0004_error_rollup_bucket'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='systemerrordailyrollup',
+            name='system_error_rollup_unique_bucket',
+        ),
+        migrations.AddField(
+            model_name='activitylogdailyrollup',
+            name='bucket',
+            field=models.CharField(default='', editable=False, max_length=40),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='datachangelogdailyrollup',
+            name='bucket',
+            field=models.CharField(default='', editable=False, max_length=40),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='importexportlogdailyrollup',
+            name='bucket',
+            field=models.CharField(default='', editable=False, max_length=40),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='systemerrordailyrollup',
+            name='bucket',
+            field=models.CharField(default='', editable=False, max_length=40),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='systemerrordailyrollup',
+            name='error_message',
+            field=models.TextField(),
+        ),
+        migrations.RunPython(rebuild_rollups, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='activitylogdailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'bucket'), name='activity_log_rollup_unique_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='datachangelogdailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'bucket'), name='data_change_log_rollup_unique_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='importexportlogdailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'bucket'), name='import_export_log_rollup_unique_bucket'),
+        ),
+        migrations.AddConstraint(
+            model_name='systemerrordailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'bucket'), name='system_error_rollup_unique_bucket'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
@@ -88,7 +89,8 @@ class ActivityLog(models.Model):
     metadata = models.JSONField(null=True, blank=True)  # Additional context
 
     # Timestamps
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Set when the entry is built, not when the buffered writer inserts it
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
 
     class Meta:
         db_table = 'activity_logs'
@@ -449,3 +451,114 @@ class ImportExportLog(models.Model):
         if self.total_records > 0:
             return (self.successful_records / self.total_records) * 100
         return 0
+
+
+class DailyRollup(models.Model):
+    """
+    Per-day row counts of a log table, grouped by the dimensions the stats
+    endpoints report on. Kept up to date incrementally (see apps.logs.rollups).
+    """
+
+    day = models.DateField(db_index=True)
+    # Hash of the dimension values (see apps.logs.rollups.bucket_key), unique
+    # per day: nullable and long text dimensions cannot be in the constraint
+    bucket = models.CharField(max_length=40, editable=False)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ActivityLogDailyRollup(DailyRollup):
+    """Daily ActivityLog counts by user, action, severity and model"""
+
+    user = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    username = models.CharField(max_length=150)
+    action = models.CharField(max_length=50, choices=ActivityLog.Action.choices)
+    severity = models.CharField(max_length=20, choices=ActivityLog.Severity.choices)
+    model_name = models.CharField(max_length=100, blank=True)
+
+    class Meta:
+        db_table = 'activity_log_daily_rollups'
+        indexes = [
+            models.Index(fields=['day', 'action']),
+            models.Index(fields=['user', 'day']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'bucket'], name='activity_log_rollup_unique_bucket'),
+        ]
+
+
+class DataChangeLogDailyRollup(DailyRollup):
+    """Daily DataChangeLog counts by user, model and operation"""
+
+    user = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    username = models.CharField(max_length=150)
+    model_name = models.CharField(max_length=100)
+    operation = models.CharField(max_length=20, choices=DataChangeLog.Operation.choices)
+
+    class Meta:
+        db_table = 'data_change_log_daily_rollups'
+        indexes = [
+            models.Index(fields=['day', 'model_name']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'bucket'], name='data_change_log_rollup_unique_bucket'),
+        ]
+
+
+class SystemErrorDailyRollup(DailyRollup):
+    """Daily SystemError counts by severity, type, resolution and error"""
+
+    severity = models.CharField(max_length=20, choices=SystemError.Severity.choices)
+    error_type = models.CharField(max_length=50, choices=SystemError.ErrorType.choices)
+    is_resolved = models.BooleanField(default=False)
+    error_code = models.CharField(max_length=50, blank=True)
+    error_message = models.TextField()
+
+    class Meta:
+        db_table = 'system_error_daily_rollups'
+        indexes = [
+            models.Index(fields=['day', 'error_code']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'bucket'], name='system_error_rollup_unique_bucket'),
+        ]
+
+
+class ImportExportLogDailyRollup(DailyRollup):
+    """Daily ImportExportLog counts (and processed records) by operation and status"""
+
+    user = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    username = models.CharField(max_length=150)
+    operation = models.CharField(max_length=20, choices=ImportExportLog.Operation.choices)
+    status = models.CharField(max_length=30, choices=ImportExportLog.Status.choices)
+    file_format = models.CharField(max_length=20, choices=ImportExportLog.Format.choices)
+    total_records = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = 'import_export_log_daily_rollups'
+        indexes = [
+            models.Index(fields=['day', 'operation']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'bucket'], name='import_export_log_rollup_unique_bucket'),
+        ]
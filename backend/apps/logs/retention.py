@@ -0,0 +1,183 @@
+"""
+Retention engine for the audit/log tables
+
+Rows older than SystemSettings.data_retention_days are removed in small
+primary-key batches (optionally archived first to gzip-compressed JSONL), so
+no single DELETE holds long locks or bloats the undo log.
+
+Native MySQL range partitioning is not used: InnoDB does not support foreign
+keys on partitioned tables, and every log table references users (or
+surveys); batched deletes on the indexed timestamp column are the portable
+equivalent of dropping an expired month.
+
+Files written for a purged row (background export files) are removed with it.
+"""
+import gzip
+import json
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router, transaction
+from django.dispatch import Signal
+from django.utils import timezone
+
+from apps.accounts.models import UserActivityLog
+from apps.settings.models import SystemSettings
+from apps.survey.models import SurveyUploadKey, SyncTombstone
+from .models import ActivityLog, VerificationLog, DataChangeLog, SystemError, ImportExportLog
+
+# Sent after expired rows of a log model were deleted; provides `count` and
+# `cutoff` (rows older than it were purged)
+logs_purged = Signal()
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Log model -> datetime field its age is measured by
+RETENTION_POLICIES = {
+    ActivityLog: 'timestamp',
+    VerificationLog: 'timestamp',
+    DataChangeLog: 'timestamp',
+    # Recurring errors stay as long as they keep occurring
+    SystemError: 'last_occurred_at',
+    UserActivityLog: 'timestamp',
+    # Delta sync falls back to a full sync for watermarks older than this
+    SyncTombstone: 'deleted_at',
+    # Survey uploads retried after this are applied again
+    SurveyUploadKey: 'created_at',
+    ImportExportLog: 'started_at',
+}
+
+# Log model -> field holding the path (relative to MEDIA_ROOT) of a file
+# written for the row
+RETENTION_FILES = {
+    ImportExportLog: 'file_path',
+}
+
+
+def get_retention_days():
+    """Configured retention period, in days"""
+    return SystemSettings.load().data_retention_days
+
+
+def get_retention_cutoff(days=None, now=None):
+    """
+    Start of the first day that is still retained.
+
+    Aligned to local midnight so repeated runs on the same day purge the
+    same set of rows.
+    """
+    if days is None:
+        days = get_retention_days()
+    today = timezone.localdate(now)
+    return timezone.make_aware(datetime.combine(today - timedelta(days=days), time.min))
+
+
+def get_archive_path(model, cutoff, archive_dir=None):
+    """Archive file for the rows of `model` purged at `cutoff`"""
+    archive_dir = Path(archive_dir or settings.LOG_ARCHIVE_DIR)
+    stamp = timezone.localtime().strftime('%Y%m%d%H%M%S')
+    return archive_dir / f'{model._meta.db_table}-before-{cutoff:%Y%m%d}-{stamp}.jsonl.gz'
+
+
+def _delete_pks(model, pks):
+    """
+    Delete rows by primary key with a single DELETE statement.
+
+    QuerySet.delete() would load and signal every row once post_delete
+    receivers exist, which defeats batching.
+    """
+    db = router.db_for_write(model)
+    connection = connections[db]
+    qn = connection.ops.quote_name
+    placeholders = ', '.join(['%s'] * len(pks))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {qn(model._meta.db_table)} '
+            f'WHERE {qn(model._meta.pk.column)} IN ({placeholders})',
+            pks
+        )
+        return cursor.rowcount
+
+
+def _delete_files(paths):
+    """Remove the files of purged rows (missing files are ignored)"""
+    media_root = Path(settings.MEDIA_ROOT)
+    for path in paths:
+        if path:
+            (media_root / path).unlink(missing_ok=True)
+
+
+def purge_model(model, cutoff, batch_size=DEFAULT_BATCH_SIZE, archive_path=None, dry_run=False):
+    """
+    Delete (and optionally archive) rows of `model` older than `cutoff`.
+
+    Returns the number of purged rows (or of rows that would be purged on a
+    dry run).
+    """
+    field = RETENTION_POLICIES[model]
+    expired = model.objects.filter(**{f'{field}__lt': cutoff}).order_by(field, 'pk')
+
+    if dry_run:
+        return expired.count()
+
+    archive = None
+    if archive_path is not None:
+        Path(archive_path).parent.mkdir(parents=True, exist_ok=True)
+        archive = gzip.open(archive_path, 'wt', encoding='utf-8')
+
+    purged = 0
+    try:
+        while True:
+            if archive is not None:
+                rows = list(expired.values()[:batch_size])
+                pks = [row[model._meta.pk.attname] for row in rows]
+            else:
+                pks = list(expired.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+
+            if archive is not None:
+                for row in rows:
+                    archive.write(json.dumps(row, cls=DjangoJSONEncoder))
+                    archive.write('\n')
+                # Archived rows must reach disk before they are deleted
+                archive.flush()
+
+            files = []
+            if model in RETENTION_FILES:
+                files = list(model.objects.filter(pk__in=pks).values_list(RETENTION_FILES[model], flat=True))
+
+            with transaction.atomic(using=router.db_for_write(model)):
+                purged += _delete_pks(model, pks)
+            _delete_files(files)
+
+            if len(pks) < batch_size:
+                break
+    finally:
+        if archive is not None:
+            archive.close()
+            if not purged:
+                Path(archive_path).unlink()
+
+    if purged:
+        logs_purged.send(sender=model, count=purged, cutoff=cutoff)
+    return purged
+
+
+def purge_expired_logs(days=None, models=None, batch_size=DEFAULT_BATCH_SIZE,
+                       archive=False, archive_dir=None, dry_run=False):
+    """
+    Apply the retention policy to every log model (or the given subset).
+
+    Returns a dict of model -> purged row count.
+    """
+    cutoff = get_retention_cutoff(days)
+    results = {}
+    for model in models or RETENTION_POLICIES:
+        archive_path = get_archive_path(model, cutoff, archive_dir) if archive else None
+        results[model] = purge_model(
+            model, cutoff, batch_size=batch_size, archive_path=archive_path, dry_run=dry_run
+        )
+    return results
@@ -0,0 +1,224 @@
+"""
+Daily rollups of the log tables
+
+Every write to a rolled-up log table adjusts the matching (day, dimensions)
+row of its rollup table, so the stats endpoints aggregate a few rows per day
+instead of scanning the log table. Rows are counted by the local calendar day
+of their date field, and rollup rows whose count drops to zero are removed,
+which keeps rollup aggregates identical to a GROUP BY over the raw table.
+
+Tables with mutable dimensions (SystemError resolution, ImportExportLog
+status) are tracked through save(); queryset.update() bypasses the rollups,
+so run `manage.py rebuild_log_rollups` after bulk maintenance.
+
+A rollup row is identified by its day and the hash of its dimension values
+(`bucket`), unique together, so concurrent writers of a new bucket add to the
+same row instead of creating duplicates.
+"""
+import hashlib
+import json
+from datetime import datetime, time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import (
+    ActivityLog, DataChangeLog, SystemError, ImportExportLog,
+    ActivityLogDailyRollup, DataChangeLogDailyRollup, SystemErrorDailyRollup,
+    ImportExportLogDailyRollup,
+)
+
+
+class RollupSpec:
+    """How a log model is rolled up"""
+
+    def __init__(self, rollup_model, date_field, dimensions, measures=(), mutable=False):
+        self.rollup_model = rollup_model
+        self.date_field = date_field
+        # Field attnames the rollup groups by (same names on both models)
+        self.dimensions = dimensions
+        # Numeric fields summed into the rollup
+        self.measures = measures
+        # Whether dimensions or measures can change after the row is created
+        self.mutable = mutable
+
+    @property
+    def fields(self):
+        return (self.date_field, *self.dimensions, *self.measures)
+
+
+def bucket_key(dimensions):
+    """Hash of the dimension values of a rollup row (a frozen copy is in migration 0005)"""
+    return hashlib.sha1(json.dumps(list(dimensions), default=str).encode()).hexdigest()
+
+
+ROLLUPS = {
+    ActivityLog: RollupSpec(
+        ActivityLogDailyRollup, 'timestamp',
+        ('user_id', 'username', 'action', 'severity', 'model_name'),
+    ),
+    DataChangeLog: RollupSpec(
+        DataChangeLogDailyRollup, 'timestamp',
+        ('user_id', 'username', 'model_name', 'operation'),
+    ),
+    SystemError: RollupSpec(
+        SystemErrorDailyRollup, 'timestamp',
+        ('severity', 'error_type', 'is_resolved', 'error_code', 'error_message'),
+        mutable=True,
+    ),
+    ImportExportLog: RollupSpec(
+        ImportExportLogDailyRollup, 'started_at',
+        ('user_id', 'username', 'operation', 'status', 'file_format'),
+        measures=('total_records',),
+        mutable=True,
+    ),
+}
+
+
+def start_of_day(day):
+    """Aware datetime of local midnight at the start of `day`"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def get_rollup_values(spec, instance):
+    """The rolled-up field values of a log instance"""
+    return {field: getattr(instance, field) for field in spec.fields}
+
+
+def _add_delta(deltas, spec, values, sign):
+    key = (timezone.localdate(values[spec.date_field]), tuple(values[field] for field in spec.dimensions))
+    delta = deltas.setdefault(key, [0, [0] * len(spec.measures)])
+    delta[0] += sign
+    for index, measure in enumerate(spec.measures):
+        delta[1][index] += sign * (values[measure] or 0)
+
+
+def apply_rollup_deltas(spec, deltas):
+    """
+    Add count/measure deltas to the rollup rows they belong to.
+
+    Args:
+        spec: RollupSpec of the log model
+        deltas: Dict of (day, dimension values) -> [count delta, measure deltas]
+    """
+    model = spec.rollup_model
+    with transaction.atomic():
+        for (day, dimensions), (count, measures) in deltas.items():
+            if not count and not any(measures):
+                continue
+            lookup = {'day': day, 'bucket': bucket_key(dimensions)}
+
+            row_pk = (
+                model.objects.select_for_update().filter(**lookup)
+                .values_list('pk', flat=True).first()
+            )
+            if row_pk is None:
+                if count <= 0:
+                    continue
+                try:
+                    with transaction.atomic():
+                        model.objects.create(
+                            count=count, **lookup, **dict(zip(spec.dimensions, dimensions)),
+                            **dict(zip(spec.measures, measures))
+                        )
+                    continue
+                except IntegrityError:
+                    # Created by a concurrent writer since the lookup
+                    row_pk = model.objects.select_for_update().filter(**lookup).values_list('pk', flat=True).get()
+
+            updates = {measure: F(measure) + value for measure, value in zip(spec.measures, measures)}
+            model.objects.filter(pk=row_pk).update(count=F('count') + count, **updates)
+            if count < 0:
+                model.objects.filter(pk=row_pk, count__lte=0).delete()
+
+
+def record_logs(model, instances, sign=1):
+    """Count (sign=1) or uncount (sign=-1) log instances in their rollup"""
+    spec = ROLLUPS[model]
+    deltas = {}
+    for instance in instances:
+        _add_delta(deltas, spec, get_rollup_values(spec, instance), sign)
+    apply_rollup_deltas(spec, deltas)
+
+
+def record_change(model, previous, instance):
+    """Move a changed log row from its previous rollup bucket to its current one"""
+    spec = ROLLUPS[model]
+    current = get_rollup_values(spec, instance)
+    if previous == current:
+        return
+    deltas = {}
+    _add_delta(deltas, spec, previous, -1)
+    _add_delta(deltas, spec, current, 1)
+    apply_rollup_deltas(spec, deltas)
+
+
+def get_rollup_queryset(model, since=None, until=None):
+    """Rollup rows of a log model for the days in [since, until] (inclusive)"""
+    queryset = ROLLUPS[model].rollup_model.objects.all()
+    if since:
+        queryset = queryset.filter(day__gte=since)
+    if until:
+        queryset = queryset.filter(day__lte=until)
+    return queryset
+
+
+def get_distribution(rollups, *fields, limit=None):
+    """
+    Row counts per combination of `fields`, largest first, in the shape of
+    `queryset.values(*fields).annotate(count=Count('id'))`.
+    """
+    rows = rollups.values(*fields).annotate(total=Sum('count')).order_by('-total', *fields)
+    if limit:
+        rows = rows[:limit]
+    return [
+        {**{field: row[field] for field in fields}, 'count': row['total']}
+        for row in rows
+    ]
+
+
+def rebuild_rollups(model, since=None, until=None):
+    """
+    Recompute the rollup rows of a log model from the raw table.
+
+    Args:
+        model: Rolled-up log model
+        since: First day to rebuild (inclusive), or None for the beginning
+        until: Day to stop at (exclusive), or None for today
+
+    Returns:
+        Number of rollup rows written
+    """
+    spec = ROLLUPS[model]
+    rollups = spec.rollup_model.objects.all()
+    raw = model.objects.order_by()
+    if since:
+        rollups = rollups.filter(day__gte=since)
+        raw = raw.filter(**{f'{spec.date_field}__gte': start_of_day(since)})
+    if until:
+        rollups = rollups.filter(day__lt=until)
+        raw = raw.filter(**{f'{spec.date_field}__lt': start_of_day(until)})
+
+    rows = raw.annotate(rollup_day=TruncDate(spec.date_field)).values(
+        'rollup_day', *spec.dimensions
+    ).annotate(
+        rollup_count=Count('pk'),
+        **{f'rollup_{measure}': Sum(measure) for measure in spec.measures}
+    )
+
+    objects = [
+        spec.rollup_model(
+            day=row['rollup_day'], count=row['rollup_count'],
+            bucket=bucket_key([row[field] for field in spec.dimensions]),
+            **{field: row[field] for field in spec.dimensions},
+            **{measure: row[f'rollup_{measure}'] or 0 for measure in spec.measures}
+        )
+        for row in rows
+    ]
+
+    with transaction.atomic():
+        rollups.delete()
+        spec.rollup_model.objects.bulk_create(objects, batch_size=1000)
+    return len(objects)
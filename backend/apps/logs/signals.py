@@ -0,0 +1,65 @@
+"""
+Signal handlers keeping the daily log rollups in sync with log writes
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.utils import timezone
+
+from .buffer import activity_logs_written
+from .retention import logs_purged
+from .rollups import ROLLUPS, record_logs, record_change, rebuild_rollups
+
+
+def remember_rollup_values(sender, instance, **kwargs):
+    """Load the stored rollup fields of a mutable log row before it changes"""
+    if instance._state.adding or instance.pk is None:
+        return
+    spec = ROLLUPS[sender]
+    instance._rollup_previous = sender.objects.filter(pk=instance.pk).values(*spec.fields).first()
+
+
+def update_rollups_on_save(sender, instance, created, **kwargs):
+    """Count new log rows, and re-bucket changed mutable ones"""
+    previous = instance.__dict__.pop('_rollup_previous', None)
+    if created:
+        record_logs(sender, [instance])
+    elif previous is not None:
+        record_change(sender, previous, instance)
+
+
+def update_rollups_on_delete(sender, instance, **kwargs):
+    """Uncount deleted log rows"""
+    record_logs(sender, [instance], sign=-1)
+
+
+def update_rollups_on_bulk_write(sender, logs, **kwargs):
+    """Count log rows inserted by the buffered writer"""
+    record_logs(sender, logs)
+
+
+def rebuild_rollups_after_purge(sender, cutoff, **kwargs):
+    """Recompute the purged days from whatever the retention policy kept"""
+    if sender in ROLLUPS:
+        rebuild_rollups(sender, until=timezone.localdate(cutoff))
+
+
+for model, spec in ROLLUPS.items():
+    if spec.mutable:
+        pre_save.connect(
+            remember_rollup_values, sender=model,
+            dispatch_uid=f'log_rollup_pre_save_{model.__name__}'
+        )
+    post_save.connect(
+        update_rollups_on_save, sender=model,
+        dispatch_uid=f'log_rollup_save_{model.__name__}'
+    )
+    post_delete.connect(
+        update_rollups_on_delete, sender=model,
+        dispatch_uid=f'log_rollup_delete_{model.__name__}'
+    )
+
+activity_logs_written.connect(
+    update_rollups_on_bulk_write, dispatch_uid='log_rollup_activity_logs_written'
+)
+logs_purged.connect(
+    rebuild_rollups_after_purge, dispatch_uid='log_rollup_logs_purged'
+)
@@ -1,6 +1,30 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+from datetime import time, timedelta
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
-from .models import ActivityLog, SystemError, ImportExportLog
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory
+from apps.accounts.models import UserActivityLog
+from apps.settings.loader import get_system_settings
+from apps.settings.models import SystemSettings
+from .buffer import ActivityLogBuffer, activity_logs_written, write_activity_logs
+from .models import (
+    ActivityLog, DataChangeLog, SystemError, ImportExportLog,
+    ActivityLogDailyRollup, SystemErrorDailyRollup
+)
+from .retention import get_retention_cutoff, purge_expired_logs
+from .rollups import rebuild_rollups
+from .utils import log_activity
 
 User = get_user_model()
 
@@ -63,3 +87,355 @@ class ImportExportLogTests(TestCase):
         )
         
         self.assertEqual(log.success_rate, 95.0)
+
+
+class ActivityLogBufferTests(TestCase):
+    """Test cases for the buffered activity log writer"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='testuser@example.com', password='pass')
+
+    def build_log(self, description):
+        return ActivityLog(
+            user=self.user,
+            username=self.user.email,
+            action=ActivityLog.Action.UPDATE,
+            description=description
+        )
+
+    def test_flush_writes_queued_entries_in_one_insert(self):
+        """Queued entries are bulk-inserted together, keeping their build time"""
+        buffer = ActivityLogBuffer(batch_size=10)
+        logs = [self.build_log(f'Entry {i}') for i in range(3)]
+        for log in logs:
+            buffer.queue.put_nowait(log)
+
+        with CaptureQueriesContext(connection) as queries:
+            buffer.flush()
+
+        inserts = [q for q in queries if q['sql'].startswith('INSERT INTO "activity_logs"')]
+        self.assertEqual(len(inserts), 1)
+
+        self.assertEqual(ActivityLog.objects.count(), 3)
+        stored = ActivityLog.objects.get(description='Entry 0')
+        self.assertEqual(stored.timestamp, logs[0].timestamp)
+
+    def test_full_queue_falls_back_to_synchronous_write(self):
+        """Entries that do not fit in the queue are written immediately"""
+        buffer = ActivityLogBuffer(max_queue_size=1)
+        buffer._ensure_started = lambda: None
+        buffer.enqueue(self.build_log('Queued'))
+        buffer.enqueue(self.build_log('Overflow'))
+
+        self.assertEqual(
+            list(ActivityLog.objects.values_list('description', flat=True)), ['Overflow']
+        )
+        buffer.flush()
+        self.assertEqual(ActivityLog.objects.count(), 2)
+
+    @override_settings(ACTIVITY_LOG_ASYNC=False)
+    def test_log_activity_writes_synchronously_when_async_disabled(self):
+        """log_activity writes immediately and announces the write"""
+        received = []
+
+        def receiver(sender, logs, **kwargs):
+            received.extend(logs)
+
+        activity_logs_written.connect(receiver)
+        self.addCleanup(activity_logs_written.disconnect, receiver)
+
+        request = APIRequestFactory().post('/v1/directory/services/')
+        request.user = self.user
+        log_activity(request, ActivityLog.Action.CREATE, 'Created Service: Test')
+
+        self.assertEqual(ActivityLog.objects.get().request_method, 'POST')
+        self.assertEqual(len(received), 1)
+
+
+class RetentionTests(TestCase):
+    """Test cases for the log retention purge"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='testuser@example.com', password='pass')
+        settings = SystemSettings.load()
+        settings.data_retention_days = 30
+        settings.save()
+
+        now = timezone.now()
+        for age in [400, 31, 29]:
+            log = ActivityLog.objects.create(
+                user=self.user,
+                username=self.user.email,
+                action=ActivityLog.Action.UPDATE,
+                description=f'Entry {age} days old'
+            )
+            ActivityLog.objects.filter(pk=log.pk).update(timestamp=now - timedelta(days=age))
+
+        UserActivityLog.objects.create(user=self.user, action=UserActivityLog.Action.LOGIN)
+        UserActivityLog.objects.update(timestamp=now - timedelta(days=90))
+        error = SystemError.objects.create(error_message='Old but still occurring')
+        SystemError.objects.filter(pk=error.pk).update(timestamp=now - timedelta(days=90))
+
+    def test_cutoff_aligned_to_local_midnight(self):
+        """The cutoff is the start of the oldest retained day"""
+        cutoff = get_retention_cutoff(30)
+        self.assertEqual(timezone.localtime(cutoff).time(), time.min)
+        self.assertEqual(timezone.localdate(cutoff), timezone.localdate() - timedelta(days=30))
+
+    def test_purge_removes_only_expired_rows(self):
+        """Rows older than the retention period are deleted in batches"""
+        results = purge_expired_logs(batch_size=1)
+
+        self.assertEqual(results[ActivityLog], 2)
+        self.assertEqual(
+            list(ActivityLog.objects.values_list('description', flat=True)),
+            ['Entry 29 days old']
+        )
+        self.assertFalse(UserActivityLog.objects.exists())
+        # SystemError age is measured by its last occurrence
+        self.assertEqual(SystemError.objects.count(), 1)
+
+    def test_dry_run_deletes_nothing(self):
+        """A dry run only counts expired rows"""
+        results = purge_expired_logs(dry_run=True)
+
+        self.assertEqual(results[ActivityLog], 2)
+        self.assertEqual(ActivityLog.objects.count(), 3)
+
+    def test_purge_removes_export_files(self):
+        """Files of purged background exports are deleted with their log rows"""
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            paths = {}
+            for age in [90, 1]:
+                export_log = ImportExportLog.objects.create(
+                    operation=ImportExportLog.Operation.EXPORT, user=self.user,
+                    username=self.user.email, model_name='Service',
+                    file_format=ImportExportLog.Format.EXCEL, file_name='services.xlsx',
+                    file_path=f'exports/{age}-services.xlsx',
+                )
+                ImportExportLog.objects.filter(pk=export_log.pk).update(
+                    started_at=timezone.now() - timedelta(days=age)
+                )
+                paths[age] = Path(media_root) / export_log.file_path
+                paths[age].parent.mkdir(exist_ok=True)
+                paths[age].write_bytes(b'xlsx')
+
+            results = purge_expired_logs()
+
+            self.assertEqual(results[ImportExportLog], 1)
+            self.assertFalse(paths[90].exists())
+            self.assertTrue(paths[1].exists())
+
+    def test_command_archives_purged_rows(self):
+        """--archive writes purged rows to gzip-compressed JSONL first"""
+        with tempfile.TemporaryDirectory() as archive_dir:
+            out = StringIO()
+            call_command(
+                'purge_logs', '--archive', '--archive-dir', archive_dir,
+                '--table', 'activity_logs', stdout=out
+            )
+
+            self.assertIn('Purged 2 log row(s)', out.getvalue())
+            archives = list(Path(archive_dir).glob('activity_logs-*.jsonl.gz'))
+            self.assertEqual(len(archives), 1)
+            with gzip.open(archives[0], 'rt') as archive:
+                rows = [json.loads(line) for line in archive]
+
+        self.assertEqual(
+            sorted(row['description'] for row in rows),
+            ['Entry 31 days old', 'Entry 400 days old']
+        )
+        self.assertEqual(UserActivityLog.objects.count(), 1)
+
+
+class LogRollupTests(TestCase):
+    """Rollup-backed stats must match a GROUP BY over the raw log tables"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email='admin@test.com', password='pass', role='ADMIN')
+        self.surveyor = User.objects.create_user(email='surveyor@test.com', password='pass', role='SURVEYOR')
+        self.client.force_authenticate(user=self.admin)
+
+        now = timezone.now()
+        activity = [
+            (self.admin, ActivityLog.Action.CREATE, ActivityLog.Severity.INFO, 'Service', 0),
+            (self.admin, ActivityLog.Action.CREATE, ActivityLog.Severity.INFO, 'Service', 0),
+            (self.admin, ActivityLog.Action.UPDATE, ActivityLog.Severity.INFO, 'Survey', 3),
+            (self.surveyor, ActivityLog.Action.SURVEY_SUBMIT, ActivityLog.Severity.INFO, 'Survey', 3),
+            (self.surveyor, ActivityLog.Action.LOGIN_FAILED, ActivityLog.Severity.WARNING, '', 10),
+        ]
+        for user, action, severity, model_name, age in activity:
+            ActivityLog.objects.create(
+                user=user, username=user.email, action=action, severity=severity,
+                model_name=model_name, description='test', timestamp=now - timedelta(days=age)
+            )
+        # Entries written by the buffered writer
+        write_activity_logs([
+            ActivityLog(user=None, username='anonymous', action=ActivityLog.Action.EXPORT,
+                        description='test', timestamp=now - timedelta(days=age))
+            for age in (0, 10)
+        ])
+
+        for operation, model_name in [('INSERT', 'Service'), ('UPDATE', 'Service'), ('INSERT', 'Survey')]:
+            DataChangeLog.objects.create(
+                user=self.admin, username=self.admin.email, model_name=model_name,
+                app_label='directory', operation=operation
+            )
+
+        self.errors = [
+            SystemError.objects.create(
+                severity=severity, error_type=SystemError.ErrorType.DATABASE,
+                error_code=code, error_message=f'Error {code}'
+            )
+            for severity, code in [('ERROR', 'E1'), ('ERROR', 'E1'), ('CRITICAL', 'E2')]
+        ]
+
+        self.transfers = [
+            ImportExportLog.objects.create(
+                operation=operation, user=self.admin, username=self.admin.email,
+                model_name='Service', file_format=ImportExportLog.Format.CSV, file_name='services.csv'
+            )
+            for operation in (ImportExportLog.Operation.IMPORT, ImportExportLog.Operation.EXPORT)
+        ]
+
+    def get_stats(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def raw_distribution(self, queryset, *fields):
+        return [
+            dict(row) for row in queryset.values(*fields).annotate(count=Count('id')).order_by()
+        ]
+
+    def assertSameRows(self, actual, expected):
+        key = lambda row: sorted((k, str(v)) for k, v in row.items())
+        self.assertEqual(sorted(actual, key=key), sorted(expected, key=key))
+
+    def assert_activity_stats_match(self, url='/v1/logs/activity/stats/', raw=None):
+        raw = ActivityLog.objects.all() if raw is None else raw
+        data = self.get_stats(url)
+        self.assertEqual(data['total_activities'], raw.count())
+        self.assertSameRows(data['action_distribution'], self.raw_distribution(raw, 'action'))
+        self.assertSameRows(data['severity_distribution'], self.raw_distribution(raw, 'severity'))
+        self.assertSameRows(
+            data['most_active_users'], self.raw_distribution(raw, 'username', 'user__email')
+        )
+
+    def test_activity_stats_match_raw_scan(self):
+        """Single and buffered writes are both rolled up"""
+        self.assert_activity_stats_match()
+
+        ActivityLog.objects.filter(action=ActivityLog.Action.UPDATE).get().delete()
+        self.assert_activity_stats_match()
+
+    def test_stats_window(self):
+        """?since=/?until= restrict the stats to whole local days"""
+        today = timezone.localdate()
+        since = today - timedelta(days=5)
+        until = today - timedelta(days=1)
+        raw = ActivityLog.objects.filter(
+            timestamp__date__gte=since, timestamp__date__lte=until
+        )
+
+        self.assertEqual(raw.count(), 2)
+        self.assert_activity_stats_match(
+            f'/v1/logs/activity/stats/?since={since}&until={until}', raw=raw
+        )
+
+        response = self.client.get('/v1/logs/activity/stats/?since=yesterday')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_data_change_stats_match_raw_scan(self):
+        """Data change stats are served from the rollups"""
+        data = self.get_stats('/v1/logs/data-changes/stats/')
+        raw = DataChangeLog.objects.all()
+
+        self.assertEqual(data['total_changes'], raw.count())
+        self.assertSameRows(data['model_distribution'], self.raw_distribution(raw, 'model_name'))
+        self.assertSameRows(data['action_distribution'], self.raw_distribution(raw, 'operation'))
+
+    def test_error_stats_follow_resolution(self):
+        """Resolving an error moves it between the rollup buckets"""
+        response = self.client.post(f'/v1/logs/errors/{self.errors[0].pk}/resolve/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        data = self.get_stats('/v1/logs/errors/stats/')
+        raw = SystemError.objects.all()
+
+        self.assertEqual(data['total_errors'], 3)
+        self.assertEqual(data['unresolved_errors'], raw.filter(is_resolved=False).count())
+        self.assertSameRows(data['severity_distribution'], self.raw_distribution(raw, 'severity'))
+        self.assertSameRows(data['type_distribution'], self.raw_distribution(raw, 'error_type'))
+        self.assertSameRows(
+            data['most_common_errors'], self.raw_distribution(raw, 'error_code', 'error_message')
+        )
+
+    def test_import_export_stats_follow_status_changes(self):
+        """Status and record count changes made through save() are rolled up"""
+        transfer = self.transfers[0]
+        transfer.status = ImportExportLog.Status.COMPLETED
+        transfer.total_records = 40
+        transfer.save()
+
+        data = self.get_stats('/v1/logs/import-export/stats/')
+        raw = ImportExportLog.objects.all()
+
+        self.assertEqual(data['total_operations'], 2)
+        self.assertSameRows(data['status_distribution'], self.raw_distribution(raw, 'status'))
+        self.assertSameRows(data['operation_distribution'], self.raw_distribution(raw, 'operation'))
+        self.assertEqual(
+            data['total_records_processed'], raw.aggregate(total=Sum('total_records'))['total']
+        )
+
+    def test_rebuild_matches_incremental_rollups(self):
+        """Rebuilding from the raw tables reproduces the incremental rollups"""
+        self.errors[1].is_resolved = True
+        self.errors[1].save()
+        fields = ('day', 'user_id', 'username', 'action', 'severity', 'model_name', 'count')
+        incremental = sorted(ActivityLogDailyRollup.objects.values_list(*fields), key=str)
+        error_rollups = sorted(SystemErrorDailyRollup.objects.values_list(
+            'day', 'severity', 'is_resolved', 'error_code', 'count'
+        ), key=str)
+
+        rebuild_rollups(ActivityLog)
+        rebuild_rollups(SystemError)
+
+        self.assertEqual(sorted(ActivityLogDailyRollup.objects.values_list(*fields), key=str), incremental)
+        self.assertEqual(sorted(SystemErrorDailyRollup.objects.values_list(
+            'day', 'severity', 'is_resolved', 'error_code', 'count'
+        ), key=str), error_rollups)
+
+    def test_error_rollup_keeps_long_messages_apart(self):
+        """Messages sharing a long prefix get their own bucket with the full text"""
+        prefix = 'Timeout calling the geocoder ' * 10
+        messages = [f'{prefix} (request {request_id})' for request_id in range(3)]
+        for message in messages + messages[:1]:
+            SystemError.objects.create(error_code='E3', error_message=message)
+
+        buckets = SystemErrorDailyRollup.objects.filter(error_code='E3').order_by('error_message')
+        expected = [(messages[0], 2), (messages[1], 1), (messages[2], 1)]
+        self.assertEqual(list(buckets.values_list('error_message', 'count')), expected)
+
+        rebuild_rollups(SystemError)
+        self.assertEqual(list(buckets.values_list('error_message', 'count')), expected)
+
+    def test_rollup_bucket_unique_per_day(self):
+        """A second row for the same day and dimensions is rejected, even without a user"""
+        rollup = ActivityLogDailyRollup.objects.filter(user__isnull=True).first()
+        rollup.pk = None
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            rollup.save()
+
+    def test_stats_query_count_independent_of_log_volume(self):
+        """Stats read a fixed number of queries regardless of table size"""
+        write_activity_logs([
+            ActivityLog(user=self.admin, username=self.admin.email,
+                        action=ActivityLog.Action.CREATE, description='bulk')
+            for _ in range(50)
+        ])
+
+        get_system_settings()
+        with self.assertNumQueries(4):
+            self.get_stats('/v1/logs/activity/stats/')
@@ -1,6 +1,7 @@
 """
 Utility functions for activity logging
 """
+from .buffer import submit_activity_log
 from .models import ActivityLog
 
 
@@ -28,6 +29,9 @@ def log_activity(
     """
     Create an activity log entry.
 
+    The entry is handed to the buffered writer (see apps.logs.buffer), so it
+    may not be in the database yet when this returns.
+
     Args:
         request: The HTTP request object
         action: ActivityLog.Action choice
@@ -67,7 +71,7 @@ def log_activity(
         if not object_repr:
             log_data['object_repr'] = str(obj)[:200]
 
-    return ActivityLog.objects.create(**log_data)
+    return submit_activity_log(ActivityLog(**log_data))
 
 
 def log_create(request, obj, description=None):
@@ -1,10 +1,12 @@
 from rest_framework import viewsets, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Count, Q
+from django.db.models import Count, Q, Sum
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
 
 from .models import (
@@ -16,10 +18,25 @@ from .serializers import (
     DataChangeLogSerializer, SystemErrorSerializer,
     ImportExportLogSerializer
 )
+from .rollups import get_rollup_queryset, get_distribution
 from apps.accounts.permissions import IsAdmin, CanAccessAuditLog
 from apps.accounts.mixins import UserActivityFilterMixin
 
 
+def get_stats_window(request):
+    """
+    Parse the optional ?since=/?until= (YYYY-MM-DD, inclusive) stats window
+    """
+    window = []
+    for param in ('since', 'until'):
+        value = request.query_params.get(param)
+        day = parse_date(value) if value else None
+        if value and day is None:
+            raise ValidationError({param: 'Enter a date in YYYY-MM-DD format.'})
+        window.append(day)
+    return window
+
+
 class ActivityLogViewSet(UserActivityFilterMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for ActivityLog (read-only)
@@ -48,6 +65,8 @@ class ActivityLogViewSet(UserActivityFilterMixin, viewsets.ReadOnlyModelViewSet)
     search_fields = ['username', 'description', 'ip_address', 'model_name']
     ordering_fields = ['timestamp', 'action', 'severity']
     ordering = ['-timestamp']
+    # ?pagination=cursor pages (see core.pagination) walk the timestamp index
+    keyset_ordering = ('-timestamp', '-id')
 
     # get_queryset is now handled by UserActivityFilterMixin
     # The mixin automatically filters based on role:
@@ -57,37 +76,34 @@ class ActivityLogViewSet(UserActivityFilterMixin, viewsets.ReadOnlyModelViewSet)
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get activity log statistics"""
-        queryset = self.get_queryset()
-
-        # Total activities
-        total_activities = queryset.count()
+        """Get activity log statistics (from the daily rollups)"""
+        since, until = get_stats_window(request)
+        rollups = self.apply_rbac_filter(
+            get_rollup_queryset(ActivityLog, since, until), request.user
+        )
 
         # Action distribution
-        action_distribution = queryset.values('action').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        action_distribution = get_distribution(rollups, 'action', limit=10)
 
         # Severity distribution
-        severity_distribution = queryset.values('severity').annotate(
-            count=Count('id')
-        )
+        severity_distribution = get_distribution(rollups, 'severity')
+
+        # Total activities
+        total_activities = sum(row['count'] for row in severity_distribution)
 
         # Recent activities (last 24 hours)
         yesterday = timezone.now() - timedelta(hours=24)
-        recent_activities = queryset.filter(timestamp__gte=yesterday).count()
+        recent_activities = self.get_queryset().filter(timestamp__gte=yesterday).count()
 
         # Most active users
-        active_users = queryset.values(
-            'username', 'user__email'
-        ).annotate(count=Count('id')).order_by('-count')
+        active_users = get_distribution(rollups, 'username', 'user__email', limit=10)
 
         return Response({
             'total_activities': total_activities,
-            'action_distribution': list(action_distribution)[:10],
-            'severity_distribution': list(severity_distribution),
+            'action_distribution': action_distribution,
+            'severity_distribution': severity_distribution,
             'recent_activities': recent_activities,
-            'most_active_users': list(active_users)[:10]
+            'most_active_users': active_users
         })
 
 
@@ -95,14 +111,14 @@ class VerificationLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for VerificationLog (read-only)
     """
-    queryset = VerificationLog.objects.select_related('survey', 'verifier')
+    queryset = VerificationLog.objects.select_related('survey__service', 'performed_by')
     serializer_class = VerificationLogSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
 
     filterset_fields = {
         'survey': ['exact'],
-        'verifier': ['exact'],
+        'performed_by': ['exact'],
         'action': ['exact'],
         'previous_status': ['exact'],
         'new_status': ['exact'],
@@ -126,13 +142,13 @@ class VerificationLogViewSet(viewsets.ReadOnlyModelViewSet):
 
         # Most active verifiers
         active_verifiers = queryset.values(
-            'verifier__email', 'verifier__first_name', 'verifier__last_name'
-        ).annotate(count=Count('id')).order_by('-count')
+            'performed_by__email', 'performed_by__first_name', 'performed_by__last_name'
+        ).annotate(count=Count('id')).order_by('-count')[:10]
 
         return Response({
             'total_verifications': total_verifications,
             'action_distribution': list(action_distribution),
-            'most_active_verifiers': list(active_verifiers)[:10]
+            'most_active_verifiers': list(active_verifiers)
         })
 
 
@@ -148,39 +164,37 @@ class DataChangeLogViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_fields = {
         'user': ['exact'],
         'model_name': ['exact'],
-        'action': ['exact'],
+        'operation': ['exact'],
         'timestamp': ['gte', 'lte'],
     }
 
-    search_fields = ['model_name', 'field_name', 'user__email']
+    search_fields = ['model_name', 'object_repr', 'username']
     ordering_fields = ['timestamp']
     ordering = ['-timestamp']
+    keyset_ordering = ('-timestamp', '-id')
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get data change log statistics"""
-        queryset = self.get_queryset()
-
-        total_changes = queryset.count()
+        """Get data change log statistics (from the daily rollups)"""
+        since, until = get_stats_window(request)
+        rollups = get_rollup_queryset(DataChangeLog, since, until)
 
         # Changes by model
-        model_distribution = queryset.values('model_name').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        model_distribution = get_distribution(rollups, 'model_name')
 
-        # Changes by action
-        action_distribution = queryset.values('action').annotate(
-            count=Count('id')
-        )
+        total_changes = sum(row['count'] for row in model_distribution)
+
+        # Changes by operation
+        action_distribution = get_distribution(rollups, 'operation')
 
         # Recent changes (last 24 hours)
         yesterday = timezone.now() - timedelta(hours=24)
-        recent_changes = queryset.filter(timestamp__gte=yesterday).count()
+        recent_changes = self.get_queryset().filter(timestamp__gte=yesterday).count()
 
         return Response({
             'total_changes': total_changes,
-            'model_distribution': list(model_distribution),
-            'action_distribution': list(action_distribution),
+            'model_distribution': model_distribution,
+            'action_distribution': action_distribution,
             'recent_changes': recent_changes
         })
 
@@ -189,7 +203,7 @@ class SystemErrorViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for SystemError (read-only for non-admins)
     """
-    queryset = SystemError.objects.all()
+    queryset = SystemError.objects.select_related('user', 'resolved_by')
     serializer_class = SystemErrorSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
@@ -201,7 +215,7 @@ class SystemErrorViewSet(viewsets.ReadOnlyModelViewSet):
         'timestamp': ['gte', 'lte'],
     }
 
-    search_fields = ['error_message', 'error_code', 'endpoint']
+    search_fields = ['error_message', 'error_code', 'request_path']
     ordering_fields = ['timestamp', 'severity', 'occurrence_count']
     ordering = ['-timestamp']
 
@@ -220,39 +234,36 @@ class SystemErrorViewSet(viewsets.ReadOnlyModelViewSet):
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get system error statistics"""
-        queryset = self.get_queryset()
-
-        total_errors = queryset.count()
-        unresolved_errors = queryset.filter(is_resolved=False).count()
+        """Get system error statistics (from the daily rollups)"""
+        since, until = get_stats_window(request)
+        rollups = get_rollup_queryset(SystemError, since, until)
 
         # Severity distribution
-        severity_distribution = queryset.values('severity').annotate(
-            count=Count('id')
-        )
+        severity_distribution = get_distribution(rollups, 'severity')
+
+        total_errors = sum(row['count'] for row in severity_distribution)
+        unresolved_errors = rollups.filter(is_resolved=False).aggregate(
+            total=Sum('count')
+        )['total'] or 0
 
         # Error type distribution
-        type_distribution = queryset.values('error_type').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        type_distribution = get_distribution(rollups, 'error_type')
 
         # Recent errors (last 24 hours)
         yesterday = timezone.now() - timedelta(hours=24)
-        recent_errors = queryset.filter(timestamp__gte=yesterday).count()
+        recent_errors = self.get_queryset().filter(timestamp__gte=yesterday).count()
 
         # Most common errors
-        common_errors = queryset.values('error_code', 'error_message').annotate(
-            count=Count('id')
-        ).order_by('-count')
+        common_errors = get_distribution(rollups, 'error_code', 'error_message', limit=10)
 
         return Response({
             'total_errors': total_errors,
             'unresolved_errors': unresolved_errors,
             'resolved_errors': total_errors - unresolved_errors,
-            'severity_distribution': list(severity_distribution),
-            'type_distribution': list(type_distribution),
+            'severity_distribution': severity_distribution,
+            'type_distribution': type_distribution,
             'recent_errors': recent_errors,
-            'most_common_errors': list(common_errors)[:10]
+            'most_common_errors': common_errors
         })
 
 
@@ -267,47 +278,41 @@ class ImportExportLogViewSet(viewsets.ReadOnlyModelViewSet):
 
     filterset_fields = {
         'user': ['exact'],
-        'operation_type': ['exact'],
+        'operation': ['exact'],
         'file_format': ['exact'],
         'status': ['exact'],
-        'timestamp': ['gte', 'lte'],
+        'started_at': ['gte', 'lte'],
     }
 
-    search_fields = ['file_name', 'model_name', 'error_message']
-    ordering_fields = ['timestamp', 'records_processed']
-    ordering = ['-timestamp']
+    search_fields = ['file_name', 'model_name', 'notes']
+    ordering_fields = ['started_at', 'total_records']
+    ordering = ['-started_at']
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Get import/export log statistics"""
-        queryset = self.get_queryset()
-
-        total_operations = queryset.count()
+        """Get import/export log statistics (from the daily rollups)"""
+        since, until = get_stats_window(request)
+        rollups = get_rollup_queryset(ImportExportLog, since, until)
 
         # Operation type distribution
-        operation_distribution = queryset.values('operation_type').annotate(
-            count=Count('id')
-        )
+        operation_distribution = get_distribution(rollups, 'operation')
 
         # Status distribution
-        status_distribution = queryset.values('status').annotate(
-            count=Count('id')
-        )
+        status_distribution = get_distribution(rollups, 'status')
+
+        total_operations = sum(row['count'] for row in status_distribution)
 
         # Recent operations (last 7 days)
         week_ago = timezone.now() - timedelta(days=7)
-        recent_operations = queryset.filter(timestamp__gte=week_ago).count()
+        recent_operations = self.get_queryset().filter(started_at__gte=week_ago).count()
 
         # Total records processed
-        from django.db.models import Sum
-        total_records = queryset.aggregate(
-            total=Sum('records_processed')
-        )['total'] or 0
+        total_records = rollups.aggregate(total=Sum('total_records'))['total'] or 0
 
         return Response({
             'total_operations': total_operations,
-            'operation_distribution': list(operation_distribution),
-            'status_distribution': list(status_distribution),
+            'operation_distribution': operation_distribution,
+            'status_distribution': status_distribution,
             'recent_operations': recent_operations,
             'total_records_processed': total_records
         })
@@ -0,0 +1,81 @@
+"""
+Process-wide cached copy of the SystemSettings singleton
+
+SystemSettings.load() runs a get_or_create per call; pagination, the
+maintenance middleware and the activity logger read the settings on every
+request, so they use get_system_settings() instead. The row is loaded once
+per process and kept until the version stamp changes: every save or delete
+of the row bumps it (see signals.py), and each process compares its loaded
+version with the stamp at most once per SYSTEM_SETTINGS_CHECK_INTERVAL
+seconds. The stamp lives in the default cache, so a change made through one
+worker (e.g. turning maintenance mode on) reaches the others only when they
+share it (see CACHES); a stamp lost from the cache is replaced, which makes
+every process reload. The returned instance is shared: treat it as read-only and use
+SystemSettings.load() to change the settings.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import SystemSettings
+
+SETTINGS_VERSION_CACHE_KEY = 'settings:system_version'
+
+
+def get_settings_version():
+    """Current version stamp, shared by the processes using the cache"""
+    version = cache.get(SETTINGS_VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(SETTINGS_VERSION_CACHE_KEY, version, None)
+        version = cache.get(SETTINGS_VERSION_CACHE_KEY, version)
+    return version
+
+
+class SettingsLoader:
+    """Lazily loaded, version-checked SystemSettings instance"""
+
+    def __init__(self):
+        # Reentrant: creating the row on first load sends post_save, which calls reload()
+        self._lock = threading.RLock()
+        self._settings = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def get(self):
+        now = time.monotonic()
+        interval = getattr(settings, 'SYSTEM_SETTINGS_CHECK_INTERVAL', 5)
+        # Read once: reload() may reset it concurrently
+        loaded = self._settings
+        if loaded is not None and now - self._checked_at < interval:
+            return loaded
+
+        with self._lock:
+            version = get_settings_version()
+            if self._settings is None or version != self._version:
+                self._settings = SystemSettings.load()
+                self._version = version
+            self._checked_at = now
+            return self._settings
+
+    def reload(self):
+        """Reload the settings on next access"""
+        with self._lock:
+            self._settings = None
+
+
+loader = SettingsLoader()
+
+
+def get_system_settings():
+    """The SystemSettings singleton, from the process cache (read-only)"""
+    return loader.get()
+
+
+def invalidate_system_settings():
+    """Make every process sharing the cache reload the settings"""
+    cache.set(SETTINGS_VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    loader.reload()
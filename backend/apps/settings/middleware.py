@@ -0,0 +1,50 @@
+"""
+Maintenance mode middleware
+
+While SystemSettings.maintenance_mode is on, API requests get a 503 with the
+maintenance message, except for admins and the endpoints they need to sign in
+and switch maintenance mode off. The flag is read from the cached settings
+(see loader.py), so requests cost no query outside maintenance.
+"""
+import re
+
+from django.http import JsonResponse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .loader import get_system_settings
+
+
+class MaintenanceModeMiddleware:
+    """Reject non-admin requests with 503 while maintenance mode is on"""
+
+    EXEMPT_ENDPOINTS = [
+        r'^/admin/',  # Django admin (staff switch maintenance mode off there)
+        r'^/v1/accounts/auth/',  # Sign-in and token refresh
+        r'^/v1/settings/system/public/',  # Maintenance banner of the frontend
+    ]
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.exempt = re.compile('|'.join(f'(?:{pattern})' for pattern in self.EXEMPT_ENDPOINTS))
+        self.authentication = JWTAuthentication()
+
+    def __call__(self, request):
+        system = get_system_settings()
+        if system.maintenance_mode and not self.exempt.match(request.path) and not self.is_admin(request):
+            return JsonResponse({
+                'detail': system.maintenance_message,
+                'maintenance_mode': True,
+            }, status=503)
+        return self.get_response(request)
+
+    def is_admin(self, request):
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            # API clients send a bearer token, which DRF only reads in the view
+            try:
+                authenticated = self.authentication.authenticate(request)
+            except (InvalidToken, TokenError):
+                return False
+            user = authenticated[0] if authenticated else None
+        return user is not None and (user.is_superuser or user.role == user.Role.ADMIN)
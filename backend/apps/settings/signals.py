@@ -0,0 +1,24 @@
+"""
+Signal handlers invalidating the cached system settings (see loader.py) and
+the cached list responses paginated with them (see core.caching)
+"""
+from django.db.models.signals import post_save, post_delete
+
+from core.caching import track_model_writes
+from .loader import invalidate_system_settings
+from .models import SystemSettings
+
+
+def invalidate_settings_cache(sender, **kwargs):
+    """Reload the settings in every process after the singleton is saved or reset"""
+    invalidate_system_settings()
+
+
+post_save.connect(
+    invalidate_settings_cache, sender=SystemSettings, dispatch_uid='system_settings_save'
+)
+post_delete.connect(
+    invalidate_settings_cache, sender=SystemSettings, dispatch_uid='system_settings_delete'
+)
+
+track_model_writes(SystemSettings)
@@ -1,3 +1,133 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.logs.models import ActivityLog
+from apps.logs.utils import log_create
+from .loader import SETTINGS_VERSION_CACHE_KEY, get_system_settings, invalidate_system_settings
+from .models import SystemSettings
+
+User = get_user_model()
+
+
+class CachedSettingsTestCase(TestCase):
+    """Starts and ends every test with freshly loaded settings"""
+
+    def setUp(self):
+        invalidate_system_settings()
+        self.addCleanup(invalidate_system_settings)
+        self.admin = User.objects.create_user(email='admin@test.com', password='pass', role=User.Role.ADMIN)
+        self.viewer = User.objects.create_user(email='viewer@test.com', password='pass', role=User.Role.VIEWER)
+        self.client = APIClient()
+
+    def update_settings(self, **values):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.patch('/v1/settings/system/1/', values, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+
+
+class SettingsLoaderTests(CachedSettingsTestCase):
+
+    def test_loaded_once(self):
+        get_system_settings()
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                self.assertEqual(get_system_settings().pk, 1)
+
+    def test_updates_and_resets_are_seen(self):
+        self.assertEqual(get_system_settings().default_page_size, 10)
+        self.update_settings(default_page_size=25)
+        self.assertEqual(get_system_settings().default_page_size, 25)
+
+        response = self.client.post('/v1/settings/system/reset_to_defaults/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_system_settings().default_page_size, 10)
+
+    def test_other_process_changes_seen_after_version_bump(self):
+        get_system_settings()
+        SystemSettings.objects.filter(pk=1).update(app_name='Renamed')
+        self.assertEqual(get_system_settings().app_name, 'Yakkum')
+        invalidate_system_settings()
+        self.assertEqual(get_system_settings().app_name, 'Renamed')
+
+
+    def test_other_worker_saves_seen_after_check_interval(self):
+        """Another worker's save only reaches this one through the shared stamp"""
+        get_system_settings()
+        SystemSettings.objects.filter(pk=1).update(maintenance_mode=True)
+        cache.set(SETTINGS_VERSION_CACHE_KEY, 'bumped by another worker', None)
+        self.assertFalse(get_system_settings().maintenance_mode)
+
+        with override_settings(SYSTEM_SETTINGS_CHECK_INTERVAL=0):
+            self.assertTrue(get_system_settings().maintenance_mode)
+
+
+class SettingsPaginationTests(CachedSettingsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        ActivityLog.objects.bulk_create([
+            ActivityLog(user=self.admin, username=self.admin.email, action=ActivityLog.Action.READ,
+                        description=f'Entry {n}')
+            for n in range(30)
+        ])
+        self.client.force_authenticate(user=self.admin)
+
+    def count_results(self, **params):
+        response = self.client.get('/v1/logs/activity/', params)
+        self.assertEqual(response.status_code, 200)
+        return len(response.data['results'])
+
+    def test_default_page_size(self):
+        self.assertEqual(self.count_results(), 10)
+        self.assertEqual(self.count_results(pagination='cursor'), 10)
+        self.update_settings(default_page_size=20)
+        self.assertEqual(self.count_results(), 20)
+
+    def test_page_size_capped(self):
+        self.assertEqual(self.count_results(page_size=15), 15)
+        self.update_settings(max_page_size=12)
+        self.assertEqual(self.count_results(page_size=15), 12)
+        self.assertEqual(self.count_results(page_size='abc'), 10)
+
+
+class MaintenanceModeTests(CachedSettingsTestCase):
+
+    def test_only_admins_and_exempt_endpoints_pass(self):
+        self.update_settings(maintenance_mode=True, maintenance_message='Back soon')
+
+        self.client.force_authenticate(user=None)
+        token = self.client.post(
+            '/v1/accounts/auth/login/', {'email': 'viewer@test.com', 'password': 'pass'}, format='json'
+        ).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = self.client.get('/v1/directory/services/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['detail'], 'Back soon')
+        self.assertEqual(self.client.get('/v1/settings/system/public/').status_code, 200)
+
+        token = self.client.post(
+            '/v1/accounts/auth/login/', {'email': 'admin@test.com', 'password': 'pass'}, format='json'
+        ).data['access']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(self.client.get('/v1/directory/services/').status_code, 200)
+
+    def test_no_queries_outside_maintenance(self):
+        self.client.get('/v1/settings/system/public/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/v1/directory/services/')
+        self.assertEqual(response.status_code, 401)
+
+
+class AuditLogToggleTests(CachedSettingsTestCase):
+
+    def test_activity_logs_skipped_while_disabled(self):
+        self.client.force_authenticate(user=self.admin)
+        request = self.client.get('/v1/settings/system/').wsgi_request
+        log_create(request, self.viewer)
+        self.assertEqual(ActivityLog.objects.count(), 1)
+
+        self.update_settings(enable_audit_logs=False)
+        log_create(request, self.viewer)
+        self.assertEqual(ActivityLog.objects.count(), 1)
@@ -3,6 +3,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from apps.accounts.permissions import IsAdmin
+from .loader import get_system_settings
 from .models import SystemSettings
 from .serializers import SystemSettingsSerializer
 
@@ -22,13 +23,13 @@ class SystemSettingsViewSet(viewsets.ViewSet):
 
     def list(self, request):
         """Get current system settings"""
-        settings = SystemSettings.load()
+        settings = get_system_settings()
         serializer = SystemSettingsSerializer(settings)
         return Response(serializer.data)
 
     def retrieve(self, request, pk=None):
         """Get system settings (always returns singleton)"""
-        settings = SystemSettings.load()
+        settings = get_system_settings()
         serializer = SystemSettingsSerializer(settings)
         return Response(serializer.data)
 
@@ -60,7 +61,7 @@ class SystemSettingsViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def public(self, request):
         """Get public settings (no auth required)"""
-        settings = SystemSettings.load()
+        settings = get_system_settings()
         # Only return public-safe settings
         return Response({
             'app_name': settings.app_name,
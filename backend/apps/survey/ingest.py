@@ -0,0 +1,270 @@
+"""
+Batch upload of the surveys captured offline by the mobile client
+
+A surveyor coming back online sends a list of items to
+POST /v1/surveys/surveys/batch/ instead of a create, update and submit
+request per survey. An item holds the survey fields plus:
+
+    key     client-generated idempotency key (unique per user)
+    id      survey to update, omitted to create one
+    submit  submit the survey for verification (default false)
+
+The items are validated in one pass against the services and surveys they
+reference, each loaded with one query, and written in one transaction: new
+surveys with bulk_create, changed ones with bulk_update, and their audit rows
+and idempotency keys with one statement each. The activity log entries are
+recorded together afterwards (see apps.logs.buffer.collect_activity_logs).
+
+Every item gets a result in the order sent: "created" or "updated" with the
+survey id and status, the stored result with "replayed": true when its key
+was already applied (so resending an upload whose response was lost changes
+nothing), or "invalid" with its errors. Invalid items do not stop the others
+and their keys are not stored, so they can be fixed and sent again.
+
+bulk_create and bulk_update send no post_save, so `rows_imported` is sent
+for the written surveys, as after a directory import, which invalidates the
+cached survey responses and the dashboard.
+"""
+from django.conf import settings
+from django.db import IntegrityError, connections, router, transaction
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from apps.directory.importer import rows_imported
+from apps.directory.models import Service
+from apps.geo.index import resolve_survey_region
+from apps.logs.utils import log_create, log_survey_submit, log_update
+from apps.logs.buffer import collect_activity_logs
+from .models import Survey, SurveyAuditLog, SurveyUploadKey
+from .serializers import SurveyBatchItemSerializer, SurveyBatchSerializer
+
+DEFAULT_MAX_ITEMS = 200
+
+# Survey fields a change of which moves the survey to another region
+LOCATION_FIELDS = {'latitude', 'longitude', 'service'}
+
+
+class BatchConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The upload conflicts with a concurrent write; send it again.'
+    default_code = 'conflict'
+
+
+class BatchItem:
+    """An item of the upload and what it resolves to"""
+
+    def __init__(self, data):
+        self.data = data
+        self.key = None
+        self.survey_id = None
+        self.survey = None
+        self.created = False
+        self.submit = False
+        self.changed_fields = set()
+        self.result = None
+
+    def fail(self, errors):
+        self.result = {'key': self.key, 'status': 'invalid', 'errors': errors}
+
+    @property
+    def pending(self):
+        return self.result is None
+
+
+def can_edit(user, survey):
+    """Same rule as IsSurveyOwnerOrReadOnly for surveyors and admins"""
+    return user.role == 'ADMIN' or survey.surveyor_id == user.pk
+
+
+def read_items(data, user):
+    """Validate the item envelopes and replay the keys already applied"""
+    if not isinstance(data, list):
+        raise serializers.ValidationError({'detail': 'Expected a list of surveys.'})
+    max_items = getattr(settings, 'SURVEY_BATCH_MAX_ITEMS', DEFAULT_MAX_ITEMS)
+    if len(data) > max_items:
+        raise serializers.ValidationError({'detail': f'Send at most {max_items} surveys per batch.'})
+
+    items = [BatchItem(value) for value in data]
+    seen = set()
+    for item in items:
+        if not isinstance(item.data, dict):
+            item.fail({'non_field_errors': ['Expected an object.']})
+            continue
+        envelope = SurveyBatchItemSerializer(data=item.data)
+        if not envelope.is_valid():
+            item.key = item.data.get('key') if isinstance(item.data.get('key'), str) else None
+            item.fail(envelope.errors)
+            continue
+        item.key = envelope.validated_data['key']
+        item.submit = envelope.validated_data['submit']
+        item.survey_id = envelope.validated_data.get('id')
+        if item.key in seen:
+            item.fail({'key': ['Duplicate key in this batch.']})
+        seen.add(item.key)
+
+    applied = dict(
+        SurveyUploadKey.objects.filter(user=user, key__in=seen).values_list('key', 'result')
+    )
+    for item in items:
+        if item.pending and item.key in applied:
+            item.result = {**applied[item.key], 'replayed': True}
+    return items
+
+
+def validate_items(items, user, surveys):
+    """Resolve and validate the survey fields of the pending items"""
+    pending = [item for item in items if item.pending]
+    existing = surveys.filter(pk__in=[item.survey_id for item in pending if item.survey_id]).in_bulk()
+    service_ids = set()
+    for item in pending:
+        try:
+            service_ids.add(int(item.data['service']))
+        except (KeyError, TypeError, ValueError):
+            pass
+    for survey in existing.values():
+        service_ids.add(survey.service_id)
+    lookups = {'service': Service.objects.filter(pk__in=service_ids).in_bulk()}
+
+    for item in pending:
+        if item.survey_id:
+            item.survey = existing.get(item.survey_id)
+            if item.survey is None:
+                item.fail({'id': ['Not found.']})
+                continue
+            if not can_edit(user, item.survey):
+                item.fail({'id': ['You do not have permission to edit this survey.']})
+                continue
+            if item.submit and item.survey.verification_status != Survey.Status.DRAFT:
+                item.fail({'submit': ['Only draft surveys can be submitted']})
+                continue
+            # The service of a survey is loaded with the batch (see resolve_survey_region)
+            item.survey.service = lookups['service'][item.survey.service_id]
+        serializer = SurveyBatchSerializer(
+            item.survey, data=item.data, partial=item.survey is not None, context={'lookups': lookups}
+        )
+        if not serializer.is_valid():
+            item.fail(serializer.errors)
+            continue
+        if item.survey is None:
+            item.survey = Survey(surveyor=user)
+            item.created = True
+        for field, value in serializer.validated_data.items():
+            setattr(item.survey, field, value)
+        item.changed_fields = set(serializer.validated_data)
+
+    check_unique_dates([item for item in pending if item.pending])
+
+
+def check_unique_dates(items):
+    """Reject items whose (service, survey_date) is taken, in the database or earlier in the batch"""
+    if not items:
+        return
+    taken = {
+        (service_id, survey_date): pk
+        for pk, service_id, survey_date in Survey.objects.filter(
+            service_id__in={item.survey.service_id for item in items},
+            survey_date__in={item.survey.survey_date for item in items},
+        ).values_list('pk', 'service_id', 'survey_date')
+    }
+    # The surveys updated by the batch free their stored dates
+    updated = {item.survey.pk for item in items if not item.created}
+    taken = {pair: pk for pair, pk in taken.items() if pk not in updated}
+    for item in items:
+        pair = (item.survey.service_id, item.survey.survey_date)
+        if pair in taken:
+            item.fail({'non_field_errors': ['The fields service, survey_date must make a unique set.']})
+        else:
+            taken[pair] = item.survey.pk
+
+
+def write_items(items, user):
+    """Insert and update the surveys of the valid items, with their audit rows and keys"""
+    items = [item for item in items if item.pending]
+    if not items:
+        return []
+    now = timezone.now()
+    for item in items:
+        survey = item.survey
+        if item.submit:
+            survey.verification_status = Survey.Status.SUBMITTED
+            survey.submitted_at = now
+            item.changed_fields |= {'verification_status', 'submitted_at'}
+        if item.created or LOCATION_FIELDS & item.changed_fields:
+            survey.region_id = resolve_survey_region(survey)
+            item.changed_fields.add('region')
+        if not item.created:
+            survey.updated_at = now
+
+    created = [item.survey for item in items if item.created]
+    updated = [item.survey for item in items if not item.created]
+    db = router.db_for_write(Survey)
+    try:
+        with transaction.atomic(using=db):
+            Survey.objects.bulk_create(created)
+            if created and not connections[db].features.can_return_rows_from_bulk_insert:
+                fetch_created_ids(created)
+            if updated:
+                fields = set().union(*(item.changed_fields for item in items if not item.created))
+                Survey.objects.bulk_update(updated, sorted(fields | {'updated_at'}))
+
+            SurveyAuditLog.objects.bulk_create([
+                SurveyAuditLog(
+                    survey=item.survey, action=SurveyAuditLog.Action.SUBMITTED, user=user,
+                    previous_status=Survey.Status.DRAFT, new_status=Survey.Status.SUBMITTED,
+                    notes='Survey submitted for verification'
+                )
+                for item in items if item.submit
+            ])
+            for item in items:
+                item.result = {
+                    'key': item.key,
+                    'status': 'created' if item.created else 'updated',
+                    'id': item.survey.pk,
+                    'verification_status': item.survey.verification_status,
+                }
+            SurveyUploadKey.objects.bulk_create([
+                SurveyUploadKey(user=user, key=item.key, survey=item.survey, result=item.result)
+                for item in items
+            ])
+    except IntegrityError:
+        # A concurrent upload of the same keys or survey dates won the race
+        raise BatchConflict()
+    return items
+
+
+def fetch_created_ids(surveys):
+    """Set the ids of inserted surveys on backends that do not return them"""
+    ids = {
+        (service_id, survey_date): pk
+        for pk, service_id, survey_date in Survey.objects.filter(
+            service_id__in={survey.service_id for survey in surveys},
+            survey_date__in={survey.survey_date for survey in surveys},
+        ).values_list('pk', 'service_id', 'survey_date')
+    }
+    for survey in surveys:
+        survey.pk = ids[(survey.service_id, survey.survey_date)]
+
+
+def ingest_surveys(request, data, surveys):
+    """
+    Apply a batch upload for request.user; `surveys` are the surveys the
+    user may update (the RBAC-scoped queryset). Returns the item results.
+    """
+    user = request.user
+    items = read_items(data, user)
+    validate_items(items, user, surveys)
+    written = write_items(items, user)
+
+    if written:
+        rows_imported.send(sender=Survey, pks=[item.survey.pk for item in written])
+        with collect_activity_logs():
+            for item in written:
+                survey = item.survey
+                if item.created:
+                    log_create(request, survey, f'Created survey for service: {survey.service.name}')
+                else:
+                    log_update(request, survey, f'Updated survey for service: {survey.service.name}')
+                if item.submit:
+                    log_survey_submit(request, survey)
+    return [item.result for item in items]
@@ -0,0 +1,20 @@
+# Generated by Django 6.1.2 on 2026-10-17 19:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geo', '0001_initial'),
+        ('survey', '0003_alter_survey_latitude_alter_survey_longitude'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='survey',
+            name='region',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Kecamatan/regency of the GPS fix (or of the service), assigned on save', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='surveys', to='geo.region'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
 
 
 class Survey(models.Model):
@@ -45,6 +46,15 @@ class Survey(models.Model):
         blank=True,
         help_text="GPS accuracy in meters"
     )
+    region = models.ForeignKey(
+        'geo.Region',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        editable=False,
+        related_name='surveys',
+        help_text="Kecamatan/regency of the GPS fix (or of the service), assigned on save"
+    )
 
     # Surveyor Information
     surveyor = models.ForeignKey(
@@ -207,12 +217,21 @@ class Survey(models.Model):
             models.Index(fields=['surveyor', '-survey_date']),
             models.Index(fields=['verification_status', '-survey_date']),
             models.Index(fields=['assigned_verifier', 'verification_status']),
+            # Delta sync walks (updated_at, id) (see sync.py)
+            models.Index(fields=['updated_at', 'id']),
         ]
         unique_together = [['service', 'survey_date']]
 
     def __str__(self):
         return f"Survey for {self.service.name} on {self.survey_date}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude', 'service'} & set(update_fields):
+            # The region follows the location (set by a pre_save handler)
+            kwargs['update_fields'] = {*update_fields, 'region'}
+        super().save(*args, **kwargs)
+
     @property
     def occupancy_rate(self):
         """Calculate bed occupancy rate"""
@@ -313,3 +332,72 @@ class SurveyAuditLog(models.Model):
 
     def __str__(self):
         return f"{self.get_action_display()} - Survey #{self.survey_id} at {self.timestamp}"
+
+
+class SyncTombstone(models.Model):
+    """
+    A deleted service or survey, kept so that delta syncs can report the
+    deletion (see sync.py); purged with the logs after the retention period
+    """
+
+    class Kind(models.TextChoices):
+        SERVICE = 'service', 'Service'
+        SURVEY = 'survey', 'Survey'
+
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    # Scope of a deleted survey, filtered like live surveys (no constraints:
+    # the users may be deleted in turn)
+    surveyor = models.ForeignKey(
+        'accounts.User', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='+'
+    )
+    assigned_verifier = models.ForeignKey(
+        'accounts.User', on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='+'
+    )
+    verification_status = models.CharField(max_length=20, choices=Survey.Status.choices, blank=True)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'sync_tombstones'
+        indexes = [
+            models.Index(fields=['kind', 'deleted_at']),
+        ]
+
+    def __str__(self):
+        return f"Deleted {self.kind} #{self.object_id}"
+
+
+class SurveyUploadKey(models.Model):
+    """
+    Idempotency key of a survey applied by a batch upload (see ingest.py),
+    with the result returned for it; purged with the logs after the
+    retention period
+    """
+
+    user = models.ForeignKey(
+        'accounts.User',
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    key = models.CharField(max_length=64)
+    survey = models.ForeignKey(
+        Survey,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    result = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'survey_upload_keys'
+        unique_together = [['user', 'key']]
+        indexes = [
+            models.Index(fields=['created_at']),
+        ]
+
+    def __str__(self):
+        return f"Upload {self.key} by user #{self.user_id}"
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import Survey, SurveyAttachment, SurveyAuditLog
+from apps.directory.models import Service
 from apps.directory.serializers import ServiceListSerializer
 
 
@@ -96,6 +97,43 @@ class SurveyCreateUpdateSerializer(serializers.ModelSerializer):
         ]
 
 
+class BatchLookupField(serializers.PrimaryKeyRelatedField):
+    """
+    Primary key of a row loaded beforehand for a whole batch, looked up in
+    context['lookups'][field name] ({pk: instance}) without a query
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        instance = self.context['lookups'][self.field_name].get(pk)
+        if instance is None:
+            self.fail('does_not_exist', pk_value=data)
+        return instance
+
+
+class SurveyBatchItemSerializer(serializers.Serializer):
+    """Batch upload fields of an item, besides the survey fields"""
+
+    key = serializers.CharField(max_length=64)
+    id = serializers.IntegerField(required=False, min_value=1)
+    submit = serializers.BooleanField(default=False)
+
+
+class SurveyBatchSerializer(SurveyCreateUpdateSerializer):
+    """Survey fields of a batch upload item"""
+
+    service = BatchLookupField(queryset=Service.objects.all())
+
+    class Meta(SurveyCreateUpdateSerializer.Meta):
+        # (service, survey_date) is checked once for the whole batch
+        validators = []
+
+
 class SurveySubmitSerializer(serializers.Serializer):
     """Serializer for submitting survey"""
     pass
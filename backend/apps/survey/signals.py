@@ -0,0 +1,28 @@
+"""
+Signal handlers invalidating the cached survey lists and stats (see
+core.caching) and recording deletions for the delta sync (see sync.py)
+"""
+from django.db.models.signals import post_delete
+
+from apps.directory.models import Service
+from core.caching import track_model_writes
+from .models import Survey, SyncTombstone
+
+track_model_writes(Survey)
+
+
+def record_service_deletion(sender, instance, **kwargs):
+    SyncTombstone.objects.create(kind=SyncTombstone.Kind.SERVICE, object_id=instance.pk)
+
+
+def record_survey_deletion(sender, instance, **kwargs):
+    # The scope fields let the sync filter tombstones like the surveys were
+    SyncTombstone.objects.create(
+        kind=SyncTombstone.Kind.SURVEY, object_id=instance.pk,
+        surveyor_id=instance.surveyor_id, assigned_verifier_id=instance.assigned_verifier_id,
+        verification_status=instance.verification_status,
+    )
+
+
+post_delete.connect(record_service_deletion, sender=Service, dispatch_uid='sync_tombstone_service')
+post_delete.connect(record_survey_deletion, sender=Survey, dispatch_uid='sync_tombstone_survey')
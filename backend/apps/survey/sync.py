@@ -0,0 +1,200 @@
+"""
+Delta sync for the offline mobile client
+
+GET /v1/surveys/sync/<services|surveys>/?since=<watermark> returns the rows of
+the caller's scope changed since the watermark, walked by keyset on
+(updated_at, id), and the ids deleted since then, read from the tombstones
+written on delete. A sync is a series of pages:
+
+    {"changed": [...], "deleted": [...], "next": <url or null>,
+     "watermark": "...", "full": false}
+
+The changed rows come first. Once they are exhausted, the tombstones follow
+in pages of their own, walked by keyset on (deleted_at, id), so no page holds
+more than page_size rows and page_size deletions. Every page carries the same
+`watermark`, which the client keeps once `next` is null and sends as `since`
+next time. It trails the start of the sync by SYNC_WATERMARK_LAG seconds, so
+rows committed while a sync runs are sent again rather than missed (clients
+upsert by id). Without `since`, or with one older than the tombstone
+retention (SystemSettings.data_retention_days), the whole scope is sent with
+"full": true and the client replaces its copy.
+
+Scopes are those of the list endpoints (ServiceViewSet, SurveyViewSet). Since
+non-admins do not see inactive services, services deactivated since the
+watermark are reported to them as deleted.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+from apps.directory.models import Service, TargetPopulation
+from apps.directory.serializers import ServiceDetailSerializer
+from apps.logs.retention import get_retention_cutoff
+from apps.settings.loader import get_system_settings
+from core.pagination import KeysetPagination, decode_cursor, encode_cursor, keyset_filter
+from .models import Survey, SyncTombstone
+from .serializers import SurveyDetailSerializer
+
+SYNC_ORDERING = ('updated_at', 'id')
+TOMBSTONE_ORDERING = ('deleted_at', 'id')
+
+# Cursor phases: paging the changed rows, then the tombstones
+CHANGED, DELETED = 'changed', 'deleted'
+
+DEFAULT_WATERMARK_LAG = 60
+
+
+class SyncResource:
+    """A table clients keep a copy of, scoped like its list endpoint"""
+
+    def __init__(self, kind, get_queryset, serializer_class, get_viewset, report_hidden=False,
+                 scope_tombstones=False):
+        self.kind = kind
+        self.get_queryset = get_queryset
+        self.serializer_class = serializer_class
+        self.get_viewset = get_viewset
+        # Report changed rows the caller no longer sees as deleted
+        self.report_hidden = report_hidden
+        # Filter tombstones with the viewset's RBAC filter (they keep the scope fields)
+        self.scope_tombstones = scope_tombstones
+
+    def scope(self, queryset, user):
+        return self.get_viewset()().apply_rbac_filter(queryset, user)
+
+
+def _service_viewset():
+    from apps.directory.views import ServiceViewSet
+    return ServiceViewSet
+
+
+def _survey_viewset():
+    from .views import SurveyViewSet
+    return SurveyViewSet
+
+
+SYNC_RESOURCES = {
+    'services': SyncResource(
+        SyncTombstone.Kind.SERVICE,
+        # Only the population ids are read; the serializer resolves them through the registry
+        lambda: Service.objects.select_related('created_by', 'verified_by').prefetch_related(
+            Prefetch('target_populations', queryset=TargetPopulation.objects.only('pk'))
+        ),
+        ServiceDetailSerializer, _service_viewset, report_hidden=True,
+    ),
+    'surveys': SyncResource(
+        SyncTombstone.Kind.SURVEY,
+        lambda: Survey.objects.select_related('service', 'surveyor', 'assigned_verifier', 'verified_by'),
+        SurveyDetailSerializer, _survey_viewset, scope_tombstones=True,
+    ),
+}
+
+
+def parse_timestamp(value, name):
+    timestamp = parse_datetime(value)
+    if timestamp is None:
+        raise ValidationError({name: 'Enter an ISO 8601 date and time.'})
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+    return timestamp
+
+
+def read_cursor(cursor):
+    """(phase, keyset position, watermark, since) of a sync cursor; 404 when tampered with"""
+    values, _ = decode_cursor(cursor)
+    try:
+        phase, timestamp, pk, watermark, since = values
+        if phase not in (CHANGED, DELETED):
+            raise ValueError
+        if not all(isinstance(value, str) for value in (timestamp, watermark, since or '')):
+            raise TypeError
+        timestamps = [parse_timestamp(value, 'cursor') for value in (timestamp, watermark)]
+        since = parse_timestamp(since, 'cursor') if since else None
+        if phase == DELETED and since is None:
+            raise ValueError
+        return phase, [timestamps[0], int(pk)], timestamps[1], since
+    except (TypeError, ValueError, ValidationError):
+        raise NotFound('Invalid cursor')
+
+
+def sync_page(request, resource_name):
+    """One page of the changes of a resource since ?since= (see module docstring)"""
+    resource = SYNC_RESOURCES.get(resource_name)
+    if resource is None:
+        raise NotFound(f'Unknown sync resource {resource_name!r}.')
+    user = request.user
+
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        phase, position, watermark, since = read_cursor(cursor)
+    else:
+        phase, position = CHANGED, None
+        lag = getattr(settings, 'SYNC_WATERMARK_LAG', DEFAULT_WATERMARK_LAG)
+        watermark = timezone.now() - timedelta(seconds=lag)
+        since = request.query_params.get('since')
+        since = parse_timestamp(since, 'since') if since else None
+        if since is not None and since < get_retention_cutoff(get_system_settings().data_retention_days):
+            # Tombstones of older deletions may be purged
+            since = None
+    full = since is None
+    page_size = KeysetPagination().get_page_size(request)
+
+    changed, deleted, next_position = [], [], None
+    if phase == CHANGED:
+        queryset = resource.get_queryset()
+        if full or not resource.report_hidden:
+            queryset = resource.scope(queryset, user)
+        if since is not None:
+            queryset = queryset.filter(updated_at__gte=since)
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(SYNC_ORDERING, position))
+
+        rows = list(queryset.order_by(*SYNC_ORDERING)[:page_size + 1])
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_position = (CHANGED, rows[-1].updated_at, rows[-1].pk)
+
+        if not full and resource.report_hidden and rows:
+            visible = set(resource.scope(Service.objects.filter(pk__in=[row.pk for row in rows]), user)
+                          .values_list('pk', flat=True))
+            deleted = [row.pk for row in rows if row.pk not in visible]
+            changed = [row for row in rows if row.pk in visible]
+        else:
+            changed = rows
+        position = None
+
+    if not full and next_position is None:
+        # The changed rows are exhausted: page the tombstones
+        tombstones = SyncTombstone.objects.filter(kind=resource.kind, deleted_at__gte=since)
+        if resource.scope_tombstones:
+            tombstones = resource.scope(tombstones, user)
+        if position is not None:
+            tombstones = tombstones.filter(keyset_filter(TOMBSTONE_ORDERING, position))
+        tombstones = list(tombstones.order_by(*TOMBSTONE_ORDERING).values_list(
+            'deleted_at', 'id', 'object_id')[:page_size + 1])
+        if len(tombstones) > page_size:
+            tombstones = tombstones[:page_size]
+            next_position = (DELETED, tombstones[-1][0], tombstones[-1][1])
+        deleted.extend(object_id for _, _, object_id in tombstones)
+
+    next_link = None
+    if next_position is not None:
+        next_phase, timestamp, pk = next_position
+        token = encode_cursor([
+            next_phase, timestamp.isoformat(), pk, watermark.isoformat(),
+            since.isoformat() if since else None,
+        ])
+        next_link = replace_query_param(request.build_absolute_uri(), 'cursor', token)
+
+    serializer = resource.serializer_class(changed, many=True, context={'request': request})
+    return {
+        'changed': serializer.data,
+        'deleted': deleted,
+        'next': next_link,
+        'watermark': watermark.isoformat(),
+        'full': full,
+    }
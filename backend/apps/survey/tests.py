@@ -2,8 +2,16 @@ from django.test import TestCase
 from django.contrib.auth import get_user_model
 from datetime import date, timedelta
 from decimal import Decimal
-from apps.directory.models import MainTypeOfCare, BasicStableInputsOfCare, ServiceType, Service
-from .models import Survey, SurveyAttachment, SurveyAuditLog
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.directory.models import MainTypeOfCare, BasicStableInputsOfCare, ServiceType, Service, TargetPopulation
+from apps.directory.registry import registry
+from apps.logs.models import ActivityLog
+from apps.settings.loader import get_system_settings
+from core.pagination import encode_cursor
+from .models import Survey, SurveyAttachment, SurveyAuditLog, SurveyUploadKey
 
 User = get_user_model()
 
@@ -111,3 +119,250 @@ class SurveyWorkflowTests(TestCase):
         survey.verified_by = self.verifier
         survey.save()
         self.assertEqual(survey.verification_status, Survey.Status.VERIFIED)
+
+
+class SyncTests(TestCase):
+    """Test the delta sync endpoint of the mobile client"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_user(email='admin@example.com', password='pass', role=User.Role.ADMIN)
+        self.surveyor = User.objects.create_user(email='surveyor@example.com', password='pass', role=User.Role.SURVEYOR)
+        self.other = User.objects.create_user(email='other@example.com', password='pass', role=User.Role.SURVEYOR)
+        self.viewer = User.objects.create_user(email='viewer@example.com', password='pass', role=User.Role.VIEWER)
+        mtc = MainTypeOfCare.objects.create(code='R1', name='Residential')
+        bsic = BasicStableInputsOfCare.objects.create(code='A', name='Accessibility')
+        service_type = ServiceType.objects.create(name='Hospital')
+        self.services = [
+            Service.objects.create(name=f'Service {n}', mtc=mtc, bsic=bsic, service_type=service_type)
+            for n in range(3)
+        ]
+        self.surveys = [
+            Survey.objects.create(
+                service=self.services[0], survey_date=date.today() - timedelta(days=n),
+                survey_period_start=date.today(), survey_period_end=date.today(), surveyor=surveyor
+            )
+            for n, surveyor in enumerate([self.surveyor, self.surveyor, self.other])
+        ]
+        # Everything last changed yesterday
+        yesterday = timezone.now() - timedelta(days=1)
+        Service.objects.update(updated_at=yesterday)
+        Survey.objects.update(updated_at=yesterday)
+        self.since = (timezone.now() - timedelta(hours=1)).isoformat()
+
+    def sync(self, user, resource, **params):
+        self.client.force_authenticate(user=user)
+        response = self.client.get(f'/v1/surveys/sync/{resource}/', params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_full_then_incremental(self):
+        data = self.sync(self.admin, 'services')
+        self.assertTrue(data['full'])
+        self.assertEqual([row['id'] for row in data['changed']], [s.pk for s in self.services])
+        self.assertIsNone(data['next'])
+
+        data = self.sync(self.admin, 'services', since=self.since)
+        self.assertFalse(data['full'])
+        self.assertEqual((data['changed'], data['deleted']), ([], []))
+
+        self.services[1].name = 'Renamed'
+        self.services[1].save()
+        deleted_pk = self.services[2].pk
+        self.services[2].delete()
+        data = self.sync(self.admin, 'services', since=self.since)
+        self.assertEqual([row['name'] for row in data['changed']], ['Renamed'])
+        self.assertEqual(data['deleted'], [deleted_pk])
+
+    def test_deactivated_service_reported_deleted_to_viewers(self):
+        Service.objects.filter(pk=self.services[0].pk).update(is_active=False, updated_at=timezone.now())
+        data = self.sync(self.viewer, 'services', since=self.since)
+        self.assertEqual((data['changed'], data['deleted']), ([], [self.services[0].pk]))
+
+        data = self.sync(self.admin, 'services', since=self.since)
+        self.assertEqual([row['id'] for row in data['changed']], [self.services[0].pk])
+
+    def test_surveys_scoped_to_surveyor(self):
+        data = self.sync(self.surveyor, 'surveys')
+        self.assertEqual({row['id'] for row in data['changed']}, {s.pk for s in self.surveys[:2]})
+
+        own, other = self.surveys[0].pk, self.surveys[2].pk
+        self.surveys[0].delete()
+        self.surveys[2].delete()
+        data = self.sync(self.surveyor, 'surveys', since=self.since)
+        self.assertEqual(data['deleted'], [own])
+        data = self.sync(self.other, 'surveys', since=self.since)
+        self.assertEqual(data['deleted'], [other])
+
+    def test_keyset_pages(self):
+        data = self.sync(self.admin, 'services', page_size=2)
+        ids = [row['id'] for row in data['changed']]
+        self.assertEqual(len(ids), 2)
+
+        response = self.client.get(data['next'])
+        self.assertEqual(response.data['watermark'], data['watermark'])
+        self.assertIsNone(response.data['next'])
+        ids += [row['id'] for row in response.data['changed']]
+        self.assertEqual(ids, [s.pk for s in self.services])
+
+    def test_service_page_queries_independent_of_rows(self):
+        """Target populations are prefetched, not read per service"""
+        population = TargetPopulation.objects.create(name='Adults')
+        for service in self.services:
+            service.target_populations.add(population)
+        get_system_settings()
+        registry.all('target_population')
+        self.client.force_authenticate(user=self.admin)
+
+        # The page rows and their target populations
+        with self.assertNumQueries(2):
+            response = self.client.get('/v1/surveys/sync/services/')
+        self.assertEqual(len(response.data['changed']), 3)
+        self.assertEqual(response.data['changed'][0]['target_populations'][0]['name'], 'Adults')
+
+    def test_tombstones_paged(self):
+        """Deletions follow the changed rows, at most a page of them per response"""
+        self.services[0].name = 'Renamed'
+        self.services[0].save()
+        deleted = [survey.pk for survey in self.surveys]
+        for survey in self.surveys:
+            survey.delete()
+
+        data = self.sync(self.admin, 'surveys', since=self.since, page_size=2)
+        self.assertEqual((data['changed'], data['deleted']), ([], deleted[:2]))
+        response = self.client.get(data['next'])
+        self.assertEqual(response.data['deleted'], deleted[2:])
+        self.assertIsNone(response.data['next'])
+
+        data = self.sync(self.admin, 'services', since=self.since, page_size=1)
+        self.assertEqual([row['name'] for row in data['changed']], ['Renamed'])
+        self.assertEqual(data['deleted'], [])
+        self.assertIsNone(data['next'])
+
+    def test_gzipped_when_accepted(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/v1/surveys/sync/services/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_invalid_requests(self):
+        self.client.force_authenticate(user=self.admin)
+        self.assertEqual(self.client.get('/v1/surveys/sync/services/', {'since': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/v1/surveys/sync/users/').status_code, 404)
+
+    def test_tampered_cursors(self):
+        now = timezone.now().isoformat()
+        self.client.force_authenticate(user=self.admin)
+        for values in (['changed', now, 'x', now, None], ['changed', now, 1, 42, None],
+                       ['changed', now, 1, now, ['x']], ['changed', '2026-13-01T00:00:00', 1, now, None],
+                       ['deleted', now, 1, now, None], ['other', now, 1, now, now], [now, 1, now, None]):
+            response = self.client.get('/v1/surveys/sync/services/', {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 404, values)
+
+
+class BatchUploadTests(TestCase):
+    """Test the batch upload of offline surveys"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.surveyor = User.objects.create_user(email='surveyor@example.com', password='pass', role=User.Role.SURVEYOR)
+        self.other = User.objects.create_user(email='other@example.com', password='pass', role=User.Role.SURVEYOR)
+        mtc = MainTypeOfCare.objects.create(code='R1', name='Residential')
+        bsic = BasicStableInputsOfCare.objects.create(code='A', name='Accessibility')
+        service_type = ServiceType.objects.create(name='Hospital')
+        self.services = [
+            Service.objects.create(name=f'Service {n}', mtc=mtc, bsic=bsic, service_type=service_type)
+            for n in range(2)
+        ]
+        self.client.force_authenticate(user=self.surveyor)
+
+    def item(self, key, days_ago=0, service=None, **fields):
+        day = date.today() - timedelta(days=days_ago)
+        return {
+            'key': key, 'service': (service or self.services[0]).pk, 'survey_date': day.isoformat(),
+            'survey_period_start': day.isoformat(), 'survey_period_end': day.isoformat(), **fields
+        }
+
+    def upload(self, items):
+        response = self.client.post('/v1/surveys/surveys/batch/', items, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['results']
+
+    def test_create_and_submit(self):
+        results = self.upload([self.item('a', 0), self.item('b', 1, submit=True, beds_occupied=3)])
+
+        self.assertEqual([r['status'] for r in results], ['created', 'created'])
+        self.assertEqual([r['verification_status'] for r in results], ['DRAFT', 'SUBMITTED'])
+        submitted = Survey.objects.get(pk=results[1]['id'])
+        self.assertEqual((submitted.surveyor, submitted.beds_occupied), (self.surveyor, 3))
+        self.assertIsNotNone(submitted.submitted_at)
+        self.assertEqual(
+            list(SurveyAuditLog.objects.values_list('survey_id', 'action')),
+            [(submitted.pk, SurveyAuditLog.Action.SUBMITTED)]
+        )
+        self.assertEqual(
+            sorted(ActivityLog.objects.values_list('action', flat=True)),
+            sorted([ActivityLog.Action.CREATE, ActivityLog.Action.CREATE, ActivityLog.Action.SURVEY_SUBMIT])
+        )
+
+    def test_replayed_keys_change_nothing(self):
+        first = self.upload([self.item('a', 0), self.item('b', 1)])
+        again = self.upload([self.item('a', 0), self.item('b', 1), self.item('c', 2)])
+
+        self.assertEqual([r['id'] for r in again[:2]], [r['id'] for r in first])
+        self.assertTrue(again[0]['replayed'])
+        self.assertEqual(again[2]['status'], 'created')
+        self.assertEqual(Survey.objects.count(), 3)
+        self.assertEqual(SurveyUploadKey.objects.filter(user=self.surveyor).count(), 3)
+
+    def test_update_and_invalid_items(self):
+        own = Survey.objects.create(
+            service=self.services[0], survey_date=date.today(), survey_period_start=date.today(),
+            survey_period_end=date.today(), surveyor=self.surveyor
+        )
+        others = Survey.objects.create(
+            service=self.services[1], survey_date=date.today(), survey_period_start=date.today(),
+            survey_period_end=date.today(), surveyor=self.other
+        )
+        results = self.upload([
+            {'key': 'update', 'id': own.pk, 'beds_occupied': 7, 'submit': True},
+            {'key': 'other', 'id': others.pk, 'beds_occupied': 7},
+            self.item('taken', 0),
+            self.item('new', 1),
+            self.item('same-day', 1),
+            {**self.item('no-service', 2), 'service': 0},
+            {'survey_date': 'no key'},
+        ])
+
+        self.assertEqual(
+            [r['status'] for r in results], ['updated', 'invalid', 'invalid', 'created', 'invalid', 'invalid', 'invalid']
+        )
+        self.assertIn('service', results[5]['errors'])
+        self.assertIn('key', results[6]['errors'])
+        own.refresh_from_db()
+        self.assertEqual((own.beds_occupied, own.verification_status), (7, Survey.Status.SUBMITTED))
+        self.assertEqual(Survey.objects.count(), 3)
+
+        # Invalid items can be fixed and sent again with the same key
+        results = self.upload([self.item('same-day', 2)])
+        self.assertEqual(results[0]['status'], 'created')
+
+    def test_queries_do_not_grow_with_items(self):
+        self.upload([self.item('warm', 30, submit=True)])
+
+        def count_queries(keys, first_day):
+            items = [self.item(key, first_day + n, submit=True) for n, key in enumerate(keys)]
+            with CaptureQueriesContext(connection) as context:
+                self.upload(items)
+            return len(context.captured_queries)
+
+        self.assertEqual(count_queries(['a', 'b'], 0), count_queries([str(n) for n in range(8)], 10))
+
+    def test_rejected_requests(self):
+        response = self.client.post('/v1/surveys/surveys/batch/', {'key': 'a'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(user=User.objects.create_user(
+            email='viewer@example.com', password='pass', role=User.Role.VIEWER
+        ))
+        response = self.client.post('/v1/surveys/surveys/batch/', [self.item('a')], format='json')
+        self.assertEqual(response.status_code, 403)
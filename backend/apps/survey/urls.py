@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import SurveyViewSet, SurveyAttachmentViewSet, SurveyAuditLogViewSet
+from .views import SurveyViewSet, SurveyAttachmentViewSet, SurveyAuditLogViewSet, sync_changes
 
 router = DefaultRouter()
 router.register(r'surveys', SurveyViewSet, basename='survey')
@@ -9,5 +9,6 @@ router.register(r'attachments', SurveyAttachmentViewSet, basename='attachment')
 router.register(r'audit-logs', SurveyAuditLogViewSet, basename='audit-log')
 
 urlpatterns = [
+    path('sync/<str:resource>/', sync_changes, name='sync'),
     path('', include(router.urls)),
 ]
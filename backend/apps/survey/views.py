@@ -1,12 +1,15 @@
 from rest_framework import viewsets, filters, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Count, Q, Avg
 from django.utils import timezone
+from django.views.decorators.gzip import gzip_page
 
 from .models import Survey, SurveyAttachment, SurveyAuditLog
+from .ingest import ingest_surveys
+from .sync import sync_page
 from .serializers import (
     SurveyListSerializer, SurveyDetailSerializer,
     SurveyCreateUpdateSerializer, SurveySubmitSerializer,
@@ -18,6 +21,9 @@ from apps.accounts.permissions import (
     CanModifySurveyStatus
 )
 from apps.accounts.mixins import SurveyorFilterMixin
+from apps.accounts.models import User
+from apps.directory.models import Service
+from core.caching import CachedResponseMixin
 from apps.logs.utils import (
     log_create, log_update, log_delete,
     log_survey_submit, log_survey_verify, log_survey_reject,
@@ -25,7 +31,7 @@ from apps.logs.utils import (
 )
 
 
-class SurveyViewSet(SurveyorFilterMixin, viewsets.ModelViewSet):
+class SurveyViewSet(CachedResponseMixin, SurveyorFilterMixin, viewsets.ModelViewSet):
     """
     ViewSet for Survey with verification workflow
     """
@@ -40,6 +46,7 @@ class SurveyViewSet(SurveyorFilterMixin, viewsets.ModelViewSet):
         'surveyor': ['exact'],
         'verification_status': ['exact'],
         'assigned_verifier': ['exact'],
+        'region': ['exact'],
         'survey_date': ['exact', 'gte', 'lte'],
         'created_at': ['gte', 'lte'],
     }
@@ -51,6 +58,8 @@ class SurveyViewSet(SurveyorFilterMixin, viewsets.ModelViewSet):
 
     ordering_fields = ['survey_date', 'created_at', 'verification_status']
     ordering = ['-survey_date']
+    # ?pagination=cursor pages (see core.pagination) walk the survey_date indexes
+    keyset_ordering = ('-survey_date', '-id')
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -66,6 +75,9 @@ class SurveyViewSet(SurveyorFilterMixin, viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update']:
             return [IsSurveyorOrAdmin(), IsSurveyOwnerOrReadOnly()]
+        elif self.action == 'batch':
+            # Ownership is checked per item (see ingest.py)
+            return [IsSurveyorOrAdmin()]
         elif self.action == 'verify':
             return [IsVerifierOrAdmin(), CanModifySurveyStatus()]
         elif self.action == 'submit':
@@ -81,6 +93,12 @@ class SurveyViewSet(SurveyorFilterMixin, viewsets.ModelViewSet):
     rbac_admin_sees_all = True
     rbac_allow_superuser = True
 
+    # Lists and stats are cached per role, and per user for the roles whose
+    # surveys are filtered by user (see core.caching)
+    response_cache_actions = ('list', 'stats')
+    response_cache_models = (Survey, Service, User)
+    response_cache_user_scoped_roles = ('SURVEYOR', 'VERIFIER')
+
     # get_queryset is now handled by SurveyorFilterMixin
     # The mixin automatically filters based on role:
     # - ADMIN: sees all surveys
@@ -150,6 +168,18 @@ class SurveyViewSet(SurveyorFilterMixin, viewsets.ModelViewSet):
 
         return Response(SurveyDetailSerializer(survey).data)
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """
+        Create, update and submit the surveys captured offline, in one request
+
+        Takes a list of survey fields with a client-generated idempotency
+        `key`, an optional `id` to update and `submit`; returns a result per
+        item. See apps.survey.ingest.
+        """
+        results = ingest_surveys(request, request.data, self.get_queryset())
+        return Response({'results': results})
+
     @action(detail=True, methods=['post'])
     def verify(self, request, pk=None):
         """Verify or reject survey"""
@@ -206,7 +236,7 @@ class SurveyViewSet(SurveyorFilterMixin, viewsets.ModelViewSet):
     def attachments(self, request, pk=None):
         """Get all attachments for this survey"""
         survey = self.get_object()
-        attachments = SurveyAttachment.objects.filter(survey=survey)
+        attachments = SurveyAttachment.objects.filter(survey=survey).select_related('uploaded_by')
         serializer = SurveyAttachmentSerializer(attachments, many=True)
         return Response(serializer.data)
 
@@ -214,7 +244,7 @@ class SurveyViewSet(SurveyorFilterMixin, viewsets.ModelViewSet):
     def audit_logs(self, request, pk=None):
         """Get audit log for this survey"""
         survey = self.get_object()
-        logs = SurveyAuditLog.objects.filter(survey=survey).order_by('-timestamp')
+        logs = SurveyAuditLog.objects.filter(survey=survey).select_related('user').order_by('-timestamp')
         serializer = SurveyAuditLogSerializer(logs, many=True)
         return Response(serializer.data)
 
@@ -289,3 +319,16 @@ class SurveyAuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['survey', 'action', 'user', 'previous_status', 'new_status']
     ordering = ['-timestamp']
+
+
+@gzip_page
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_changes(request, resource):
+    """
+    Changes of services or surveys since ?since= for the offline mobile client
+
+    Scoped like the list endpoints, walked by keyset (follow `next`) and
+    gzipped when accepted. See apps.survey.sync for the protocol.
+    """
+    return Response(sync_page(request, resource))
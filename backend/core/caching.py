@@ -0,0 +1,272 @@
+"""
+Role-scoped response cache for list and stats endpoints
+
+The list and stats results of the RBAC-filtered viewsets depend only on the
+query string and the caller's scope: their role, plus their user id for the
+roles whose rows are filtered by user (e.g. surveyors see their own surveys).
+CachedResponseMixin computes such a response once per scope and serves it to
+every caller in that scope, so a dashboard polled by many viewers runs its
+queries once.
+
+Every model has a generation stamp in the default cache. A cache key holds
+the generations of the models the viewset reads, so bumping one (on post_save
+/ post_delete through track_model_writes, or from the handlers of bulk-write
+signals) orphans every response built from the old rows, in every process
+using that cache. Several workers must therefore share a cache backend (as
+production.py configures); with a process-local one, the other workers keep
+serving their responses until they expire (check_shared_cache warns about
+it on `manage.py check --deploy`). Entries also expire after
+RESPONSE_CACHE_TIMEOUT seconds, which bounds time-relative figures such as
+"created in the last 30 days".
+
+Cached responses carry an ETag and Last-Modified, and conditional GETs
+(If-None-Match / If-Modified-Since) get a 304.
+"""
+import hashlib
+import json
+import time
+import uuid
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from apps.settings.models import SystemSettings
+
+GENERATION_CACHE_PREFIX = 'response:generation:'
+RESPONSE_CACHE_PREFIX = 'response:'
+
+DEFAULT_TIMEOUT = 300
+
+
+def generation_key(model):
+    return f'{GENERATION_CACHE_PREFIX}{model._meta.label_lower}'
+
+
+def get_generations(models):
+    """Current generation stamps of some models, shared by the processes using the cache"""
+    keys = [generation_key(model) for model in models]
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        for key in missing:
+            cache.add(key, uuid.uuid4().hex, None)
+        generations.update(cache.get_many(missing))
+    return [generations.get(key) for key in keys]
+
+
+def bump_generation(*models):
+    """Invalidate the cached responses built from some models, in every process using the cache"""
+    cache.set_many({generation_key(model): uuid.uuid4().hex for model in models}, None)
+
+
+def bump_generation_on_write(sender, **kwargs):
+    # Now for this process, and again on commit in case a concurrent request
+    # cached the rows as they were before it
+    bump_generation(sender)
+    transaction.on_commit(lambda: bump_generation(sender))
+
+
+def track_model_writes(*models):
+    """Bump the generation of some models whenever one of their rows is saved or deleted"""
+    for model in models:
+        post_save.connect(
+            bump_generation_on_write, sender=model,
+            dispatch_uid=f'response_cache_save_{model._meta.label_lower}'
+        )
+        post_delete.connect(
+            bump_generation_on_write, sender=model,
+            dispatch_uid=f'response_cache_delete_{model._meta.label_lower}'
+        )
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """Invalidations only reach the other workers through a shared default cache"""
+    if isinstance(caches['default'], LocMemCache):
+        return [checks.Warning(
+            'The default cache is local to each process: with several workers, writes '
+            'do not invalidate the cached responses, settings and reference data of the others.',
+            hint='Configure a shared CACHES backend (see core/settings/production.py).',
+            id='core.W001',
+        )]
+    return []
+
+
+def etag_matches(request, etag):
+    """Whether the If-None-Match header of a request lists an ETag"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+
+def accepts_gzip(request):
+    """Whether the Accept-Encoding header of a request accepts gzip, honouring q=0"""
+    qualities = {}
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, *params = item.split(';')
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def not_modified(request, validators):
+    """Whether a conditional GET matches validators ({'etag', optional 'last_modified'})"""
+    if 'HTTP_IF_NONE_MATCH' in request.META:
+        return etag_matches(request, validators['etag'])
+    if validators.get('last_modified') is None:
+        return False
+    modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return modified_since is not None and int(validators['last_modified']) <= modified_since
+
+
+class EarlyResponse(Exception):
+    """Raised from initial() to answer a request without running its handler"""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified validators and 304s for the GET responses of a view
+
+    get_response_validators() runs once the request is authenticated and
+    permitted, before the handler. A GET matching the validators it returns
+    gets a 304 without the handler running; the validators are added to the
+    200 and 304 responses in finalize_response().
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.response_validators = None
+        if request.method == 'GET':
+            self.response_validators = self.get_response_validators(request)
+            if self.response_validators and not_modified(request, self.response_validators):
+                raise EarlyResponse(Response(status=status.HTTP_304_NOT_MODIFIED))
+
+    def get_response_validators(self, request):
+        """{'etag': ..., 'last_modified': timestamp or None} of a GET, or None"""
+        return None
+
+    def handle_exception(self, exc):
+        if isinstance(exc, EarlyResponse):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, 'response_validators', None)
+        if validators and response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = validators['etag']
+            if validators.get('last_modified') is not None:
+                response['Last-Modified'] = http_date(validators['last_modified'])
+            response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class CachedResponseMixin(ConditionalGetMixin):
+    """
+    Caches the GET responses of some viewset actions per RBAC scope
+
+    Configure per viewset:
+        response_cache_actions = ('list', 'stats')
+        response_cache_models = (Service, ServiceType)  # writes to these invalidate
+        response_cache_user_scoped_roles = ('SURVEYOR',)  # rows filtered by user
+        response_cache_timeout = 60  # default RESPONSE_CACHE_TIMEOUT
+
+    The models default to the queryset's model; list responses also depend on
+    SystemSettings (page sizes). Their writes must be tracked (see
+    track_model_writes) for the cache to see them.
+
+    A cached entry answers the request from initial(), before the handler
+    runs; the response of a miss is stored in finalize_response().
+    """
+    response_cache_actions = ()
+    response_cache_models = ()
+    response_cache_user_scoped_roles = ()
+    response_cache_timeout = None
+
+    def initial(self, request, *args, **kwargs):
+        self.response_cache_key = None
+        self.response_cache_status = None
+        super().initial(request, *args, **kwargs)
+        if self.response_cache_status == 'HIT':
+            raise EarlyResponse(Response(self.response_validators['data']))
+
+    def get_response_validators(self, request):
+        if self.action not in self.response_cache_actions or not self.get_response_cache_timeout():
+            return None
+        self.response_cache_key = self.get_response_cache_key(request)
+        entry = cache.get(self.response_cache_key)
+        self.response_cache_status = 'MISS' if entry is None else 'HIT'
+        return entry
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (self.response_cache_status == 'MISS' and isinstance(response, Response)
+                and response.status_code == status.HTTP_200_OK):
+            body = json.dumps(response.data, cls=DjangoJSONEncoder).encode()
+            entry = {
+                'data': response.data,
+                'etag': '"%s"' % hashlib.sha1(body).hexdigest(),
+                'last_modified': time.time(),
+            }
+            cache.set(self.response_cache_key, entry, self.get_response_cache_timeout())
+            self.response_validators = entry
+            if not_modified(request, entry):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.response_cache_status and self.response_validators:
+            response['X-Cache'] = self.response_cache_status
+            # The scope comes from the credentials
+            patch_vary_headers(response, ['Authorization'])
+        return response
+
+    def get_response_cache_timeout(self):
+        if self.response_cache_timeout is not None:
+            return self.response_cache_timeout
+        return getattr(settings, 'RESPONSE_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+    def get_response_cache_models(self):
+        models = list(self.response_cache_models or [self.queryset.model])
+        if self.action == 'list':
+            models.append(SystemSettings)
+        return models
+
+    def get_response_cache_scope(self, request):
+        """Callers sharing a scope see the same rows"""
+        user = request.user
+        if not user or not user.is_authenticated:
+            return 'anonymous'
+        if user.is_superuser:
+            return 'superuser'
+        role = getattr(user, 'role', '')
+        if role in self.response_cache_user_scoped_roles:
+            return f'{role}:{user.pk}'
+        return role
+
+    def get_response_cache_key(self, request):
+        params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+        parts = [
+            f'{type(self).__module__}.{type(self).__qualname__}', self.action, self.kwargs,
+            request.get_host(), params, self.get_response_cache_scope(request),
+            get_generations(self.get_response_cache_models()),
+        ]
+        digest = hashlib.sha1(json.dumps(parts, default=str).encode()).hexdigest()
+        return f'{RESPONSE_CACHE_PREFIX}{digest}'
@@ -0,0 +1,209 @@
+"""
+Keyset (cursor) pagination for high-volume listings
+
+Page-number pagination runs `OFFSET n` plus a `COUNT(*)` per request, both
+proportional to the table size. KeysetPagination keeps page-number pages as
+the default and adds a keyset mode, chosen per request with
+`?pagination=cursor` (first page) or `?cursor=` (the `next`/`previous` links):
+the view's `keyset_ordering` (e.g. ('-timestamp', '-id')) is walked with
+`WHERE (timestamp, id) < (last row)`, which reads one page from the
+matching index at any depth. Cursors are opaque, URL-safe tokens. No count
+is run unless asked with `?estimate_count=true`, which sets the
+X-Estimated-Count header from a count capped at KEYSET_COUNT_LIMIT rows
+("10000+" beyond it; MySQL table statistics for unfiltered listings).
+
+Page sizes come from SystemSettings: default_page_size unless the request
+asks for another `?page_size=`, which is capped at max_page_size.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from apps.settings.loader import get_system_settings
+
+DEFAULT_COUNT_LIMIT = 10000
+
+TRUE_VALUES = {'1', 'true', 'yes'}
+
+
+def encode_cursor(values, reverse=False):
+    """Opaque cursor of the ordering values of a row"""
+    payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(ordering values, reverse) of a cursor"""
+    try:
+        payload = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(payload)
+        return list(data['v']), bool(data.get('r'))
+    except (TypeError, ValueError, KeyError, AttributeError):
+        raise NotFound('Invalid cursor')
+
+
+def keyset_filter(fields, values):
+    """
+    Q of the rows after `values` in the ordering `fields`: for ('-timestamp',
+    '-id'), timestamp <= t AND (timestamp < t OR (timestamp = t AND id < i));
+    the leading range lets the database seek the index
+    """
+    after = Q()
+    for index, field in enumerate(fields):
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        equal = {fields[position].lstrip('-'): values[position] for position in range(index)}
+        after |= Q(**equal, **{f'{field.lstrip("-")}__{lookup}': values[index]})
+    first = fields[0]
+    return Q(**{f'{first.lstrip("-")}__{"lte" if first.startswith("-") else "gte"}': values[0]}) & after
+
+
+def estimate_count(queryset, limit):
+    """
+    (count, capped) of a queryset, the count stopping at `limit` rows; for
+    an unfiltered MySQL table, the table statistics
+    """
+    connection = connections[queryset.db]
+    if connection.vendor == 'mysql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT TABLE_ROWS FROM information_schema.TABLES '
+                'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] is not None:
+            return row[0], False
+    count = queryset.order_by()[:limit + 1].count()
+    return min(count, limit), count > limit
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page-number pagination with an opt-in keyset mode over the view's
+    `keyset_ordering`, sized by SystemSettings
+    """
+    # None: SystemSettings.default_page_size (subclasses may fix a size)
+    page_size = None
+    page_size_query_param = 'page_size'
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'estimate_count'
+
+    def get_page_size(self, request):
+        system = get_system_settings()
+        if self.page_size_query_param in request.query_params:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True, cutoff=system.max_page_size,
+                )
+            except ValueError:
+                pass
+        return min(self.page_size or system.default_page_size, system.max_page_size)
+
+    def use_keyset(self, request, view):
+        return getattr(view, 'keyset_ordering', None) and (
+            self.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = bool(self.use_keyset(request, view))
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM)
+        if ordering and ordering != view.keyset_ordering[0]:
+            raise ValidationError({
+                api_settings.ORDERING_PARAM: f'Cursor pagination is ordered by {", ".join(view.keyset_ordering)}.'
+            })
+
+        self.request = request
+        self.ordering = list(view.keyset_ordering)
+        self.limit = self.get_page_size(request)
+        self.estimated_count = None
+        if request.query_params.get(self.count_query_param, '').lower() in TRUE_VALUES:
+            self.estimated_count = estimate_count(
+                queryset, getattr(settings, 'KEYSET_COUNT_LIMIT', DEFAULT_COUNT_LIMIT)
+            )
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        values, reverse = decode_cursor(cursor) if cursor else (None, False)
+        if values is not None and len(values) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            try:
+                values = [
+                    queryset.model._meta.get_field(field.lstrip('-')).to_python(value)
+                    for field, value in zip(ordering, values)
+                ]
+                queryset = queryset.filter(keyset_filter(ordering, values))
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound('Invalid cursor')
+
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+        self.rows = rows
+        # Going back there is always a next page; going forward, a previous one after the first
+        self.has_next = has_more or (reverse and bool(rows))
+        self.has_previous = (has_more if reverse else values is not None) and bool(rows)
+        return rows
+
+    def cursor_values(self, row):
+        values = []
+        for field in self.ordering:
+            value = getattr(row, field.lstrip('-'))
+            values.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return values
+
+    def cursor_link(self, row, reverse):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        url = remove_query_param(url, self.mode_query_param)
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(self.cursor_values(row), reverse))
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        return self.cursor_link(self.rows[-1], False) if self.has_next else None
+
+    def get_previous_link(self):
+        if not self.keyset:
+            return super().get_previous_link()
+        return self.cursor_link(self.rows[0], True) if self.has_previous else None
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+        headers = {}
+        if self.estimated_count is not None:
+            count, capped = self.estimated_count
+            headers['X-Estimated-Count'] = f'{count}+' if capped else str(count)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }, headers=headers)
+
+    def get_paginated_response_schema(self, schema):
+        response = super().get_paginated_response_schema(schema)
+        # Keyset pages have no count
+        response['required'] = ['results']
+        return response
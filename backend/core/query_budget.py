@@ -0,0 +1,264 @@
+"""
+Query budget harness for the API
+
+Seeds the `seed_data` dataset plus a few rows of every model it does not
+cover, discovers every GET route registered on the v1 routers (list, detail
+and extra actions such as stats) and counts the queries of each one for
+every role. `core/tests.py` asserts that the counts do not grow
+with the number of rows and stay within the recorded budget in
+query_budget.json.
+
+Record a new budget (e.g. after adding an endpoint) with:
+
+    QUERY_BUDGET_RECORD=core/query_budget.json python manage.py test core
+
+QUERY_BUDGET_RECORD may point anywhere, e.g. for CI to diff against the
+committed budget. Only query counts are recorded: they are the same on
+every run, while timings vary with the machine. Measure latency with
+`manage.py benchmark_api` instead.
+"""
+import json
+import random
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+from rest_framework.test import APIClient
+from rest_framework.viewsets import ViewSetMixin
+
+from apps.accounts.models import UserActivityLog
+from apps.directory.models import Service
+from apps.help.models import HelpCategory, HelpArticle, FAQ, SupportTicket, SupportTicketReply
+from apps.logs.models import ActivityLog, VerificationLog, DataChangeLog, SystemError, ImportExportLog
+from apps.survey.models import Survey, SurveyAuditLog
+
+User = get_user_model()
+
+BUDGET_FILE = Path(__file__).resolve().parent / 'query_budget.json'
+
+API_PREFIX = 'v1/'
+ROLES = [User.Role.ADMIN, User.Role.SURVEYOR, User.Role.VERIFIER, User.Role.VIEWER]
+
+URL_ARGUMENT = re.compile(r'\(\?P<(\w+)>[^)]*\)')
+
+
+def seed_dataset(seed=0):
+    """Load the seed_data dataset (deterministically) and add the first batch of extra rows"""
+    random.seed(seed)
+    call_command('seed_data', stdout=StringIO())
+    add_rows(0)
+
+
+def add_rows(batch):
+    """
+    Add one batch of rows to every table the API lists: a survey per
+    service and an audit log per survey, services with surveys and
+    verification history, logs, help content and tickets. Batches are
+    numbered so that their unique fields do not collide.
+    """
+    users = {role: list(User.objects.filter(role=role).order_by('pk')) for role in ROLES}
+    admin = users[User.Role.ADMIN][0]
+    template = Service.objects.order_by('pk').first()
+
+    # Detail routes list children: add some to every existing parent
+    for survey in Survey.objects.all():
+        SurveyAuditLog.objects.create(
+            survey=survey, action=SurveyAuditLog.Action.UPDATED, user=survey.surveyor,
+            previous_status=survey.verification_status, new_status=survey.verification_status,
+        )
+    for n, service in enumerate(Service.objects.order_by('pk')):
+        Survey.objects.create(
+            service=service,
+            # seed_data surveys are at most 90 days old
+            survey_date=date.today() - timedelta(days=100 + batch),
+            survey_period_start=date.today() - timedelta(days=130 + batch),
+            survey_period_end=date.today() - timedelta(days=100 + batch),
+            surveyor=users[User.Role.SURVEYOR][n % len(users[User.Role.SURVEYOR])],
+        )
+
+    for i, surveyor in enumerate(users[User.Role.SURVEYOR]):
+        service = Service.objects.get(pk=template.pk)
+        service.pk = None
+        service.name = f'Layanan Uji {batch}.{i}'
+        service.created_by = admin
+        service.save()
+        service.target_populations.set(template.target_populations.all())
+
+        survey = Survey.objects.create(
+            service=service,
+            survey_date=date.today() - timedelta(days=i + 1),
+            survey_period_start=date.today() - timedelta(days=30),
+            survey_period_end=date.today(),
+            latitude=service.latitude,
+            longitude=service.longitude,
+            location_accuracy=Decimal('10.0'),
+            surveyor=surveyor,
+            assigned_verifier=users[User.Role.VERIFIER][0],
+            verification_status=Survey.Status.SUBMITTED,
+        )
+        SurveyAuditLog.objects.create(
+            survey=survey, action=SurveyAuditLog.Action.SUBMITTED, user=surveyor,
+            previous_status=Survey.Status.DRAFT, new_status=Survey.Status.SUBMITTED,
+        )
+        VerificationLog.objects.create(
+            survey=survey, action=VerificationLog.Action.SUBMITTED, performed_by=surveyor,
+            previous_status=Survey.Status.DRAFT, new_status=Survey.Status.SUBMITTED,
+            new_verifier=users[User.Role.VERIFIER][0],
+        )
+
+    for role, role_users in users.items():
+        for user in role_users:
+            ActivityLog.objects.create(
+                user=user, username=user.email, action=ActivityLog.Action.LOGIN,
+                description='User logged into system', request_method='POST',
+            )
+            UserActivityLog.objects.create(user=user, action=UserActivityLog.Action.LOGIN)
+            DataChangeLog.objects.create(
+                user=user, username=user.email, model_name='Service', app_label='directory',
+                operation=DataChangeLog.Operation.UPDATE, object_repr=f'Service #{batch}',
+            )
+            ticket = SupportTicket.objects.create(
+                user=user, subject=f'Ticket {batch}', description='Help', assigned_to=admin,
+            )
+            SupportTicketReply.objects.create(ticket=ticket, user=admin, message='On it', is_staff_reply=True)
+
+    SystemError.objects.create(
+        severity=SystemError.Severity.ERROR, error_type=SystemError.ErrorType.API,
+        error_message=f'Error {batch}', user=admin, username=admin.email,
+    )
+    ImportExportLog.objects.create(
+        operation=ImportExportLog.Operation.EXPORT, status=ImportExportLog.Status.COMPLETED,
+        user=admin, username=admin.email, model_name='Service',
+        file_format=ImportExportLog.Format.CSV, file_name=f'export_{batch}.csv',
+    )
+
+    category = HelpCategory.objects.create(name=f'Panduan {batch}', slug=f'panduan-{batch}')
+    for i in range(2):
+        HelpArticle.objects.create(
+            category=category, title=f'Artikel {batch}.{i}', slug=f'artikel-{batch}-{i}',
+            summary='Ringkasan', content='Isi artikel', status='published', author=admin,
+            is_featured=i == 0,
+        )
+        FAQ.objects.create(question=f'Pertanyaan {batch}.{i}?', answer='Jawaban', category=category)
+
+
+def iter_routes(patterns=None, prefix=''):
+    """(path regex, viewset view function) of every router-registered route"""
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern).lstrip('^')
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            view_class = getattr(pattern.callback, 'cls', None)
+            if view_class is not None and issubclass(view_class, ViewSetMixin):
+                yield route, pattern.callback
+
+
+def collect_endpoints():
+    """
+    GET endpoints of the v1 routers as {name: lookup field, or None for list routes}
+
+    Names are the path with the lookup as `{pk}`, e.g.
+    'v1/directory/services/{pk}/surveys/'. Format-suffix variants are skipped.
+    """
+    endpoints = {}
+    for route, callback in iter_routes():
+        if not route.startswith(API_PREFIX) or 'format' in route or 'get' not in callback.actions:
+            continue
+        name = URL_ARGUMENT.sub('{pk}', route).rstrip('$')
+        endpoints[name] = getattr(callback.cls, 'lookup_field', 'pk') if callback.initkwargs.get('detail') else None
+    return endpoints
+
+
+def first_row(response):
+    """First row of a (paginated) list response, the object of a singleton, or None"""
+    data = getattr(response, 'data', None)
+    if isinstance(data, dict):
+        data = data.get('results', [data])
+    if not data or not isinstance(data, list) or not isinstance(data[0], dict):
+        return None
+    return data[0]
+
+
+def measure(client, url):
+    """(response, query count) of a GET request"""
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    return response, len(context.captured_queries)
+
+
+def measure_endpoints(users, objects=None):
+    """
+    Query count of every endpoint for every role
+
+    `users` maps each role to the user making its requests. Detail routes
+    request the first row their list returns for that role (skipped when it
+    is empty), or the same objects as a previous run when given its
+    `objects`. Each URL is requested once before measuring, so that
+    process-wide caches are warm; the response cache (core.caching) is off,
+    so that cached endpoints are measured computing their response, and the
+    process caches of the settings and reference data do not check their
+    version stamps, so that a reload never lands between the two requests.
+
+    Returns ({endpoint: {role: {status, queries}}}, objects).
+    """
+    with override_settings(RESPONSE_CACHE_TIMEOUT=0, SYSTEM_SETTINGS_CHECK_INTERVAL=float('inf'),
+                           REFERENCE_DATA_CHECK_INTERVAL=float('inf')):
+        return _measure_endpoints(users, objects)
+
+
+def _measure_endpoints(users, objects):
+    endpoints = collect_endpoints()
+    report = {}
+    objects = objects or {}
+    for role, user in users.items():
+        # Report server errors instead of raising them
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user=user)
+        first_rows = objects.setdefault(role, {})
+        # List routes first: detail routes look up the first row of their list
+        for name, lookup_field in sorted(endpoints.items(), key=lambda item: item[1] is not None):
+            if lookup_field:
+                row = first_rows.get(name.split('{pk}')[0])
+                field = 'id' if lookup_field == 'pk' else lookup_field
+                if row is None or row.get(field) is None:
+                    continue
+                url = '/' + name.replace('{pk}', str(row[field]))
+            else:
+                url = '/' + name
+            client.get(url)
+            response, queries = measure(client, url)
+            if lookup_field is None and name not in first_rows:
+                first_rows[name] = first_row(response)
+            report.setdefault(name, {})[role] = {
+                'status': response.status_code,
+                'queries': queries,
+            }
+    return report, objects
+
+
+def load_budget():
+    """{endpoint: {role: query budget}} recorded in query_budget.json"""
+    if not BUDGET_FILE.exists():
+        return {}
+    return json.loads(BUDGET_FILE.read_text())['queries']
+
+
+def write_report(report, path):
+    """Write the measured query counts (the budget) as JSON"""
+    data = {
+        'queries': {
+            name: {role: row['queries'] for role, row in roles.items()}
+            for name, roles in sorted(report.items())
+        },
+    }
+    Path(path).write_text(json.dumps(data, indent=2, sort_keys=True) + '\n')
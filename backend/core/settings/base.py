@@ -6,6 +6,7 @@ Common settings shared between development and production.
 from pathlib import Path
 from datetime import timedelta
 import os
+import sys
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -14,6 +15,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 # Load environment variables from .env file
 load_dotenv(BASE_DIR / '.env')
 
+# True while running the Django test runner (background work runs inline)
+TESTING = len(sys.argv) > 1 and sys.argv[1] == 'test'
+
 
 # Application definition
 
@@ -39,6 +43,7 @@ INSTALLED_APPS = [
     'apps.logs',
     'apps.help',
     'apps.settings',
+    'apps.geo',
 ]
 
 MIDDLEWARE = [
@@ -52,6 +57,8 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     # RBAC validation middleware - Add after authentication
     'apps.accounts.middleware.RBACValidationMiddleware',
+    # 503 for non-admins while SystemSettings.maintenance_mode is on
+    'apps.settings.middleware.MaintenanceModeMiddleware',
 ]
 
 ROOT_URLCONF = 'core.urls'
@@ -133,8 +140,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 50,
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.SearchFilter',
@@ -150,3 +156,106 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': False,
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
+
+# Dashboard snapshot: maximum age (seconds) of a precomputed section before
+# it is recomputed on read, even without an invalidating write
+DASHBOARD_SNAPSHOT_MAX_AGE = 300
+
+# Background jobs (large exports) run on a pool of BACKGROUND_TASKS_MAX_WORKERS
+# threads per process; inline under tests
+BACKGROUND_TASKS_ASYNC = not TESTING
+BACKGROUND_TASKS_MAX_WORKERS = 2
+
+# Exports still unfinished after this many seconds (their process restarted)
+# are reported as failed
+EXPORT_JOB_TIMEOUT = 3600
+
+# Excel exports with more rows than this are built as a background job
+EXPORT_EXCEL_INLINE_LIMIT = 2000
+
+# Activity logs are queued and bulk-inserted by a background flusher thread,
+# every ACTIVITY_LOG_BATCH_SIZE entries or ACTIVITY_LOG_FLUSH_INTERVAL seconds;
+# written synchronously under tests
+ACTIVITY_LOG_ASYNC = not TESTING
+ACTIVITY_LOG_BATCH_SIZE = 100
+ACTIVITY_LOG_FLUSH_INTERVAL = 2.0
+ACTIVITY_LOG_MAX_QUEUE_SIZE = 10000
+
+# Help article and FAQ views are counted in memory and added to views_count
+# every HELP_VIEW_FLUSH_INTERVAL seconds; written synchronously under tests
+HELP_VIEW_COUNTS_ASYNC = not TESTING
+HELP_VIEW_FLUSH_INTERVAL = 10.0
+
+# Purged log rows are archived here by `manage.py purge_logs --archive`
+LOG_ARCHIVE_DIR = BASE_DIR / 'log_archives'
+
+# The cached MTC tree, boundary payloads and responses, and the version
+# stamps of the process-wide caches (settings, reference registry, region
+# index, help search) live in the default cache, so writes in one process
+# reach the others only through a shared backend. The process-local default
+# suits a single development process; production.py configures a shared one
+# (`manage.py check --deploy` warns otherwise)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Seconds the MTC classification tree stays cached (writes invalidate it)
+MTC_TREE_CACHE_TIMEOUT = 3600
+
+# Seconds between checks of the shared reference-data version stamp (MTC,
+# BSIC, service types, target populations) by each process
+REFERENCE_DATA_CHECK_INTERVAL = 5
+
+# Service map (/directory/services/map/): default and maximum ?radius_km= of
+# ?near= queries, and the highest ?zoom= at which services are clustered
+MAP_DEFAULT_RADIUS_KM = 10
+MAP_MAX_RADIUS_KM = 500
+MAP_CLUSTER_MAX_ZOOM = 15
+
+# Region boundaries (/geo/boundaries/): source file of `manage.py
+# ingest_boundaries`, zoom levels simplified ahead of time (at a tolerance of
+# GEO_SIMPLIFY_PIXELS screen pixels), the zoom served by default, and how long
+# payloads are cached server-side and by clients (seconds)
+GEO_BOUNDARIES_FILE = BASE_DIR.parent / 'data' / 'Kebumen.geojson'
+GEO_BOUNDARY_ZOOMS = [8, 10, 12, 14]
+GEO_SIMPLIFY_PIXELS = 1.0
+GEO_DEFAULT_ZOOM = 10
+GEO_BOUNDARY_CACHE_TIMEOUT = 3600
+GEO_BOUNDARY_MAX_AGE = 300
+
+# Region index assigning services and surveys to a kecamatan on save: grid
+# cell size (degrees) and seconds between checks of its shared version stamp
+GEO_INDEX_CELL_DEGREES = 0.05
+GEO_INDEX_CHECK_INTERVAL = 5
+
+# Service search (?search= on /directory/services/): words of a query beyond
+# this many are ignored
+SERVICE_SEARCH_MAX_TERMS = 10
+
+# Help centre search: relative weight of a word in the title (FAQ question),
+# tags and body, characters of the highlighted snippet, and seconds between
+# checks of the shared index version stamp by each process
+HELP_SEARCH_WEIGHTS = {'title': 3.0, 'tags': 2.0, 'body': 1.0}
+HELP_SEARCH_SNIPPET_CHARS = 160
+HELP_SEARCH_CHECK_INTERVAL = 5
+
+# Keyset pagination (?pagination=cursor): ?estimate_count=true counts at most
+# this many rows for the X-Estimated-Count header
+KEYSET_COUNT_LIMIT = 10000
+
+# Seconds between checks of the shared SystemSettings version stamp by each
+# process (saves in the same process take effect immediately)
+SYSTEM_SETTINGS_CHECK_INTERVAL = 5
+
+# Role-scoped response cache of list and stats endpoints (core.caching):
+# seconds a response is reused at most (writes invalidate it sooner); 0 disables
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Delta sync (apps.survey.sync): seconds the returned watermark trails the
+# start of a sync, so rows committed while it runs are sent again, not missed
+SYNC_WATERMARK_LAG = 60
+
+# Batch upload of offline surveys (apps.survey.ingest): most surveys per request
+SURVEY_BATCH_MAX_ITEMS = 200
@@ -35,6 +35,28 @@ DATABASES = {
     }
 }
 
+# Cache shared by every worker (see CACHES in base.py): Redis when REDIS_URL
+# is set (needs the redis package), else a table of the database, created
+# with `python manage.py createcachetable`
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            'OPTIONS': {
+                # Cached responses are many; culled version stamps only cause a reload
+                'MAX_ENTRIES': 20000,
+            },
+        }
+    }
+
 # =============================================================================
 # STATIC AND MEDIA FILES (Production)
 # =============================================================================
@@ -0,0 +1,263 @@
+"""
+Query budget tests for every router-registered API endpoint (see core.query_budget)
+and tests of the shared API machinery
+"""
+import os
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.directory.models import BasicStableInputsOfCare, MainTypeOfCare, Service, ServiceType
+from apps.logs.models import ActivityLog
+from apps.survey.models import Survey
+from .caching import check_shared_cache
+from .pagination import KeysetPagination, decode_cursor, encode_cursor
+from .query_budget import ROLES, seed_dataset, add_rows, measure_endpoints, load_budget, write_report
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    """Every GET endpoint runs a bounded number of queries for every role"""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_dataset()
+        cls.users = {role: User.objects.filter(role=role).order_by('pk').first() for role in ROLES}
+        cls.small_report, objects = measure_endpoints(cls.users)
+        add_rows(1)
+        add_rows(2)
+        # Detail routes are measured on the same objects, which now have more children
+        cls.report, _ = measure_endpoints(cls.users, objects)
+
+        path = os.environ.get('QUERY_BUDGET_RECORD')
+        if path:
+            write_report(cls.report, path)
+
+    def test_no_server_errors(self):
+        errors = [
+            f'{name} as {role}: {row["status"]}'
+            for name, roles in self.report.items() for role, row in roles.items()
+            if row['status'] >= 500
+        ]
+        self.assertEqual(errors, [])
+
+    def test_queries_do_not_grow_with_rows(self):
+        """The same requests run the same queries with three times the rows"""
+        grown = [
+            f'{name} as {role}: {self.small_report[name][role]["queries"]} -> {row["queries"]}'
+            for name, roles in self.report.items() for role, row in roles.items()
+            if role in self.small_report.get(name, {})
+            and row['queries'] != self.small_report[name][role]['queries']
+        ]
+        self.assertEqual(grown, [])
+
+    def test_queries_within_budget(self):
+        if os.environ.get('QUERY_BUDGET_RECORD'):
+            self.skipTest('Recording a new query budget')
+        budget = load_budget()
+        over = [
+            f'{name} as {role}: {row["queries"]} queries, budget {budget.get(name, {}).get(role)}'
+            for name, roles in self.report.items() for role, row in roles.items()
+            if row['queries'] > budget.get(name, {}).get(role, -1)
+        ]
+        self.assertEqual(
+            over, [], 'Fix the regression or record a new budget with QUERY_BUDGET_RECORD (see core.query_budget)'
+        )
+
+
+@mock.patch.object(KeysetPagination, 'page_size', 3)
+class KeysetPaginationTests(TestCase):
+    """?pagination=cursor pages of the activity log"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(email='admin@test.com', password='pass', role=User.Role.ADMIN)
+        now = timezone.now()
+        # Pairs of entries share a timestamp, so pages split ties
+        ActivityLog.objects.bulk_create([
+            ActivityLog(
+                user=cls.admin, username=cls.admin.email, action=ActivityLog.Action.READ,
+                description=f'Entry {n}', timestamp=now - timedelta(minutes=n // 2),
+            )
+            for n in range(8)
+        ])
+        cls.expected = list(ActivityLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def get(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response
+
+    def ids(self, response):
+        return [row['id'] for row in response.data['results']]
+
+    def test_walks_every_row_once_both_ways(self):
+        response = self.get('/v1/logs/activity/', pagination='cursor')
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        pages = [self.ids(response)]
+        while response.data['next']:
+            response = self.get(response.data['next'])
+            pages.append(self.ids(response))
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 2])
+
+        back = [self.ids(response)]
+        while response.data['previous']:
+            response = self.get(response.data['previous'])
+            back.insert(0, self.ids(response))
+        self.assertEqual(back, pages)
+
+    def test_page_number_mode_unchanged(self):
+        response = self.get('/v1/logs/activity/', page=2)
+        self.assertEqual(response.data['count'], 8)
+        self.assertEqual(self.ids(response), self.expected[3:6])
+
+    def test_no_count_or_offset(self):
+        first = self.get('/v1/logs/activity/', pagination='cursor')
+        with CaptureQueriesContext(connection) as queries:
+            self.get(first.data['next'])
+        sql = ' '.join(query['sql'] for query in queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_estimated_count_header(self):
+        response = self.get('/v1/logs/activity/', pagination='cursor', estimate_count='true')
+        self.assertEqual(response['X-Estimated-Count'], '8')
+        with self.settings(KEYSET_COUNT_LIMIT=5):
+            response = self.get('/v1/logs/activity/', pagination='cursor', estimate_count='true')
+        self.assertEqual(response['X-Estimated-Count'], '5+')
+
+    def test_invalid_cursor_and_ordering(self):
+        self.assertEqual(self.client.get('/v1/logs/activity/', {'cursor': 'garbage'}).status_code, 404)
+        response = self.client.get('/v1/logs/activity/', {'pagination': 'cursor', 'ordering': 'action'})
+        self.assertEqual(response.status_code, 400)
+        next_link = self.get('/v1/logs/activity/', pagination='cursor').data['next']
+        values, reverse = decode_cursor(next_link.split('cursor=')[1])
+        self.assertEqual(len(values), 2)
+        self.assertFalse(reverse)
+
+        # Well-formed cursors holding values of the wrong type
+        for tampered in ([values[0], 'x'], ['not a date', values[1]], [None, values[1]], [[1], values[1]]):
+            response = self.client.get('/v1/logs/activity/', {'cursor': encode_cursor(tampered)})
+            self.assertEqual(response.status_code, 404, tampered)
+
+
+class ResponseCacheTests(TestCase):
+    """Role-scoped caching of list and stats responses (see core.caching)"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(email='admin@test.com', password='pass', role=User.Role.ADMIN)
+        self.viewers = [
+            User.objects.create_user(email=f'viewer{n}@test.com', password='pass', role=User.Role.VIEWER)
+            for n in range(2)
+        ]
+        self.surveyors = [
+            User.objects.create_user(email=f'surveyor{n}@test.com', password='pass', role=User.Role.SURVEYOR)
+            for n in range(2)
+        ]
+        self.mtc = MainTypeOfCare.objects.create(code='R1', name='Residential Care')
+        self.bsic = BasicStableInputsOfCare.objects.create(code='A', name='Accessibility')
+        self.service_type = ServiceType.objects.create(name='Psychiatric Hospital')
+        self.service = self.create_service(name='Active')
+        self.create_service(name='Closed', is_active=False)
+        self.client = APIClient()
+
+    def create_service(self, **fields):
+        return Service.objects.create(
+            mtc=self.mtc, bsic=self.bsic, service_type=self.service_type,
+            city='Kebumen', province='Jawa Tengah', created_by=self.admin, **fields
+        )
+
+    def get(self, user, url, **headers):
+        self.client.force_authenticate(user=user)
+        return self.client.get(url, headers=headers)
+
+    def test_shared_within_a_role(self):
+        first = self.get(self.viewers[0], '/v1/directory/services/stats/')
+        self.assertEqual((first['X-Cache'], first.data['total_services']), ('MISS', 1))
+
+        with self.assertNumQueries(0):
+            second = self.get(self.viewers[1], '/v1/directory/services/stats/')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        admin = self.get(self.admin, '/v1/directory/services/stats/')
+        self.assertEqual((admin['X-Cache'], admin.data['total_services']), ('MISS', 2))
+
+    def test_query_string_normalized(self):
+        self.get(self.viewers[0], '/v1/directory/services/?city=Kebumen&ordering=name')
+        response = self.get(self.viewers[0], '/v1/directory/services/?ordering=name&city=Kebumen')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        response = self.get(self.viewers[0], '/v1/directory/services/?ordering=-name&city=Kebumen')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_writes_invalidate(self):
+        self.get(self.viewers[0], '/v1/directory/services/stats/')
+        self.create_service(name='New')
+        response = self.get(self.viewers[1], '/v1/directory/services/stats/')
+        self.assertEqual((response['X-Cache'], response.data['total_services']), ('MISS', 2))
+
+        self.get(self.viewers[0], '/v1/directory/services/')
+        self.mtc.name = 'Residential'
+        self.mtc.save()
+        response = self.get(self.viewers[0], '/v1/directory/services/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['mtc_name'], 'Residential')
+
+    def test_surveyors_scoped_per_user(self):
+        for days, surveyor in enumerate(self.surveyors):
+            Survey.objects.create(
+                service=self.service, surveyor=surveyor, survey_date=date.today() - timedelta(days=days),
+                survey_period_start=date.today(), survey_period_end=date.today(),
+            )
+        for surveyor in self.surveyors:
+            response = self.get(surveyor, '/v1/surveys/surveys/')
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual([row['surveyor'] for row in response.data['results']], [surveyor.pk])
+
+    def test_conditional_requests(self):
+        first = self.get(self.viewers[0], '/v1/directory/services/stats/')
+        response = self.get(self.viewers[1], '/v1/directory/services/stats/', if_none_match=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+
+        response = self.get(
+            self.viewers[1], '/v1/directory/services/stats/', if_modified_since=first['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.get(self.viewers[1], '/v1/directory/services/stats/', if_none_match='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_disabled(self):
+        with self.settings(RESPONSE_CACHE_TIMEOUT=0):
+            self.get(self.viewers[0], '/v1/directory/services/stats/')
+            response = self.get(self.viewers[0], '/v1/directory/services/stats/')
+        self.assertNotIn('X-Cache', response)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """`check --deploy` warns when the workers cannot share invalidations"""
+
+    def test_process_local_cache(self):
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['core.W001'])
+
+    @override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp/cache-check',
+    }})
+    def test_shared_cache(self):
+        self.assertEqual(check_shared_cache(None), [])
@@ -30,6 +30,7 @@ urlpatterns = [
     path('v1/analytics/', include('apps.analytics.urls')),
     path('v1/help/', include('apps.help.urls')),
     path('v1/settings/', include('apps.settings.urls')),
+    path('v1/geo/', include('apps.geo.urls')),
 ]
 
 # Serve media files in development
@@ -2,6 +2,9 @@
 Seed script for adding DESDE-LTC classification data
 This includes MTC, BSIC, Service Types, and Target Populations
 Run with: python seed/seed_classifications.py (from backend directory)
+
+Rows are inserted in bulk by the directory import engine; existing codes
+and names are left untouched.
 """
 import os
 import sys
@@ -13,11 +16,10 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 django.setup()
 
-from apps.directory.models import MainTypeOfCare, BasicStableInputsOfCare, ServiceType, TargetPopulation
+from apps.directory.importer import import_directory
 
-def seed_mtc():
-    """Seed Main Type of Care (MTC) classifications"""
-    print("Seeding Main Type of Care (MTC) data...")
+def mtc_rows():
+    """Main Type of Care (MTC) classifications to import"""
 
     mtc_data = [
         # Residential Care
@@ -76,20 +78,10 @@ def seed_mtc():
         },
     ]
 
-    created_count = 0
-    for data in mtc_data:
-        if not MainTypeOfCare.objects.filter(code=data['code']).exists():
-            MainTypeOfCare.objects.create(**data)
-            created_count += 1
-            print(f"✓ Created MTC: {data['code']} - {data['name']}")
-        else:
-            print(f"- Skipped (exists): {data['code']}")
-
-    print(f"MTC: Created {created_count} new, Total: {MainTypeOfCare.objects.count()}\n")
+    return mtc_data
 
-def seed_bsic():
-    """Seed Basic Stable Inputs of Care (BSIC) classifications"""
-    print("Seeding Basic Stable Inputs of Care (BSIC) data...")
+def bsic_rows():
+    """Basic Stable Inputs of Care (BSIC) classifications to import"""
 
     bsic_data = [
         # Hospital Care
@@ -179,20 +171,10 @@ def seed_bsic():
         },
     ]
 
-    created_count = 0
-    for data in bsic_data:
-        if not BasicStableInputsOfCare.objects.filter(code=data['code']).exists():
-            BasicStableInputsOfCare.objects.create(**data)
-            created_count += 1
-            print(f"✓ Created BSIC: {data['code']} - {data['name']}")
-        else:
-            print(f"- Skipped (exists): {data['code']}")
-
-    print(f"BSIC: Created {created_count} new, Total: {BasicStableInputsOfCare.objects.count()}\n")
+    return bsic_data
 
-def seed_service_types():
-    """Seed Service Types"""
-    print("Seeding Service Types data...")
+def service_types_rows():
+    """Service Types to import"""
 
     service_types_data = [
         {
@@ -237,20 +219,10 @@ def seed_service_types():
         },
     ]
 
-    created_count = 0
-    for data in service_types_data:
-        if not ServiceType.objects.filter(name=data['name']).exists():
-            ServiceType.objects.create(**data)
-            created_count += 1
-            print(f"✓ Created Service Type: {data['name']}")
-        else:
-            print(f"- Skipped (exists): {data['name']}")
+    return service_types_data
 
-    print(f"Service Types: Created {created_count} new, Total: {ServiceType.objects.count()}\n")
-
-def seed_target_populations():
-    """Seed Target Populations"""
-    print("Seeding Target Populations data...")
+def target_populations_rows():
+    """Target Populations to import"""
 
     target_populations_data = [
         {
@@ -303,26 +275,24 @@ def seed_target_populations():
         },
     ]
 
-    created_count = 0
-    for data in target_populations_data:
-        if not TargetPopulation.objects.filter(name=data['name']).exists():
-            TargetPopulation.objects.create(**data)
-            created_count += 1
-            print(f"✓ Created Target Population: {data['name']}")
-        else:
-            print(f"- Skipped (exists): {data['name']}")
-
-    print(f"Target Populations: Created {created_count} new, Total: {TargetPopulation.objects.count()}\n")
+    return target_populations_data
 
 def main():
     print("="*60)
     print("Starting DESDE-LTC Classification Data Seeding")
     print("="*60 + "\n")
 
-    seed_mtc()
-    seed_bsic()
-    seed_service_types()
-    seed_target_populations()
+    result = import_directory({
+        'mtc': mtc_rows(),
+        'bsic': bsic_rows(),
+        'service_types': service_types_rows(),
+        'target_populations': target_populations_rows(),
+    }, file_name='seed_classifications.py', update=False)
+
+    for table, counts in result.tables.items():
+        print(f"{table}: Created {counts['created']} new, skipped {counts['unchanged']} existing")
+    for error in result.errors:
+        print(f"✗ {error['table']} {error['key']}: {error['error']}")
 
     print("="*60)
     print("Seeding completed successfully!")
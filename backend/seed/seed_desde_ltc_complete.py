@@ -13,6 +13,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 django.setup()
 
+from apps.directory.importer import import_directory
 from apps.directory.models import MainTypeOfCare
 
 def get_service_delivery_type(code):
@@ -276,86 +277,24 @@ def seed_desde_ltc():
     print(f"  Non-healthcare codes (SR, SD, SO, SA, SI): {non_healthcare_count}")
     print(f"  Total: {len(DESDE_LTC_CODES)}\n")
 
-    # Process first phase: root codes (codes without parents)
-    print("Phase 1: Creating/Updating root codes...")
-    root_codes_created = 0
-    root_codes_updated = 0
-    for data in DESDE_LTC_CODES:
-        if data['parent'] is None:
-            code = data['code']
-            obj, created = MainTypeOfCare.objects.update_or_create(
-                code=code,
-                defaults={
-                    'name': data['name'],
-                    'description': data['name'],  # Use name as description
-                    'parent': None,
-                    'is_healthcare': is_healthcare_code(code),
-                    'service_delivery_type': get_service_delivery_type(code),
-                    'is_active': True
-                }
-            )
-            if created:
-                root_codes_created += 1
-                print(f"✓ Created root: {code} - {data['name'][:60]}...")
-            else:
-                root_codes_updated += 1
-                print(f"✓ Updated root: {code} - {data['name'][:60]}...")
-    print(f"Phase 1 Complete: {root_codes_created} created, {root_codes_updated} updated\n")
-
-    # Process remaining codes in multiple passes (to handle hierarchies)
-    max_passes = 5
-    for pass_num in range(1, max_passes + 1):
-        print(f"Phase {pass_num + 1}: Creating/Updating level {pass_num} codes...")
-        created_in_pass = 0
-        updated_in_pass = 0
-
-        for data in DESDE_LTC_CODES:
-            if data['parent'] is not None:
-                code = data['code']
-                parent_code = data['parent']
-
-                # Check if parent exists
-                parent_obj = MainTypeOfCare.objects.filter(code=parent_code).first()
-                if parent_obj:
-                    obj, created = MainTypeOfCare.objects.update_or_create(
-                        code=code,
-                        defaults={
-                            'name': data['name'],
-                            'description': data['name'],  # Use name as description
-                            'parent': parent_obj,
-                            'is_healthcare': is_healthcare_code(code),
-                            'service_delivery_type': get_service_delivery_type(code),
-                            'is_active': True
-                        }
-                    )
-                    if created:
-                        created_in_pass += 1
-                        if created_in_pass <= 10:  # Show first 10 of each phase
-                            print(f"✓ Created {code} (parent: {parent_code})")
-                    else:
-                        updated_in_pass += 1
-                        if updated_in_pass <= 10:
-                            print(f"✓ Updated {code} (parent: {parent_code})")
-
-        total_changes = created_in_pass + updated_in_pass
-        if total_changes > 10:
-            print(f"  ... and {total_changes - 10} more codes")
-        print(f"Phase {pass_num + 1} Complete: {created_in_pass} created, {updated_in_pass} updated\n")
-
-        if total_changes == 0:
-            print("All codes processed successfully!")
-            break
-
-    # Update levels for all codes based on parent chain
-    print("Updating hierarchy levels...")
-    updated_levels = 0
-    for mtc in MainTypeOfCare.objects.all():
-        calculated_level = mtc.get_hierarchy_level()
-        if mtc.level != calculated_level:
-            mtc.level = calculated_level
-            mtc.save(update_fields=['level'])
-            updated_levels += 1
-    print(f"✓ Updated {updated_levels} hierarchy levels\n")
+    # One bulk import: parents are written before their children, levels derived
+    result = import_directory({'mtc': [
+        {
+            'code': data['code'],
+            'name': data['name'],
+            'description': data['name'],  # Use name as description
+            'parent': data['parent'],
+            'is_healthcare': is_healthcare_code(data['code']),
+            'service_delivery_type': get_service_delivery_type(data['code']),
+            'is_active': True,
+        }
+        for data in DESDE_LTC_CODES
+    ]}, file_name='seed_desde_ltc_complete.py')
+    counts = result.tables['mtc']
+    print(f"Created {counts['created']}, updated {counts['updated']}, unchanged {counts['unchanged']}")
+    for error in result.errors:
+        print(f"✗ {error['key']}: {error['error']}")
+    print()
 
     # Final summary
     total_created = MainTypeOfCare.objects.count()
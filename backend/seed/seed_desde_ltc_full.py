@@ -13,6 +13,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 django.setup()
 
+from apps.directory.importer import import_directory
 from apps.directory.models import MainTypeOfCare
 
 def seed_desde_ltc():
@@ -140,57 +141,11 @@ def seed_desde_ltc():
         {'code': 'I2.2', 'name': 'Layanan Informasi, Non Interaktif', 'description': 'Layanan Informasi, Non Interaktif', 'parent': 'I2'},
     ]
 
-    # Process first phase: root codes (codes without parents)
-    print("Phase 1: Creating root codes...")
-    root_codes_created = 0
-    for data in DESDE_LTC_CODES:
-        if data['parent'] is None:
-            code = data['code']
-            if not MainTypeOfCare.objects.filter(code=code).exists():
-                MainTypeOfCare.objects.create(
-                    code=code,
-                    name=data['name'],
-                    description=data['description'],
-                    parent=None,
-                    is_active=True
-                )
-                root_codes_created += 1
-                print(f"✓ Created root: {code} - {data['name'][:60]}...")
-    print(f"Phase 1 Complete: {root_codes_created} root codes created\n")
-
-    # Process remaining codes in multiple passes (to handle hierarchies)
-    max_passes = 5
-    for pass_num in range(1, max_passes + 1):
-        print(f"Phase {pass_num + 1}: Creating level {pass_num} codes...")
-        created_in_pass = 0
-
-        for data in DESDE_LTC_CODES:
-            if data['parent'] is not None:
-                code = data['code']
-                parent_code = data['parent']
-
-                # Check if code already exists
-                if MainTypeOfCare.objects.filter(code=code).exists():
-                    continue
-
-                # Check if parent exists
-                parent_obj = MainTypeOfCare.objects.filter(code=parent_code).first()
-                if parent_obj:
-                    MainTypeOfCare.objects.create(
-                        code=code,
-                        name=data['name'],
-                        description=data['description'],
-                        parent=parent_obj,
-                        is_active=True
-                    )
-                    created_in_pass += 1
-                    print(f"✓ Created {code} (parent: {parent_code})")
-
-        print(f"Phase {pass_num + 1} Complete: {created_in_pass} codes created\n")
-
-        if created_in_pass == 0:
-            print("All codes created successfully!")
-            break
+    # One bulk import of the missing codes, parents before their children
+    result = import_directory({'mtc': DESDE_LTC_CODES}, file_name='seed_desde_ltc_full.py', update=False)
+    print(f"Created {result.tables['mtc']['created']} codes, {result.tables['mtc']['unchanged']} already existed")
+    for error in result.errors:
+        print(f"✗ {error['key']}: {error['error']}")
 
     total_created = MainTypeOfCare.objects.count()
     print(f"\n{'='*60}")
@@ -15,6 +15,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 django.setup()
 
 from decimal import Decimal
+from apps.directory.importer import import_directory
 from apps.directory.models import Service, MainTypeOfCare, BasicStableInputsOfCare, ServiceType, TargetPopulation
 from apps.survey.models import Survey
 from apps.accounts.models import User
@@ -78,9 +79,6 @@ def ensure_classifications():
         {"code": "A", "name": "Accessibility", "description": "Accessibility and information services"},
     ]
 
-    for data in mtc_data:
-        MainTypeOfCare.objects.get_or_create(code=data["code"], defaults=data)
-
     # Basic Stable Inputs of Care (BSIC)
     bsic_data = [
         {"code": "R1.1", "name": "Psychiatric Hospital Ward", "description": "Inpatient psychiatric ward"},
@@ -92,9 +90,6 @@ def ensure_classifications():
         {"code": "A1.1", "name": "Information Service", "description": "Mental health information"},
     ]
 
-    for data in bsic_data:
-        BasicStableInputsOfCare.objects.get_or_create(code=data["code"], defaults=data)
-
     # Service Types
     service_types = [
         {"name": "Rumah Sakit Umum", "description": "General hospital with mental health services"},
@@ -106,9 +101,6 @@ def ensure_classifications():
         {"name": "Posyandu Jiwa", "description": "Community mental health post"},
     ]
 
-    for data in service_types:
-        ServiceType.objects.get_or_create(name=data["name"], defaults=data)
-
     # Target Populations
     populations = [
         {"name": "Dewasa", "description": "Adult population (18-64 years)"},
@@ -117,9 +109,12 @@ def ensure_classifications():
         {"name": "Semua Usia", "description": "All age groups"},
     ]
 
-    for data in populations:
-        TargetPopulation.objects.get_or_create(name=data["name"], defaults=data)
-
+    import_directory({
+        'mtc': mtc_data,
+        'bsic': bsic_data,
+        'service_types': service_types,
+        'target_populations': populations,
+    }, file_name='seed_kebumen_services.py', update=False)
     print("Classifications ensured")
 
 
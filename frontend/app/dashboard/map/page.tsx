@@ -154,7 +154,7 @@ export default function ServiceDistributionMapPage() {
                 <div className="space-y-3">
                   {stats?.geographic_distribution?.slice(0, 5).map((item, idx) => (
                     <div key={idx} className="flex items-center justify-between">
-                      <span className="text-sm font-medium">{item.city}</span>
+                      <span className="text-sm font-medium">{item.city ?? "Di luar wilayah"}</span>
                       <span className="text-sm text-muted-foreground">{item.count} layanan</span>
                     </div>
                   )) || (
@@ -2,6 +2,7 @@
 
 import { Map, MapControls, MapMarker, MarkerContent, MarkerPopup, MapGeoJSON } from "@/components/ui/map";
 import { cn } from "@/lib/utils";
+import { API_BASE_URL } from "@/lib/api-client";
 import { Badge } from "@/components/ui/badge";
 import Image from "next/image";
 
@@ -246,7 +247,7 @@ export function KebumenMap({
         maxZoom={15}
       >
         <MapGeoJSON
-          data="/data/33.05_kecamatan.geojson"
+          data={`${API_BASE_URL}/geo/boundaries/?zoom=10`}
           fillColor="#00979D"
           fillOpacity={0.2}
           strokeColor="#007A80"
@@ -8,6 +8,7 @@ import { apiClient } from '@/lib/api-client';
 import {
   Service,
   ServiceListItem,
+  ServiceMapPoint,
   PaginatedResponse,
   MainTypeOfCare,
   BasicStableInputsOfCare,
@@ -65,7 +66,7 @@ export const serviceStatsQueryOptions = () =>
 export const servicesMapQueryOptions = () =>
   queryOptions({
     queryKey: queryKeys.services.map(),
-    queryFn: () => apiClient.get<ServiceListItem[]>('/directory/services/map/'),
+    queryFn: () => apiClient.get<ServiceMapPoint[]>('/directory/services/map/'),
     staleTime: 5 * 60 * 1000, // Map data can be stale for 5 minutes
   });
 
@@ -10,7 +10,7 @@ const getApiBaseUrl = () => {
   return `${baseUrl}/v1`;
 };
 
-const API_BASE_URL = getApiBaseUrl();
+export const API_BASE_URL = getApiBaseUrl();
 
 export interface ApiError {
   message: string;
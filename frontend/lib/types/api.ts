@@ -134,6 +134,15 @@ export interface ServiceListItem {
   accepts_emergency?: boolean;
 }
 
+export interface ServiceMapPoint {
+  id: number;
+  name: string;
+  mtc_code: string | null;
+  latitude: number;
+  longitude: number;
+  distance_km?: number;
+}
+
 // Survey Models
 export interface SurveyService {
   id: number;
@@ -337,7 +346,7 @@ export interface DashboardStats {
     nurses: number;
     social_workers: number;
   };
-  geographic_distribution: Array<{ city: string; count: number }>;
+  geographic_distribution: Array<{ region_id: number | null; region_code: string | null; city: string | null; count: number }>;
   mtc_distribution: Array<{ mtc__code: string; mtc__name: string; count: number }>;
   system_health: {
     unresolved_errors: number;